@@ -0,0 +1,161 @@
+"""
+Load test: a burst of concurrent chat streams with and without admission control.
+
+The fake provider slows down with every stream it serves at once, like a
+rate-limited upstream. Without admission control every request opens an
+upstream stream and all of them get slow; with it, the server keeps
+`--max-streams` running, queues a bounded number and refuses the rest at
+once with a Retry-After.
+
+    python bench/bench_admission.py [--requests 500] [--max-streams 50] [--queue 50]
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+import common
+import httpx
+
+
+class LoadedStream:
+    """A streamed answer whose latency grows with the streams running at once."""
+
+    def __init__(self, state: dict):
+        self.state = state
+
+    async def __aiter__(self):
+        state = self.state
+        state["active"] += 1
+        state["peak"] = max(state["peak"], state["active"])
+        try:
+            await asyncio.sleep(0.2 + 0.004 * state["active"])
+            for index in range(20):
+                await asyncio.sleep(0.02 + 0.0004 * state["active"])
+                yield SimpleNamespace(text=f"t{index} ", usage_metadata=None)
+        finally:
+            state["active"] -= 1
+
+    async def close(self):
+        pass
+
+
+def serve(port: int):
+    """Run the app with the loaded fake provider (in the server subprocess)."""
+    import uvicorn
+    from main import app
+    from services_instance import model_service
+    from tests.fakes import FakeGenai, install
+
+    state = {"active": 0, "peak": 0}
+
+    class LoadedModel:
+        def __init__(self, model_name, **kwargs):
+            self.name = model_name
+
+        async def generate_content_async(self, prompt, stream=False, request_options=None):
+            return LoadedStream(state)
+
+    genai = FakeGenai()
+    genai.GenerativeModel = LoadedModel
+    install(model_service, genai)
+
+    @app.get("/bench/peak")
+    async def peak():
+        return state
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="error", backlog=4096)
+
+
+async def one_stream(client, index: int):
+    started = time.perf_counter()
+    body = {"message": f"message {index}", "model": "gemini-2.5-flash", "session_id": f"bench-{index}"}
+    async with client.stream("POST", "/api/chat/stream", json=body) as response:
+        await response.aread()
+        return response.status_code, time.perf_counter() - started, response.headers.get("retry-after")
+
+
+async def burst(base: str, requests: int):
+    limits = httpx.Limits(max_connections=requests + 10, max_keepalive_connections=requests + 10)
+    async with httpx.AsyncClient(base_url=base, timeout=120, limits=limits) as client:
+        await one_stream(client, -1)
+        results = await asyncio.gather(*(one_stream(client, index) for index in range(requests)))
+        peak = (await client.get("/bench/peak")).json()["peak"]
+    return results, peak
+
+
+def wait_ready(url: str, process):
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise SystemExit("the benchmark server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--max-streams", type=int, default=50)
+    parser.add_argument("--queue", type=int, default=50)
+    parser.add_argument("--queue-timeout", type=float, default=3.0)
+    parser.add_argument("--port", type=int, default=8760)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.port)
+        return
+
+    for enabled in ("false", "true"):
+        env = dict(
+            os.environ,
+            ADMISSION_ENABLED=enabled,
+            ADMISSION_MAX_STREAMS=str(args.max_streams),
+            ADMISSION_QUEUE_SIZE=str(args.queue),
+            ADMISSION_QUEUE_TIMEOUT=str(args.queue_timeout),
+            CLIENT_RATE_PER_MINUTE="0",  # Every request comes from one address
+            SESSION_STORE="memory",
+            HTTP_WARMUP_CONNECTIONS="0",
+            LOG_LEVEL="WARNING",
+        )
+        with tempfile.TemporaryDirectory() as workdir:
+            server = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(args.port)],
+                env=env, cwd=workdir
+            )
+            try:
+                base = f"http://127.0.0.1:{args.port}"
+                wait_ready(base + "/", server)
+                results, peak = asyncio.run(burst(base, args.requests))
+            finally:
+                server.terminate()
+                server.wait()
+
+        served = sorted(seconds for status, seconds, _ in results if status == 200)
+        refused = sorted(seconds for status, seconds, _ in results if status != 200)
+        codes = sorted({status for status, _, _ in results if status != 200})
+        retry_after = sorted({int(value) for status, _, value in results if status != 200 and value})
+        print(
+            f"admission={'on' if enabled == 'true' else 'off'}: {len(served)} served, "
+            f"{len(refused)} refused {codes}, peak upstream streams {peak}"
+        )
+        if served:
+            print(
+                f"  served   p50 {common.ms(common.median(served))}  p99 {common.ms(common.percentile(served, 0.99))}"
+                f"  max {common.ms(served[-1])}"
+            )
+        if refused:
+            print(
+                f"  refused  p50 {common.ms(common.median(refused))}  p99 {common.ms(common.percentile(refused, 0.99))}"
+                f"  retry-after {retry_after}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark: the "auto" model router on simulated traffic against simulated providers.
+
+"simulate" routes generated requests and compares the response times with
+sending every tier to one fixed model; halfway through, one model degrades
+and the router should route around it. "replay" re-decides a decision log
+with the current heuristic.
+
+    python bench/bench_auto_router.py simulate [--requests 5000] [--log decisions.jsonl]
+    python bench/bench_auto_router.py replay decisions.jsonl
+"""
+
+import argparse
+import json
+import random
+from typing import Optional, Tuple
+import common
+from config import AVAILABLE_MODELS, AUTO_EXPECTED_CHARS
+from services.auto_router import TIERS, AutoRouter, complexity_tier, extract_features
+from services.routing_policy import RoutingPolicy, percentile
+
+# Per model: median seconds to first token, characters per second, failure probability
+SIMULATED_PROVIDERS = {
+    "gemini-2.5-flash-lite": (0.35, 900, 0.01),
+    "gpt-4o-mini": (0.45, 700, 0.01),
+    "gemini-2.5-flash": (0.6, 600, 0.01),
+    "gpt-4.1-mini": (0.55, 550, 0.01),
+    "gemini-2.5-pro": (2.5, 300, 0.02),
+    "gpt-4.1": (0.9, 250, 0.02),
+}
+
+SIMULATED_PROMPTS = [
+    "Здравей!",
+    "thanks, that helps",
+    "What is the capital of Bulgaria?",
+    "Напиши кратко описание на продукта за онлайн магазин.",
+    "Summarize this paragraph in two sentences: " + "lorem ipsum dolor sit amet " * 20,
+    "Обясни стъпка по стъпка защо алгоритъмът на Дейкстра не работи с отрицателни тегла.",
+    "Compare the trade-offs of event sourcing and CRUD for an order system and explain when each fits.",
+    "Debug this:\n```python\ndef mean(xs):\n    return sum(xs) / len(xs) - 1\n```\nWhy is the result wrong?",
+]
+
+
+class SimulatedCatalogue:
+    """Model catalogue for the simulation: every catalogue model is available."""
+
+    def get_model_info(self, model_name: str) -> dict:
+        for company_models in AVAILABLE_MODELS.values():
+            if model_name in company_models:
+                return company_models[model_name]
+        return {}
+
+    def is_available(self, model_name: str) -> bool:
+        return bool(self.get_model_info(model_name))
+
+
+def simulate(
+    requests: int = 5000,
+    seed: int = 1,
+    slow_model: Optional[str] = "gemini-2.5-flash-lite",
+    log_path: str = ""
+) -> dict:
+    """
+    Route simulated traffic and compare it with fixed per-tier models.
+
+    Provider latency is sampled from SIMULATED_PROVIDERS; halfway through,
+    slow_model degrades to six times its first-token latency, which the
+    live measurements should route around. The baseline sends every tier
+    to its first candidate regardless of measured latency. The same seed
+    gives the same traffic, and the decision log can be replayed.
+
+    Args:
+        requests: Number of simulated requests
+        seed: Random seed for traffic, latency and exploration
+        slow_model: Model that degrades halfway through, None for none
+        log_path: Where to write the router's decision log, empty for none
+
+    Returns:
+        Mean and p95 response time for both policies and the router's decision stats
+    """
+    rng = random.Random(seed)
+    random.seed(seed)
+    catalogue = SimulatedCatalogue()
+    policy = RoutingPolicy(catalogue, failover=False, hedge=False)
+    router = AutoRouter(catalogue, policy, log_path=log_path)
+    baseline = {
+        tier: next(name for name in router.candidates if router._tier_of(name) == tier)
+        for tier in TIERS
+    }
+
+    def call(model_name: str, degraded: bool) -> Tuple[bool, float, float]:
+        ttft, chars_per_second, failure = SIMULATED_PROVIDERS[model_name]
+        if degraded and model_name == slow_model:
+            ttft *= 6
+        return rng.random() >= failure, ttft * rng.lognormvariate(0, 0.3), chars_per_second
+
+    auto_times, baseline_times = [], []
+    for index in range(requests):
+        degraded = index >= requests // 2
+        message = rng.choice(SIMULATED_PROMPTS)
+        turns = rng.randint(0, 30)
+        tier = complexity_tier(extract_features(message, turns))
+        chars = AUTO_EXPECTED_CHARS[tier] * rng.uniform(0.5, 1.5)
+
+        model_name = router.choose(message, turns)
+        ok, ttft, chars_per_second = call(model_name, degraded)
+        policy.record(model_name, ok, ttft if ok else None)
+        if ok:
+            policy.record_throughput(model_name, int(chars), chars / chars_per_second)
+            auto_times.append(ttft + chars / chars_per_second)
+
+        ok, ttft, chars_per_second = call(baseline[tier], degraded)
+        if ok:
+            baseline_times.append(ttft + chars / chars_per_second)
+
+    router.close()
+    stats = router.get_stats()
+    stats.pop("recent")
+    return {
+        "requests": requests,
+        "auto": {
+            "mean_seconds": sum(auto_times) / len(auto_times),
+            "p95_seconds": percentile(auto_times, 0.95),
+        },
+        "baseline": {
+            "models": baseline,
+            "mean_seconds": sum(baseline_times) / len(baseline_times),
+            "p95_seconds": percentile(baseline_times, 0.95),
+        },
+        "decisions": stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("simulate", help="Route simulated traffic")
+    run.add_argument("--requests", type=int, default=5000)
+    run.add_argument("--seed", type=int, default=1)
+    run.add_argument("--slow-model", default="gemini-2.5-flash-lite")
+    run.add_argument("--log", default="", help="Write the decision log to this file")
+    again = commands.add_parser("replay", help="Re-decide a decision log with the current heuristic")
+    again.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "simulate":
+        result = simulate(args.requests, args.seed, args.slow_model or None, args.log)
+    else:
+        catalogue = SimulatedCatalogue()
+        result = AutoRouter(catalogue, RoutingPolicy(catalogue)).replay(args.path)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Benchmark: batch job throughput against sending the prompts one request at a time.
+
+The fake provider answers every prompt after a fixed latency. The baseline
+streams each prompt through ChatService in turn, the way the nightly jobs used
+/api/chat/stream; the batch job runs the same prompts through its worker pool,
+then under a provider rate limit, and finally against an instant provider,
+which leaves only the job's own per-prompt overhead.
+
+    python bench/bench_batch.py [--prompts 2000] [--latency 0.1] [--concurrency 16] [--rate 1200]
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+import common
+from services.batch_service import BatchService
+from services.chat_service import ChatService
+from services.memory_service import ConversationMemoryManager
+from services.model_service import ModelService
+from tests.fakes import FakeGenai, FakeOpenAI, FakeProvider, install
+
+MODEL = "gemini-2.5-flash"
+
+
+async def upload(count: int):
+    """Request body chunks of a JSONL input with `count` prompts."""
+    lines = [json.dumps({"id": f"p{index}", "message": f"Обобщи запис {index}", "model": MODEL}) for index in range(count)]
+    data = ("\n".join(lines) + "\n").encode("utf-8")
+    for start in range(0, len(data), 64 * 1024):
+        yield data[start:start + 64 * 1024]
+
+
+def fake_models(latency: float):
+    model_service = ModelService()
+    provider = FakeProvider(parts=1, ttft=latency)
+    install(model_service, FakeGenai(provider), FakeOpenAI())
+    return model_service, provider
+
+
+async def one_at_a_time(prompts: int, latency: float) -> float:
+    """Prompts per second when each one is a separate streamed chat request."""
+    model_service, _ = fake_models(latency)
+    chat = ChatService(model_service, ConversationMemoryManager())
+    chat.response_cache.enabled = False
+    started = time.perf_counter()
+    for index in range(prompts):
+        async for _ in chat.stream_events(f"Обобщи запис {index}", MODEL, f"batch-{index}"):
+            pass
+    return prompts / (time.perf_counter() - started)
+
+
+async def batch_job(prompts: int, latency: float, concurrency: int, rate: float = 0):
+    """Run one job; returns prompts per second and the provider's peak concurrency."""
+    model_service, provider = fake_models(latency)
+    with tempfile.TemporaryDirectory() as directory:
+        service = BatchService(
+            model_service,
+            directory=directory,
+            concurrency={"google": concurrency, "openai": concurrency},
+            rate_per_minute={"google": rate} if rate else {},
+        )
+        started = time.perf_counter()
+        job = await service.create_job(upload(prompts))
+        await service._tasks[job.id]
+        elapsed = time.perf_counter() - started
+        if job.state != "completed" or job.failed:
+            raise SystemExit(f"the job ended {job.state} with {job.failed} failed prompts")
+    return prompts / elapsed, provider.peak_in_flight
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--prompts", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds the provider takes per prompt")
+    parser.add_argument("--concurrency", type=int, default=16, help="Provider concurrency limit")
+    parser.add_argument("--rate", type=float, default=1200, help="Provider rate limit, requests per minute")
+    args = parser.parse_args()
+
+    sample = min(args.prompts, 50)
+    rate = asyncio.run(one_at_a_time(sample, args.latency))
+    print(f"one request at a time: {rate:8.1f} prompts/s ({args.prompts / rate:.0f} s for {args.prompts} prompts)")
+
+    rate, peak = asyncio.run(batch_job(args.prompts, args.latency, args.concurrency))
+    ceiling = args.concurrency / args.latency
+    print(
+        f"batch job:             {rate:8.1f} prompts/s ({rate / ceiling:.0%} of the {ceiling:.0f}/s"
+        f" the concurrency limit allows, peak {peak} in flight)"
+    )
+
+    limited = min(args.prompts, int(args.rate / 60 * 10))
+    rate, _ = asyncio.run(batch_job(limited, args.latency, args.concurrency, args.rate))
+    burst = max(1, int(args.rate / 60))
+    print(f"rate limited:          {rate:8.1f} prompts/s (limit {args.rate / 60:.0f}/s after a burst of {burst})")
+
+    rate, _ = asyncio.run(batch_job(args.prompts, 0, args.concurrency))
+    print(f"instant provider:      {rate:8.1f} prompts/s, {1_000_000 / rate:.0f} us of overhead per prompt")
+
+
+if __name__ == "__main__":
+    main()
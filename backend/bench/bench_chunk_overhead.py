@@ -0,0 +1,106 @@
+"""
+Micro-benchmark: per-chunk overhead of the streaming path, before and after.
+
+"before" replays the old loop body: an id()-keyed dedup set, `+=` into the
+full response, json.dumps and a flushed print per chunk (to /dev/null here,
+so the terminal is not the bottleneck). "after" is the current loop: a list
+buffer and a level-gated logger that only enqueues records. The end-to-end
+numbers stream zero-latency fake answers through ChatService.
+
+    python bench/bench_chunk_overhead.py [--chunks 50000]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from types import SimpleNamespace
+import common
+from logger import get_logger
+from services.model_service import ModelService
+from services.memory_service import ConversationMemoryManager
+from services.chat_service import ChatService, sse_frame
+from tests.fakes import FakeGenai, FakeOpenAI, FakeProvider, install
+
+logger = get_logger("bench")
+
+
+def before(chunks, output):
+    """The old per-chunk work of _stream_google plus the frame it produced."""
+    sent_chunks = set()
+    full_response = ""
+    count = 0
+    for chunk in chunks:
+        if chunk.text:
+            chunk_id = id(chunk)
+            if chunk_id not in sent_chunks:
+                sent_chunks.add(chunk_id)
+                text = chunk.text
+                count += 1
+                full_response += text
+                data = json.dumps({"text": text}, ensure_ascii=False)
+                print(f"[BACKEND LOG] google chunk #{count}: {data[:100]}...", file=output, flush=True)
+                frame = f"data: {data}\n\n"
+    return full_response, frame
+
+
+def after(chunks):
+    """The current per-chunk work: list buffer, gated logging, one frame."""
+    sent_chunks = []
+    log_chunks = logger.isEnabledFor(logging.DEBUG)
+    for chunk in chunks:
+        text = chunk.text
+        if text:
+            sent_chunks.append(text)
+            if log_chunks:
+                logger.debug("%s chunk #%d: %.100s", "google", len(sent_chunks), text)
+            frame = sse_frame({"text": text})
+    return "".join(sent_chunks), frame
+
+
+def per_chunk(function, chunks, *args) -> float:
+    """Best of three runs, in microseconds per chunk."""
+    best = float("inf")
+    for _ in range(3):
+        started = time.perf_counter()
+        function(chunks, *args)
+        best = min(best, time.perf_counter() - started)
+    return best / len(chunks) * 1e6
+
+
+async def end_to_end(model_name: str, parts: int) -> float:
+    """Microseconds per frame through ChatService.stream_response with instant fakes."""
+    provider = FakeProvider(parts=parts, ttft=0.0)
+    model_service = ModelService()
+    install(model_service, FakeGenai(provider), FakeOpenAI(provider))
+    chat_service = ChatService(model_service, ConversationMemoryManager())
+    best = float("inf")
+    for index in range(3):
+        started = time.perf_counter()
+        frames = 0
+        async for _ in chat_service.stream_response(f"message {index}", model_name, f"bench-{index}"):
+            frames += 1
+        best = min(best, (time.perf_counter() - started) / frames)
+    return best * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=50000)
+    args = parser.parse_args()
+    chunks = [SimpleNamespace(text=f"токен{index} ") for index in range(args.chunks)]
+
+    print(f"loop body, {args.chunks} chunks")
+    with open(os.devnull, "w") as output:
+        print(f"  before (print + dedup + +=): {per_chunk(before, chunks, output):6.2f} us/chunk")
+    print(f"  after (list + gated log):    {per_chunk(after, chunks):6.2f} us/chunk")
+
+    print("end to end, ChatService.stream_response")
+    for model_name in ("gemini-2.5-flash", "gpt-4o-mini"):
+        print(f"  {model_name:17s} {asyncio.run(end_to_end(model_name, args.chunks // 10)):6.2f} us/frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark: per-session memory footprint and OpenAI message assembly for 1k-turn histories.
+
+Compares LangChain message objects (the old storage) with the compact
+records, uncompressed and with old turns compressed by zlib and zstd.
+
+    python bench/bench_history.py [--turns 1000]
+"""
+
+import argparse
+import timeit
+import tracemalloc
+import common
+from langchain_core.messages import HumanMessage, AIMessage
+from services.memory_service import ConversationMemoryManager
+
+USER = "Можеш ли да ми обясниш как работи {0} в Python? " * 2
+ASSISTANT = "Разбира се! Ето подробно обяснение с примери за {0}. " * 12
+
+
+def traced(build):
+    """Build something and get it with the bytes it allocated."""
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def langchain_session(turns):
+    messages = []
+    for index in range(turns):
+        messages.append(HumanMessage(content=USER.format(index)))
+        messages.append(AIMessage(content=ASSISTANT.format(index)))
+    return messages
+
+
+def compact_session(turns, **options):
+    memory = ConversationMemoryManager(max_messages_per_session=10**6, max_total_bytes=10**12, **options)
+    for index in range(turns):
+        memory.add_message("s", "user", USER.format(index))
+        memory.add_message("s", "assistant", ASSISTANT.format(index))
+    return memory
+
+
+def assemble_langchain(history):
+    """The old _stream_openai loop over LangChain messages."""
+    messages = [{"role": "system", "content": "system"}]
+    for message in history[:-1]:
+        role = "user" if message.type == "human" else "assistant"
+        messages.append({"role": role, "content": message.content})
+    return messages
+
+
+def assemble_compact(memory):
+    """The same loop over compact (role, content) turns."""
+    messages = [{"role": "system", "content": "system"}]
+    for role, content in memory.get_turns("s")[:-1]:
+        messages.append({"role": role, "content": content})
+    return messages
+
+
+def best_ms(function) -> float:
+    return min(timeit.repeat(function, number=20, repeat=5)) / 20 * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=1000, help="User/assistant exchanges per session")
+    args = parser.parse_args()
+
+    history, langchain_bytes = traced(lambda: langchain_session(args.turns))
+    variants = [("langchain messages", langchain_bytes, lambda: assemble_langchain(history))]
+    for label, options in (
+        ("compact", {"compress_after_turns": 0}),
+        ("compact + zlib", {"compress_after_turns": 20, "compression": "zlib"}),
+        ("compact + zstd", {"compress_after_turns": 20, "compression": "zstd"}),
+    ):
+        memory, size = traced(lambda: compact_session(args.turns, **options))
+        variants.append((label, size, lambda memory=memory: assemble_compact(memory)))
+
+    print(f"{args.turns * 2} messages per session")
+    print(f"{'storage':<20} {'footprint':>12} {'assembly':>10}")
+    for label, size, assemble in variants:
+        print(f"{label:<20} {size / 1024:8.0f} KiB {best_ms(assemble):7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Soak benchmark: RSS stays flat while millions of sessions pass through memory.
+
+Each simulated session sends one message and gets one answer; the memory
+manager's session, message and byte caps keep the resident set bounded.
+
+    python bench/bench_memory_soak.py [--sessions 2000000] [--max-sessions 20000]
+"""
+
+import argparse
+import os
+import resource
+import time
+import common
+from services.memory_service import ConversationMemoryManager
+
+
+def rss_mb() -> float:
+    """Current resident set size (peak size where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=2_000_000)
+    parser.add_argument("--max-sessions", type=int, default=20_000)
+    parser.add_argument("--max-bytes", type=int, default=32 * 2**20)
+    args = parser.parse_args()
+
+    memory = ConversationMemoryManager(
+        max_sessions=args.max_sessions,
+        max_messages_per_session=20,
+        max_total_bytes=args.max_bytes,
+        session_ttl=3600,
+    )
+    report_every = max(args.sessions // 8, 1)
+    print(f"{'sessions seen':>14} {'rss':>10} {'held':>8} {'bytes':>10} {'lru':>9} {'bytes ev':>9}")
+    started = time.perf_counter()
+    for index in range(args.sessions):
+        session_id = f"s{index}"
+        memory.add_message(session_id, "user", "Здравей, как си? " * 3)
+        memory.add_message(session_id, "assistant", "Добре съм, благодаря! " * 5)
+        if index % report_every == 0 or index == args.sessions - 1:
+            stats = memory.get_stats()
+            print(
+                f"{index + 1:14d} {rss_mb():7.1f} MB {stats['sessions']:8d} {stats['bytes']:10d} "
+                f"{stats['evictions']['lru']:9d} {stats['evictions']['bytes']:9d}"
+            )
+    elapsed = time.perf_counter() - started
+    print(f"{elapsed / (args.sessions * 2) * 1e6:.2f} us per add_message")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmark: per-request model resolution when requests alternate between models.
+
+Compares building a Gemini GenerativeModel per request (what a model switch
+used to cost) with ModelService.resolve(), which builds each handle once. Uses
+the real Gemini SDK for the construction cost; nothing goes over the network.
+
+    python bench/bench_model_registry.py [--requests 100000]
+"""
+
+import argparse
+import time
+import common
+from services.model_service import ModelService
+
+MODELS = ["gemini-2.5-pro", "gemini-2.5-flash", "gpt-4o-mini", "gemini-2.0-flash"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100_000)
+    args = parser.parse_args()
+
+    model_service = ModelService()
+    genai = model_service.genai
+    gemini_models = [name for name in MODELS if model_service.get_provider(name) == "google"]
+
+    builds = 1000
+    started = time.perf_counter()
+    for index in range(builds):
+        genai.GenerativeModel(gemini_models[index % len(gemini_models)])
+    per_build = (time.perf_counter() - started) / builds
+
+    started = time.perf_counter()
+    for name in MODELS:
+        model_service.resolve(name)
+    first = (time.perf_counter() - started) / len(MODELS)
+
+    started = time.perf_counter()
+    for index in range(args.requests):
+        model_service.resolve(MODELS[index % len(MODELS)])
+    per_resolve = (time.perf_counter() - started) / args.requests
+
+    print(f"GenerativeModel per request:  {per_build * 1e6:8.2f} us")
+    print(f"resolve(), first per model:   {first * 1e6:8.2f} us  (builds the handle)")
+    print(f"resolve(), alternating:       {per_resolve * 1e6:8.2f} us")
+    print(f"handles built for {args.requests} requests: {len(model_service._handles)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Benchmark: time to first token of the first message after a pause, with and without the prepare hint.
+
+Every measured session is a long conversation stored in SQLite and not in
+memory, like a user coming back to it. With the hint, prepare_session() runs
+when the user starts typing: it loads the session, renders its prompt,
+uploads the Gemini prefix as cached content and reopens the OpenAI
+connection. The message follows after `--pause` seconds of typing.
+
+The fake Gemini model spends prefill time per uncached input token. OpenAI
+requests go to a local mock server over HTTP. Its connections expire while
+the user reads the last answer, and each new one waits `--connect-ms`,
+standing in for a remote host's TCP and TLS handshake.
+
+    python bench/bench_prepare.py [--sessions 5] [--turns 200] [--pause 1.0] [--connect-ms 60]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import common
+from bench_prompt_cache import prefill_genai
+from services.chat_service import ChatService
+from services.http_transport import HttpTransport
+from services.memory_service import ConversationMemoryManager
+from services.model_service import ModelService
+from services.session_store import SQLiteSessionStore
+from tests.fakes import install
+from tests.mock_provider import MockProvider
+
+MODELS = ("gemini-2.5-flash", "gpt-4o-mini")
+TURN = "подробен текст за темата " * 24
+
+
+def store_sessions(path: str, count: int, turns: int):
+    """Write `count` sessions of `turns` turns each to the store."""
+    memory = ConversationMemoryManager(store=SQLiteSessionStore(path))
+    for session in range(count):
+        for turn in range(turns):
+            memory.add_message(f"s{session}", "user" if turn % 2 == 0 else "assistant", f"Ход {turn}: {TURN}")
+    memory.close()
+
+
+async def first_token(chat: ChatService, session_id: str, model_name: str, hint: bool, pause: float) -> float:
+    # The user reads the last answer for longer than a connection stays open
+    await asyncio.sleep(chat.model_service.transport.keepalive_expiry + 0.2)
+    if hint:
+        await chat.prepare_session(session_id, model_name)
+    await asyncio.sleep(pause)  # The user types the message
+    started = time.perf_counter()
+    async for event in chat.stream_events("И какво следва?", model_name, session_id):
+        if "text" in event:
+            return time.perf_counter() - started
+        if "error" in event:
+            raise SystemExit(f"{model_name} failed: {event['error']}")
+    raise SystemExit(f"{model_name} answered without text")
+
+
+async def run(args) -> dict:
+    provider = MockProvider(chunks=5, connect_delay=args.connect_ms / 1000)
+    os.environ["OPENAI_BASE_URL"] = await provider.start()
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+        sessions = len(MODELS) * 2 * args.sessions
+        store_sessions(path, sessions, args.turns)
+
+        model_service = ModelService()
+        # Connections outlive the typing but not the reading before it
+        model_service.transport = HttpTransport(keepalive_expiry=args.pause + 0.5)
+        install(model_service, prefill_genai(args.prefill_us / 1_000_000), model_service.openai_client)
+        memory = ConversationMemoryManager(store=SQLiteSessionStore(path))
+        chat = ChatService(model_service, memory)
+        chat.response_cache.enabled = False
+
+        # Open the first connection, so every measured run finds it expired
+        await chat.model_service.warm_connection("openai")
+        next_session = 0
+        for model_name in MODELS:
+            for hint in (False, True):
+                ttfts = []
+                for _ in range(args.sessions):
+                    ttfts.append(await first_token(chat, f"s{next_session}", model_name, hint, args.pause))
+                    next_session += 1
+                results[model_name, hint] = ttfts
+        await chat.prompt_cache.aclose()
+        memory.close()
+        await model_service.aclose()
+    await provider.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=5, help="Sessions measured per model and mode")
+    parser.add_argument("--turns", type=int, default=200, help="Stored turns per session")
+    parser.add_argument("--pause", type=float, default=1.0, help="Seconds between the hint and the message")
+    parser.add_argument("--connect-ms", type=float, default=60, help="Setup time of a new OpenAI connection")
+    parser.add_argument("--prefill-us", type=float, default=20, help="Gemini prefill per uncached token")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    for model_name in MODELS:
+        without, with_hint = results[model_name, False], results[model_name, True]
+        print(
+            f"{model_name:18} ttft without hint {common.ms(common.median(without))}"
+            f"  with hint {common.ms(common.median(with_hint))}"
+            f"  ({1 - common.median(with_hint) / common.median(without):.0%} lower)"
+        )
+
+
+if __name__ == "__main__":
+    main()
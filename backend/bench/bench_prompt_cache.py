@@ -0,0 +1,119 @@
+"""
+Benchmark: time to first token and input tokens of a long session with and without Gemini prompt caching.
+
+The fake Gemini model takes longer to its first token the more uncached input
+tokens it is sent, like a provider's prefill, and reports cached tokens in its
+usage metadata like the real API. Uploads of cached content go through the
+fake caching API in the background, as they would in production.
+
+    python bench/bench_prompt_cache.py [--turns 40] [--prefill-us 20]
+"""
+
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+import common
+from services.chat_service import ChatService
+from services.memory_service import ConversationMemoryManager
+from services.model_service import ModelService
+from services.prompt_cache import PromptCache
+from tests.fakes import FakeGenai, install
+
+MODEL = "gemini-2.5-flash"
+ANSWER = ["Отговор " * 60, "с подробности " * 40]
+
+
+class PrefillStream:
+    """A streamed answer that starts after the prefill of the uncached input."""
+
+    def __init__(self, prompt_tokens: int, cached_tokens: int, prefill: float):
+        self.prompt_tokens = prompt_tokens
+        self.cached_tokens = cached_tokens
+        self.prefill = prefill
+
+    async def __aiter__(self):
+        await asyncio.sleep(0.05 + self.prefill * (self.prompt_tokens - self.cached_tokens))
+        for index, text in enumerate(ANSWER):
+            usage = SimpleNamespace(
+                prompt_token_count=self.prompt_tokens,
+                candidates_token_count=len(text) // 4,
+                cached_content_token_count=self.cached_tokens,
+            )
+            yield SimpleNamespace(text=text, usage_metadata=usage if index == len(ANSWER) - 1 else None)
+
+    async def close(self):
+        pass
+
+
+def prefill_genai(prefill: float) -> FakeGenai:
+    """Fake genai module whose models charge prefill time per uncached token."""
+    genai = FakeGenai()
+
+    class PrefillModel:
+        def __init__(self, model_name, system_instruction=None, generation_config=None, cache=None):
+            self.cache = cache
+
+        @classmethod
+        def from_cached_content(cls, cache, generation_config=None):
+            return cls(cache.model, cache=cache)
+
+        async def generate_content_async(self, prompt, stream=False, request_options=None):
+            cached = self.cache.tokens if self.cache else 0
+            return PrefillStream(len(prompt) // 4 + cached, cached, prefill)
+
+    genai.GenerativeModel = PrefillModel
+    return genai
+
+
+async def session(enabled: bool, turns: int, prefill: float) -> dict:
+    model_service = ModelService()
+    genai, _ = install(model_service, prefill_genai(prefill))
+    chat = ChatService(model_service, ConversationMemoryManager())
+    chat.response_cache.enabled = False
+    chat.prompt_cache = PromptCache(model_service, enabled=enabled)
+
+    ttfts = []
+    for turn in range(turns):
+        message = f"Въпрос {turn}: " + "разкажи повече за темата " * 25
+        started = time.perf_counter()
+        first = None
+        async for event in chat.stream_events(message, MODEL, "long"):
+            if first is None and "text" in event:
+                first = time.perf_counter() - started
+        ttfts.append(first)
+        # The user reads the answer; uploads finish in the meantime
+        while chat.prompt_cache._tasks:
+            await asyncio.gather(*chat.prompt_cache._tasks)
+    await chat.prompt_cache.aclose()
+    return {
+        "ttfts": ttfts,
+        "usage": chat.usage.get_session_usage("long"),
+        "uploads": len(genai.caches),
+        "deleted": sum(cache.deleted for cache in genai.caches),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--prefill-us", type=float, default=20, help="Microseconds of prefill per uncached token")
+    args = parser.parse_args()
+
+    for enabled in (False, True):
+        result = asyncio.run(session(enabled, args.turns, args.prefill_us / 1_000_000))
+        ttfts, usage = result["ttfts"], result["usage"]
+        early, late = ttfts[:10], ttfts[10:]
+        print(
+            f"prompt cache {'on' if enabled else 'off'}: ttft turns 1-10 mean {common.ms(sum(early) / len(early))}"
+            f"  later turns mean {common.ms(sum(late) / len(late))}  max {common.ms(max(late))}"
+        )
+        print(
+            f"  input tokens {usage['input_tokens']}, cached {usage['cached_tokens']}"
+            f" ({usage['cached_tokens'] / usage['input_tokens']:.0%}), cost ${usage['cost_usd']:.4f}"
+            f"  uploads {result['uploads']}, deleted on close {result['deleted']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Load benchmark: recovering from dropped connections by resuming the stream against asking again.
+
+Starts the app under uvicorn in a subprocess with fake providers. Every
+client drops its connection partway through the answer and reconnects after
+`--gap` seconds, either resuming with Last-Event-ID from the replay buffer or
+sending the message again. Reports the time from the drop to the complete
+answer, whether the answer came through intact, and the provider calls it
+took.
+
+    python bench/bench_resume.py [--streams 100] [--parts 200] [--delay 0.005] [--gap 0.2]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import common
+import httpx
+from bench_sse_coalescing import wait_ready
+
+
+def serve(port: int, parts: int, delay: float):
+    """Run the app with fake providers (in the server subprocess)."""
+    import uvicorn
+    from main import app
+    from services_instance import model_service
+    from tests.fakes import FakeGenai, FakeOpenAI, FakeProvider, install
+
+    provider = FakeProvider(parts=parts, ttft=0.05, delay=delay, prefix="o")
+    install(model_service, FakeGenai(provider), FakeOpenAI(provider))
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="error")
+
+
+async def read_events(response, text: list, stop_after: int = None):
+    """Read SSE events into `text` until the stream ends or `stop_after` text events; returns the last event id."""
+    last_id = None
+    received = 0
+    async for line in response.aiter_lines():
+        if line.startswith("id: "):
+            last_id = line[4:]
+        if not line.startswith("data: "):
+            continue
+        event = json.loads(line[6:])
+        if "error" in event:
+            raise SystemExit(f"stream failed: {event['error']}")
+        if "text" in event:
+            text.append(event["text"])
+            received += 1
+            if received == stop_after:
+                break
+    return last_id
+
+
+async def one_client(client, base: str, index: int, drop_after: int, gap: float, resume: bool):
+    """Drop the stream after `drop_after` text events and recover; returns (seconds to recover, text)."""
+    body = {"message": f"message {index}", "model": "gpt-4o-mini", "session_id": f"bench-{index}"}
+    text = []
+    async with client.stream("POST", base + "/api/chat/stream", json=body) as response:
+        stream_id = response.headers["X-Stream-Id"]
+        last_id = await read_events(response, text, drop_after)
+    dropped = time.perf_counter()
+    await asyncio.sleep(gap)
+
+    if resume:
+        request = client.stream("GET", f"{base}/api/chat/stream/{stream_id}", headers={"Last-Event-ID": last_id})
+    else:
+        text = []
+        body["session_id"] = f"bench-{index}-again"
+        request = client.stream("POST", base + "/api/chat/stream", json=body)
+    async with request as response:
+        response.raise_for_status()
+        await read_events(response, text)
+    return time.perf_counter() - dropped, "".join(text)
+
+
+async def load(base: str, args, resume: bool) -> list:
+    limits = httpx.Limits(max_connections=args.streams + 10)
+    drops = random.Random(1)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        return await asyncio.gather(*(
+            one_client(client, base, index, drops.randint(1, args.parts - 1), args.gap, resume)
+            for index in range(args.streams)
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--streams", type=int, default=100, help="Concurrent clients")
+    parser.add_argument("--parts", type=int, default=200, help="Chunks per answer")
+    parser.add_argument("--delay", type=float, default=0.005, help="Fake interval between chunks, seconds")
+    parser.add_argument("--gap", type=float, default=0.2, help="Seconds a client stays disconnected")
+    parser.add_argument("--port", type=int, default=8760)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.port, args.parts, args.delay)
+        return
+
+    expected = "".join(f"o{index} " for index in range(args.parts))
+    env = dict(
+        os.environ,
+        SSE_RESUME_ENABLED="true",
+        SESSION_STORE="memory",
+        ADMISSION_ENABLED="false",  # One client address would hit the rate limits
+        RESPONSE_CACHE_ENABLED="false",
+        HTTP_WARMUP_CONNECTIONS="0",  # The fake providers have no hosts to connect to
+        LOG_LEVEL="WARNING",
+    )
+    print(f"{'recovery':>8} {'p50':>11} {'p99':>11} {'provider calls':>15} intact")
+    with tempfile.TemporaryDirectory() as workdir:
+        server = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(args.port),
+             "--parts", str(args.parts), "--delay", str(args.delay)],
+            env=env, cwd=workdir
+        )
+        try:
+            base = f"http://127.0.0.1:{args.port}"
+            wait_ready(base + "/", server)
+            for label, resume in (("ask", False), ("resume", True)):
+                before = httpx.get(base + "/api/cache/stats").json()["stream_replay"]["streams"]
+                results = asyncio.run(load(base, args, resume))
+                # Every POST starts one generation, which is one provider call
+                calls = httpx.get(base + "/api/cache/stats").json()["stream_replay"]["streams"] - before
+                seconds = [result[0] for result in results]
+                intact = sum(result[1] == expected for result in results)
+                print(
+                    f"{label:>8} {common.ms(common.median(seconds))} {common.ms(common.percentile(seconds, 0.99))}"
+                    f" {calls:15d} {intact}/{args.streams}"
+                )
+            stats = httpx.get(base + "/api/cache/stats").json()["stream_replay"]
+            print(f"replay buffers: {stats['buffered']} streams, {stats['bytes'] / 1024:.0f} KiB")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: SQLite session store write throughput, cold-load latency and multi-worker correctness.
+
+Worker processes write to one WAL database through their own memory
+managers, including a session all of them share; the script then checks
+that no write was lost or reordered within a worker.
+
+    python bench/bench_session_store.py [--writes 100000] [--workers 4]
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+import common
+from services.memory_service import ConversationMemoryManager
+from services.session_store import SQLiteSessionStore
+
+
+def worker(path: str, worker_id: int, writes: int, results):
+    memory = ConversationMemoryManager(store=SQLiteSessionStore(path, shared=True))
+    started = time.perf_counter()
+    for index in range(writes):
+        memory.add_message(f"w{worker_id}-s{index % 500}", "user", f"въпрос {index}")
+        if index % 10 == 0:
+            memory.add_message("shared", "assistant", f"w{worker_id}:{index}")
+    request_path = time.perf_counter() - started
+    memory.close()
+    results.put((worker_id, request_path, time.perf_counter() - started))
+
+
+def run_workers(path: str, count: int, writes: int, first_id: int):
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(path, first_id + index, writes, results))
+        for index in range(count)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    return [results.get() for _ in processes], elapsed, [process.exitcode for process in processes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writes", type=int, default=100_000, help="Turns per worker")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    per_worker = args.writes + args.writes // 10
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "sessions.db")
+
+        (result,), elapsed, _ = run_workers(path, 1, args.writes, 0)
+        print(
+            f"1 worker:  {per_worker:,} writes, request path {result[1] / per_worker * 1e6:.1f} us/write, "
+            f"durable {per_worker / result[2]:,.0f} writes/s"
+        )
+
+        _, elapsed, exit_codes = run_workers(path, args.workers, args.writes // 2, 1)
+        total = args.workers * (args.writes // 2 + args.writes // 20)
+        print(f"{args.workers} workers: {total:,} writes in {elapsed:.2f} s ({total / elapsed:,.0f} writes/s), exit codes {exit_codes}")
+
+        connection = sqlite3.connect(path)
+        rows = connection.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        shared = [row[0] for row in connection.execute(
+            "SELECT content FROM messages WHERE session_id = 'shared' ORDER BY id"
+        )]
+        ordered = all(
+            sequence == sorted(sequence)
+            for sequence in (
+                [int(content.split(":")[1]) for content in shared if content.startswith(f"w{worker_id}:")]
+                for worker_id in range(args.workers + 1)
+            )
+        )
+        print(f"rows {rows:,} (expected {per_worker + total:,}), shared session in per-worker order: {ordered}")
+
+        memory = ConversationMemoryManager(store=SQLiteSessionStore(path))
+        latencies = []
+        for index in range(200):
+            started = time.perf_counter()
+            memory.get_turns(f"w1-s{index}")
+            latencies.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        for index in range(100_000):
+            memory.get_turns(f"w1-s{index % 200}")
+        warm = (time.perf_counter() - started) / 100_000
+        print(
+            f"cold load: p50 {common.median(latencies) * 1000:.2f} ms, p99 {common.percentile(latencies, 0.99) * 1000:.2f} ms; "
+            f"warm read {warm * 1e6:.1f} us"
+        )
+        memory.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Load benchmark: SSE frames per response and server CPU, with and without coalescing.
+
+Starts the app under uvicorn in a subprocess for each mode, with fake
+providers streaming many small chunks, and reads concurrent streams over
+HTTP. CPU is the server process's user plus system time during the run.
+
+    python bench/bench_sse_coalescing.py [--levels 1,100,200] [--parts 400] [--delay 0.002]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import common
+import httpx
+
+
+def serve(port: int, parts: int, delay: float):
+    """Run the app with fake providers (in the server subprocess)."""
+    import uvicorn
+    from main import app
+    from services_instance import model_service
+    from tests.fakes import FakeGenai, FakeOpenAI, FakeProvider, install
+
+    provider = FakeProvider(parts=parts, ttft=0.05, delay=delay, prefix="o")
+    install(model_service, FakeGenai(provider), FakeOpenAI(provider))
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="error")
+
+
+def cpu_seconds(pid: int) -> float:
+    """User plus system CPU time of a process, from /proc."""
+    with open(f"/proc/{pid}/stat") as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+async def one_stream(client, url: str, index: int):
+    started = time.perf_counter()
+    ttft = None
+    frames = 0
+    text = []
+    body = {"message": f"message {index}", "model": "gpt-4o-mini", "session_id": f"bench-{index}"}
+    async with client.stream("POST", url, json=body) as response:
+        async for line in response.aiter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[6:])
+            if "text" in event:
+                ttft = ttft or time.perf_counter() - started
+                frames += 1
+                text.append(event["text"])
+    return ttft, frames, "".join(text)
+
+
+async def load(url: str, level: int):
+    limits = httpx.Limits(max_connections=level + 10)
+    async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+        return await asyncio.gather(*(one_stream(client, url, index) for index in range(level)))
+
+
+def wait_ready(url: str, process):
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise SystemExit("the benchmark server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--levels", default="1,100,200")
+    parser.add_argument("--parts", type=int, default=400, help="Chunks per answer")
+    parser.add_argument("--delay", type=float, default=0.002, help="Fake interval between chunks, seconds")
+    parser.add_argument("--port", type=int, default=8750)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.serve:
+        serve(args.port, args.parts, args.delay)
+        return
+
+    expected = "".join(f"o{index} " for index in range(args.parts))
+    print(f"{'coalesce':>8} {'streams':>8} {'frames/resp':>12} {'ttft p50':>11} {'server cpu':>11} {'wall':>8} intact")
+    for coalesce in ("false", "true"):
+        env = dict(
+            os.environ,
+            SSE_COALESCE_ENABLED=coalesce,
+            SESSION_STORE="memory",
+            ADMISSION_ENABLED="false",  # One client address would hit the rate limits
+            RESPONSE_CACHE_ENABLED="false",
+            HTTP_WARMUP_CONNECTIONS="0",  # The fake providers have no hosts to connect to
+            LOG_LEVEL="WARNING",
+        )
+        with tempfile.TemporaryDirectory() as workdir:
+            server = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(args.port),
+                 "--parts", str(args.parts), "--delay", str(args.delay)],
+                env=env, cwd=workdir
+            )
+            try:
+                base = f"http://127.0.0.1:{args.port}"
+                wait_ready(base + "/", server)
+                for level in [int(level) for level in args.levels.split(",")]:
+                    cpu_before = cpu_seconds(server.pid)
+                    started = time.perf_counter()
+                    results = asyncio.run(load(base + "/api/chat/stream", level))
+                    wall = time.perf_counter() - started
+                    cpu = cpu_seconds(server.pid) - cpu_before
+                    frames = sum(result[1] for result in results) / level
+                    ttft = common.median([result[0] for result in results])
+                    intact = all(result[2] == expected for result in results)
+                    print(
+                        f"{coalesce:>8} {level:8d} {frames:12.1f} {common.ms(ttft)} "
+                        f"{cpu:10.2f}s {wall:7.2f}s {intact}"
+                    )
+            finally:
+                server.terminate()
+                server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Benchmark: server cold start, with the provider SDKs loaded lazily against loading them eagerly.
+
+Measures the import time of `main` with `python -X importtime`, once as it is
+and once followed by the imports the server used to run at startup (the
+Gemini and OpenAI SDKs and LangChain), and lists the slowest top-level
+imports. Then it starts the server and times how long it takes to accept
+requests and to report ready on /ready.
+
+    python bench/bench_startup.py [--runs 5] [--top 10]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import common
+import httpx
+
+EAGER_IMPORTS = "import google.generativeai, openai, langchain_core.messages"
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def import_profile(code: str) -> tuple:
+    """
+    Run code under -X importtime in a fresh interpreter.
+
+    Returns:
+        Tuple of (seconds spent importing, {top-level module: cumulative seconds})
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=common.BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        # Top-level imports are the ones without indentation
+        if match and not match.group(3):
+            modules[match.group(4)] = int(match.group(2)) / 1_000_000
+    return sum(modules.values()), modules
+
+
+def serve_times(port: int) -> tuple:
+    """Start the server; returns seconds until it answers a request and until /ready is 200."""
+    env = dict(
+        os.environ,
+        PYTHONPATH=common.BACKEND_DIR,
+        PYTHONWARNINGS="ignore::FutureWarning",  # google.generativeai announces its deprecation on import
+        SESSION_STORE="memory",
+        HTTP_WARMUP_CONNECTIONS="0",
+        LOG_LEVEL="WARNING",
+    )
+    base = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as workdir:
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "error"],
+            env=env, cwd=workdir
+        )
+        try:
+            serving = ready = None
+            while ready is None and time.perf_counter() - started < 60 and server.poll() is None:
+                try:
+                    response = httpx.get(base + "/ready", timeout=1)
+                except httpx.HTTPError:
+                    time.sleep(0.01)
+                    continue
+                serving = serving or time.perf_counter() - started
+                if response.status_code == 200:
+                    ready = time.perf_counter() - started
+                else:
+                    time.sleep(0.01)
+        finally:
+            server.terminate()
+            server.wait()
+    if ready is None:
+        raise SystemExit("the server did not become ready")
+    return serving, ready
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Slowest top-level imports to list")
+    parser.add_argument("--port", type=int, default=8790)
+    args = parser.parse_args()
+
+    profiles = {}
+    for label, code in (("lazy", "import main"), ("eager", f"import main; {EAGER_IMPORTS}")):
+        runs = [import_profile(code) for _ in range(args.runs)]
+        profiles[label] = runs[-1][1]
+        print(f"import main, {label} SDKs: {common.ms(common.median([seconds for seconds, _ in runs]))}")
+
+    print("slowest top-level imports (eager):")
+    for name, seconds in sorted(profiles["eager"].items(), key=lambda item: -item[1])[:args.top]:
+        note = "" if name in profiles["lazy"] else "  (deferred)"
+        print(f"  {common.ms(seconds)}  {name}{note}")
+
+    times = [serve_times(args.port) for _ in range(args.runs)]
+    print(f"server accepts requests after {common.ms(common.median([serving for serving, _ in times]))}")
+    print(f"/ready is 200 after           {common.ms(common.median([ready for _, ready in times]))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Load benchmark: time-to-first-token and throughput as concurrent streams grow.
+
+Every stream goes through ChatService and the async provider clients; only
+the SDKs are fakes, with a fixed first-token latency and chunk interval. With
+non-blocking streaming both numbers stay flat until the CPU is saturated.
+
+    python bench/bench_streaming.py [--model gemini-2.5-flash] [--levels 1,10,100,500]
+"""
+
+import argparse
+import asyncio
+import time
+import common
+from services.model_service import ModelService
+from services.memory_service import ConversationMemoryManager
+from services.chat_service import ChatService
+from tests.fakes import FakeGenai, FakeOpenAI, FakeProvider, install
+
+
+async def one_stream(chat_service, model_name, index):
+    started = time.perf_counter()
+    ttft = None
+    frames = 0
+    async for _ in chat_service.stream_response(f"message {index}", model_name, f"bench-{index}"):
+        if ttft is None:
+            ttft = time.perf_counter() - started
+        frames += 1
+    return ttft, frames
+
+
+async def run(model_name: str, levels, ttft: float, delay: float, parts: int):
+    provider = FakeProvider(parts=parts, ttft=ttft, delay=delay)
+    model_service = ModelService()
+    install(model_service, FakeGenai(provider), FakeOpenAI(provider))
+    chat_service = ChatService(model_service, ConversationMemoryManager())
+    chat_service.response_cache.enabled = False
+
+    ideal = ttft + delay * (parts - 1)
+    print(f"fake provider: first token {ttft * 1000:.0f} ms, {parts} chunks, ideal stream {ideal * 1000:.0f} ms")
+    print(f"{'streams':>8} {'ttft p50':>11} {'ttft p99':>11} {'wall':>11} {'frames/s':>10}")
+    for level in levels:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(one_stream(chat_service, model_name, index) for index in range(level)))
+        wall = time.perf_counter() - started
+        ttfts = [result[0] for result in results]
+        frames = sum(result[1] for result in results)
+        print(
+            f"{level:8d} {common.ms(common.median(ttfts))} {common.ms(common.percentile(ttfts, 0.99))} "
+            f"{common.ms(wall)} {frames / wall:10.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="gemini-2.5-flash")
+    parser.add_argument("--levels", default="1,10,100,500")
+    parser.add_argument("--ttft", type=float, default=0.05, help="Fake first-token latency, seconds")
+    parser.add_argument("--delay", type=float, default=0.01, help="Fake interval between chunks, seconds")
+    parser.add_argument("--parts", type=int, default=20, help="Chunks per answer")
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+    asyncio.run(run(args.model, levels, args.ttft, args.delay, args.parts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark: prompt size per turn over long sessions, truncation vs rolling summary.
+
+A stub summarizer stands in for the summary model, so only the prompt
+sizes and the prompt-build cost are measured, not provider latency.
+
+    python bench/bench_summary.py [--turns 500] [--trigger 40] [--keep 20]
+"""
+
+import argparse
+import asyncio
+import time
+import common
+from services.model_service import ModelService
+from services.memory_service import ConversationMemoryManager
+from services.context_builder import ContextBuilder, estimate_tokens
+from services.summary_service import SummaryService
+from tests.fakes import StubSummarizer
+
+ANSWER = "Това е отговор с подробности за темата. " * 15
+
+
+async def run(mode: str, args):
+    model_service = ModelService()
+    memory = ConversationMemoryManager(max_messages_per_session=10**6, max_total_bytes=10**12)
+    builder = ContextBuilder(memory, model_service)
+    summary_service = SummaryService(
+        model_service, memory, mode=mode, trigger_turns=args.trigger, keep_turns=args.keep
+    )
+    stub = StubSummarizer(summary_chars=600)
+    summary_service.summarize = stub
+
+    sizes = []
+    build = 0.0
+    for index in range(args.turns):
+        memory.add_message("s", "user", f"Въпрос {index}: разкажи ми повече?")
+        started = time.perf_counter()
+        prompt, _ = builder.build_gemini_prompt("s", args.model)
+        build += time.perf_counter() - started
+        sizes.append(estimate_tokens(prompt))
+        memory.add_message("s", "assistant", ANSWER)
+        summary_service.maybe_schedule("s")
+        await asyncio.sleep(0)  # The request ends; background summaries may run
+    await asyncio.gather(*summary_service._tasks)
+
+    print(
+        f"{mode:<10} {sum(sizes) / len(sizes):9.0f} {max(sizes):9d} {sizes[-1]:9d} {sum(sizes):11d} "
+        f"{build / args.turns * 1000:9.3f} {stub.calls:10d}"
+    )
+
+
+async def run_all(args):
+    print(f"{args.turns} turns on {args.model}, estimated input tokens per turn")
+    print(f"{'mode':<10} {'avg':>9} {'max':>9} {'last':>9} {'total':>11} {'build ms':>9} {'summaries':>10}")
+    await run("truncate", args)
+    await run("summarize", args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=500)
+    parser.add_argument("--trigger", type=int, default=40, help="Turns that trigger a summary")
+    parser.add_argument("--keep", type=int, default=20, help="Recent turns kept verbatim")
+    parser.add_argument("--model", default="gemini-2.5-pro")
+    asyncio.run(run_all(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: time-to-first-token with and without the shared, warmed connection pool.
+
+Runs against a local mock provider whose new connections wait
+`--connect-delay` before being served, standing in for the TCP and TLS
+handshake of a remote API. "per request" opens a new client for every call;
+"shared" is ModelService's pooled transport, cold and after warm_up().
+
+    python bench/bench_transport.py [--connect-delay 0.03] [--requests 20] [--burst 50]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import common
+from openai import AsyncOpenAI
+from services.model_service import ModelService
+from tests.fakes import FakeGenai
+from tests.mock_provider import MockProvider
+
+
+async def first_token(client) -> float:
+    started = time.perf_counter()
+    stream = await client.chat.completions.create(
+        model="gpt-4o-mini", messages=[{"role": "user", "content": "hi"}], stream=True
+    )
+    first = None
+    async for chunk in stream:
+        if first is None and chunk.choices and chunk.choices[0].delta.content:
+            first = time.perf_counter() - started
+    return first
+
+
+async def per_request_client() -> float:
+    async with AsyncOpenAI() as client:
+        return await first_token(client)
+
+
+def report(name: str, first: float, sequential, burst):
+    print(
+        f"{name:16s} first {common.ms(first)}   sequential p50 {common.ms(common.median(sequential))}   "
+        f"burst p50 {common.ms(common.median(burst))} p95 {common.ms(common.percentile(burst, 0.95))}"
+    )
+
+
+async def run(connect_delay: float, requests: int, burst: int):
+    provider = MockProvider(chunks=5, connect_delay=connect_delay)
+    os.environ["OPENAI_BASE_URL"] = await provider.start()
+    print(f"mock provider: {connect_delay * 1000:.0f} ms connection setup")
+
+    first = await per_request_client()
+    sequential = [await per_request_client() for _ in range(requests)]
+    together = await asyncio.gather(*(per_request_client() for _ in range(burst)))
+    report("per request", first, sequential, together)
+
+    for warm in (False, True):
+        model_service = ModelService()
+        model_service._genai = FakeGenai()
+        if warm:
+            await model_service.warm_up()
+        client = model_service.openai_client
+        first = await first_token(client)
+        sequential = [await first_token(client) for _ in range(requests)]
+        together = await asyncio.gather(*(first_token(client) for _ in range(burst)))
+        report("shared, warmed" if warm else "shared, cold", first, sequential, together)
+        if warm:
+            print(json.dumps(model_service.transport.get_stats(), indent=2))
+        await model_service.aclose()
+    await provider.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--connect-delay", type=float, default=0.03, help="Seconds of simulated handshake")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--burst", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.connect_delay, args.requests, args.burst))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark: chat stream throughput against the number of worker processes.
+
+Each run starts the server with `--workers N` in shared mode, so the workers
+share session history and stream cancellation through SQLite, and drives it
+with a closed loop of concurrent clients. Every client keeps its own session,
+and the turns it sent are checked against the stored history at the end, which
+fails when a worker lost or reordered another worker's writes. Throughput only scales up
+to the number of CPU cores.
+
+    python bench/bench_workers.py [--workers 1 2 4] [--clients 32] [--seconds 10]
+"""
+
+import argparse
+import asyncio
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import common
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def __getattr__(name: str):
+    """Build the app with fake providers when a uvicorn worker imports `bench_workers:app`."""
+    if name != "app":
+        raise AttributeError(name)
+    from main import app
+    from services_instance import model_service
+    from tests.fakes import FakeGenai, FakeProvider, install
+
+    provider = FakeProvider(parts=40, ttft=0.01, delay=0.002)
+    install(model_service, FakeGenai(provider))
+    globals()["app"] = app
+    return app
+
+
+async def client_loop(client, client_id: int, deadline: float, latencies: list) -> int:
+    """Send turns on one session until the deadline; returns the number of turns sent."""
+    turns = 0
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        body = {"message": f"turn {turns}", "model": "gemini-2.5-flash", "session_id": f"bench-{client_id}"}
+        async with client.stream("POST", "/api/chat/stream", json=body) as response:
+            await response.aread()
+            if response.status_code != 200:
+                raise SystemExit(f"stream failed with {response.status_code}")
+        latencies.append(time.perf_counter() - started)
+        turns += 1
+    return turns
+
+
+def lost_turns(db_path: str, turns: list) -> int:
+    """Count the sessions whose stored turns differ from the ones sent, in order."""
+    with sqlite3.connect(db_path) as conn:
+        lost = 0
+        for client_id, sent in enumerate(turns):
+            rows = conn.execute(
+                "SELECT content FROM messages WHERE session_id = ? AND role = 'user' ORDER BY id",
+                (f"bench-{client_id}",)
+            ).fetchall()
+            lost += [row[0] for row in rows] != [f"turn {index}" for index in range(sent)]
+    return lost
+
+
+async def load(base: str, clients: int, seconds: float):
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base, timeout=60, limits=limits) as client:
+        # Warm every worker's imports and connections before measuring
+        await asyncio.gather(*(client_loop(client, -1 - index, time.monotonic() + 1, []) for index in range(clients)))
+        latencies: list = []
+        deadline = time.monotonic() + seconds
+        turns = await asyncio.gather(*(client_loop(client, index, deadline, latencies) for index in range(clients)))
+        return turns, latencies
+
+
+def wait_ready(url: str, process):
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline and process.poll() is None:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise SystemExit("the benchmark server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8770)
+    args = parser.parse_args()
+    print(f"{os.cpu_count()} CPU cores")
+
+    baseline = None
+    for workers in args.workers:
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join([BENCH_DIR, common.BACKEND_DIR]),
+            WORKERS=str(workers),
+            WORKER_MODE="shared",
+            SESSION_STORE="sqlite",  # One worker too, so every run pays for the shared store
+            ADMISSION_ENABLED="false",
+            HTTP_WARMUP_CONNECTIONS="0",
+            LOG_LEVEL="WARNING",
+        )
+        with tempfile.TemporaryDirectory() as workdir:
+            server = subprocess.Popen(
+                [
+                    sys.executable, "-m", "uvicorn", "bench_workers:app", "--port", str(args.port),
+                    "--workers", str(workers), "--log-level", "error",
+                ],
+                env=env, cwd=workdir
+            )
+            try:
+                base = f"http://127.0.0.1:{args.port}"
+                wait_ready(base + "/", server)
+                turns, latencies = asyncio.run(load(base, args.clients, args.seconds))
+            finally:
+                server.terminate()
+                server.wait()
+            # The workers flush their pending writes on shutdown
+            lost = lost_turns(os.path.join(workdir, "nova_sessions.db"), turns)
+
+        rate = sum(turns) / args.seconds
+        baseline = baseline or rate
+        print(
+            f"workers={workers}: {rate:7.1f} streams/s ({rate / baseline:.2f}x)"
+            f"  p50 {common.ms(common.median(latencies))}  p99 {common.ms(common.percentile(latencies, 0.99))}"
+            f"  sessions with lost turns: {lost}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+"""Setup shared by the benchmarks: run from anywhere, against fake providers only."""
+
+import os
+import statistics
+import sys
+import warnings
+
+os.environ.setdefault("GOOGLE_API_KEY", "bench-key")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("USAGE_LOG", "")
+os.environ.setdefault("TRACING_EXPORT", "")
+# google.generativeai announces its deprecation on import
+warnings.filterwarnings("ignore", category=FutureWarning)
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+def percentile(values, fraction: float) -> float:
+    """Get a percentile of a list of numbers."""
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def median(values) -> float:
+    return statistics.median(values)
+
+
+def ms(seconds: float) -> str:
+    """Format seconds as milliseconds."""
+    return f"{seconds * 1000:8.1f} ms"
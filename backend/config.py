@@ -28,48 +28,66 @@ AVAILABLE_MODELS = {
         "gemini-2.5-pro": {
             "name": "Gemini 2.5 Pro",
             "description": "Most powerful Gemini (1M tokens)",
+            "context_tokens": 1_048_576,
+            "tier": "pro",
         },
         "gemini-2.5-flash": {
             "name": "Gemini 2.5 Flash",
             "description": "Fast multimodal (1M tokens)",
+            "context_tokens": 1_048_576,
+            "tier": "standard",
         },
         "gemini-2.5-flash-lite": {
             "name": "Gemini 2.5 Flash-Lite",
             "description": "Lightweight and efficient",
+            "context_tokens": 1_048_576,
+            "tier": "lite",
         },
         
         # Gemini 2.0 Series
         "gemini-2.0-flash": {
             "name": "Gemini 2.0 Flash",
             "description": "Fast and versatile",
+            "context_tokens": 1_048_576,
+            "tier": "standard",
         },
         "gemini-2.0-flash-lite": {
             "name": "Gemini 2.0 Flash-Lite",
             "description": "Compact version",
+            "context_tokens": 1_048_576,
+            "tier": "lite",
         },
         "gemini-2.0-flash-thinking-exp": {
             "name": "Gemini 2.0 Flash Thinking",
             "description": "Reasoning experimental",
+            "context_tokens": 32_768,
+            "tier": "pro",
         },
         
         # Gemini Special Models
         "gemini-2.5-computer-use-preview-10-2025": {
             "name": "Gemini 2.5 Computer Use",
             "description": "Computer interaction preview",
+            "context_tokens": 131_072,
         },
         "learnlm-2.0-flash-experimental": {
             "name": "LearnLM 2.0 Flash",
             "description": "Learning-focused model",
+            "context_tokens": 32_768,
         },
         
         # Latest Aliases (auto-update to newest)
         "gemini-pro-latest": {
             "name": "Gemini Pro (Latest)",
             "description": "Latest Pro version",
+            "context_tokens": 1_048_576,
+            "tier": "pro",
         },
         "gemini-flash-latest": {
             "name": "Gemini Flash (Latest)",
             "description": "Latest Flash version",
+            "context_tokens": 1_048_576,
+            "tier": "standard",
         },
     },
     "OpenAI": {
@@ -77,72 +95,102 @@ AVAILABLE_MODELS = {
         "gpt-5-pro": {
             "name": "GPT-5 Pro",
             "description": "Most powerful model",
+            "context_tokens": 400_000,
+            "tier": "pro",
         },
         "gpt-5": {
             "name": "GPT-5",
             "description": "Latest flagship model",
+            "context_tokens": 400_000,
+            "tier": "pro",
         },
         "gpt-5-mini": {
             "name": "GPT-5 Mini",
             "description": "Compact GPT-5 version",
+            "context_tokens": 400_000,
+            "tier": "standard",
         },
         
         # o-series - Reasoning Models
         "o3": {
             "name": "o3",
             "description": "Advanced reasoning (newest)",
+            "context_tokens": 200_000,
+            "tier": "pro",
         },
         "o1-pro": {
             "name": "o1 Pro",
             "description": "Pro reasoning model",
+            "context_tokens": 200_000,
+            "tier": "pro",
         },
         "o1": {
             "name": "o1",
             "description": "Reasoning model",
+            "context_tokens": 200_000,
+            "tier": "pro",
         },
         "o3-mini": {
             "name": "o3 Mini",
             "description": "Compact reasoning",
+            "context_tokens": 200_000,
+            "tier": "standard",
         },
         "o1-mini": {
             "name": "o1 Mini",
             "description": "Light reasoning model",
+            "context_tokens": 128_000,
+            "tier": "standard",
         },
         
         # GPT-4.1 Series
         "gpt-4.1": {
             "name": "GPT-4.1",
             "description": "Enhanced GPT-4",
+            "context_tokens": 1_047_576,
+            "tier": "pro",
         },
         "gpt-4.1-mini": {
             "name": "GPT-4.1 Mini",
             "description": "Compact GPT-4.1",
+            "context_tokens": 1_047_576,
+            "tier": "standard",
         },
         
         # GPT-4o Series
         "chatgpt-4o-latest": {
             "name": "ChatGPT-4o (Latest)",
             "description": "Latest ChatGPT version",
+            "context_tokens": 128_000,
+            "tier": "standard",
         },
         "gpt-4o": {
             "name": "GPT-4o",
             "description": "Multimodal model",
+            "context_tokens": 128_000,
+            "tier": "standard",
         },
         "gpt-4o-mini": {
             "name": "GPT-4o Mini",
             "description": "Fast and cost-effective",
+            "context_tokens": 128_000,
+            "tier": "lite",
         },
         
         # GPT-4 Turbo
         "gpt-4-turbo": {
             "name": "GPT-4 Turbo",
             "description": "Fast and powerful",
+            "context_tokens": 128_000,
+            "tier": "standard",
         },
         
         # GPT-3.5
         "gpt-3.5-turbo": {
             "name": "GPT-3.5 Turbo",
             "description": "Efficient and fast",
+            "context_tokens": 16_385,
+            "tier": "lite",
         },
     },
 }
@@ -158,6 +206,246 @@ GENERATION_CONFIG = {
     "top_k": 40,
 }
 
+# Automatic model selection for the "auto" model: a tier is picked from the prompt,
+# then the model of that tier with the lowest measured latency
+AUTO_MODEL = "auto"
+AUTO_ROUTING_ENABLED = os.getenv("AUTO_ROUTING_ENABLED", "true").lower() == "true"
+AUTO_MODEL_INFO = {
+    "name": "Auto",
+    "description": "Picks a fast model for simple prompts and a pro model for complex ones",
+}
+AUTO_MODEL_CANDIDATES = [
+    "gemini-2.5-flash-lite",
+    "gpt-4o-mini",
+    "gemini-2.5-flash",
+    "gpt-4.1-mini",
+    "gemini-2.5-pro",
+    "gpt-4.1",
+]
+# Typical answer length per tier, used to weigh first-token latency against throughput
+AUTO_EXPECTED_CHARS = {"lite": 300, "standard": 1200, "pro": 3000}
+# Assumed latency for models without measurements, so new models get tried
+AUTO_PRIOR_TTFT_SECONDS = float(os.getenv("AUTO_PRIOR_TTFT_SECONDS", "0.8"))
+AUTO_PRIOR_CHARS_PER_SECOND = float(os.getenv("AUTO_PRIOR_CHARS_PER_SECOND", "400"))
+AUTO_EXPLORE_RATE = float(os.getenv("AUTO_EXPLORE_RATE", "0.05"))
+AUTO_DECISION_LOG = os.getenv("AUTO_DECISION_LOG", "")  # JSONL file of routing decisions, empty disables
+
+# Provider failover: models tried in order when the requested model fails before its first token
+ROUTING_FAILOVER_ENABLED = os.getenv("ROUTING_FAILOVER_ENABLED", "true").lower() == "true"
+MODEL_FALLBACKS = {
+    "gemini-2.5-pro": ["gemini-2.5-flash", "gpt-4o-mini"],
+    "gemini-2.5-flash": ["gemini-2.0-flash", "gpt-4o-mini"],
+    "gemini-2.5-flash-lite": ["gemini-2.0-flash-lite", "gpt-4o-mini"],
+    "gemini-2.0-flash": ["gemini-2.5-flash", "gpt-4o-mini"],
+    "gemini-2.0-flash-lite": ["gemini-2.5-flash-lite", "gpt-4o-mini"],
+    "gemini-pro-latest": ["gemini-2.5-pro", "gpt-4.1"],
+    "gemini-flash-latest": ["gemini-2.5-flash", "gpt-4o-mini"],
+    "gpt-5": ["gpt-4.1", "gemini-2.5-pro"],
+    "gpt-5-mini": ["gpt-4.1-mini", "gemini-2.5-flash"],
+    "gpt-4.1": ["gpt-4o", "gemini-2.5-pro"],
+    "gpt-4.1-mini": ["gpt-4o-mini", "gemini-2.5-flash"],
+    "gpt-4o": ["gpt-4.1", "gemini-2.5-flash"],
+    "gpt-4o-mini": ["gpt-4.1-mini", "gemini-2.5-flash"],
+    "gpt-3.5-turbo": ["gpt-4o-mini", "gemini-2.0-flash-lite"],
+}
+# Circuit breaker: a model is skipped for a while once too many recent calls failed or were slow
+CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", "20"))
+CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+CIRCUIT_SLOW_TTFT_SECONDS = float(os.getenv("CIRCUIT_SLOW_TTFT_SECONDS", "15"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30"))
+# Hedging: start the next fallback when the first token is later than the model's p95
+ROUTING_HEDGE_ENABLED = os.getenv("ROUTING_HEDGE_ENABLED", "false").lower() == "true"
+ROUTING_HEDGE_MIN_SAMPLES = int(os.getenv("ROUTING_HEDGE_MIN_SAMPLES", "20"))
+ROUTING_HEDGE_MIN_DELAY = float(os.getenv("ROUTING_HEDGE_MIN_DELAY", "0.25"))
+
+# Conversation memory limits
+MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "10000"))
+MEMORY_MAX_MESSAGES_PER_SESSION = int(os.getenv("MEMORY_MAX_MESSAGES_PER_SESSION", "200"))
+MEMORY_MAX_TOTAL_BYTES = int(os.getenv("MEMORY_MAX_TOTAL_BYTES", str(256 * 1024 * 1024)))
+MEMORY_SESSION_TTL_SECONDS = int(os.getenv("MEMORY_SESSION_TTL_SECONDS", str(24 * 60 * 60)))
+# Turns older than this many positions from the end are stored compressed (0 disables)
+MEMORY_COMPRESS_AFTER_TURNS = int(os.getenv("MEMORY_COMPRESS_AFTER_TURNS", "0"))
+MEMORY_COMPRESS_MIN_BYTES = int(os.getenv("MEMORY_COMPRESS_MIN_BYTES", "512"))
+# "zstd" (needs the zstandard package, falls back to zlib without it) or "zlib"
+MEMORY_COMPRESSION = os.getenv("MEMORY_COMPRESSION", "zstd").lower()
+
+# Server processes. More than one worker shares session history and stream
+# cancellation through SQLite. "shared" workers accept on one port and check
+# cached sessions against the store; "sticky" worker i listens on PORT + i behind
+# a load balancer with session affinity (e.g. nginx ip_hash) and trusts its cache
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WORKERS = int(os.getenv("WORKERS", "1"))
+WORKER_MODE = os.getenv("WORKER_MODE", "shared")
+STREAM_DB_PATH = os.getenv("STREAM_DB_PATH", "nova_streams.db")
+CANCEL_POLL_INTERVAL = float(os.getenv("CANCEL_POLL_INTERVAL", "0.1"))
+# Seconds a SQLite call made for a request waits on another worker's lock before failing
+SQLITE_REQUEST_TIMEOUT = float(os.getenv("SQLITE_REQUEST_TIMEOUT", "1"))
+
+# Session storage backend: "memory" keeps history in-process, "sqlite" persists it
+SESSION_STORE = os.getenv("SESSION_STORE", "sqlite" if WORKERS > 1 else "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "nova_sessions.db")
+SESSION_STORE_BATCH_SIZE = int(os.getenv("SESSION_STORE_BATCH_SIZE", "256"))
+SESSION_STORE_FLUSH_INTERVAL = float(os.getenv("SESSION_STORE_FLUSH_INTERVAL", "0.05"))
+# Retries of a failed write batch, with doubling backoff, before its writes are tried one by one
+SESSION_STORE_WRITE_RETRIES = int(os.getenv("SESSION_STORE_WRITE_RETRIES", "5"))
+SESSION_STORE_SHARED = WORKERS > 1 and WORKER_MODE == "shared"
+# Seconds a cached session counts as current after it was checked against the store.
+# Chat requests always check in a thread first; this spares the event loop the repeats
+SESSION_VERSION_CHECK_INTERVAL = float(os.getenv("SESSION_VERSION_CHECK_INTERVAL", "1"))
+
+# Memory mode: "truncate" drops the oldest turns, "summarize" folds them into a running summary
+MEMORY_MODE = os.getenv("MEMORY_MODE", "truncate")
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gemini-2.5-flash-lite")
+SUMMARY_TRIGGER_TURNS = int(os.getenv("SUMMARY_TRIGGER_TURNS", "40"))
+SUMMARY_KEEP_TURNS = int(os.getenv("SUMMARY_KEEP_TURNS", "20"))
+SUMMARY_PROMPT = """Обобщи накратко разговора по-долу, като запазиш имената, фактите,
+решенията и отворените въпроси, които ще са нужни за продължаването му.
+Ако има предишно резюме, обедини го с новите реплики. Върни само резюмето."""
+
+# Response cache for repeated prompts. Off by default: with a sampling temperature
+# above 0, a cached answer makes every repeat of a context get the same reply
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+# Semantic tier: match similar first messages by local n-gram embeddings
+RESPONSE_CACHE_SEMANTIC_ENABLED = os.getenv("RESPONSE_CACHE_SEMANTIC_ENABLED", "false").lower() == "true"
+RESPONSE_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SEMANTIC_THRESHOLD", "0.9"))
+RESPONSE_CACHE_SEMANTIC_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_SEMANTIC_MAX_ENTRIES", "500"))
+
+# Identical in-flight generations share one upstream call
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+# Prompt context limits (token counts are estimated from characters)
+CONTEXT_MAX_PROMPT_TOKENS = int(os.getenv("CONTEXT_MAX_PROMPT_TOKENS", "32000"))
+CONTEXT_RESERVED_OUTPUT_TOKENS = int(os.getenv("CONTEXT_RESERVED_OUTPUT_TOKENS", "4096"))
+CONTEXT_CHARS_PER_TOKEN = 3  # Conservative for Cyrillic text
+# Over-budget history is trimmed to this share of the budget, so the prompt
+# prefix stays byte-stable (and provider-cacheable) for several turns
+CONTEXT_TRIM_RATIO = float(os.getenv("CONTEXT_TRIM_RATIO", "0.8"))
+
+# Provider-side prompt caching. Long Gemini session prefixes are uploaded as
+# cached content and reused, so only the turns after them are sent again.
+# Cached content is billed for its storage time, so it is opt-in. OpenAI caches
+# prefixes itself at no charge; requests always carry the session as prompt_cache_key
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "false").lower() == "true"
+GEMINI_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "4096"))
+# Re-upload once this many tokens were added after the cached prefix
+GEMINI_CACHE_REFRESH_TOKENS = int(os.getenv("GEMINI_CACHE_REFRESH_TOKENS", "4096"))
+GEMINI_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CACHE_TTL_SECONDS", "600"))
+GEMINI_CACHE_MAX_SESSIONS = int(os.getenv("GEMINI_CACHE_MAX_SESSIONS", "1000"))
+
+# SSE output batching: merge text deltas into fewer frames (the first token is never delayed)
+SSE_COALESCE_ENABLED = os.getenv("SSE_COALESCE_ENABLED", "false").lower() == "true"
+SSE_COALESCE_WINDOW_MS = int(os.getenv("SSE_COALESCE_WINDOW_MS", "30"))
+SSE_COALESCE_MAX_BYTES = int(os.getenv("SSE_COALESCE_MAX_BYTES", "1024"))
+
+# Resumable streams: frames carry SSE ids and are buffered, so a client whose
+# connection dropped can reconnect with Last-Event-ID instead of asking again
+SSE_RESUME_ENABLED = os.getenv("SSE_RESUME_ENABLED", "true").lower() == "true"
+# Seconds a generation keeps running with no client attached
+SSE_RESUME_GRACE_SECONDS = float(os.getenv("SSE_RESUME_GRACE_SECONDS", "15"))
+# Seconds a finished stream stays resumable
+SSE_REPLAY_TTL_SECONDS = float(os.getenv("SSE_REPLAY_TTL_SECONDS", "120"))
+SSE_REPLAY_MAX_STREAM_BYTES = int(os.getenv("SSE_REPLAY_MAX_STREAM_BYTES", str(256 * 1024)))
+SSE_REPLAY_MAX_TOTAL_BYTES = int(os.getenv("SSE_REPLAY_MAX_TOTAL_BYTES", str(32 * 1024 * 1024)))
+
+# Shared HTTP connection pool for provider clients
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "200"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "50"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "90"))
+HTTP_HTTP2 = os.getenv("HTTP_HTTP2", "false").lower() == "true"  # Requires the h2 package
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "10"))
+HTTP_WARMUP_CONNECTIONS = int(os.getenv("HTTP_WARMUP_CONNECTIONS", "2"))
+# Longest wait for the next streamed chunk, per provider
+PROVIDER_READ_TIMEOUTS = {
+    "openai": float(os.getenv("OPENAI_READ_TIMEOUT", "60")),
+    "google": float(os.getenv("GOOGLE_READ_TIMEOUT", "60")),
+}
+# Longest a whole Gemini request may take, streamed or not; its SDK takes a single
+# deadline, so the wait for each chunk above is enforced while reading the stream
+GOOGLE_REQUEST_DEADLINE = float(os.getenv("GOOGLE_REQUEST_DEADLINE", "600"))
+
+# Admission control for chat streams: concurrency slots, a bounded wait queue
+# and per-session / per-client token buckets. Rejections get 429 or 503 with Retry-After
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+ADMISSION_MAX_STREAMS = int(os.getenv("ADMISSION_MAX_STREAMS", "256"))
+ADMISSION_MODEL_MAX_STREAMS = int(os.getenv("ADMISSION_MODEL_MAX_STREAMS", "128"))
+# Lower limits for slow, expensive models
+ADMISSION_MODEL_LIMITS = {
+    "gemini-2.5-pro": 64,
+    "gpt-5-pro": 16,
+    "o1-pro": 16,
+    "o3": 32,
+}
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", "128"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))  # Seconds
+SESSION_RATE_PER_MINUTE = float(os.getenv("SESSION_RATE_PER_MINUTE", "20"))  # 0 disables
+SESSION_BURST = float(os.getenv("SESSION_BURST", "5"))
+CLIENT_RATE_PER_MINUTE = float(os.getenv("CLIENT_RATE_PER_MINUTE", "120"))  # 0 disables
+CLIENT_BURST = float(os.getenv("CLIENT_BURST", "30"))
+
+# Token usage accounting. Prices are USD per 1M tokens: (input, output, cached input);
+# update them when providers change pricing. Models without a price are counted at no cost
+MODEL_PRICES = {
+    "gemini-2.5-pro": (1.25, 10.0, 0.31),
+    "gemini-2.5-flash": (0.30, 2.50, 0.075),
+    "gemini-2.5-flash-lite": (0.10, 0.40, 0.025),
+    "gemini-2.0-flash": (0.10, 0.40, 0.025),
+    "gemini-2.0-flash-lite": (0.075, 0.30, 0.075),
+    "gpt-5": (1.25, 10.0, 0.125),
+    "gpt-5-mini": (0.25, 2.0, 0.025),
+    "gpt-4.1": (2.0, 8.0, 0.5),
+    "gpt-4.1-mini": (0.40, 1.60, 0.10),
+    "gpt-4o": (2.50, 10.0, 1.25),
+    "gpt-4o-mini": (0.15, 0.60, 0.075),
+    "o3": (2.0, 8.0, 0.5),
+    "o3-mini": (1.10, 4.40, 0.55),
+}
+# Aggregated usage is appended to this JSONL file every interval; off unless a path is set
+USAGE_LOG = os.getenv("USAGE_LOG", "")
+USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "60"))
+# Per-session budgets; a session over either one is served by a cheaper model (0 disables)
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "0"))
+SESSION_COST_BUDGET = float(os.getenv("SESSION_COST_BUDGET", "0"))
+BUDGET_DOWNGRADE_MODELS = {"google": "gemini-2.5-flash-lite", "openai": "gpt-4o-mini"}
+
+# Batch jobs: JSONL prompts answered offline by a worker pool per provider
+BATCH_DIR = os.getenv("BATCH_DIR", "batch_jobs")
+BATCH_DEFAULT_MODEL = os.getenv("BATCH_DEFAULT_MODEL", "gemini-2.5-flash")
+BATCH_CONCURRENCY = {
+    "google": int(os.getenv("BATCH_CONCURRENCY_GOOGLE", "16")),
+    "openai": int(os.getenv("BATCH_CONCURRENCY_OPENAI", "32")),
+}
+# Requests per minute per provider, to stay under its rate limit (0 disables)
+BATCH_RATE_PER_MINUTE = {
+    "google": float(os.getenv("BATCH_RATE_PER_MINUTE_GOOGLE", "0")),
+    "openai": float(os.getenv("BATCH_RATE_PER_MINUTE_OPENAI", "0")),
+}
+BATCH_MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", "4"))
+# Largest JSONL input accepted by POST /api/chat/batch
+BATCH_MAX_INPUT_BYTES = int(os.getenv("BATCH_MAX_INPUT_BYTES", str(256 * 1024 * 1024)))
+# Seconds between progress checkpoints and between polls of provider batches
+BATCH_CHECKPOINT_INTERVAL = float(os.getenv("BATCH_CHECKPOINT_INTERVAL", "1"))
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+
+# Metrics at /metrics in the Prometheus text format
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Request tracing with OpenTelemetry-compatible spans; off unless a sample rate is set
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "0"))
+# JSONL file, or an OTLP/HTTP JSON endpoint such as http://localhost:4318/v1/traces;
+# sampled spans are only propagated, not exported, unless a target is set
+TRACING_EXPORT = os.getenv("TRACING_EXPORT", "")
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "nova-backend")
+
+# Logging: records are written to stdout by a background thread
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json"
+
 # CORS settings
 CORS_ORIGINS = [
     "http://localhost:3000",
@@ -0,0 +1,86 @@
+"""Asynchronous, level-gated logging for the Nova AI backend."""
+
+import atexit
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from config import LOG_LEVEL, LOG_FORMAT
+
+_ROOT_LOGGER = "nova"
+_TEXT_FORMAT = "%(asctime)s [BACKEND %(levelname)s] %(name)s: %(message)s"
+# LogRecord attributes that are not user supplied `extra` fields
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including `extra` fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(
+            (key, value) for key, value in vars(record).items()
+            if key not in _RECORD_FIELDS
+        )
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT):
+    """
+    Route backend logs through a queue to a background writer thread.
+
+    Request handlers only enqueue records; formatting and the blocking
+    write to stdout happen on the listener thread. Calling it again is a no-op.
+
+    Args:
+        level: Minimum level that is logged, e.g. "INFO" or "DEBUG"
+        fmt: "text" for readable lines or "json" for structured lines
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(_TEXT_FORMAT))
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root = logging.getLogger(_ROOT_LOGGER)
+    root.setLevel(level.upper())
+    root.addHandler(QueueHandler(records))
+    root.propagate = False
+
+    _listener = QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Write all queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Get a backend logger, setting up logging on first use.
+
+    Args:
+        name: Component name, e.g. "chat"
+
+    Returns:
+        Logger under the backend's root logger
+    """
+    setup_logging()
+    return logging.getLogger(f"{_ROOT_LOGGER}.{name}")
@@ -1,16 +1,68 @@
 """FastAPI server for Nova AI backend."""
 
+import asyncio
+import subprocess
 import sys
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from config import CORS_ORIGINS
-from routes import models_router, chat_router, cancel_router
+from config import CORS_ORIGINS, TRACING_SAMPLE_RATE, HOST, PORT, WORKERS, WORKER_MODE, SESSION_STORE
+from logger import get_logger, shutdown_logging
+from metrics import HttpMetricsMiddleware
+from tracing import TracingMiddleware, shutdown_tracing
+from services_instance import chat_service, memory_manager, model_service, batch_service
+from routes import (
+    models_router,
+    chat_router,
+    cancel_router,
+    sessions_router,
+    cache_router,
+    transport_router,
+    routing_router,
+    metrics_router,
+    admission_router,
+    usage_router,
+    batch_router,
+)
+
+logger = get_logger("main")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start background work and resume batch jobs; on shutdown, flush and close everything."""
+    # Loads the provider SDKs and opens connections in the background, so the
+    # server accepts requests at once; /ready reports when it has finished
+    app.state.warm_up = asyncio.create_task(model_service.warm_up())
+    chat_service.usage.start()
+    chat_service.stream_registry.start()
+    batch_service.resume()
+    logger.info("Nova AI Backend started successfully")
+    
+    yield
+    
+    # Flush pending session writes, close connections, and flush spans and log records
+    app.state.warm_up.cancel()
+    await chat_service.stream_replay.aclose()
+    memory_manager.close()
+    chat_service.auto_router.close()
+    chat_service.stream_registry.close()
+    await batch_service.aclose()
+    await chat_service.usage.aclose()
+    await chat_service.prompt_cache.aclose()
+    await model_service.aclose()
+    logger.info("Nova AI Backend stopped")
+    shutdown_tracing()
+    shutdown_logging()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Nova AI Backend",
     description="FastAPI backend for Nova AI chatbot",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -20,12 +72,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Stream-Id"],
 )
 
+# Count and time requests per route for /metrics
+app.add_middleware(HttpMetricsMiddleware)
+
+# Trace sampled requests; without a sample rate the middleware is not installed at all
+if TRACING_SAMPLE_RATE > 0:
+    app.add_middleware(TracingMiddleware)
+
 # Include routers
 app.include_router(models_router)
 app.include_router(chat_router)
 app.include_router(cancel_router)
+app.include_router(sessions_router)
+app.include_router(cache_router)
+app.include_router(transport_router)
+app.include_router(routing_router)
+app.include_router(metrics_router)
+app.include_router(admission_router)
+app.include_router(usage_router)
+app.include_router(batch_router)
 
 
 @app.get("/")
@@ -34,17 +102,55 @@ async def read_root():
     return {"message": "Nova AI Backend is running"}
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Log startup message."""
-    print(
-        "[BACKEND LOG] Nova AI Backend started successfully",
-        file=sys.stdout,
-        flush=True
-    )
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 503 until the provider SDKs are loaded and connections warmed up."""
+    warm_up = getattr(app.state, "warm_up", None)
+    if warm_up is None or not warm_up.done():
+        state = "starting"
+    elif warm_up.cancelled() or warm_up.exception() is not None:
+        # Requests still work, each one loads what it needs
+        state = "degraded"
+    else:
+        state = "ready"
+    body = {"status": state, "sdks": model_service.get_sdk_status()}
+    return JSONResponse(body, status_code=503 if state == "starting" else 200)
 
 
-if __name__ == "__main__":
+def run():
+    """Serve the app with the configured number of worker processes."""
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    if WORKERS <= 1:
+        uvicorn.run(app, host=HOST, port=PORT)
+        return
+    
+    if WORKER_MODE == "shared":
+        if SESSION_STORE == "memory":
+            raise SystemExit("Shared workers need a shared session store, set SESSION_STORE=sqlite")
+        uvicorn.run("main:app", host=HOST, port=PORT, workers=WORKERS)
+    elif WORKER_MODE == "sticky":
+        # One server per port; the load balancer keeps each session on one of them
+        processes = [
+            subprocess.Popen([
+                sys.executable, "-m", "uvicorn", "main:app",
+                "--host", HOST, "--port", str(PORT + index)
+            ])
+            for index in range(WORKERS)
+        ]
+        logger.info("Started %d sticky workers on ports %d-%d", WORKERS, PORT, PORT + WORKERS - 1)
+        try:
+            for process in processes:
+                process.wait()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for process in processes:
+                process.terminate()
+                process.wait()
+    else:
+        raise SystemExit(f"Unknown WORKER_MODE: {WORKER_MODE}")
+
+
+if __name__ == "__main__":
+    run()
 
@@ -0,0 +1,353 @@
+"""In-process metrics, exposed in the Prometheus text format."""
+
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from config import METRICS_ENABLED
+
+# Seconds; covers fast first tokens up to long generations
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 400, 800)
+
+
+def _escape(value: str) -> str:
+    """Escape a label value for the text format."""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    """Render a label set such as {model="gpt-4o",le="0.5"}."""
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    """Render a sample value, keeping integers free of a trailing .0."""
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    """Base for a named metric family with optional labels."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        """
+        Get the series for a label set, creating it on first use.
+
+        Hot paths should keep the returned series instead of looking it
+        up for every observation.
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """Render the HELP and TYPE lines and every sample."""
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+            *self._samples(),
+        ]
+
+
+class _Value:
+    """A single counter or gauge series."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, e.g. of errors."""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        """Increment the unlabelled series."""
+        self.labels().inc(amount)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+            for values, child in self._children.items()
+        ]
+
+
+class Gauge(Counter):
+    """
+    Value that goes up and down.
+
+    With a callback, the value is read when metrics are collected, which
+    costs nothing on the request path.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        callback: Optional[Callable[[], float]] = None
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def _samples(self) -> List[str]:
+        if self.callback is not None:
+            self.labels().set(self.callback())
+        return super()._samples()
+
+
+class _HistogramSeries:
+    """Bucket counts of one histogram series."""
+
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is the +Inf bucket
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float):
+        """Observe a value on the unlabelled series."""
+        self.labels().observe(value)
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for values, series in self._children.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float("inf")), series.counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together at /metrics."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        """Add a metric; names must be unique."""
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Chat streams
+STREAM_TTFT = REGISTRY.register(Histogram(
+    "nova_stream_time_to_first_token_seconds",
+    "Time from receiving a chat request to its first response chunk.",
+    ["model"],
+))
+STREAM_INTER_TOKEN = REGISTRY.register(Histogram(
+    "nova_stream_inter_chunk_seconds",
+    "Time between consecutive response chunks of a stream.",
+    ["model"],
+))
+STREAM_TOKENS_PER_SECOND = REGISTRY.register(Histogram(
+    "nova_stream_tokens_per_second",
+    "Output rate after the first chunk, in tokens estimated as 4 characters each.",
+    ["model"],
+    buckets=RATE_BUCKETS,
+))
+STREAM_DURATION = REGISTRY.register(Histogram(
+    "nova_stream_duration_seconds",
+    "Total duration of chat streams by outcome (completed, cancelled, error).",
+    ["model", "outcome"],
+))
+PROMPT_BUILD = REGISTRY.register(Histogram(
+    "nova_prompt_build_seconds",
+    "Time spent building the prompt from conversation history.",
+    ["provider"],
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+))
+STREAM_CANCELLATIONS = REGISTRY.register(Counter(
+    "nova_stream_cancellations_total",
+    "Chat streams cancelled by the client.",
+    ["model"],
+))
+STREAM_ERRORS = REGISTRY.register(Counter(
+    "nova_stream_errors_total",
+    "Chat streams that ended with an error, by provider.",
+    ["provider"],
+))
+CACHE_HITS = REGISTRY.register(Counter(
+    "nova_response_cache_hits_total",
+    "Chat requests answered from the response cache.",
+))
+STREAM_RESUMES = REGISTRY.register(Counter(
+    "nova_stream_resumes_total",
+    "Reconnections to a stream with Last-Event-ID, by outcome (resumed, gone, unknown).",
+    ["outcome"],
+))
+# Read at collection time; services_instance wires the callbacks
+ACTIVE_STREAMS = REGISTRY.register(Gauge(
+    "nova_active_streams",
+    "Chat streams currently being generated.",
+))
+REPLAY_BYTES = REGISTRY.register(Gauge(
+    "nova_stream_replay_bytes",
+    "Stream frames buffered for reconnecting clients.",
+))
+SESSIONS = REGISTRY.register(Gauge(
+    "nova_sessions",
+    "Conversations held in the session store.",
+))
+ADMISSION_QUEUE = REGISTRY.register(Gauge(
+    "nova_admission_queue_length",
+    "Chat requests waiting for a stream slot.",
+))
+
+# Session store
+SESSION_WRITE_FAILURES = REGISTRY.register(Counter(
+    "nova_session_store_write_failures_total",
+    "Failed session store writes, by outcome (retried, dropped).",
+    ["outcome"],
+))
+
+# Admission control
+ADMISSION_REJECTIONS = REGISTRY.register(Counter(
+    "nova_admission_rejections_total",
+    "Chat requests rejected by admission control, by reason.",
+    ["reason"],
+))
+ADMISSION_QUEUE_WAIT = REGISTRY.register(Histogram(
+    "nova_admission_queue_wait_seconds",
+    "Time queued chat requests waited for a stream slot.",
+))
+
+# Provider usage
+TOKENS = REGISTRY.register(Counter(
+    "nova_tokens_total",
+    "Provider tokens by model and kind (input, output, cached input).",
+    ["model", "kind"],
+))
+COST = REGISTRY.register(Counter(
+    "nova_cost_usd_total",
+    "Estimated provider cost in USD by model.",
+    ["model"],
+))
+
+# Batch jobs
+BATCH_REQUESTS = REGISTRY.register(Counter(
+    "nova_batch_prompts_total",
+    "Batch job prompts answered, by outcome (ok, error, invalid).",
+    ["outcome"],
+))
+
+# HTTP routes
+HTTP_REQUESTS = REGISTRY.register(Counter(
+    "nova_http_requests_total",
+    "HTTP requests by route and status code.",
+    ["method", "route", "status"],
+))
+HTTP_DURATION = REGISTRY.register(Histogram(
+    "nova_http_request_duration_seconds",
+    "Time until the response headers were sent, by route.",
+    ["method", "route"],
+))
+
+
+class HttpMetricsMiddleware:
+    """
+    ASGI middleware counting requests and timing them until the headers are sent.
+
+    Streaming responses are timed to their first byte; their full duration
+    is recorded by the chat stream metrics. Routes are labelled by their
+    path template, so session ids do not create new series.
+    """
+
+    def __init__(self, app, enabled: bool = METRICS_ENABLED):
+        self.app = app
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                route = scope.get("route")
+                path = route.path if route is not None else "unmatched"
+                HTTP_DURATION.labels(scope["method"], path).observe(time.perf_counter() - started)
+                HTTP_REQUESTS.labels(scope["method"], path, str(message["status"])).inc()
+            await send(message)
+
+        await self.app(scope, receive, send_with_metrics)
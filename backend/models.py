@@ -27,4 +27,16 @@ class ChatStreamResponse(BaseModel):
     """Model for chat stream response."""
     text: str | None = None
     done: bool = False
+    model: str | None = None  # Model chosen for "auto" requests, sent with done
     error: str | None = None
+
+
+class PrepareSessionRequest(BaseModel):
+    """Model for the hint sent while the user types the next message."""
+    model: str = "gemini-2.5-pro"
+
+
+class CancelStreamRequest(BaseModel):
+    """Model for stream cancellation request."""
+    stream_id: str | None = None
+    session_id: str | None = None
@@ -3,5 +3,25 @@
 from routes.models import router as models_router
 from routes.chat import router as chat_router
 from routes.cancel import router as cancel_router
+from routes.sessions import router as sessions_router
+from routes.cache import router as cache_router
+from routes.transport import router as transport_router
+from routes.routing import router as routing_router
+from routes.metrics import router as metrics_router
+from routes.admission import router as admission_router
+from routes.usage import router as usage_router
+from routes.batch import router as batch_router
 
-__all__ = ["models_router", "chat_router", "cancel_router"]
+__all__ = [
+    "models_router",
+    "chat_router",
+    "cancel_router",
+    "sessions_router",
+    "cache_router",
+    "transport_router",
+    "routing_router",
+    "metrics_router",
+    "admission_router",
+    "usage_router",
+    "batch_router",
+]
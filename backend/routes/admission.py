@@ -0,0 +1,12 @@
+"""Routes for admission control."""
+
+from fastapi import APIRouter
+from services_instance import admission
+
+router = APIRouter(prefix="/api", tags=["admission"])
+
+
+@router.get("/admission/stats")
+async def get_admission_stats():
+    """Get stream slot usage, queue length and rejection counts."""
+    return admission.get_stats()
@@ -0,0 +1,61 @@
+"""Routes for offline batch chat completions."""
+
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse
+from services_instance import batch_service
+
+router = APIRouter(prefix="/api", tags=["batch"])
+
+
+@router.post("/chat/batch", status_code=202)
+async def create_batch(
+    request: Request,
+    model: Optional[str] = None,
+    concurrency: Optional[int] = Query(None, ge=1, le=256),
+    provider_batch: bool = False
+):
+    """
+    Start a batch job from a JSONL body with one {"id", "message", "model"} object per line.
+
+    Results are written to a JSONL file as they arrive; poll the job and
+    download them from /api/chat/batch/{job_id}/results.
+    """
+    try:
+        job = await batch_service.create_job(request.stream(), model, concurrency, provider_batch)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return job.to_dict()
+
+
+@router.get("/chat/batch")
+async def list_batches():
+    """List the most recent batch jobs."""
+    return {"jobs": batch_service.list_jobs(), **batch_service.get_stats()}
+
+
+@router.get("/chat/batch/{job_id}")
+async def get_batch(job_id: str):
+    """Get the state and progress of a batch job."""
+    job = batch_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return job.to_dict()
+
+
+@router.get("/chat/batch/{job_id}/results")
+async def get_batch_results(job_id: str):
+    """Download the results written so far, one JSON object per line."""
+    job = batch_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return FileResponse(job.output_path, media_type="application/x-ndjson", filename=f"{job_id}.jsonl")
+
+
+@router.post("/chat/batch/{job_id}/cancel")
+async def cancel_batch(job_id: str):
+    """Cancel a batch job, keeping the results written so far."""
+    job = batch_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Batch job not found")
+    return batch_service.cancel(job_id).to_dict()
@@ -0,0 +1,17 @@
+"""Routes for the response cache."""
+
+from fastapi import APIRouter
+from services_instance import chat_service
+
+router = APIRouter(prefix="/api", tags=["cache"])
+
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    """Get response cache, request coalescing, provider prompt cache and stream replay statistics."""
+    return {
+        **chat_service.response_cache.get_stats(),
+        "single_flight": chat_service.single_flight.get_stats(),
+        "prompt_cache": chat_service.prompt_cache.get_stats(),
+        "stream_replay": chat_service.stream_replay.get_stats(),
+    }
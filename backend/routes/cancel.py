@@ -1,13 +1,20 @@
 """Routes for stream cancellation."""
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from services_instance import chat_service
+from models import CancelStreamRequest
 
 router = APIRouter(prefix="/api", tags=["chat"])
 
 
 @router.post("/cancel-stream")
-async def cancel_stream():
-    """Cancel the current streaming response."""
-    chat_service.cancel_current_stream()
-    return {"status": "cancelled"}
+async def cancel_stream(data: CancelStreamRequest):
+    """Cancel a streaming response by stream id, or all streams of a session."""
+    if data.stream_id:
+        cancelled = [data.stream_id] if await chat_service.cancel_stream(data.stream_id) else []
+    elif data.session_id:
+        cancelled = await chat_service.cancel_session_streams(data.session_id)
+    else:
+        raise HTTPException(status_code=400, detail="stream_id or session_id is required")
+    
+    return {"status": "cancelled", "cancelled": cancelled}
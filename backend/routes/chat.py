@@ -1,35 +1,243 @@
 """Routes for chat endpoints."""
 
-from fastapi import APIRouter
+import asyncio
+import uuid
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Request
 from fastapi.responses import StreamingResponse
-from services_instance import chat_service, model_service
+from starlette.background import BackgroundTask
+from config import SSE_COALESCE_ENABLED, SSE_COALESCE_WINDOW_MS, SSE_COALESCE_MAX_BYTES, SSE_RESUME_ENABLED
+from services_instance import chat_service, admission, model_service
+from services.chat_service import sse_frame
+from services.admission import AdmissionRejected
+from metrics import STREAM_RESUMES
 from models import ChatMessage
+import tracing
 
 router = APIRouter(prefix="/api", tags=["chat"])
 
+# How often to poll the client connection while a stream is active
+DISCONNECT_POLL_INTERVAL = 0.5
+
+
+def _sse_headers(stream_id: str) -> dict:
+    """Response headers of an SSE stream."""
+    return {
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+        "Connection": "keep-alive",
+        "X-Stream-Id": stream_id
+    }
+
+
+async def _cancel_on_disconnect(request: Request, stream_id: str):
+    """Cancel the stream as soon as the client goes away."""
+    while True:
+        if await request.is_disconnected():
+            await chat_service.cancel_stream(stream_id)
+            return
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+
+def _admission_model(model_name: str) -> str:
+    """
+    Get the model whose slots a request takes.
+    
+    Unknown names would add a slot pool per string a client sends, and
+    "auto" picks its model only once the stream starts, so both count
+    against the default model.
+    """
+    if model_service.is_available(model_name):
+        return model_name
+    return model_service.get_current_model_name()
+
+
+async def _frames(events):
+    """Format events as SSE frames, closing the events however iteration ends."""
+    try:
+        async for event in events:
+            yield sse_frame(event)
+    finally:
+        await events.aclose()
+
+
+async def _coalesce(
+    events,
+    window: float = SSE_COALESCE_WINDOW_MS / 1000,
+    max_bytes: int = SSE_COALESCE_MAX_BYTES
+):
+    """
+    Merge consecutive text events into fewer, larger events.
+    
+    A reader task drains the events into a buffer, so each delta only costs
+    a list append. The first text event and every non-text event are
+    released at once, so time-to-first-token does not change. Other text
+    is held until `max_bytes` have accumulated or `window` seconds have
+    passed since the oldest held text, even if the provider goes quiet.
+    
+    Args:
+        events: Event dicts from ChatService.stream_events
+        window: Longest time text is held back, in seconds
+        max_bytes: UTF-8 size at which held text is released immediately
+        
+    Yields:
+        Event dicts
+    """
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    released = []  # Events the writer may send, in order
+    held = []  # Text not released yet
+    state = {"bytes": 0, "timer": None, "done": False, "error": None}
+    
+    def release():
+        if state["timer"] is not None:
+            state["timer"].cancel()
+            state["timer"] = None
+        if held:
+            released.append({"text": "".join(held)})
+            held.clear()
+            state["bytes"] = 0
+        ready.set()
+    
+    async def read():
+        first_text = True
+        try:
+            async for event in events:
+                text = event.get("text")
+                if text is None or first_text:
+                    if text is not None:
+                        first_text = False
+                    release()
+                    released.append(event)
+                    continue
+                held.append(text)
+                state["bytes"] += len(text.encode("utf-8"))
+                if state["bytes"] >= max_bytes:
+                    release()
+                elif state["timer"] is None:
+                    state["timer"] = loop.call_later(window, release)
+        except Exception as e:
+            state["error"] = e
+        finally:
+            state["done"] = True
+            release()
+    
+    reader = asyncio.create_task(read())
+    try:
+        while True:
+            await ready.wait()
+            ready.clear()
+            batch = released[:]
+            released.clear()
+            # Text that piled up behind a slow client goes out as one frame
+            text = []
+            for event in batch:
+                if "text" in event:
+                    text.append(event["text"])
+                    continue
+                if text:
+                    yield {"text": "".join(text)}
+                    text = []
+                yield event
+            if text:
+                yield {"text": "".join(text)}
+            if state["done"] and not released:
+                break
+        if state["error"] is not None:
+            raise state["error"]
+    finally:
+        reader.cancel()
+        await asyncio.wait({reader})
+        if state["timer"] is not None:
+            state["timer"].cancel()
+
 
 @router.post("/chat/stream")
-async def chat_stream(data: ChatMessage):
+async def chat_stream(data: ChatMessage, request: Request):
     """Streaming chat endpoint with conversation memory - returns response word by word."""
+    stream_id = uuid.uuid4().hex
+    request_span = tracing.current_span()
+    if request_span:
+        # Body reading and validation ran between the request span's start and here
+        request_span.child("request.parse", request_span.start_ns).end()
+        request_span.set(**{"chat.model": data.model, "chat.stream_id": stream_id})
+    
+    # Overload is refused up front instead of opening another upstream stream
+    try:
+        with tracing.span("admission.wait"):
+            ticket = await admission.admit(
+                data.session_id,
+                request.client.host if request.client else "unknown",
+                _admission_model(data.model)
+            )
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=f"Server busy ({e.reason}), retry later",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    release = ticket.release if ticket is not None else None
+    
+    events = chat_service.stream_events(
+        data.message, 
+        data.model,
+        data.session_id,
+        stream_id
+    )
+    if SSE_COALESCE_ENABLED:
+        events = _coalesce(events)
     
-    # Set the model if different from current
-    if data.model != model_service.get_current_model_name():
-        model_service.set_model(data.model)
+    if SSE_RESUME_ENABLED:
+        # Generated in the background, so a dropped connection does not lose the
+        # answer; the generation holds the admission slot until it ends
+        replay = chat_service.stream_replay
+        buffer = replay.start(stream_id, _frames(events), on_finish=release)
+        return StreamingResponse(
+            replay.follow(buffer, disconnected=request.is_disconnected, poll_interval=DISCONNECT_POLL_INTERVAL),
+            media_type="text/event-stream",
+            headers=_sse_headers(stream_id)
+        )
     
     async def generate():
-        async for chunk in chat_service.stream_response(
-            data.message, 
-            data.model,
-            data.session_id
-        ):
-            yield chunk
+        watcher = asyncio.create_task(_cancel_on_disconnect(request, stream_id))
+        try:
+            async for frame in _frames(events):
+                yield frame
+        finally:
+            watcher.cancel()
+            await events.aclose()
+            if release is not None:
+                release()
     
     return StreamingResponse(
         generate(),
+        # Also frees the slot when the client left before the body started
+        background=BackgroundTask(release) if release is not None else None,
+        media_type="text/event-stream",
+        headers=_sse_headers(stream_id)
+    )
+
+
+@router.get("/chat/stream/{stream_id}")
+async def resume_stream(stream_id: str, request: Request, last_event_id: Optional[str] = Header(None)):
+    """Reconnect to a stream and continue after the frame named by the Last-Event-ID header."""
+    buffer = chat_service.stream_replay.get(stream_id) if SSE_RESUME_ENABLED else None
+    if buffer is None:
+        STREAM_RESUMES.labels("unknown").inc()
+        raise HTTPException(status_code=404, detail="Stream not found or expired, send the message again")
+    try:
+        after = int(last_event_id) if last_event_id else -1
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Last-Event-ID must be an event id")
+    if after + 1 < buffer.first_id:
+        STREAM_RESUMES.labels("gone").inc()
+        raise HTTPException(status_code=410, detail="The stream is no longer buffered from that event")
+    
+    STREAM_RESUMES.labels("resumed").inc()
+    return StreamingResponse(
+        chat_service.stream_replay.follow(
+            buffer, after, disconnected=request.is_disconnected, poll_interval=DISCONNECT_POLL_INTERVAL
+        ),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "X-Accel-Buffering": "no",
-            "Connection": "keep-alive"
-        }
+        headers=_sse_headers(stream_id)
     )
@@ -0,0 +1,16 @@
+"""Route for Prometheus metrics."""
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from config import METRICS_ENABLED
+from metrics import REGISTRY
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Get stream, route and session metrics in the Prometheus text format."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,18 @@
+"""Routes for provider routing and failover."""
+
+from fastapi import APIRouter
+from services_instance import chat_service
+
+router = APIRouter(prefix="/api", tags=["routing"])
+
+
+@router.get("/routing/stats")
+async def get_routing_stats():
+    """Get circuit breaker state, failovers and hedging statistics per model."""
+    return chat_service.routing_policy.get_stats()
+
+
+@router.get("/routing/auto/stats")
+async def get_auto_routing_stats():
+    """Get the auto router's decision counts per tier and model, and its recent decisions."""
+    return chat_service.auto_router.get_stats()
@@ -0,0 +1,20 @@
+"""Routes for conversation session management."""
+
+from fastapi import APIRouter
+from services_instance import chat_service, memory_manager
+from models import PrepareSessionRequest
+
+router = APIRouter(prefix="/api", tags=["sessions"])
+
+
+@router.get("/sessions/stats")
+async def get_session_stats():
+    """Get session store occupancy and eviction statistics."""
+    return memory_manager.get_stats()
+
+
+@router.post("/sessions/{session_id}/prepare")
+async def prepare_session(session_id: str, data: PrepareSessionRequest | None = None):
+    """Hint that a message for this session is being typed, so its context is ready when it arrives."""
+    data = data or PrepareSessionRequest()
+    return await chat_service.prepare_session(session_id, data.model)
@@ -0,0 +1,12 @@
+"""Routes for the shared provider HTTP transport."""
+
+from fastapi import APIRouter
+from services_instance import model_service
+
+router = APIRouter(prefix="/api", tags=["transport"])
+
+
+@router.get("/transport/stats")
+async def get_transport_stats():
+    """Get connection reuse and pool wait statistics."""
+    return model_service.transport.get_stats()
@@ -0,0 +1,21 @@
+"""Routes for token usage and budgets."""
+
+from fastapi import APIRouter, HTTPException
+from services_instance import chat_service
+
+router = APIRouter(prefix="/api", tags=["usage"])
+
+
+@router.get("/usage")
+async def get_usage():
+    """Get total and per-model token usage and the most expensive sessions."""
+    return chat_service.usage.get_stats()
+
+
+@router.get("/usage/sessions/{session_id}")
+async def get_session_usage(session_id: str):
+    """Get a session's token usage and whether it is over budget."""
+    usage = chat_service.usage.get_session_usage(session_id)
+    if usage is None:
+        raise HTTPException(status_code=404, detail="No usage recorded for this session")
+    return {"session_id": session_id, **usage}
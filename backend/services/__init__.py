@@ -1,6 +1,6 @@
 """Services package for Nova AI backend."""
 
-from services.model_service import ModelService
+from services.model_service import ModelService, ModelHandle
 from services.chat_service import ChatService
 
-__all__ = ["ModelService", "ChatService"]
+__all__ = ["ModelService", "ModelHandle", "ChatService"]
@@ -0,0 +1,289 @@
+"""Admission control for chat streams: concurrency limits, rate limits and a bounded queue."""
+
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional
+from config import (
+    ADMISSION_ENABLED,
+    ADMISSION_MAX_STREAMS,
+    ADMISSION_MODEL_MAX_STREAMS,
+    ADMISSION_MODEL_LIMITS,
+    ADMISSION_QUEUE_SIZE,
+    ADMISSION_QUEUE_TIMEOUT,
+    SESSION_RATE_PER_MINUTE,
+    SESSION_BURST,
+    CLIENT_RATE_PER_MINUTE,
+    CLIENT_BURST,
+)
+from logger import get_logger
+from metrics import ADMISSION_REJECTIONS, ADMISSION_QUEUE_WAIT
+
+logger = get_logger("admission")
+
+# Rate limit buckets kept per key type; the least recently used are dropped first
+_MAX_BUCKETS = 10000
+
+
+class AdmissionRejected(Exception):
+    """A request was turned away; carries the HTTP status and when to retry."""
+    
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    """Allows `rate` requests per second on average, with bursts of up to `burst`."""
+    
+    __slots__ = ("rate", "burst", "tokens", "updated")
+    
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+    
+    def take(self) -> float:
+        """
+        Take a token if one is available.
+        
+        Returns:
+            0 when the request may proceed, otherwise seconds until a token is available
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _RateLimiter:
+    """Token buckets keyed by session or client address."""
+    
+    def __init__(self, per_minute: float, burst: float):
+        self.rate = per_minute / 60
+        self.burst = burst
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+    
+    def take(self, key: str) -> float:
+        """Take a token for a key; returns seconds to wait when none is left."""
+        if self.rate <= 0:
+            return 0.0
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > _MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take()
+
+
+class AdmissionTicket:
+    """A granted stream slot; release() gives it back exactly once."""
+    
+    __slots__ = ("_controller", "model_name", "granted_at", "_released")
+    
+    def __init__(self, controller: "AdmissionController", model_name: str):
+        self._controller = controller
+        self.model_name = model_name
+        self.granted_at = time.monotonic()
+        self._released = False
+    
+    def release(self):
+        """Free the slot and let the next queued request in."""
+        if not self._released:
+            self._released = True
+            self._controller._release(self)
+
+
+class _Waiter:
+    """A queued request waiting for a slot."""
+    
+    __slots__ = ("model_name", "future")
+    
+    def __init__(self, model_name: str, future: asyncio.Future):
+        self.model_name = model_name
+        self.future = future
+
+
+class AdmissionController:
+    """
+    Decides whether a chat stream may start.
+    
+    Per-session and per-client token buckets reject request floods with
+    429. Streams then need a global slot and a slot for their model.
+    When none is free, the request waits in a bounded FIFO queue until
+    its deadline; a full queue or an expired deadline gives a 503. Every
+    rejection carries a Retry-After estimate, so overload turns into fast
+    refusals instead of unbounded upstream connections and latency.
+    """
+    
+    def __init__(
+        self,
+        enabled: bool = ADMISSION_ENABLED,
+        max_streams: int = ADMISSION_MAX_STREAMS,
+        model_max_streams: int = ADMISSION_MODEL_MAX_STREAMS,
+        model_limits: Dict[str, int] = ADMISSION_MODEL_LIMITS,
+        queue_size: int = ADMISSION_QUEUE_SIZE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT
+    ):
+        """
+        Initialize the controller.
+        
+        Args:
+            enabled: Whether to apply any limits
+            max_streams: Streams running at once across all models
+            model_max_streams: Streams running at once per model, unless overridden
+            model_limits: Per-model overrides of model_max_streams
+            queue_size: Requests that may wait for a slot
+            queue_timeout: Seconds a request waits before it is rejected
+        """
+        self.enabled = enabled
+        self.max_streams = max_streams
+        self.model_max_streams = model_max_streams
+        self.model_limits = model_limits
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.session_limiter = _RateLimiter(SESSION_RATE_PER_MINUTE, SESSION_BURST)
+        self.client_limiter = _RateLimiter(CLIENT_RATE_PER_MINUTE, CLIENT_BURST)
+        self._active = 0
+        self._active_per_model: Dict[str, int] = {}
+        self._waiters: Deque[_Waiter] = deque()
+        self._hold_seconds = 10.0  # Moving average of how long a stream keeps its slot
+        self._counters = {"admitted": 0, "queued": 0, "rejected": 0}
+    
+    def _model_limit(self, model_name: str) -> int:
+        """Get the concurrency limit of a model."""
+        return self.model_limits.get(model_name, self.model_max_streams)
+    
+    def _has_slot(self, model_name: str) -> bool:
+        """Whether a stream on this model may start now."""
+        return (
+            self._active < self.max_streams
+            and self._active_per_model.get(model_name, 0) < self._model_limit(model_name)
+        )
+    
+    def _grant(self, model_name: str) -> AdmissionTicket:
+        """Take a slot."""
+        self._active += 1
+        self._active_per_model[model_name] = self._active_per_model.get(model_name, 0) + 1
+        self._counters["admitted"] += 1
+        return AdmissionTicket(self, model_name)
+    
+    def _reject(self, status_code: int, reason: str, retry_after: float):
+        """Count a rejection and raise it."""
+        self._counters["rejected"] += 1
+        ADMISSION_REJECTIONS.labels(reason).inc()
+        logger.debug("Rejected a chat stream (%s, retry after %.1f s)", reason, retry_after)
+        raise AdmissionRejected(status_code, reason, retry_after)
+    
+    def _retry_after(self) -> float:
+        """Estimate how long until the queue ahead has drained."""
+        return self._hold_seconds * (len(self._waiters) + 1) / self.max_streams
+    
+    async def admit(self, session_id: str, client: str, model_name: str) -> Optional[AdmissionTicket]:
+        """
+        Admit a chat stream or raise AdmissionRejected.
+        
+        Args:
+            session_id: Session the request belongs to
+            client: Client address
+            model_name: Requested model
+            
+        Returns:
+            Ticket to release when the stream ends, or None when admission control is off
+        """
+        if not self.enabled:
+            return None
+        
+        # Keyed by client too: clients choose session ids and may share one, e.g. "default"
+        wait = self.session_limiter.take(f"{client}/{session_id}")
+        if wait:
+            self._reject(429, "session_rate", wait)
+        wait = self.client_limiter.take(client)
+        if wait:
+            self._reject(429, "client_rate", wait)
+        
+        # Released slots go straight to queued requests, so a free slot
+        # here means no queued request can use it
+        if self._has_slot(model_name):
+            return self._grant(model_name)
+        
+        if len(self._waiters) >= self.queue_size:
+            self._reject(503, "queue_full", self._retry_after())
+        
+        waiter = _Waiter(model_name, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        self._counters["queued"] += 1
+        queued_at = time.monotonic()
+        try:
+            ticket = await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the deadline passed
+                ticket = waiter.future.result()
+            else:
+                self._remove_waiter(waiter)
+                self._reject(503, "queue_timeout", self._retry_after())
+        except BaseException:
+            # The client went away while waiting
+            self._remove_waiter(waiter)
+            if waiter.future.done() and not waiter.future.cancelled():
+                waiter.future.result().release()
+            raise
+        ADMISSION_QUEUE_WAIT.observe(time.monotonic() - queued_at)
+        return ticket
+    
+    def _remove_waiter(self, waiter: _Waiter):
+        """Take a waiter out of the queue."""
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        if not waiter.future.done():
+            waiter.future.cancel()
+    
+    def _release(self, ticket: AdmissionTicket):
+        """Return a slot and hand free slots to queued requests in order."""
+        self._active -= 1
+        count = self._active_per_model[ticket.model_name] - 1
+        if count:
+            self._active_per_model[ticket.model_name] = count
+        else:
+            del self._active_per_model[ticket.model_name]
+        held = time.monotonic() - ticket.granted_at
+        self._hold_seconds += (held - self._hold_seconds) * 0.1
+        
+        # Skip waiters whose model is at its limit so they do not block other models
+        for waiter in list(self._waiters):
+            if self._active >= self.max_streams:
+                break
+            if waiter.future.done():
+                self._waiters.remove(waiter)
+            elif self._has_slot(waiter.model_name):
+                self._waiters.remove(waiter)
+                waiter.future.set_result(self._grant(waiter.model_name))
+    
+    def get_queue_length(self) -> int:
+        """Get the number of requests waiting for a slot."""
+        return len(self._waiters)
+    
+    def get_stats(self) -> dict:
+        """Get slot usage, queue length and admission counters."""
+        return {
+            "enabled": self.enabled,
+            **self._counters,
+            "active": self._active,
+            "max_streams": self.max_streams,
+            "active_per_model": dict(self._active_per_model),
+            "queue_length": len(self._waiters),
+            "queue_size": self.queue_size,
+            "avg_hold_seconds": self._hold_seconds,
+        }
@@ -0,0 +1,276 @@
+"""Automatic model selection for the "auto" model."""
+
+import json
+import random
+import re
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Tuple
+from config import (
+    AUTO_MODEL_CANDIDATES,
+    AUTO_EXPECTED_CHARS,
+    AUTO_PRIOR_TTFT_SECONDS,
+    AUTO_PRIOR_CHARS_PER_SECOND,
+    AUTO_EXPLORE_RATE,
+    AUTO_DECISION_LOG,
+)
+from logger import get_logger
+from services.model_service import ModelService
+from services.routing_policy import RoutingPolicy, percentile
+
+logger = get_logger("auto")
+
+TIERS = ("lite", "standard", "pro")
+_SMALL_TALK = re.compile(
+    r"^(здравей|здрасти|привет|хей|благодаря|мерси|супер|добре|ок|"
+    r"hi|hello|hey|thanks|thank you|ok|okay|cool|bye|чао|довиждане)\b"
+)
+_REASONING = re.compile(
+    r"защо|обясн|анализ|сравн|докаж|стъпка по стъпка|изчисл|реш[иа]|оптимиз|алгоритъм|"
+    r"архитектур|стратеги|план|why|explain|analy[sz]|compare|prove|step by step|calculat|"
+    r"solve|optimi[sz]|algorithm|architect|debug|refactor|design"
+)
+_CODE = re.compile(r"```|\bdef |\bclass |\bfunction\b|=>|;\s*$|\{\s*$", re.MULTILINE)
+
+
+def extract_features(message: str, history_turns: int) -> dict:
+    """
+    Describe a prompt by the cheap signals the complexity heuristic uses.
+    
+    Args:
+        message: User message
+        history_turns: Turns already in the conversation
+        
+    Returns:
+        Feature dict; holds no message text so it can be logged
+    """
+    text = message.casefold().strip()
+    return {
+        "words": len(text.split()),
+        "small_talk": bool(_SMALL_TALK.match(text)),
+        "reasoning": len(_REASONING.findall(text)),
+        "code": bool(_CODE.search(message)),
+        "questions": text.count("?"),
+        "history_turns": history_turns,
+    }
+
+
+def complexity_tier(features: dict) -> str:
+    """
+    Pick the model tier a prompt needs.
+    
+    Short small talk goes to the lite tier; long prompts, code and
+    reasoning requests score towards the pro tier.
+    
+    Args:
+        features: Output of extract_features
+        
+    Returns:
+        "lite", "standard" or "pro"
+    """
+    if features["small_talk"] and features["words"] <= 8:
+        return "lite"
+    score = features["words"] / 60
+    score += 1.5 * min(features["reasoning"], 3)
+    score += 2.0 if features["code"] else 0.0
+    score += 0.5 * max(features["questions"] - 1, 0)
+    score += 0.5 if features["history_turns"] > 20 else 0.0
+    if score < 1.0:
+        return "lite"
+    if score < 3.0:
+        return "standard"
+    return "pro"
+
+
+class AutoRouter:
+    """
+    Chooses a model for each "auto" request.
+    
+    The prompt decides the tier; within the tier the model with the
+    lowest expected response time wins, estimated from the live
+    first-token latency, throughput and failure rate the routing policy
+    measures. Unmeasured models use optimistic priors so they get tried,
+    and a small share of requests explores other models of the tier.
+    """
+    
+    def __init__(
+        self,
+        model_service: ModelService,
+        routing_policy: RoutingPolicy,
+        candidates: List[str] = AUTO_MODEL_CANDIDATES,
+        explore_rate: float = AUTO_EXPLORE_RATE,
+        log_path: str = AUTO_DECISION_LOG
+    ):
+        """
+        Initialize the router.
+        
+        Args:
+            model_service: Service used to look up model tiers and availability
+            routing_policy: Source of live latency and circuit breaker state
+            candidates: Models the router may pick from
+            explore_rate: Share of requests sent to a random model of the tier
+            log_path: JSONL file that receives every decision, empty disables
+        """
+        self.model_service = model_service
+        self.routing_policy = routing_policy
+        self.candidates = candidates
+        self.explore_rate = explore_rate
+        self._log = open(log_path, "a", encoding="utf-8") if log_path else None
+        self._recent: Deque[dict] = deque(maxlen=200)
+        self._tiers: Counter = Counter()
+        self._models: Counter = Counter()
+        self._explored = 0
+    
+    def snapshot(self, model_name: str) -> dict:
+        """Get the live stats of a model the decision is based on."""
+        health = self.routing_policy.health(model_name)
+        ttfts = list(health.ttfts)
+        throughputs = list(health.throughputs)
+        return {
+            "ttft": percentile(ttfts, 0.5) if ttfts else AUTO_PRIOR_TTFT_SECONDS,
+            "chars_per_second": (
+                percentile(throughputs, 0.5) if throughputs else AUTO_PRIOR_CHARS_PER_SECOND
+            ),
+            "failure_rate": health.failure_rate(),
+            "usable": health.usable(),
+        }
+    
+    def choose(self, message: str, history_turns: int = 0) -> str:
+        """
+        Choose the model for a request.
+        
+        Args:
+            message: User message
+            history_turns: Turns already in the conversation
+            
+        Returns:
+            Model name from AVAILABLE_MODELS
+        """
+        features = extract_features(message, history_turns)
+        tier = complexity_tier(features)
+        snapshots = {
+            name: self.snapshot(name)
+            for name in self.candidates
+            if self.model_service.is_available(name)
+        }
+        explore = random.random() < self.explore_rate
+        model_name, estimates = self.pick(tier, snapshots, explore)
+        
+        decision = {
+            "time": time.time(),
+            "features": features,
+            "tier": tier,
+            "model": model_name,
+            "explored": explore,
+            "estimates": estimates,
+            "snapshots": snapshots,
+        }
+        self._tiers[tier] += 1
+        self._models[model_name] += 1
+        self._explored += explore
+        self._recent.append(decision)
+        if self._log is not None:
+            self._log.write(json.dumps(decision) + "\n")
+        logger.debug("Auto routing chose %s (tier %s)", model_name, tier)
+        return model_name
+    
+    def pick(
+        self,
+        tier: str,
+        snapshots: Dict[str, dict],
+        explore: bool = False
+    ) -> Tuple[str, Dict[str, float]]:
+        """
+        Pick the fastest usable model of a tier from stats snapshots.
+        
+        Falls back to the nearest tier when a tier has no usable model.
+        
+        Args:
+            tier: Tier from complexity_tier
+            snapshots: Stats per available candidate, from snapshot()
+            explore: Pick a random usable model of the tier instead
+            
+        Returns:
+            Tuple of (model name, expected seconds per candidate of the tier)
+        """
+        order = sorted(TIERS, key=lambda other: abs(TIERS.index(other) - TIERS.index(tier)))
+        for candidate_tier in order:
+            names = [
+                name for name, snap in snapshots.items()
+                if snap["usable"] and self._tier_of(name) == candidate_tier
+            ]
+            if not names:
+                continue
+            expected_chars = AUTO_EXPECTED_CHARS[tier]
+            estimates = {
+                name: self._expected_seconds(snapshots[name], expected_chars) for name in names
+            }
+            if explore:
+                return random.choice(names), estimates
+            return min(names, key=estimates.get), estimates
+        # Nothing usable: let the routing policy's failover deal with it
+        return self.candidates[-1], {}
+    
+    def _tier_of(self, model_name: str) -> Optional[str]:
+        """Get a model's tier from the catalogue."""
+        return self.model_service.get_model_info(model_name).get("tier")
+    
+    @staticmethod
+    def _expected_seconds(snapshot: dict, expected_chars: int) -> float:
+        """Expected time for a full answer, inflated by the failure rate."""
+        seconds = snapshot["ttft"] + expected_chars / max(snapshot["chars_per_second"], 1.0)
+        return seconds / max(1.0 - snapshot["failure_rate"], 0.1)
+    
+    def replay(self, path: str) -> dict:
+        """
+        Re-run logged decisions with the current heuristic and scoring.
+        
+        Each logged request is re-decided from its recorded features and
+        stats snapshots (without exploration), so threshold or scoring
+        changes can be compared against real traffic offline.
+        
+        Args:
+            path: Decision log written by this router
+            
+        Returns:
+            Summary with the tier mix before and after and the changed decisions
+        """
+        before, after = Counter(), Counter()
+        changed = 0
+        total = 0
+        expected_before = expected_after = 0.0
+        with open(path, encoding="utf-8") as log:
+            for line in log:
+                decision = json.loads(line)
+                tier = complexity_tier(decision["features"])
+                model_name, estimates = self.pick(tier, decision["snapshots"])
+                total += 1
+                before[decision["tier"]] += 1
+                after[tier] += 1
+                changed += model_name != decision["model"]
+                expected_before += decision["estimates"].get(decision["model"], 0.0)
+                expected_after += estimates.get(model_name, 0.0)
+        return {
+            "decisions": total,
+            "changed": changed,
+            "tiers_before": dict(before),
+            "tiers_after": dict(after),
+            "mean_expected_seconds_before": expected_before / total if total else 0.0,
+            "mean_expected_seconds_after": expected_after / total if total else 0.0,
+        }
+    
+    def close(self):
+        """Flush and close the decision log."""
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+    
+    def get_stats(self) -> dict:
+        """Get the decision counts and the most recent decisions."""
+        return {
+            "decisions": sum(self._tiers.values()),
+            "explored": self._explored,
+            "tiers": dict(self._tiers),
+            "models": dict(self._models),
+            "recent": list(self._recent)[-20:],
+        }
@@ -0,0 +1,674 @@
+"""Offline batch chat completions: JSONL prompts in, JSONL results out, resumable."""
+
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+import httpx
+from config import (
+    SYSTEM_PROMPT,
+    BATCH_DIR,
+    BATCH_DEFAULT_MODEL,
+    BATCH_MAX_INPUT_BYTES,
+    BATCH_CONCURRENCY,
+    BATCH_RATE_PER_MINUTE,
+    BATCH_MAX_ATTEMPTS,
+    BATCH_CHECKPOINT_INTERVAL,
+    BATCH_POLL_INTERVAL,
+)
+from logger import get_logger
+from metrics import BATCH_REQUESTS
+from services.admission import TokenBucket
+from services.model_service import ModelService, ModelHandle
+from services.usage_service import UsageTracker, TokenCounts, openai_usage, gemini_usage
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process job locks, run a single worker
+    fcntl = None
+
+logger = get_logger("batch")
+
+# Job states; queued and running jobs are resumed when the server starts
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+FAILED = "failed"
+_FINISHED = (COMPLETED, CANCELLED, FAILED)
+# OpenAI batch statuses that will not change any more
+_PROVIDER_BATCH_DONE = ("completed", "failed", "expired", "cancelled")
+_JOB_ID = re.compile(r"^[0-9a-f]{12}$")
+# Uploaded input is written to disk in blocks of about this size
+_WRITE_BLOCK_BYTES = 1 << 20
+
+
+class BatchJob:
+    """
+    A batch job and its directory.
+    
+    job.json holds the state, input.jsonl the prompts and output.jsonl the
+    results written so far, which doubles as the checkpoint: a resumed job
+    skips every prompt whose id is already in the output.
+    """
+    
+    def __init__(
+        self,
+        job_id: str,
+        directory: str,
+        default_model: str,
+        concurrency: int,
+        provider_batch: bool
+    ):
+        self.id = job_id
+        self.directory = directory
+        self.default_model = default_model
+        self.concurrency = concurrency  # Workers per provider
+        self.provider_batch = provider_batch  # Send OpenAI prompts through the OpenAI Batch API
+        self.state = QUEUED
+        self.total = 0
+        self.processed = 0
+        self.failed = 0
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.provider_batch_id: Optional[str] = None
+        self.error: Optional[str] = None
+        self.cancel_requested = False
+    
+    @property
+    def input_path(self) -> str:
+        return os.path.join(self.directory, "input.jsonl")
+    
+    @property
+    def output_path(self) -> str:
+        return os.path.join(self.directory, "output.jsonl")
+    
+    @property
+    def cancel_path(self) -> str:
+        """Marker file that lets any worker process cancel the job."""
+        return os.path.join(self.directory, "cancel")
+    
+    def to_dict(self) -> dict:
+        """Get the job state as a dict."""
+        elapsed = (self.finished_at or time.time()) - self.started_at if self.started_at else 0
+        return {
+            "id": self.id,
+            "state": self.state,
+            "default_model": self.default_model,
+            "concurrency": self.concurrency,
+            "provider_batch": self.provider_batch,
+            "provider_batch_id": self.provider_batch_id,
+            "total": self.total,
+            "processed": self.processed,
+            "failed": self.failed,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "prompts_per_second": round(self.processed / elapsed, 2) if elapsed else None,
+            "error": self.error,
+        }
+    
+    def save(self):
+        """Write the state atomically, so a crash never leaves a torn job.json."""
+        path = os.path.join(self.directory, "job.json")
+        with open(path + ".tmp", "w", encoding="utf-8") as manifest:
+            json.dump(self.to_dict(), manifest)
+        os.replace(path + ".tmp", path)
+    
+    @classmethod
+    def load(cls, directory: str) -> "BatchJob":
+        """Read a job from its directory."""
+        with open(os.path.join(directory, "job.json"), encoding="utf-8") as manifest:
+            data = json.load(manifest)
+        job = cls(data["id"], directory, data["default_model"], data["concurrency"], data["provider_batch"])
+        for key in ("state", "total", "processed", "failed", "created_at", "started_at",
+                    "finished_at", "provider_batch_id", "error"):
+            setattr(job, key, data[key])
+        return job
+
+
+class BatchService:
+    """
+    Runs batch jobs: one JSON prompt per input line, one JSON result per output line.
+    
+    Each job feeds its prompts to a pool of workers per provider. Provider
+    calls are plain, non-streaming completions without conversation
+    memory, and they share per-provider concurrency slots and rate limits
+    across all jobs, so throughput is bounded by what the provider allows.
+    Transient errors are retried with backoff. Jobs survive restarts: on
+    startup every unfinished job is resumed from its output file, and a
+    lock file keeps two worker processes from running the same job.
+    """
+    
+    def __init__(
+        self,
+        model_service: ModelService,
+        usage: UsageTracker | None = None,
+        directory: str = BATCH_DIR,
+        concurrency: Dict[str, int] = BATCH_CONCURRENCY,
+        rate_per_minute: Dict[str, float] = BATCH_RATE_PER_MINUTE,
+        max_attempts: int = BATCH_MAX_ATTEMPTS,
+        max_input_bytes: int = BATCH_MAX_INPUT_BYTES,
+        checkpoint_interval: float = BATCH_CHECKPOINT_INTERVAL,
+        poll_interval: float = BATCH_POLL_INTERVAL
+    ):
+        """
+        Initialize the service.
+        
+        Args:
+            model_service: Service used to resolve models
+            usage: Tracker charged with token usage, per job
+            directory: Directory holding one subdirectory per job
+            concurrency: Concurrent requests per provider across all jobs
+            rate_per_minute: Requests per minute per provider, 0 for no limit
+            max_attempts: Attempts per prompt before it is written as failed
+            max_input_bytes: Largest accepted input upload
+            checkpoint_interval: Seconds between job.json updates
+            poll_interval: Seconds between status checks of provider batches
+        """
+        self.model_service = model_service
+        self.usage = usage
+        self.directory = directory
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.max_input_bytes = max_input_bytes
+        self.checkpoint_interval = checkpoint_interval
+        self.poll_interval = poll_interval
+        self._slots = {provider: asyncio.Semaphore(limit) for provider, limit in concurrency.items()}
+        self._limiters = {
+            provider: TokenBucket(per_minute / 60, max(1.0, per_minute / 60))
+            for provider, per_minute in rate_per_minute.items()
+            if per_minute > 0
+        }
+        self._jobs: Dict[str, BatchJob] = {}  # Jobs running in this process
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._locks: Dict[str, int] = {}
+    
+    async def create_job(
+        self,
+        body: AsyncIterator[bytes],
+        model: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        provider_batch: bool = False
+    ) -> BatchJob:
+        """
+        Store an uploaded JSONL input and start a job for it.
+        
+        Inputs larger than max_input_bytes are refused with ValueError.
+        
+        Args:
+            body: Request body chunks, one {"id", "message", "model"} object per line
+            model: Model for lines that do not name one
+            concurrency: Workers per provider for this job, capped by the provider limit
+            provider_batch: Send OpenAI prompts through the OpenAI Batch API
+            
+        Returns:
+            The started job
+        """
+        model = model or BATCH_DEFAULT_MODEL
+        if not self.model_service.model_exists(model):
+            raise ValueError(f"Unknown model: {model}")
+        
+        job_id = uuid.uuid4().hex[:12]
+        directory = os.path.join(self.directory, job_id)
+        os.makedirs(directory)
+        job = BatchJob(job_id, directory, model, concurrency or max(self.concurrency.values()), provider_batch)
+        try:
+            await self._store_input(body, job.input_path)
+        except Exception:
+            # Too large, or the client went away mid-upload
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        open(job.output_path, "w").close()
+        job.total = await asyncio.to_thread(self._count_prompts, job.input_path)
+        if not job.total:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise ValueError("The input has no prompts")
+        
+        job.save()
+        self._start(job)
+        logger.info("Batch job %s started with %d prompts", job.id, job.total)
+        return job
+    
+    async def _store_input(self, body: AsyncIterator[bytes], path: str):
+        """
+        Write an uploaded input to disk as it arrives, off the event loop.
+        
+        Chunks are gathered into blocks of about a megabyte, so large inputs
+        are never held in memory and the file is written by a thread.
+        """
+        input_file = await asyncio.to_thread(open, path, "wb")
+        try:
+            size = 0
+            block: List[bytes] = []
+            block_size = 0
+            async for chunk in body:
+                size += len(chunk)
+                if size > self.max_input_bytes:
+                    raise ValueError(f"The input is larger than {self.max_input_bytes} bytes")
+                block.append(chunk)
+                block_size += len(chunk)
+                if block_size >= _WRITE_BLOCK_BYTES:
+                    await asyncio.to_thread(input_file.write, b"".join(block))
+                    block.clear()
+                    block_size = 0
+            if block:
+                await asyncio.to_thread(input_file.write, b"".join(block))
+        finally:
+            await asyncio.to_thread(input_file.close)
+    
+    @staticmethod
+    def _count_prompts(path: str) -> int:
+        """Count the non-empty lines of an input file."""
+        with open(path, "rb") as input_file:
+            return sum(1 for line in input_file if line.strip())
+    
+    def resume(self):
+        """Resume the unfinished jobs that no other worker process is running."""
+        if not os.path.isdir(self.directory):
+            return
+        for job_id in os.listdir(self.directory):
+            try:
+                job = BatchJob.load(os.path.join(self.directory, job_id))
+            except (OSError, ValueError, KeyError):
+                continue
+            if job.state not in _FINISHED and self._start(job):
+                logger.info("Resuming batch job %s at %d/%d", job.id, job.processed, job.total)
+    
+    def _start(self, job: BatchJob) -> bool:
+        """Run a job in this process unless another one holds its lock."""
+        if not self._lock(job):
+            return False
+        self._jobs[job.id] = job
+        self._tasks[job.id] = asyncio.create_task(self._run(job))
+        return True
+    
+    def _lock(self, job: BatchJob) -> bool:
+        """Take the job's lock file; the OS releases it if the process dies."""
+        if fcntl is None:
+            return True
+        fd = os.open(os.path.join(job.directory, "job.lock"), os.O_CREAT | os.O_RDWR)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._locks[job.id] = fd
+        return True
+    
+    def _unlock(self, job: BatchJob):
+        """Release the job's lock file."""
+        fd = self._locks.pop(job.id, None)
+        if fd is not None:
+            os.close(fd)
+    
+    async def _run(self, job: BatchJob):
+        """Run a job to the end, saving its state periodically."""
+        job.state = RUNNING
+        job.started_at = job.started_at or time.time()
+        job.save()
+        checkpoint = asyncio.create_task(self._checkpoint(job))
+        try:
+            done_ids = await asyncio.to_thread(self._read_output, job)
+            with open(job.output_path, "a", encoding="utf-8") as output:
+                await self._process(job, done_ids, output)
+            job.state = COMPLETED
+            logger.info("Batch job %s finished: %d prompts, %d failed", job.id, job.processed, job.failed)
+        except asyncio.CancelledError:
+            if not job.cancel_requested:
+                raise  # Server shutdown: the job stays running and resumes on the next start
+            job.state = CANCELLED
+            await self._cancel_provider_batch(job)
+        except Exception as e:
+            logger.error("Batch job %s failed: %s", job.id, e)
+            job.state = FAILED
+            job.error = str(e)
+        finally:
+            checkpoint.cancel()
+            if job.state in _FINISHED:
+                job.finished_at = time.time()
+            job.save()
+            self._unlock(job)
+            self._jobs.pop(job.id, None)
+            self._tasks.pop(job.id, None)
+    
+    async def _checkpoint(self, job: BatchJob):
+        """Save progress and pick up cancel requests made on other workers."""
+        while True:
+            await asyncio.sleep(self.checkpoint_interval)
+            job.save()
+            if os.path.exists(job.cancel_path):
+                self._cancel_local(job)
+    
+    def _read_output(self, job: BatchJob) -> Set[str]:
+        """
+        Read the ids answered before a restart and drop a partly written last line.
+        
+        Returns:
+            Ids of the prompts that already have a result
+        """
+        done_ids: Set[str] = set()
+        job.processed = job.failed = 0
+        if not os.path.exists(job.output_path):
+            return done_ids
+        with open(job.output_path, "rb+") as output:
+            data = output.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                output.truncate(end)
+        for line in data[:end].splitlines():
+            result = json.loads(line)
+            done_ids.add(result["id"])
+            job.processed += 1
+            job.failed += "error" in result
+        return done_ids
+    
+    async def _process(self, job: BatchJob, done_ids: Set[str], output):
+        """Answer the job's remaining prompts and wait for all results."""
+        pools = {provider: min(job.concurrency, limit) for provider, limit in self.concurrency.items()}
+        queues = {provider: asyncio.Queue(maxsize=2 * size) for provider, size in pools.items()}
+        tasks = [asyncio.create_task(self._feed(job, done_ids, queues, pools, output))]
+        tasks += [
+            asyncio.create_task(self._work(job, queues[provider], output))
+            for provider, size in pools.items()
+            for _ in range(size)
+        ]
+        try:
+            # Fails as soon as any task fails, so the feeder never waits on a dead pool
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def _feed(
+        self,
+        job: BatchJob,
+        done_ids: Set[str],
+        queues: Dict[str, asyncio.Queue],
+        pools: Dict[str, int],
+        output
+    ):
+        """Stream the input into the provider queues, then hand the Batch API its share."""
+        provider_batch = []
+        with open(job.input_path, encoding="utf-8") as input_file:
+            for number, line in enumerate(input_file, 1):
+                if not line.strip():
+                    continue
+                item, error = self._parse(job, number, line)
+                if item["id"] in done_ids:
+                    continue
+                if error is not None:
+                    self._write(job, output, {**item, "error": error}, "invalid")
+                elif job.provider_batch and item["provider"] == "openai":
+                    provider_batch.append(item)
+                else:
+                    await queues[item["provider"]].put(item)
+        for provider, queue in queues.items():
+            for _ in range(pools[provider]):
+                await queue.put(None)
+        
+        if provider_batch:
+            await self._run_provider_batch(job, provider_batch, output)
+    
+    def _parse(self, job: BatchJob, number: int, line: str) -> Tuple[dict, Optional[str]]:
+        """
+        Parse an input line.
+        
+        Returns:
+            Tuple of (item with id, message, model and provider, error or None)
+        """
+        item = {"id": f"line-{number}", "model": job.default_model}
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            return item, f"Invalid JSON: {e}"
+        if not isinstance(data, dict) or not isinstance(data.get("message"), str):
+            return item, 'Each line needs a "message" string'
+        item["id"] = str(data.get("id", item["id"]))
+        item["model"] = data.get("model") or job.default_model
+        item["message"] = data["message"]
+        if not self.model_service.is_available(item["model"]):
+            return item, f"Model {item['model']} is not available"
+        item["provider"] = self.model_service.get_provider(item["model"])
+        return item, None
+    
+    async def _work(self, job: BatchJob, queue: asyncio.Queue, output):
+        """Answer prompts from a queue until it yields None."""
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            result, outcome = await self._answer(job, item)
+            self._write(job, output, result, outcome)
+    
+    def _write(self, job: BatchJob, output, result: dict, outcome: str):
+        """Append a result to the output; a flushed line is a checkpoint."""
+        result.pop("provider", None)
+        result.pop("message", None)
+        output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        output.flush()
+        job.processed += 1
+        job.failed += outcome != "ok"
+        BATCH_REQUESTS.labels(outcome).inc()
+    
+    async def _answer(self, job: BatchJob, item: dict) -> Tuple[dict, str]:
+        """Answer one prompt, retrying transient errors with backoff."""
+        try:
+            model = self.model_service.resolve(item["model"])
+        except ValueError as e:
+            return {**item, "error": str(e), "attempts": 0}, "error"
+        for attempt in range(1, self.max_attempts + 1):
+            await self._throttle(model.provider)
+            try:
+                async with self._slots[model.provider]:
+                    text, counts = await self._complete(model, item["message"])
+            except Exception as e:
+                if attempt == self.max_attempts or not _is_transient(e):
+                    return {**item, "error": str(e), "attempts": attempt}, "error"
+                await asyncio.sleep(_backoff(e, attempt))
+                continue
+            result = {**item, "text": text, "attempts": attempt}
+            if counts is not None:
+                result["usage"] = self._record_usage(job, model.name, counts)
+            return result, "ok"
+    
+    async def _throttle(self, provider: str):
+        """Wait until the provider's rate limit allows another request."""
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            return
+        wait = limiter.take()
+        while wait:
+            await asyncio.sleep(wait)
+            wait = limiter.take()
+    
+    async def _complete(self, model: ModelHandle, message: str) -> Tuple[str, Optional[TokenCounts]]:
+        """Get a complete, non-streamed answer to a single prompt."""
+        if model.provider == "google":
+            response = await model.client.generate_content_async(
+                message,
+                request_options=self.model_service.get_request_options(model.provider)
+            )
+            return response.text, gemini_usage(response.usage_metadata)
+        
+        response = await model.client.chat.completions.create(
+            model=model.name,
+            messages=_openai_messages(message),
+            temperature=0.7,
+        )
+        return response.choices[0].message.content or "", openai_usage(response.usage)
+    
+    def _record_usage(self, job: BatchJob, model_name: str, counts: TokenCounts) -> dict:
+        """Charge a prompt's tokens to the job and describe them for the result."""
+        if self.usage is not None:
+            self.usage.record(f"batch:{job.id}", model_name, counts)
+        return {"input_tokens": counts[0], "output_tokens": counts[1], "cached_tokens": counts[2]}
+    
+    async def _run_provider_batch(self, job: BatchJob, items: List[dict], output):
+        """Answer OpenAI prompts through the OpenAI Batch API and write its results."""
+        client = self.model_service.openai_client
+        if job.provider_batch_id is None:
+            lines = "".join(
+                json.dumps({
+                    "custom_id": item["id"],
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {"model": item["model"], "messages": _openai_messages(item["message"]), "temperature": 0.7},
+                }, ensure_ascii=False) + "\n"
+                for item in items
+            )
+            uploaded = await client.files.create(file=(f"{job.id}.jsonl", lines.encode("utf-8")), purpose="batch")
+            batch = await client.batches.create(
+                input_file_id=uploaded.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+                metadata={"nova_job": job.id}
+            )
+            # Saved at once, so a restarted job polls this batch instead of submitting another
+            job.provider_batch_id = batch.id
+            job.save()
+        
+        while True:
+            batch = await client.batches.retrieve(job.provider_batch_id)
+            if batch.status in _PROVIDER_BATCH_DONE:
+                break
+            await asyncio.sleep(self.poll_interval)
+        
+        pending = {item["id"]: item for item in items}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                item = pending.pop(record.get("custom_id"), None)
+                if item is not None:
+                    self._write(job, output, *self._provider_batch_result(job, item, record))
+        for item in pending.values():
+            self._write(job, output, {**item, "error": f"Provider batch {batch.status} without a result"}, "error")
+    
+    def _provider_batch_result(self, job: BatchJob, item: dict, record: dict) -> Tuple[dict, str]:
+        """Convert a line of an OpenAI batch output file to a result."""
+        response = record.get("response") or {}
+        body = response.get("body") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            error = record.get("error") or body.get("error") or f"HTTP {response.get('status_code')}"
+            if isinstance(error, dict):
+                error = error.get("message", str(error))
+            return {**item, "error": error, "provider_batch": True}, "error"
+        
+        result = {**item, "text": body["choices"][0]["message"]["content"] or "", "provider_batch": True}
+        usage = body.get("usage")
+        if usage:
+            details = usage.get("prompt_tokens_details") or {}
+            counts = (usage["prompt_tokens"], usage["completion_tokens"], details.get("cached_tokens", 0))
+            result["usage"] = self._record_usage(job, item["model"], counts)
+        return result, "ok"
+    
+    async def _cancel_provider_batch(self, job: BatchJob):
+        """Cancel the job's OpenAI batch, if it has one."""
+        if job.provider_batch_id is None:
+            return
+        try:
+            await self.model_service.openai_client.batches.cancel(job.provider_batch_id)
+        except Exception as e:
+            logger.warning("Failed to cancel provider batch %s: %s", job.provider_batch_id, e)
+    
+    def get_job(self, job_id: str) -> Optional[BatchJob]:
+        """Get a job, reading it from disk if another process runs it."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        if not _JOB_ID.match(job_id):
+            return None
+        try:
+            return BatchJob.load(os.path.join(self.directory, job_id))
+        except (OSError, ValueError, KeyError):
+            return None
+    
+    def list_jobs(self, limit: int = 100) -> List[dict]:
+        """Get the most recently created jobs."""
+        if not os.path.isdir(self.directory):
+            return []
+        jobs = [self.get_job(job_id) for job_id in os.listdir(self.directory)]
+        jobs = sorted((job for job in jobs if job is not None), key=lambda job: job.created_at, reverse=True)
+        return [job.to_dict() for job in jobs[:limit]]
+    
+    def cancel(self, job_id: str) -> Optional[BatchJob]:
+        """
+        Cancel a job; results written so far are kept.
+        
+        Args:
+            job_id: Job identifier
+            
+        Returns:
+            The job, or None if it does not exist
+        """
+        job = self.get_job(job_id)
+        if job is None or job.state in _FINISHED:
+            return job
+        # The worker process running the job sees the marker on its next checkpoint
+        open(job.cancel_path, "w").close()
+        if job.id in self._tasks:
+            self._cancel_local(job)
+        return job
+    
+    def _cancel_local(self, job: BatchJob):
+        """Stop a job running in this process."""
+        job.cancel_requested = True
+        task = self._tasks.get(job.id)
+        if task is not None:
+            task.cancel()
+    
+    async def aclose(self):
+        """Stop running jobs; they stay unfinished and resume on the next start."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def get_stats(self) -> dict:
+        """Get the jobs running in this process and the provider limits."""
+        return {
+            "running": [job.to_dict() for job in self._jobs.values()],
+            "concurrency": self.concurrency,
+            "rate_per_minute": {provider: limiter.rate * 60 for provider, limiter in self._limiters.items()},
+        }
+
+
+def _openai_messages(message: str) -> List[dict]:
+    """Build the OpenAI messages for a single prompt."""
+    return [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": message}]
+
+
+def _is_transient(error: Exception) -> bool:
+    """Whether a provider error is worth retrying: rate limits, server errors and network failures."""
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    # The OpenAI SDK wraps httpx errors; it is only loaded once a client was created
+    openai = sys.modules.get("openai")
+    return openai is not None and isinstance(error, openai.APIConnectionError)
+
+
+def _backoff(error: Exception, attempt: int) -> float:
+    """Seconds to wait before the next attempt, honouring Retry-After when the provider sends it."""
+    response = getattr(error, "response", None)
+    retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return min(60.0, 2.0 ** attempt) * (0.5 + random.random())
@@ -1,9 +1,48 @@
 """Service for handling chat operations."""
 
+import asyncio
 import json
-import sys
-from services.model_service import ModelService
+import logging
+import time
+from typing import AsyncIterator
+from services.model_service import ModelService, ModelHandle
 from services.memory_service import ConversationMemoryManager
+from services.stream_registry import StreamHandle, create_stream_registry
+from services.context_builder import ContextBuilder
+from services.summary_service import SummaryService
+from services.response_cache import ResponseCache
+from services.single_flight import SingleFlight
+from services.routing_policy import RoutingPolicy
+from services.auto_router import AutoRouter
+from services.usage_service import UsageTracker, TokenCounts, openai_usage, gemini_usage
+from services.prompt_cache import PromptCache
+from services.stream_replay import StreamReplay
+from services.context_builder import estimate_tokens
+from config import (
+    AUTO_MODEL,
+    AUTO_ROUTING_ENABLED,
+    CONTEXT_CHARS_PER_TOKEN,
+    SESSION_STORE_SHARED,
+)
+from logger import get_logger
+import tracing
+from metrics import (
+    STREAM_TTFT,
+    STREAM_INTER_TOKEN,
+    STREAM_TOKENS_PER_SECOND,
+    STREAM_DURATION,
+    PROMPT_BUILD,
+    STREAM_CANCELLATIONS,
+    STREAM_ERRORS,
+    CACHE_HITS,
+)
+
+logger = get_logger("chat")
+
+
+def sse_frame(event: dict) -> str:
+    """Format a stream event as a server-sent event frame."""
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
 
 
 class ChatService:
@@ -13,22 +52,94 @@ class ChatService:
         """Initialize the chat service with a model service and memory manager."""
         self.model_service = model_service
         self.memory_manager = memory_manager
-        self.cancel_requested = False  # Flag for stream cancellation
+        self.stream_registry = create_stream_registry()
+        self.stream_replay = StreamReplay(self.cancel_stream)
+        self.context_builder = ContextBuilder(memory_manager, model_service)
+        self.usage = UsageTracker()
+        self.summary_service = SummaryService(model_service, memory_manager, usage=self.usage)
+        self.response_cache = ResponseCache()
+        self.prompt_cache = PromptCache(model_service)
+        self.single_flight = SingleFlight()
+        self.routing_policy = RoutingPolicy(model_service)
+        self.auto_router = AutoRouter(model_service, self.routing_policy)
+    
+    async def cancel_stream(self, stream_id: str) -> bool:
+        """
+        Cancel a single streaming response.
+        
+        Args:
+            stream_id: Identifier of the stream to cancel
+            
+        Returns:
+            True if an active stream was cancelled
+        """
+        cancelled = await self.stream_registry.cancel(stream_id)
+        logger.info("Stream cancellation requested for %s (active: %s)", stream_id, cancelled)
+        return cancelled
     
-    def cancel_current_stream(self):
-        """Signal to cancel the current streaming response."""
-        self.cancel_requested = True
-        print(
-            "[BACKEND LOG] Stream cancellation requested",
-            file=sys.stdout,
-            flush=True
+    async def cancel_session_streams(self, session_id: str) -> list:
+        """
+        Cancel all streaming responses of a session.
+        
+        Args:
+            session_id: Session identifier
+            
+        Returns:
+            Ids of the cancelled streams
+        """
+        cancelled = await self.stream_registry.cancel_session(session_id)
+        logger.info(
+            "Stream cancellation requested for session %s (%d streams)",
+            session_id, len(cancelled)
         )
+        return cancelled
+    
+    async def prepare_session(self, session_id: str, model_name: str) -> dict:
+        """
+        Get a session ready for its next message while the user is typing.
+        
+        Loads the session from the store, brings its prompt window up to
+        date (turns counted, Gemini prompt rendered), refreshes its cached
+        Gemini prefix and opens a provider connection. The chat request
+        then only appends the new message. Nothing here changes what that
+        request sends, so the hint is safe to skip or repeat.
+        
+        Args:
+            session_id: Session identifier
+            model_name: Model the user has selected
+            
+        Returns:
+            What was prepared
+        """
+        started = time.perf_counter()
+        turns = await self.memory_manager.preload(session_id)
+        result = {"session_id": session_id, "turns": turns, "model": None, "connection_opened": False}
+        # The auto router picks a model from the message, which is not known yet
+        if (AUTO_ROUTING_ENABLED and model_name == AUTO_MODEL) or not self.model_service.is_available(model_name):
+            result["prepare_ms"] = round((time.perf_counter() - started) * 1000, 3)
+            return result
+        
+        provider = self.model_service.get_provider(model_name)
+        model = self.model_service.resolve(self.usage.budget_model(session_id, model_name, provider))
+        # A new session has no context yet; only the connection is worth opening
+        if turns and model.provider == "google":
+            prefix, _ = self.context_builder.build_gemini_prompt(session_id, model.name)
+            if self.prompt_cache.enabled:
+                self.prompt_cache.update(session_id, model.name, prefix)
+        elif turns:
+            self.context_builder.build_openai_messages(session_id, model.name)
+        result["model"] = model.name
+        result["context_tokens"] = self.context_builder.get_token_count(session_id)
+        result["prepare_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        result["connection_opened"] = await self.model_service.warm_connection(model.provider)
+        return result
     
     async def stream_response(
         self, 
         message: str, 
         model_name: str = "gemini-2.5-pro",
-        session_id: str = "default"
+        session_id: str = "default",
+        stream_id: str | None = None
     ):
         """
         Stream a response from the AI model with conversation memory.
@@ -37,218 +148,360 @@ class ChatService:
             message: User message
             model_name: Model to use for response
             session_id: Session identifier for conversation history
+            stream_id: Identifier used to cancel this stream, generated when omitted
             
         Yields:
             JSON formatted SSE data
         """
-        # Reset cancellation flag for new stream
-        self.cancel_requested = False
+        async for event in self.stream_events(message, model_name, session_id, stream_id):
+            yield sse_frame(event)
+    
+    async def stream_events(
+        self, 
+        message: str, 
+        model_name: str = "gemini-2.5-pro",
+        session_id: str = "default",
+        stream_id: str | None = None
+    ):
+        """
+        Stream a response as events: {"text"} chunks, then {"done"} or {"error"}.
         
-        print(
-            f"\n[BACKEND LOG] Received message: {message}",
-            file=sys.stdout,
-            flush=True
-        )
-        print(
-            f"[BACKEND LOG] Selected model: {model_name}",
-            file=sys.stdout,
-            flush=True
-        )
-        print(
-            f"[BACKEND LOG] Session ID: {session_id}",
-            file=sys.stdout,
-            flush=True
+        Args:
+            message: User message
+            model_name: Model to use for response
+            session_id: Session identifier for conversation history
+            stream_id: Identifier used to cancel this stream, generated when omitted
+            
+        Yields:
+            Event dicts, each becomes one SSE frame
+        """
+        handle = self.stream_registry.register(session_id, stream_id)
+        started = time.perf_counter()
+        model = None
+        outcome = "error"
+        
+        logger.info(
+            "Received message for session %s with model %s (stream %s)",
+            session_id, model_name, handle.stream_id
         )
+        logger.debug("Message: %s", message)
+        
+        # Sessions missing from memory are read from the store in a thread
+        with tracing.span("memory.load"):
+            await self.memory_manager.preload(session_id)
         
         # Add user message to history
-        self.memory_manager.add_message(session_id, "user", message)
+        with tracing.span("memory.add_message", role="user"):
+            self.memory_manager.add_message(session_id, "user", message)
+        first_token_span = stream_span = tracing.NOOP_SPAN
         
         try:
-            model_type = self.model_service.current_model_type
-            
-            if model_type == "google":
-                async for chunk in self._stream_google(message, model_name, session_id):
-                    yield chunk
-            elif model_type == "openai":
-                async for chunk in self._stream_openai(message, model_name, session_id):
-                    yield chunk
+            # The "auto" model picks a concrete model per request
+            auto = AUTO_ROUTING_ENABLED and model_name == AUTO_MODEL
+            if auto:
+                with tracing.span("router.auto") as auto_span:
+                    model_name = self.auto_router.choose(
+                        message, self.memory_manager.get_turn_count(session_id)
+                    )
+                    auto_span.set(model=model_name)
+            with tracing.span("model.resolve", model=model_name):
+                model = self.model_service.resolve(model_name)
+                # Sessions over their token or cost budget get a cheaper model
+                budget_model = self.usage.apply_budget(session_id, model.name, model.provider)
+                downgraded = budget_model != model.name
+                if downgraded:
+                    model = self.model_service.resolve(budget_model)
+            
+            # Build the prompt from the budgeted history window (ends with the current message)
+            build_started = time.perf_counter()
+            with tracing.span("prompt.build", provider=model.provider) as build_span:
+                if model.provider == "google":
+                    prompt, turn_count = self.context_builder.build_gemini_prompt(session_id, model.name)
+                elif model.provider == "openai":
+                    prompt = self.context_builder.build_openai_messages(session_id, model.name)
+                    turn_count = len(prompt) - 1
+                else:
+                    raise ValueError(f"Unknown model type: {model.provider}")
+                build_span.set(turns=turn_count)
+            
+            PROMPT_BUILD.labels(model.provider).observe(time.perf_counter() - build_started)
+            logger.info("Using history context with %d messages", turn_count)
+            
+            # Replay a cached answer for a repeated context instead of calling the provider
+            cache_key = self.response_cache.make_key(model.name, prompt)
+            is_first_turn = self.memory_manager.get_turn_count(session_id) == 1
+            first_message = message if is_first_turn else None
+            with tracing.span("cache.lookup") as lookup_span:
+                cached_chunks = self.response_cache.get(cache_key, model.name, first_message)
+                lookup_span.set(hit=cached_chunks is not None)
+            
+            if cached_chunks is not None:
+                logger.info("Response cache hit - replaying cached answer")
+                CACHE_HITS.inc()
+                chunks = self._replay(cached_chunks, handle)
             else:
-                raise ValueError(f"Unknown model type: {model_type}")
+                # Identical concurrent requests, from any session, attach to one upstream
+                # generation, which falls back to other models if this one fails to start
+                def start(upstream: StreamHandle, sessions: list):
+                    def open_stream(candidate: ModelHandle, attempt: StreamHandle):
+                        return self._open_stream(sessions, candidate, attempt, model, prompt)
+                    
+                    served = []
+                    chunks = self.routing_policy.stream(model.name, open_stream, upstream, served.append)
+                    return self._cache_answer(chunks, upstream, cache_key, model.name, first_message, served)
                 
-        except Exception as e:
-            error_msg = json.dumps(
-                {"error": str(e)},
-                ensure_ascii=False
-            )
-            print(
-                f"[BACKEND LOG] ERROR: {str(e)}",
-                file=sys.stdout,
-                flush=True
-            )
-            yield f"data: {error_msg}\n\n"
-    
-    async def _stream_google(self, message: str, model_name: str, session_id: str):
-        """Stream response from Google Gemini with conversation history."""
-        # Get the selected model
-        model = self.model_service.get_current_model()
-        
-        # Get conversation history
-        history = self.memory_manager.get_history(session_id)
-        
-        # Build history context for Gemini
-        history_context = ""
-        if history:
-            for msg in history[:-1]:  # Exclude the last message (current user message)
-                if msg.type == "human":
-                    history_context += f"User: {msg.content}\n"
-                elif msg.type == "ai":
-                    history_context += f"Assistant: {msg.content}\n"
-        
-        # Create full prompt with history
-        full_prompt = history_context + f"User: {message}\n"
-        
-        print(
-            f"[BACKEND LOG] Using history context with {len(history)} messages",
-            file=sys.stdout,
-            flush=True
-        )
-        
-        # Generate response with streaming
-        response = model.generate_content(
-            full_prompt,
-            stream=True
-        )
-        
-        chunk_count = 0
-        sent_chunks = set()
-        full_response = ""
-        
-        for chunk in response:
-            # CHECK CANCELLATION FIRST
-            if self.cancel_requested:
-                print(
-                    "[BACKEND LOG] Google stream cancelled during generation",
-                    file=sys.stdout,
-                    flush=True
-                )
-                yield "data: {\"done\": true, \"cancelled\": true}\n\n"
+                flight_key = self.single_flight.make_key(model.name, prompt)
+                chunks = handle.iterate(self.single_flight.subscribe(flight_key, start, session_id))
+            
+            sent_chunks = []  # Joined once at the end instead of growing a string per chunk
+            log_chunks = logger.isEnabledFor(logging.DEBUG)
+            inter_chunk = STREAM_INTER_TOKEN.labels(model.name)
+            first_at = last_at = None
+            first_token_span = tracing.start_span("stream.first_token", model=model.name)
+            
+            async for text in chunks:
+                now = time.perf_counter()
+                if last_at is None:
+                    first_at = now
+                    STREAM_TTFT.labels(model.name).observe(now - started)
+                    first_token_span.end()
+                    stream_span = tracing.start_span("stream.generate", model=model.name)
+                else:
+                    inter_chunk.observe(now - last_at)
+                last_at = now
+                sent_chunks.append(text)
+                if log_chunks:
+                    logger.debug("%s chunk #%d: %.100s", model.provider, len(sent_chunks), text)
+                yield {"text": text}
+            
+            stream_span.set(chunks=len(sent_chunks))
+            stream_span.end()
+            
+            if handle.cancelled:
+                logger.info("%s stream cancelled during generation", model.provider)
+                outcome = "cancelled"
+                STREAM_CANCELLATIONS.labels(model.name).inc()
+                yield {"done": True, "cancelled": True}
                 return
             
-            if chunk.text:
-                chunk_count += 1
-                chunk_id = id(chunk)
+            # Add assistant response to history
+            full_response = "".join(sent_chunks)
+            if full_response:
+                with tracing.span("memory.write_back", chars=len(full_response)):
+                    self.memory_manager.add_message(session_id, "assistant", full_response)
+                    self.summary_service.maybe_schedule(session_id)
+                    if model.provider == "google" and self.prompt_cache.enabled:
+                        # The history including this answer starts the session's next prompt
+                        prefix, _ = self.context_builder.build_gemini_prompt(session_id, model.name)
+                        self.prompt_cache.update(session_id, model.name, prefix)
+                    if SESSION_STORE_SHARED:
+                        # The next message may go to another worker, which must see this reply
+                        await asyncio.to_thread(self.memory_manager.flush_session, session_id)
+            
+            # Replayed cache hits say nothing about provider throughput
+            if cached_chunks is None and last_at is not None and last_at > first_at:
+                STREAM_TOKENS_PER_SECOND.labels(model.name).observe(
+                    len(full_response) / 4 / (last_at - first_at)
+                )
+            outcome = "completed"
+            
+            logger.info("Stream finished. Total %d chunks", len(sent_chunks))
+            # Signal completion, telling auto and downgraded requests which model answered
+            if auto or downgraded:
+                yield {"done": True, "model": model.name, "downgraded": downgraded}
+            else:
+                yield {"done": True}
                 
-                # Check if chunk was already sent
-                if chunk_id not in sent_chunks:
-                    sent_chunks.add(chunk_id)
-                    full_response += chunk.text
-                    
-                    # Send as JSON
-                    message_data = json.dumps(
-                        {"text": chunk.text},
-                        ensure_ascii=False
-                    )
-                    print(
-                        f"[BACKEND LOG] Chunk #{chunk_count}: {message_data[:100]}...",
-                        file=sys.stdout,
-                        flush=True
-                    )
-                    yield f"data: {message_data}\n\n"
-                else:
-                    print(
-                        f"[BACKEND LOG] Duplicate chunk #{chunk_count} - SKIPPED",
-                        file=sys.stdout,
-                        flush=True
-                    )
-        
-        # Add assistant response to history
-        if full_response and not self.cancel_requested:
-            self.memory_manager.add_message(session_id, "assistant", full_response)
-        
-        print(
-            f"[BACKEND LOG] Stream finished. Total {chunk_count} chunks",
-            file=sys.stdout,
-            flush=True
-        )
-        # Signal completion
-        yield "data: {\"done\": true}\n\n"
+        except Exception as e:
+            logger.error("Stream failed: %s", e)
+            STREAM_ERRORS.labels(model.provider if model else "unknown").inc()
+            tracing.current_span().fail(e)
+            yield {"error": str(e)}
+        finally:
+            # Close spans left open by an error or an early client disconnect
+            first_token_span.end()
+            stream_span.end()
+            self.stream_registry.unregister(handle.stream_id)
+            if outcome == "error" and handle.cancelled:
+                outcome = "cancelled"  # Closed early after a client disconnect
+            # Unknown model names are not used as labels, so clients cannot add series
+            STREAM_DURATION.labels(model.name if model else "unknown", outcome).observe(
+                time.perf_counter() - started
+            )
     
-    async def _stream_openai(self, message: str, model_name: str, session_id: str):
-        """Stream response from OpenAI with conversation history."""
-        from config import SYSTEM_PROMPT
-        
-        client = self.model_service.openai_client
-        
-        # Get conversation history
-        history = self.memory_manager.get_history(session_id)
-        
-        # Build messages array with history
-        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    def _open_stream(
+        self,
+        sessions: list,
+        model: ModelHandle,
+        handle: StreamHandle,
+        requested: ModelHandle,
+        requested_prompt
+    ):
+        """
+        Open a provider stream, building the prompt for a fallback model if needed.
         
-        # Add history (excluding the last user message we just added)
-        for msg in history[:-1]:
-            if msg.type == "human":
-                messages.append({"role": "user", "content": msg.content})
-            elif msg.type == "ai":
-                messages.append({"role": "assistant", "content": msg.content})
+        `sessions` lists every session subscribed to the stream, the one that
+        started it first. Usage is charged to all of them; the first one only
+        picks the provider-side prompt cache, which serves the same prompt text.
+        """
+        if model.provider == "google":
+            if model.name == requested.name:
+                prompt = requested_prompt
+            else:
+                prompt, _ = self.context_builder.build_gemini_prompt(sessions[0], model.name)
+            return self._stream_google(sessions, model, prompt, handle)
         
-        # Add current user message
-        messages.append({"role": "user", "content": message})
+        if model.name == requested.name:
+            messages = requested_prompt
+        else:
+            messages = self.context_builder.build_openai_messages(sessions[0], model.name)
+        return self._stream_openai(sessions, model, messages, handle)
+    
+    async def _cache_answer(
+        self,
+        chunks: AsyncIterator[str],
+        handle: StreamHandle,
+        key: str,
+        model_name: str,
+        first_message: str | None,
+        served: list
+    ):
+        """
+        Pass a generation through and cache it once it is complete.
         
-        print(
-            f"[BACKEND LOG] Using history with {len(history)} messages",
-            file=sys.stdout,
-            flush=True
-        )
+        Runs once per upstream generation, however many requests share it.
+        Answers from a fallback model are not cached: the key and the
+        entry would name the requested model.
+        """
+        sent_chunks = []
+        async for text in chunks:
+            sent_chunks.append(text)
+            yield text
+        if handle.cancelled:
+            return
+        if served == [model_name]:
+            self.response_cache.put(key, model_name, sent_chunks, first_message)
+        else:
+            logger.info("Not caching the answer of fallback model %s", served[0] if served else None)
+    
+    async def _replay(self, chunks: tuple, handle: StreamHandle):
+        """Yield cached response chunks until the stream is cancelled."""
+        for text in chunks:
+            if handle.cancelled:
+                return
+            yield text
+    
+    def _record_usage(
+        self,
+        sessions: list,
+        model: ModelHandle,
+        counts: TokenCounts | None,
+        prompt,
+        output_chars: int
+    ):
+        """
+        Record a provider call, estimating the counts when the provider reported none.
         
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=messages,
-            stream=True,
-            temperature=0.7,
-        )
+        A call shared by several sessions is split between them, so the totals
+        still match what the provider billed.
+        """
+        estimated = counts is None
+        if estimated:
+            # Cancelled streams end before the provider sends usage
+            if isinstance(prompt, str):
+                prompt_tokens = estimate_tokens(prompt)
+            else:
+                prompt_tokens = sum(estimate_tokens(message["content"]) for message in prompt)
+            counts = (prompt_tokens, output_chars // CONTEXT_CHARS_PER_TOKEN, 0)
         
-        chunk_count = 0
-        full_response = ""
+        sessions = list(dict.fromkeys(sessions))
+        shares = len(sessions)
+        for index, session_id in enumerate(sessions):
+            share = tuple(count // shares + (index < count % shares) for count in counts)
+            self.usage.record(session_id, model.name, share, estimated=estimated)
+    
+    async def _stream_google(self, sessions: list, model: ModelHandle, prompt: str, handle: StreamHandle):
+        """Stream response text from Google Gemini."""
+        session_id = sessions[0]
+        # Long sessions send only the turns after their provider-side cached prefix
+        cached = self.prompt_cache.lookup(session_id, model.name, prompt)
+        request_options = self.model_service.get_request_options(model.provider)
+        response = None
         
-        for chunk in response:
-            # CHECK CANCELLATION FIRST
-            if self.cancel_requested:
-                print(
-                    "[BACKEND LOG] OpenAI stream cancelled during generation",
-                    file=sys.stdout,
-                    flush=True
-                )
-                yield "data: {\"done\": true, \"cancelled\": true}\n\n"
-                return
-            
-            # OpenAI streams chunks with delta.content that can be None
-            content = chunk.choices[0].delta.content if chunk.choices[0].delta else None
-            
-            if content:
-                chunk_count += 1
-                full_response += content
-                
-                # Send as JSON - OpenAI doesn't duplicate like Gemini, no deduplication needed
-                message_data = json.dumps(
-                    {"text": content},
-                    ensure_ascii=False
-                )
-                print(
-                    f"[BACKEND LOG] OpenAI Chunk #{chunk_count}: {message_data[:100]}...",
-                    file=sys.stdout,
-                    flush=True
+        # Generate response with async streaming so other requests keep running
+        with tracing.span(
+            "provider.connect", provider=model.provider, model=model.name, cached=cached is not None
+        ):
+            if cached is not None:
+                try:
+                    response = await cached.client.generate_content_async(
+                        prompt[cached.length:],
+                        stream=True,
+                        request_options=request_options
+                    )
+                except Exception as e:
+                    # Expired or deleted on the provider side; the full prompt still works
+                    logger.warning("Cached prompt of session %s is unusable: %s", session_id, e)
+                    self.prompt_cache.invalidate(session_id)
+            if response is None:
+                response = await model.client.generate_content_async(
+                    prompt,
+                    stream=True,
+                    request_options=request_options
                 )
-                yield f"data: {message_data}\n\n"
         
-        # Add assistant response to history
-        if full_response and not self.cancel_requested:
-            self.memory_manager.add_message(session_id, "assistant", full_response)
+        usage = None
+        output_chars = 0
+        read_timeout = self.model_service.get_read_timeout(model.provider)
+        try:
+            async for chunk in handle.iterate(response, read_timeout):
+                # CHECK CANCELLATION FIRST
+                if handle.cancelled:
+                    break
+                
+                # Token counts arrive on the chunks; the last ones are complete
+                usage = gemini_usage(chunk.usage_metadata) or usage
+                
+                # Every streamed chunk is new text; there is nothing to deduplicate
+                text = chunk.text
+                if text:
+                    output_chars += len(text)
+                    yield text
+        finally:
+            self._record_usage(sessions, model, usage, prompt, output_chars)
+    
+    async def _stream_openai(self, sessions: list, model: ModelHandle, messages: list, handle: StreamHandle):
+        """Stream response text from OpenAI."""
+        with tracing.span("provider.connect", provider=model.provider, model=model.name):
+            response = await model.client.chat.completions.create(
+                model=model.name,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                temperature=0.7,
+                # Routes a session's requests to where its prompt prefix is cached
+                prompt_cache_key=sessions[0],
+            )
         
-        print(
-            f"[BACKEND LOG] OpenAI Stream finished. Total {chunk_count} chunks",
-            file=sys.stdout,
-            flush=True
-        )
-        # Signal completion
-        yield "data: {\"done\": true}\n\n"
+        usage = None
+        output_chars = 0
+        try:
+            async for chunk in handle.iterate(response):
+                # CHECK CANCELLATION FIRST
+                if handle.cancelled:
+                    break
+                
+                # The final chunk carries the usage and no choices
+                if chunk.usage is not None:
+                    usage = openai_usage(chunk.usage)
+                if not chunk.choices:
+                    continue
+                
+                # OpenAI streams chunks with delta.content that can be None
+                content = chunk.choices[0].delta.content if chunk.choices[0].delta else None
+                
+                if content:
+                    output_chars += len(content)
+                    yield content
+        finally:
+            self._record_usage(sessions, model, usage, messages, output_chars)
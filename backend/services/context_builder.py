@@ -0,0 +1,235 @@
+"""Service for building token-budgeted prompt context from conversation memory."""
+
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Tuple
+from config import (
+    CONTEXT_MAX_PROMPT_TOKENS,
+    CONTEXT_RESERVED_OUTPUT_TOKENS,
+    CONTEXT_CHARS_PER_TOKEN,
+    CONTEXT_TRIM_RATIO,
+    MEMORY_MAX_SESSIONS,
+    SYSTEM_PROMPT,
+)
+from services.memory_service import ConversationMemoryManager
+from services.model_service import ModelService
+import tracing
+
+# Rough per-message overhead of role markers and separators
+_MESSAGE_OVERHEAD_TOKENS = 4
+_ROLE_LABELS = {
+    "user": "User",
+    "assistant": "Assistant",
+    "summary": "Summary of the earlier conversation",
+}
+# The running summary is passed to OpenAI as extra system context
+_OPENAI_ROLES = {"user": "user", "assistant": "assistant", "summary": "system"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a text."""
+    return len(text) // CONTEXT_CHARS_PER_TOKEN + _MESSAGE_OVERHEAD_TOKENS
+
+
+def _render_line(role: str, content: str) -> str:
+    """Render a turn the way it appears in a Gemini prompt."""
+    return f"{_ROLE_LABELS[role]}: {content}\n"
+
+
+class _Window:
+    """The most recent turns of a session that fit the token budget."""
+    
+    __slots__ = ("epoch", "seq", "budget", "entries", "tokens", "dropped", "prefix")
+    
+    def __init__(self, epoch: int):
+        self.epoch = epoch
+        self.seq = 0
+        self.budget = 0
+        self.entries: Deque[Tuple[str, str, int]] = deque()  # (role, content, tokens)
+        self.tokens = 0
+        self.dropped = 0  # Turns left out because of the budget
+        self.prefix = None  # Rendered Gemini prompt, built on first use
+    
+    def append(self, role: str, content: str):
+        """Add a turn at the end of the window."""
+        tokens = estimate_tokens(content)
+        self.entries.append((role, content, tokens))
+        self.tokens += tokens
+        if self.prefix is not None:
+            self.prefix += _render_line(role, content)
+    
+    def trim(self, budget: int, target: int):
+        """
+        Drop the oldest turns once the window exceeds the budget.
+        
+        Trimming down to a lower target instead of the budget itself keeps
+        the start of the prompt unchanged for the next few turns, which
+        provider-side prefix caching depends on.
+        """
+        if self.tokens <= budget:
+            return
+        removed_chars = 0
+        # The newest turn (the current user message) is always kept
+        while self.tokens > target and len(self.entries) > 1:
+            role, content, tokens = self.entries.popleft()
+            self.tokens -= tokens
+            self.dropped += 1
+            removed_chars += len(_render_line(role, content))
+        if removed_chars and self.prefix is not None:
+            self.prefix = self.prefix[removed_chars:]
+
+
+class ContextBuilder:
+    """
+    Builds provider prompts from conversation memory within a token budget.
+    
+    Each session keeps a window with a running token count and an
+    incrementally rendered prompt, so a new turn costs O(new message)
+    instead of a walk over the whole history.
+    """
+    
+    def __init__(
+        self,
+        memory_manager: ConversationMemoryManager,
+        model_service: ModelService,
+        max_sessions: int = MEMORY_MAX_SESSIONS,
+        trim_ratio: float = CONTEXT_TRIM_RATIO
+    ):
+        """Initialize the builder on top of a memory manager."""
+        self.memory_manager = memory_manager
+        self.model_service = model_service
+        self.max_sessions = max_sessions
+        self.trim_ratio = trim_ratio
+        self._windows: "OrderedDict[str, _Window]" = OrderedDict()
+        self._budgets: Dict[str, int] = {}
+        self._system_tokens = estimate_tokens(SYSTEM_PROMPT)
+        # Windows hold rendered copies of the turns, so they go when the turns do
+        memory_manager.forget_callbacks.append(self.forget)
+    
+    def get_budget(self, model_name: str) -> int:
+        """
+        Get the history token budget for a model.
+        
+        Args:
+            model_name: Model name from AVAILABLE_MODELS
+            
+        Returns:
+            Tokens available for conversation history
+        """
+        budget = self._budgets.get(model_name)
+        if budget is None:
+            info = self.model_service.get_model_info(model_name)
+            context_tokens = info.get("context_tokens", CONTEXT_MAX_PROMPT_TOKENS)
+            budget = (
+                min(context_tokens, CONTEXT_MAX_PROMPT_TOKENS)
+                - CONTEXT_RESERVED_OUTPUT_TOKENS
+                - self._system_tokens
+            )
+            self._budgets[model_name] = budget
+        return budget
+    
+    def _sync(self, session_id: str, model_name: str) -> _Window:
+        """Bring a session's window up to date with memory and the budget."""
+        budget = self.get_budget(model_name)
+        epoch, seq = self.memory_manager.get_version(session_id)
+        window = self._windows.get(session_id)
+        if window is not None:
+            self._windows.move_to_end(session_id)
+        
+        new_turns = seq - window.seq if window is not None else 0
+        if (
+            window is None
+            or window.epoch != epoch
+            or new_turns < 0
+            or new_turns > self.memory_manager.get_turn_count(session_id)
+            or (budget > window.budget and window.dropped)
+        ):
+            window = self._rebuild(session_id, epoch, budget)
+        elif new_turns:
+            with tracing.span("memory.history_fetch", mode="incremental", turns=new_turns):
+                recent = self.memory_manager.get_recent_turns(session_id, new_turns)
+            for role, content in recent:
+                window.append(role, content)
+        
+        window.seq = seq
+        window.budget = budget
+        window.trim(budget, int(budget * self.trim_ratio))
+        return window
+    
+    def _rebuild(self, session_id: str, epoch: int, budget: int) -> _Window:
+        """Rebuild a window from memory, walking back only as far as the budget."""
+        window = _Window(epoch)
+        with tracing.span("memory.history_fetch", mode="rebuild") as fetch_span:
+            turns = self.memory_manager.get_turns(session_id)
+            fetch_span.set(turns=len(turns))
+        kept = []
+        tokens = 0
+        for role, content in reversed(turns):
+            turn_tokens = estimate_tokens(content)
+            if kept and tokens + turn_tokens > budget:
+                break
+            kept.append((role, content, turn_tokens))
+            tokens += turn_tokens
+        
+        # Older turns folded into the running summary come first
+        summary = self.memory_manager.get_summary(session_id)
+        if summary:
+            summary_tokens = estimate_tokens(summary)
+            if tokens + summary_tokens <= budget:
+                kept.append(("summary", summary, summary_tokens))
+                tokens += summary_tokens
+        
+        kept.reverse()
+        window.entries.extend(kept)
+        window.tokens = tokens
+        window.dropped = len(turns) - sum(1 for role, _, _ in kept if role != "summary")
+        
+        self._windows[session_id] = window
+        while len(self._windows) > self.max_sessions:
+            self._windows.popitem(last=False)
+        return window
+    
+    def build_gemini_prompt(self, session_id: str, model_name: str) -> Tuple[str, int]:
+        """
+        Build the Gemini prompt for the latest turn of a session.
+        
+        Args:
+            session_id: Session identifier
+            model_name: Model the prompt is built for
+            
+        Returns:
+            Tuple of (prompt text, number of turns included)
+        """
+        window = self._sync(session_id, model_name)
+        if window.prefix is None:
+            window.prefix = "".join(
+                _render_line(role, content) for role, content, _ in window.entries
+            )
+        return window.prefix, len(window.entries)
+    
+    def build_openai_messages(self, session_id: str, model_name: str) -> List[dict]:
+        """
+        Build the OpenAI messages for the latest turn of a session.
+        
+        Args:
+            session_id: Session identifier
+            model_name: Model the messages are built for
+            
+        Returns:
+            Chat messages starting with the system prompt
+        """
+        window = self._sync(session_id, model_name)
+        messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+        messages.extend(
+            {"role": _OPENAI_ROLES[role], "content": content}
+            for role, content, _ in window.entries
+        )
+        return messages
+    
+    def get_token_count(self, session_id: str) -> int:
+        """Get the estimated history tokens currently in a session's window."""
+        window = self._windows.get(session_id)
+        return window.tokens if window is not None else 0
+    
+    def forget(self, session_id: str):
+        """Drop the cached window of a session."""
+        self._windows.pop(session_id, None)
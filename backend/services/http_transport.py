@@ -0,0 +1,203 @@
+"""Shared, pooled HTTP transport for the provider clients."""
+
+import asyncio
+import time
+from typing import Dict, List
+import httpx
+from config import (
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_HTTP2,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_POOL_TIMEOUT,
+    HTTP_WARMUP_CONNECTIONS,
+    PROVIDER_READ_TIMEOUTS,
+)
+from logger import get_logger
+
+logger = get_logger("http")
+
+# Extension key under which a request keeps its connection trace
+_TRACE_KEY = "nova.trace"
+
+
+class _RequestTrace:
+    """Connection events of a single request, fed by httpcore's trace extension."""
+    
+    __slots__ = ("started", "acquired", "connect", "tls")
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.acquired = None  # When the request got a connection
+        self.connect = None  # TCP connect time, set only for new connections
+        self.tls = None  # TLS handshake time, set only for new connections
+    
+    async def __call__(self, event: str, info: dict):
+        now = time.perf_counter()
+        if event == "connection.connect_tcp.started":
+            self.acquired = now
+            self.connect = now
+        elif event == "connection.connect_tcp.complete":
+            self.connect = now - self.connect
+        elif event == "connection.start_tls.started":
+            self.tls = now
+        elif event == "connection.start_tls.complete":
+            self.tls = now - self.tls
+        elif event.endswith("send_request_headers.started") and self.acquired is None:
+            self.acquired = now
+
+
+class HttpTransport:
+    """
+    One pooled, keep-alive HTTP client shared by the provider SDKs.
+    
+    Connections stay open between requests, so only the first request to a
+    provider pays for TCP and TLS setup. warm_up() moves that cost to
+    startup. Connection reuse and pool wait times are tracked per host.
+    """
+    
+    def __init__(
+        self,
+        max_connections: int = HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+        http2: bool = HTTP_HTTP2
+    ):
+        """
+        Initialize the shared client.
+        
+        Args:
+            max_connections: Maximum open connections across all providers
+            max_keepalive_connections: Maximum idle connections kept open
+            keepalive_expiry: Seconds an idle connection is kept open
+            http2: Use HTTP/2 where the server supports it (needs the h2 package)
+        """
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP/2 requested but the h2 package is missing, using HTTP/1.1")
+                http2 = False
+        self.http2 = http2
+        self.keepalive_expiry = keepalive_expiry
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            timeout=self.timeout_for("openai"),
+            event_hooks={"request": [self._on_request], "response": [self._on_response]},
+        )
+        self._stats: Dict[str, dict] = {}
+        self._last_used: Dict[str, float] = {}  # Per host, for keep_warm
+    
+    def timeout_for(self, provider: str) -> httpx.Timeout:
+        """
+        Get the timeouts for requests to a provider.
+        
+        Args:
+            provider: Provider type ('google' or 'openai')
+            
+        Returns:
+            Connect, read, write and pool timeouts
+        """
+        read = PROVIDER_READ_TIMEOUTS.get(provider, PROVIDER_READ_TIMEOUTS["openai"])
+        return httpx.Timeout(read, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT)
+    
+    async def _on_request(self, request: httpx.Request):
+        """Attach a connection trace to an outgoing request."""
+        trace = _RequestTrace()
+        request.extensions["trace"] = trace
+        request.extensions[_TRACE_KEY] = trace
+    
+    async def _on_response(self, response: httpx.Response):
+        """Record how the request got its connection."""
+        trace = response.request.extensions.get(_TRACE_KEY)
+        if trace is None:
+            return
+        stats = self._stats.get(response.request.url.host)
+        if stats is None:
+            stats = self._stats[response.request.url.host] = {
+                "requests": 0,
+                "new_connections": 0,
+                "reused_connections": 0,
+                "connect_ms": 0.0,
+                "tls_ms": 0.0,
+                "pool_wait_ms": 0.0,
+                "max_pool_wait_ms": 0.0,
+            }
+        stats["requests"] += 1
+        self._last_used[response.request.url.host] = time.monotonic()
+        if trace.connect is not None:
+            stats["new_connections"] += 1
+            stats["connect_ms"] += trace.connect * 1000
+            stats["tls_ms"] += (trace.tls or 0.0) * 1000
+        else:
+            stats["reused_connections"] += 1
+        if trace.acquired is not None:
+            wait = (trace.acquired - trace.started) * 1000
+            stats["pool_wait_ms"] += wait
+            stats["max_pool_wait_ms"] = max(stats["max_pool_wait_ms"], wait)
+    
+    async def warm_up(self, urls: List[str], connections: int = HTTP_WARMUP_CONNECTIONS):
+        """
+        Open connections to provider hosts ahead of the first request.
+        
+        Args:
+            urls: Provider base URLs
+            connections: Connections opened per URL
+        """
+        async def open_connection(url: str):
+            try:
+                # Any response leaves a ready connection in the pool
+                await self.client.head(url)
+            except httpx.HTTPError as e:
+                logger.warning("Connection warm-up to %s failed: %s", url, e)
+        
+        await asyncio.gather(*(
+            open_connection(url) for url in urls for _ in range(connections)
+        ))
+    
+    async def keep_warm(self, url: str) -> bool:
+        """
+        Open a connection to a host unless one was used recently enough to still be open.
+        
+        Args:
+            url: Provider base URL
+            
+        Returns:
+            True if a connection was opened
+        """
+        host = httpx.URL(url).host
+        now = time.monotonic()
+        if now - self._last_used.get(host, float("-inf")) < self.keepalive_expiry / 2:
+            return False
+        # Set before the request, so concurrent callers do not open more connections
+        self._last_used[host] = now
+        await self.warm_up([url], connections=1)
+        return True
+    
+    async def aclose(self):
+        """Close all pooled connections."""
+        await self.client.aclose()
+    
+    def get_stats(self) -> dict:
+        """Get connection reuse and pool wait statistics per host."""
+        hosts = {}
+        for host, stats in self._stats.items():
+            requests = stats["requests"]
+            new = stats["new_connections"]
+            hosts[host] = {
+                "requests": requests,
+                "new_connections": new,
+                "reused_connections": stats["reused_connections"],
+                "reuse_rate": stats["reused_connections"] / requests if requests else 0.0,
+                "avg_connect_ms": stats["connect_ms"] / new if new else 0.0,
+                "avg_tls_ms": stats["tls_ms"] / new if new else 0.0,
+                "avg_pool_wait_ms": stats["pool_wait_ms"] / requests if requests else 0.0,
+                "max_pool_wait_ms": stats["max_pool_wait_ms"],
+            }
+        return {"http2": self.http2, "hosts": hosts}
@@ -1,17 +1,281 @@
 """Service for managing conversation memory and history."""
 
-from typing import Dict, List
-from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
+import asyncio
+import sys
+import time
+import zlib
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+from services.session_store import SessionStore, InMemorySessionStore, StoredSession
+from config import (
+    MEMORY_MAX_SESSIONS,
+    MEMORY_MAX_MESSAGES_PER_SESSION,
+    MEMORY_MAX_TOTAL_BYTES,
+    MEMORY_SESSION_TTL_SECONDS,
+    MEMORY_COMPRESS_AFTER_TURNS,
+    MEMORY_COMPRESS_MIN_BYTES,
+    MEMORY_COMPRESSION,
+    SESSION_VERSION_CHECK_INTERVAL,
+)
+from logger import get_logger
+
+try:
+    import zstandard
+except ImportError:  # Optional; old turns are compressed with zlib instead
+    zstandard = None
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+logger = get_logger("memory")
+
+# Role names indexed by the role byte stored in each turn
+ROLES = ("user", "assistant")
+_ROLE_INDEX = {role: index for index, role in enumerate(ROLES)}
+
+# Short messages ("Здравей", "Благодаря") repeat across sessions and are interned
+_INTERN_MAX_CHARS = 64
+
+# Frames written by zstd start with this; anything else is zlib. Memory is
+# only used from the event loop thread, so one (de)compressor can be reused
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_zstd_compressor = zstandard.ZstdCompressor(level=3) if zstandard is not None else None
+_zstd_decompressor = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+
+def _pack(raw: bytes, zstd: bool) -> bytes:
+    """Compress turn content with zstd or zlib."""
+    if not zstd:
+        return zlib.compress(raw)
+    # zstandard returns a buffer sized for the worst case; keep only the frame
+    return bytes(memoryview(_zstd_compressor.compress(raw)))
+
+
+def _unpack(data: bytes) -> bytes:
+    """Decompress turn content written by either codec."""
+    if data[:4] == _ZSTD_MAGIC:
+        return _zstd_decompressor.decompress(data)
+    return zlib.decompress(data)
+
+
+class _Turn:
+    """Compact history record: a role byte plus plain or compressed content."""
+    
+    __slots__ = ("role", "data")
+    
+    def __init__(self, role: int, content: str):
+        self.role = role
+        self.data = sys.intern(content) if len(content) <= _INTERN_MAX_CHARS else content
+    
+    @property
+    def content(self) -> str:
+        """Get the message text, decompressing it if needed."""
+        data = self.data
+        if data.__class__ is bytes:
+            return _unpack(data).decode("utf-8")
+        return data
+    
+    @property
+    def size(self) -> int:
+        """Get the number of bytes this turn holds."""
+        data = self.data
+        if data.__class__ is bytes:
+            return len(data)
+        return len(data.encode("utf-8"))
+    
+    def compress(self, zstd: bool = False) -> int:
+        """
+        Store the content compressed if that makes it smaller.
+        
+        Args:
+            zstd: Compress with zstd instead of zlib
+        
+        Returns:
+            Number of bytes saved
+        """
+        if self.data.__class__ is bytes:
+            return 0
+        raw = self.data.encode("utf-8")
+        packed = _pack(raw, zstd)
+        if len(packed) >= len(raw):
+            return 0
+        self.data = packed
+        return len(raw) - len(packed)
+
+
+class _Session:
+    """Turns of one session plus the bookkeeping used for eviction."""
+    
+    __slots__ = ("turns", "size", "last_access", "epoch", "seq", "summary", "version", "checked_at")
+    
+    def __init__(self, now: float, epoch: int):
+        self.turns: List[_Turn] = []
+        self.size = 0  # Content bytes held by this session
+        self.last_access = now
+        self.epoch = epoch  # Changes whenever existing turns are removed or replaced
+        self.seq = 0  # Number of turns appended since the epoch started
+        self.summary = None  # Running summary of turns folded out of the history
+        self.version = None  # Store version token of the last write seen
+        self.checked_at = None  # When the version was last found current in the store
 
 
 class ConversationMemoryManager:
     """Manages conversation memory for different sessions."""
     
-    def __init__(self):
-        """Initialize the memory manager with empty session storage."""
-        self._sessions: Dict[str, List[BaseMessage]] = {}
+    def __init__(
+        self,
+        max_sessions: int = MEMORY_MAX_SESSIONS,
+        max_messages_per_session: int = MEMORY_MAX_MESSAGES_PER_SESSION,
+        max_total_bytes: int = MEMORY_MAX_TOTAL_BYTES,
+        session_ttl: float = MEMORY_SESSION_TTL_SECONDS,
+        compress_after_turns: int = MEMORY_COMPRESS_AFTER_TURNS,
+        compress_min_bytes: int = MEMORY_COMPRESS_MIN_BYTES,
+        compression: str = MEMORY_COMPRESSION,
+        store: SessionStore | None = None,
+        version_check_interval: float = SESSION_VERSION_CHECK_INTERVAL
+    ):
+        """
+        Initialize the memory manager with empty session storage.
+        
+        Sessions are kept in least-recently-used order and evicted when they
+        expire or when any of the limits is exceeded. Turns are stored as
+        compact records and only converted to LangChain messages on request.
+        With a persistent store, the sessions held here act as a warm cache:
+        evicted sessions are loaded back from the store on their next use,
+        and sessions another worker process wrote to are reloaded.
+        
+        Args:
+            max_sessions: Maximum number of sessions kept in memory
+            max_messages_per_session: Oldest messages beyond this are dropped
+            max_total_bytes: Budget for message content across all sessions
+            session_ttl: Seconds of inactivity after which a session expires
+            compress_after_turns: Turns further than this from the end are compressed (0 disables)
+            compress_min_bytes: Turns smaller than this are never compressed
+            compression: "zstd" or "zlib"; zstd needs the zstandard package and falls back to zlib
+            store: Durable storage backend, history is kept in-process only by default
+            version_check_interval: Seconds a cached session is trusted after a check against the store
+        """
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self.max_sessions = max_sessions
+        self.max_messages_per_session = max_messages_per_session
+        self.max_total_bytes = max_total_bytes
+        self.session_ttl = session_ttl
+        self.compress_after_turns = compress_after_turns
+        self.compress_min_bytes = compress_min_bytes
+        # Only worth a warning when turns are actually compressed
+        if compression == "zstd" and zstandard is None and compress_after_turns:
+            logger.warning("zstd compression requested but the zstandard package is missing, using zlib")
+        self.compression = "zstd" if compression == "zstd" and zstandard is not None else "zlib"
+        self.store = store or InMemorySessionStore()
+        self.version_check_interval = version_check_interval
+        self._total_bytes = 0
+        self._epoch = 0
+        self._evictions: Dict[str, int] = {"ttl": 0, "lru": 0, "bytes": 0}
+        self._trimmed_messages = 0
+        self._reloads = 0
+        # Called with the id of a session whose turns left memory, to drop state derived from them
+        self.forget_callbacks: List[Callable[[str], None]] = []
+    
+    def _touch(self, session_id: str) -> _Session:
+        """Get or create a session and mark it as most recently used."""
+        now = time.monotonic()
+        self._expire(now)
+        
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._insert(session_id, now)
+            self._load(session_id, session)
+        else:
+            self._mark_used(session_id, session, now)
+            if not self._is_current(session_id, session, now):
+                self._reset(session)
+                self._forget(session_id)
+                self._load(session_id, session)
+        return session
+    
+    def _is_current(self, session_id: str, session: _Session, now: float) -> bool:
+        """Check a cached session against the store, at most once per check interval."""
+        if session.checked_at is not None and now - session.checked_at < self.version_check_interval:
+            return True
+        if not self.store.is_current(session_id, session.version):
+            return False
+        session.checked_at = now
+        return True
+    
+    def _insert(self, session_id: str, now: float) -> _Session:
+        """Add an empty session, evicting the least recently used ones over the cap."""
+        self._epoch += 1
+        session = _Session(now, self._epoch)
+        self._sessions[session_id] = session
+        while len(self._sessions) > self.max_sessions:
+            self._evict_oldest("lru")
+        return session
+    
+    def _mark_used(self, session_id: str, session: _Session, now: float):
+        """Move a session to the most recently used end."""
+        session.last_access = now
+        self._sessions.move_to_end(session_id)
+    
+    def _reset(self, session: _Session):
+        """Empty a stale cached session before the stored one is loaded into it."""
+        self._total_bytes -= session.size
+        session.turns.clear()
+        session.summary = None
+        session.size = 0
+        self._epoch += 1
+        session.epoch = self._epoch
+        session.seq = 0
+        self._reloads += 1
+    
+    def _read(self, session_id: str) -> Tuple[Optional[str], Optional[StoredSession]]:
+        """Read a session's version and turns from the persistent store."""
+        # Read before the data: a write in between only causes another reload
+        version = self.store.get_version(session_id)
+        return version, self.store.load(session_id, self.max_messages_per_session)
+    
+    def _load(self, session_id: str, session: _Session):
+        """Fill an empty in-memory session from the persistent store."""
+        self._fill(session, *self._read(session_id))
     
-    def get_or_create_session(self, session_id: str) -> List[BaseMessage]:
+    def _fill(self, session: _Session, version: Optional[str], stored: Optional[StoredSession]):
+        """Fill an empty in-memory session with what was read from the store."""
+        session.version = version
+        session.checked_at = time.monotonic()
+        if stored is None:
+            return
+        turns, summary = stored
+        for role, content in turns:
+            turn = _Turn(_ROLE_INDEX[role], content)
+            session.turns.append(turn)
+            session.size += turn.size
+        session.seq = len(session.turns)
+        if summary:
+            session.summary = summary
+            session.size += len(summary.encode("utf-8"))
+        self._total_bytes += session.size
+    
+    def _expire(self, now: float):
+        """Evict sessions idle for longer than the TTL (oldest come first)."""
+        deadline = now - self.session_ttl
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest.last_access > deadline:
+                break
+            self._evict_oldest("ttl")
+    
+    def _evict_oldest(self, reason: str):
+        """Evict the least recently used session."""
+        session_id, session = self._sessions.popitem(last=False)
+        self._total_bytes -= session.size
+        self._evictions[reason] += 1
+        self._forget(session_id)
+    
+    def _forget(self, session_id: str):
+        """Tell the owners of derived state that a session's turns left memory."""
+        for callback in self.forget_callbacks:
+            callback(session_id)
+    
+    def get_or_create_session(self, session_id: str) -> List["BaseMessage"]:
         """
         Get existing session memory or create new one.
         
@@ -21,9 +285,7 @@ class ConversationMemoryManager:
         Returns:
             List of messages for the session
         """
-        if session_id not in self._sessions:
-            self._sessions[session_id] = []
-        return self._sessions[session_id]
+        return self.get_history(session_id)
     
     def add_message(self, session_id: str, role: str, content: str):
         """
@@ -34,24 +296,219 @@ class ConversationMemoryManager:
             role: Message role ('user' or 'assistant')
             content: Message content
         """
-        messages = self.get_or_create_session(session_id)
+        role_index = _ROLE_INDEX.get(role)
+        if role_index is None:
+            return
+        
+        session = self._touch(session_id)
+        session.version = self.store.append(session_id, role, content)
+        turn = _Turn(role_index, content)
+        size = turn.size
+        session.turns.append(turn)
+        session.seq += 1
+        session.size += size
+        self._total_bytes += size
+        
+        # Compress the turn that just became "old"
+        if self.compress_after_turns and len(session.turns) > self.compress_after_turns:
+            old_turn = session.turns[-self.compress_after_turns - 1]
+            if old_turn.data.__class__ is str and len(old_turn.data) >= self.compress_min_bytes:
+                saved = old_turn.compress(self.compression == "zstd")
+                session.size -= saved
+                self._total_bytes -= saved
+        
+        # Keep the session within its own message cap
+        excess = len(session.turns) - self.max_messages_per_session
+        if excess > 0:
+            self._trim_session(session, excess)
         
-        if role == "user":
-            messages.append(HumanMessage(content=content))
-        elif role == "assistant":
-            messages.append(AIMessage(content=content))
+        # Evict other sessions first, then trim this one if it alone is too big
+        while self._total_bytes > self.max_total_bytes and len(self._sessions) > 1:
+            self._evict_oldest("bytes")
+        trimmed = excess > 0
+        while self._total_bytes > self.max_total_bytes and len(session.turns) > 1:
+            self._trim_session(session, 1)
+            trimmed = True
+        if trimmed:
+            self._forget(session_id)
     
-    def get_history(self, session_id: str) -> List[BaseMessage]:
+    def _trim_session(self, session: _Session, count: int):
+        """Drop the oldest turns of a session."""
+        removed = sum(turn.size for turn in session.turns[:count])
+        del session.turns[:count]
+        session.size -= removed
+        self._total_bytes -= removed
+        self._trimmed_messages += count
+        # Context windows may still hold the dropped turns, so they have to be rebuilt
+        self._epoch += 1
+        session.epoch = self._epoch
+        session.seq = len(session.turns)
+    
+    def get_turns(self, session_id: str) -> List[Tuple[str, str]]:
+        """
+        Get a session's turns without building LangChain messages.
+        
+        Args:
+            session_id: Session identifier
+            
+        Returns:
+            (role, content) pairs, oldest first
+        """
+        return [
+            (ROLES[turn.role], turn.data if turn.data.__class__ is str else turn.content)
+            for turn in self._touch(session_id).turns
+        ]
+    
+    def get_recent_turns(self, session_id: str, count: int) -> List[Tuple[str, str]]:
+        """
+        Get the last turns of a session.
+        
+        Args:
+            session_id: Session identifier
+            count: Number of turns to return
+        
+        Returns:
+            (role, content) pairs, oldest first
+        """
+        turns = self._touch(session_id).turns
+        return [(ROLES[turn.role], turn.content) for turn in turns[len(turns) - count:]]
+    
+    def get_summary(self, session_id: str) -> Optional[str]:
+        """Get the running summary of a session's older turns."""
+        session = self._sessions.get(session_id)
+        return session.summary if session is not None else None
+    
+    def apply_summary(self, session_id: str, summary: str, epoch: int, upto_seq: int) -> bool:
+        """
+        Replace the oldest turns of a session with a summary.
+        
+        The summary is computed off the request path, so turns may have been
+        appended or trimmed since the snapshot it was built from. Turns are
+        therefore addressed by their position in the epoch's append sequence.
+        
+        Args:
+            session_id: Session identifier
+            summary: Summary covering the previous summary and the summarized turns
+            epoch: Epoch of the session when the snapshot was taken
+            upto_seq: Sequence position just past the last summarized turn
+        
+        Returns:
+            True if the summary was applied
+        """
+        session = self._sessions.get(session_id)
+        if session is None or session.epoch != epoch:
+            return False
+        
+        first_seq = session.seq - len(session.turns)
+        remove = min(max(upto_seq - first_seq, 0), len(session.turns))
+        
+        removed = sum(turn.size for turn in session.turns[:remove])
+        del session.turns[:remove]
+        old_summary_size = len(session.summary.encode("utf-8")) if session.summary else 0
+        summary_size = len(summary.encode("utf-8"))
+        session.summary = summary
+        session.size += summary_size - old_summary_size - removed
+        self._total_bytes += summary_size - old_summary_size - removed
+        
+        # Existing turns changed, so derived state has to be rebuilt
+        self._epoch += 1
+        session.epoch = self._epoch
+        session.seq = len(session.turns)
+        session.version = self.store.apply_summary(session_id, summary, len(session.turns))
+        return True
+    
+    def get_version(self, session_id: str) -> Tuple[int, int]:
+        """
+        Get the version of a session's history.
+        
+        Appending a turn keeps the epoch and increments the sequence number;
+        clearing or recreating the session starts a new epoch. Callers that
+        cache derived state can use this to catch up incrementally.
+        
+        Args:
+            session_id: Session identifier
+        
+        Returns:
+            (epoch, seq) pair, (0, 0) for unknown sessions
+        """
+        session = self._sessions.get(session_id)
+        if session is None:
+            return 0, 0
+        return session.epoch, session.seq
+    
+    async def preload(self, session_id: str) -> int:
+        """
+        Load a session into memory ahead of its next use.
+        
+        The store is read in a thread, so neither the read nor the wait for
+        the session's queued writes blocks the event loop; the synchronous
+        methods then find the session in memory. Sessions the store does
+        not know are not created, so hints for made-up ids cannot push
+        real sessions out of memory.
+        
+        Args:
+            session_id: Session identifier
+            
+        Returns:
+            Number of turns in memory
+        """
+        session = self._sessions.get(session_id)
+        if session is not None:
+            version = session.version
+            if not self.store.persistent or await asyncio.to_thread(
+                self.store.is_current, session_id, version
+            ):
+                # Checked off the loop; the request's synchronous reads trust the copy
+                session.checked_at = time.monotonic()
+                return len(self._touch(session_id).turns)
+        elif not self.store.persistent:
+            return 0
+        else:
+            version = None
+        
+        read = await asyncio.to_thread(self._read, session_id)
+        changed = session is not None and session.version != version
+        if changed or self._sessions.get(session_id) is not session:
+            # Another request loaded or wrote the session meanwhile; its copy is newer
+            return len(self._touch(session_id).turns)
+        if session is None and read[1] is None:
+            return 0
+        
+        now = time.monotonic()
+        self._expire(now)
+        if session is None or session_id not in self._sessions:
+            session = self._insert(session_id, now)
+        else:
+            self._mark_used(session_id, session, now)
+            self._reset(session)
+            self._forget(session_id)
+        self._fill(session, *read)
+        return len(session.turns)
+    
+    def get_turn_count(self, session_id: str) -> int:
+        """Get the number of turns stored for a session."""
+        session = self._sessions.get(session_id)
+        return len(session.turns) if session is not None else 0
+    
+    def get_history(self, session_id: str) -> List["BaseMessage"]:
         """
         Get conversation history for a session.
         
+        Messages are converted from the compact records on each call.
+        
         Args:
             session_id: Session identifier
             
         Returns:
             List of messages in the conversation
         """
-        return self.get_or_create_session(session_id)
+        # LangChain is only needed here, so it is not imported with the server
+        from langchain_core.messages import HumanMessage, AIMessage
+        
+        return [
+            HumanMessage(content=content) if role == "user" else AIMessage(content=content)
+            for role, content in self.get_turns(session_id)
+        ]
     
     def get_history_as_string(self, session_id: str) -> str:
         """
@@ -63,16 +520,11 @@ class ConversationMemoryManager:
         Returns:
             Formatted conversation history
         """
-        messages = self.get_history(session_id)
-        history_text = ""
-        
-        for msg in messages:
-            if isinstance(msg, HumanMessage):
-                history_text += f"Human: {msg.content}\n"
-            elif isinstance(msg, AIMessage):
-                history_text += f"Assistant: {msg.content}\n"
-        
-        return history_text.strip()
+        lines = [
+            f"Human: {content}" if role == "user" else f"Assistant: {content}"
+            for role, content in self.get_turns(session_id)
+        ]
+        return "\n".join(lines).strip()
     
     def clear_session(self, session_id: str):
         """
@@ -81,8 +533,18 @@ class ConversationMemoryManager:
         Args:
             session_id: Session identifier
         """
-        if session_id in self._sessions:
-            self._sessions[session_id].clear()
+        version = self.store.clear(session_id)
+        session = self._sessions.get(session_id)
+        if session is not None:
+            session.version = version
+            session.turns.clear()
+            session.summary = None
+            self._epoch += 1
+            session.epoch = self._epoch
+            session.seq = 0
+            self._total_bytes -= session.size
+            session.size = 0
+        self._forget(session_id)
     
     def delete_session(self, session_id: str):
         """
@@ -91,9 +553,38 @@ class ConversationMemoryManager:
         Args:
             session_id: Session identifier
         """
-        if session_id in self._sessions:
-            del self._sessions[session_id]
+        self.store.delete(session_id)
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._total_bytes -= session.size
+        self._forget(session_id)
+    
+    def flush_session(self, session_id: str):
+        """Wait until a session's writes are stored, so other workers see them."""
+        self.store.flush_session(session_id)
+    
+    def close(self):
+        """Flush pending writes to the persistent store."""
+        self.store.close()
     
     def get_session_count(self) -> int:
         """Get the number of active sessions."""
         return len(self._sessions)
+    
+    def get_stats(self) -> dict:
+        """Get occupancy and eviction statistics."""
+        return {
+            "sessions": len(self._sessions),
+            "messages": sum(len(s.turns) for s in self._sessions.values()),
+            "bytes": self._total_bytes,
+            "limits": {
+                "max_sessions": self.max_sessions,
+                "max_messages_per_session": self.max_messages_per_session,
+                "max_total_bytes": self.max_total_bytes,
+                "session_ttl": self.session_ttl,
+                "compression": self.compression if self.compress_after_turns else None,
+            },
+            "evictions": dict(self._evictions),
+            "trimmed_messages": self._trimmed_messages,
+            "reloads": self._reloads,
+        }
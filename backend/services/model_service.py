@@ -1,9 +1,33 @@
 """Service for managing AI models."""
 
-import sys
-import google.generativeai as genai
-from openai import OpenAI
-from config import AVAILABLE_MODELS, SYSTEM_PROMPT, GENERATION_CONFIG, GOOGLE_API_KEY, OPENAI_API_KEY
+import asyncio
+import threading
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Dict, Tuple
+from config import (
+    AVAILABLE_MODELS,
+    AUTO_MODEL,
+    AUTO_MODEL_INFO,
+    AUTO_ROUTING_ENABLED,
+    SYSTEM_PROMPT,
+    GENERATION_CONFIG,
+    GOOGLE_API_KEY,
+    GOOGLE_REQUEST_DEADLINE,
+    OPENAI_API_KEY,
+)
+from logger import get_logger
+from services.http_transport import HttpTransport
+
+logger = get_logger("models")
+
+
+@dataclass(frozen=True)
+class ModelHandle:
+    """Immutable, ready-to-use client for a single model."""
+    name: str
+    provider: str  # 'google' or 'openai'
+    client: Any
 
 
 class ModelService:
@@ -11,18 +35,53 @@ class ModelService:
     
     def __init__(self):
         """Initialize the model service."""
-        # Configure Gemini API
-        genai.configure(api_key=GOOGLE_API_KEY)
+        # Provider SDKs take most of a second to import, so they are loaded on
+        # first use (or by warm_up) rather than with the server
+        self._genai = None
+        self._openai_client = None
+        self._sdk_lock = threading.Lock()
         
-        # Initialize OpenAI client
-        self.openai_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+        # Shared connection pool for the OpenAI client
+        self.transport = HttpTransport()
         
-        self.current_model = None
+        # Built model handles, keyed by model name
+        self._handles: Dict[str, ModelHandle] = {}
         self.current_model_name = None
-        self.current_model_type = None  # 'google' or 'openai'
+    
+    @property
+    def genai(self):
+        """The Gemini SDK, imported and configured on first use."""
+        if self._genai is None:
+            with self._sdk_lock:
+                if self._genai is None:
+                    import google.generativeai as genai
+                    # Gemini keeps its own gRPC channel open between requests
+                    genai.configure(api_key=GOOGLE_API_KEY)
+                    self._genai = genai
+        return self._genai
+    
+    @property
+    def openai_client(self):
+        """The async OpenAI client on the shared connection pool, or None without an API key."""
+        if self._openai_client is None and OPENAI_API_KEY:
+            with self._sdk_lock:
+                if self._openai_client is None:
+                    from openai import AsyncOpenAI
+                    self._openai_client = AsyncOpenAI(
+                        api_key=OPENAI_API_KEY,
+                        http_client=self.transport.client,
+                        timeout=self.transport.timeout_for("openai")
+                    )
+        return self._openai_client
+    
+    def get_sdk_status(self) -> Dict[str, bool]:
+        """Get which provider SDKs are loaded."""
+        return {"google": self._genai is not None, "openai": self._openai_client is not None}
     
     def get_available_models(self) -> dict:
         """Get all available models organized by company."""
+        if AUTO_ROUTING_ENABLED:
+            return {**AVAILABLE_MODELS, "Auto": {AUTO_MODEL: AUTO_MODEL_INFO}}
         return AVAILABLE_MODELS
     
     def model_exists(self, model_name: str) -> bool:
@@ -32,6 +91,19 @@ class ModelService:
                 return True
         return False
     
+    def get_model_info(self, model_name: str) -> dict:
+        """Get the catalogue entry of a model."""
+        for company_models in AVAILABLE_MODELS.values():
+            if model_name in company_models:
+                return company_models[model_name]
+        return {}
+    
+    def is_available(self, model_name: str) -> bool:
+        """Check if a model exists and its provider is configured."""
+        if not self.model_exists(model_name):
+            return False
+        return self.get_provider(model_name) != "openai" or bool(OPENAI_API_KEY)
+    
     def get_available_model_names(self) -> list:
         """Get all available model names as a list."""
         return [
@@ -40,24 +112,50 @@ class ModelService:
             for model_name in company.keys()
         ]
     
-    def initialize_model(self, model_name: str = "gemini-2.0-flash"):
-        """Initialize a model with the given name."""
-        if not self.model_exists(model_name):
-            available = ', '.join(self.get_available_model_names())
-            raise ValueError(
-                f"Model '{model_name}' does not exist. Available models: {available}"
-            )
+    def get_provider(self, model_name: str) -> str:
+        """
+        Get the provider a model belongs to.
         
-        try:
-            # Determine which provider the model belongs to
-            model_type = None
-            for company, models in AVAILABLE_MODELS.items():
-                if model_name in models:
-                    model_type = company.lower()
-                    break
+        Args:
+            model_name: Model name from AVAILABLE_MODELS
+            
+        Returns:
+            Provider type ('google' or 'openai')
+        """
+        for company, models in AVAILABLE_MODELS.items():
+            if model_name in models:
+                return company.lower()
+        available = ', '.join(self.get_available_model_names())
+        raise ValueError(
+            f"Model '{model_name}' does not exist. Available models: {available}"
+        )
+    
+    def resolve(self, model_name: str) -> ModelHandle:
+        """
+        Resolve a model name to a ready-to-use client handle.
+        
+        Handles are built once per model and reused by every request, so
+        concurrent requests on different models never share mutable state.
+        
+        Args:
+            model_name: Model name from AVAILABLE_MODELS
             
+        Returns:
+            Immutable handle for the model
+        """
+        handle = self._handles.get(model_name)
+        if handle is None:
+            handle = self._build_handle(model_name)
+            self._handles[model_name] = handle
+        return handle
+    
+    def _build_handle(self, model_name: str) -> ModelHandle:
+        """Build the client handle for a model."""
+        model_type = self.get_provider(model_name)
+        
+        try:
             if model_type == "google":
-                model = genai.GenerativeModel(
+                client = self.genai.GenerativeModel(
                     model_name,
                     system_instruction=SYSTEM_PROMPT,
                     generation_config=GENERATION_CONFIG
@@ -65,30 +163,24 @@ class ModelService:
             elif model_type == "openai":
                 if not self.openai_client:
                     raise ValueError("OpenAI API key not configured")
-                model = self.openai_client
+                client = self.openai_client
             else:
                 raise ValueError(f"Unknown model type for {model_name}")
             
-            self.current_model = model
-            self.current_model_name = model_name
-            self.current_model_type = model_type
-            
-            print(
-                f"[BACKEND LOG] Model {model_name} successfully initialized",
-                file=sys.stdout,
-                flush=True
-            )
-            return model
+            logger.info("Model %s successfully initialized", model_name)
+            return ModelHandle(name=model_name, provider=model_type, client=client)
         except Exception as e:
-            print(
-                f"[BACKEND ERROR] Error initializing model {model_name}: {str(e)}",
-                file=sys.stdout,
-                flush=True
-            )
+            logger.error("Error initializing model %s: %s", model_name, e)
             raise
     
+    def initialize_model(self, model_name: str = "gemini-2.0-flash") -> ModelHandle:
+        """Initialize a model and make it the default."""
+        handle = self.resolve(model_name)
+        self.current_model_name = model_name
+        return handle
+    
     def set_model(self, model_name: str):
-        """Set the current model."""
+        """Set the default model used when a request does not pick one."""
         if not self.model_exists(model_name):
             available = ', '.join(self.get_available_model_names())
             raise ValueError(
@@ -97,12 +189,78 @@ class ModelService:
         
         self.initialize_model(model_name)
     
+    def create_cached_content(self, model_name: str, text: str, ttl: float) -> Tuple[Any, Any]:
+        """
+        Upload a prompt prefix as Gemini cached content. Blocks; run it in a thread.
+        
+        Args:
+            model_name: Gemini model the cache is used with
+            text: Prompt prefix, cached after the system prompt
+            ttl: Seconds until the provider deletes the cache
+            
+        Returns:
+            Tuple of (cached content, model client that sends prompts after it)
+        """
+        cache = self.genai.caching.CachedContent.create(
+            model=f"models/{model_name}",
+            system_instruction=SYSTEM_PROMPT,
+            contents=[text],
+            ttl=timedelta(seconds=ttl)
+        )
+        client = self.genai.GenerativeModel.from_cached_content(cache, generation_config=GENERATION_CONFIG)
+        return cache, client
+    
+    def extend_cached_content(self, cache: Any, ttl: float):
+        """Push back the expiry of Gemini cached content. Blocks; run it in a thread."""
+        cache.update(ttl=timedelta(seconds=ttl))
+    
+    def delete_cached_content(self, cache: Any):
+        """Delete Gemini cached content. Blocks; run it in a thread."""
+        cache.delete()
+    
+    def get_request_options(self, provider: str) -> dict:
+        """
+        Get per-request options for the Gemini SDK, which has no shared client.
+        
+        Its timeout is the deadline of the whole call, streamed answers
+        included, so it is not the per-read timeout of the transport.
+        """
+        return {"timeout": GOOGLE_REQUEST_DEADLINE}
+    
+    def get_read_timeout(self, provider: str) -> float:
+        """Get the longest wait for the next chunk of a provider's streamed answer."""
+        return self.transport.timeout_for(provider).read
+    
+    async def warm_up(self):
+        """Load the provider SDKs and open provider connections ahead of the first chat request."""
+        # Imports run in a thread so the event loop keeps serving meanwhile
+        await asyncio.to_thread(self.resolve, self.get_current_model_name())
+        client = await asyncio.to_thread(lambda: self.openai_client)
+        if client is not None:
+            await self.transport.warm_up([str(client.base_url)])
+    
+    async def warm_connection(self, provider: str) -> bool:
+        """
+        Make sure a connection to a provider is open before a request needs it.
+        
+        Only OpenAI requests go through the shared pool; the Gemini SDK opens
+        its own channel on first use and keeps it open.
+        
+        Returns:
+            True if a connection was opened
+        """
+        if provider != "openai" or self.openai_client is None:
+            return False
+        return await self.transport.keep_warm(str(self.openai_client.base_url))
+    
+    async def aclose(self):
+        """Close the shared connection pool."""
+        await self.transport.aclose()
+    
     def get_current_model(self):
-        """Get the current initialized model."""
-        if self.current_model is None:
-            self.initialize_model()
-        return self.current_model
+        """Get the client of the default model."""
+        return self.resolve(self.get_current_model_name()).client
     
     def get_current_model_name(self) -> str:
-        """Get the name of the current model."""
+        """Get the name of the default model."""
         return self.current_model_name or "gemini-2.0-flash"
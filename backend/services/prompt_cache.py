@@ -0,0 +1,218 @@
+"""Provider-side caching of long, stable prompt prefixes."""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+from config import (
+    PROMPT_CACHE_ENABLED,
+    GEMINI_CACHE_MIN_TOKENS,
+    GEMINI_CACHE_REFRESH_TOKENS,
+    GEMINI_CACHE_TTL_SECONDS,
+    GEMINI_CACHE_MAX_SESSIONS,
+)
+from logger import get_logger
+from services.model_service import ModelService
+from services.context_builder import estimate_tokens
+
+logger = get_logger("prompt_cache")
+
+# Entries this close to expiry are not used, so a request never races the provider's deletion
+_EXPIRY_MARGIN = 30
+# Seconds a model is skipped after the provider refused to cache a prompt for it
+_FAILURE_BACKOFF = 600
+
+
+class CachedPrefix:
+    """Gemini cached content holding the start of a session's prompt."""
+    
+    __slots__ = ("model_name", "length", "digest", "tokens", "cache", "client", "expires_at")
+    
+    def __init__(self, model_name: str, text: str, tokens: int, cache: Any, client: Any, expires_at: float):
+        self.model_name = model_name
+        # The prefix itself is not kept; the context builder already holds the prompt
+        self.length = len(text)
+        self.digest = hash(text)
+        self.tokens = tokens
+        self.cache = cache
+        self.client = client  # Model client that sends prompts after the cached prefix
+        self.expires_at = expires_at
+    
+    def matches(self, prompt: str) -> bool:
+        """Whether a prompt starts with the cached prefix."""
+        return len(prompt) >= self.length and hash(prompt[:self.length]) == self.digest
+
+
+class PromptCache:
+    """
+    Manages Gemini cached content for long sessions.
+    
+    Once the stable part of a session's prompt (the history up to the last
+    answer) reaches min_tokens it is uploaded as cached content. Requests
+    whose prompt still starts with it send only the rest. It is uploaded
+    again when refresh_tokens have been added after it or when history
+    trimming changed it, and its TTL is extended while the session is in
+    use. Uploads, extensions and deletions run in the background, never
+    on the request path.
+    """
+    
+    def __init__(
+        self,
+        model_service: ModelService,
+        enabled: bool = PROMPT_CACHE_ENABLED,
+        min_tokens: int = GEMINI_CACHE_MIN_TOKENS,
+        refresh_tokens: int = GEMINI_CACHE_REFRESH_TOKENS,
+        ttl: float = GEMINI_CACHE_TTL_SECONDS,
+        max_sessions: int = GEMINI_CACHE_MAX_SESSIONS
+    ):
+        """
+        Initialize the cache.
+        
+        Args:
+            model_service: Service that talks to the provider's caching API
+            enabled: Whether to create cached content at all
+            min_tokens: Smallest prefix worth caching, in estimated tokens
+            refresh_tokens: Uncached tokens after the prefix that trigger a new upload
+            ttl: Seconds cached content lives without being extended
+            max_sessions: Sessions with cached content; the least recently used are deleted
+        """
+        self.model_service = model_service
+        self.enabled = enabled
+        self.min_tokens = min_tokens
+        self.refresh_tokens = refresh_tokens
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[str, CachedPrefix]" = OrderedDict()
+        self._pending: Set[str] = set()  # Sessions with an upload or extension in flight
+        self._tasks: Set[asyncio.Task] = set()
+        self._failed_until: Dict[str, float] = {}
+        self._counters = {"hits": 0, "uploads": 0, "extensions": 0, "deletions": 0, "failures": 0}
+        self._tokens_not_resent = 0
+    
+    def lookup(self, session_id: str, model_name: str, prompt: str) -> Optional[CachedPrefix]:
+        """
+        Find cached content a prompt can be sent after.
+        
+        Args:
+            session_id: Session identifier
+            model_name: Model the prompt is for
+            prompt: Full prompt text
+            
+        Returns:
+            The cached prefix, or None to send the full prompt
+        """
+        entry = self._entries.get(session_id)
+        if entry is None or entry.model_name != model_name:
+            return None
+        if entry.expires_at - time.monotonic() < _EXPIRY_MARGIN or not entry.matches(prompt):
+            return None
+        self._entries.move_to_end(session_id)
+        self._counters["hits"] += 1
+        self._tokens_not_resent += entry.tokens
+        return entry
+    
+    def update(self, session_id: str, model_name: str, prefix: str):
+        """
+        Upload, re-upload or extend a session's cached content after a turn or before the next one.
+        
+        Args:
+            session_id: Session identifier
+            model_name: Model the next request is expected to use
+            prefix: Prompt of the session so far, the start of its next prompt
+        """
+        if not self.enabled or session_id in self._pending:
+            return
+        entry = self._entries.get(session_id)
+        usable = (
+            entry is not None
+            and entry.model_name == model_name
+            and entry.expires_at - time.monotonic() > _EXPIRY_MARGIN
+            and entry.matches(prefix)
+        )
+        if usable and estimate_tokens(prefix[entry.length:]) < self.refresh_tokens:
+            if entry.expires_at - time.monotonic() < self.ttl / 2:
+                self._schedule(session_id, self._extend(entry))
+            return
+        
+        tokens = estimate_tokens(prefix)
+        if tokens < self.min_tokens or self._failed_until.get(model_name, 0) > time.monotonic():
+            if entry is not None and not usable:
+                self.invalidate(session_id)
+            return
+        self._schedule(session_id, self._upload(session_id, model_name, prefix, tokens))
+    
+    def invalidate(self, session_id: str):
+        """Stop using a session's cached content and delete it."""
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            self._schedule(None, self._delete(entry))
+    
+    def _schedule(self, session_id: Optional[str], coro):
+        """Run provider calls in the background, one at a time per session."""
+        if session_id is not None:
+            self._pending.add(session_id)
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if session_id is not None:
+            task.add_done_callback(lambda _: self._pending.discard(session_id))
+    
+    async def _upload(self, session_id: str, model_name: str, text: str, tokens: int):
+        """Upload a prefix and replace the session's previous cached content."""
+        started = time.monotonic()
+        try:
+            cache, client = await asyncio.to_thread(
+                self.model_service.create_cached_content, model_name, text, self.ttl
+            )
+        except Exception as e:
+            self._counters["failures"] += 1
+            self._failed_until[model_name] = time.monotonic() + _FAILURE_BACKOFF
+            logger.warning("Failed to cache the prompt of session %s on %s: %s", session_id, model_name, e)
+            return
+        self._counters["uploads"] += 1
+        logger.debug("Cached %d tokens of session %s on %s", tokens, session_id, model_name)
+        
+        previous = self._entries.pop(session_id, None)
+        self._entries[session_id] = CachedPrefix(model_name, text, tokens, cache, client, started + self.ttl)
+        stale = [previous] if previous is not None else []
+        while len(self._entries) > self.max_sessions:
+            stale.append(self._entries.popitem(last=False)[1])
+        for entry in stale:
+            await self._delete(entry)
+    
+    async def _extend(self, entry: CachedPrefix):
+        """Push back the expiry of cached content that is still in use."""
+        started = time.monotonic()
+        try:
+            await asyncio.to_thread(self.model_service.extend_cached_content, entry.cache, self.ttl)
+        except Exception as e:
+            logger.warning("Failed to extend cached content: %s", e)
+            return
+        self._counters["extensions"] += 1
+        entry.expires_at = started + self.ttl
+    
+    async def _delete(self, entry: CachedPrefix):
+        """Delete cached content; it expires on its own if this fails."""
+        try:
+            await asyncio.to_thread(self.model_service.delete_cached_content, entry.cache)
+            self._counters["deletions"] += 1
+        except Exception as e:
+            logger.debug("Failed to delete cached content: %s", e)
+    
+    async def aclose(self):
+        """Finish background calls and delete all cached content."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        entries = list(self._entries.values())
+        self._entries.clear()
+        await asyncio.gather(*(self._delete(entry) for entry in entries))
+    
+    def get_stats(self) -> dict:
+        """Get cached sessions, provider call counts and tokens not sent again."""
+        return {
+            "enabled": self.enabled,
+            "sessions": len(self._entries),
+            "cached_tokens": sum(entry.tokens for entry in self._entries.values()),
+            **self._counters,
+            "tokens_not_resent": self._tokens_not_resent,
+        }
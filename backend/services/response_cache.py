@@ -0,0 +1,259 @@
+"""Service for caching complete responses to repeated prompts."""
+
+import hashlib
+import json
+import math
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from config import (
+    SYSTEM_PROMPT,
+    GENERATION_CONFIG,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_MAX_BYTES,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_CACHE_SEMANTIC_ENABLED,
+    RESPONSE_CACHE_SEMANTIC_THRESHOLD,
+    RESPONSE_CACHE_SEMANTIC_MAX_ENTRIES,
+)
+
+# Hashed character n-grams used as local embeddings for the semantic tier
+_NGRAM_SIZE = 3
+_EMBEDDING_BUCKETS = 1 << 20
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize case and whitespace so trivially different prompts match."""
+    return " ".join(text.split()).casefold()
+
+
+def embed(text: str) -> Dict[int, float]:
+    """
+    Build a sparse, L2-normalized character n-gram embedding.
+    
+    Args:
+        text: Message text, punctuation is ignored
+        
+    Returns:
+        Mapping of n-gram bucket to weight
+    """
+    padded = f" {normalize_text(_PUNCTUATION.sub(' ', text))} "
+    counts: Dict[int, float] = {}
+    for i in range(len(padded) - _NGRAM_SIZE + 1):
+        bucket = hash(padded[i:i + _NGRAM_SIZE]) & (_EMBEDDING_BUCKETS - 1)
+        counts[bucket] = counts.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {k: v / norm for k, v in counts.items()}
+
+
+def _cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    """Cosine similarity of two normalized sparse vectors."""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class _Entry:
+    """A cached response."""
+    
+    __slots__ = ("chunks", "model", "size", "created")
+    
+    def __init__(self, chunks: Tuple[str, ...], model: str, created: float):
+        self.chunks = chunks
+        self.model = model
+        self.size = sum(len(chunk.encode("utf-8")) for chunk in chunks)
+        self.created = created
+
+
+class ResponseCache:
+    """
+    Response cache keyed on (model, normalized context hash).
+    
+    The exact tier matches the full prompt context. The optional semantic
+    tier matches first messages of a conversation by embedding similarity.
+    Entries are evicted by age, count and total size.
+    """
+    
+    def __init__(
+        self,
+        enabled: bool = RESPONSE_CACHE_ENABLED,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+        semantic_enabled: bool = RESPONSE_CACHE_SEMANTIC_ENABLED,
+        semantic_threshold: float = RESPONSE_CACHE_SEMANTIC_THRESHOLD,
+        semantic_max_entries: int = RESPONSE_CACHE_SEMANTIC_MAX_ENTRIES
+    ):
+        """
+        Initialize the cache.
+        
+        Args:
+            enabled: Whether responses are cached at all
+            max_entries: Maximum number of cached responses
+            max_bytes: Maximum total size of cached responses
+            ttl: Seconds a cached response stays valid
+            semantic_enabled: Whether to match similar first messages
+            semantic_threshold: Minimum cosine similarity for a semantic hit
+            semantic_max_entries: Maximum number of first messages indexed per model
+        """
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.semantic_enabled = semantic_enabled
+        self.semantic_threshold = semantic_threshold
+        self.semantic_max_entries = semantic_max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._semantic: Dict[str, "OrderedDict[str, Dict[int, float]]"] = {}
+        self._bytes = 0
+        self._stats = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+        }
+        # Responses also depend on the global prompt and generation settings
+        self._salt = json.dumps([SYSTEM_PROMPT, GENERATION_CONFIG], sort_keys=True)
+    
+    def make_key(self, model_name: str, context) -> str:
+        """
+        Build the cache key for a prompt context.
+        
+        Args:
+            model_name: Model the response is generated with
+            context: Gemini prompt text or OpenAI messages
+            
+        Returns:
+            Hex digest identifying the context
+        """
+        if isinstance(context, str):
+            text = context
+        else:
+            text = "\n".join(f"{m['role']}: {m['content']}" for m in context[1:])
+        digest = hashlib.sha256()
+        digest.update(self._salt.encode("utf-8"))
+        digest.update(model_name.encode("utf-8"))
+        digest.update(normalize_text(text).encode("utf-8"))
+        return digest.hexdigest()
+    
+    def get(
+        self,
+        key: str,
+        model_name: str,
+        first_message: Optional[str] = None
+    ) -> Optional[Tuple[str, ...]]:
+        """
+        Look up a cached response.
+        
+        Args:
+            key: Cache key from make_key
+            model_name: Model the response is generated with
+            first_message: The user message if it opens the conversation, enables the semantic tier
+            
+        Returns:
+            Cached response chunks, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        
+        entry = self._lookup(key)
+        if entry is not None:
+            self._stats["exact_hits"] += 1
+            return entry.chunks
+        
+        if self.semantic_enabled and first_message:
+            index = self._semantic.get(model_name)
+            if index:
+                vector = embed(first_message)
+                matches = [
+                    (score, candidate_key)
+                    for candidate_key, candidate in index.items()
+                    if (score := _cosine(vector, candidate)) >= self.semantic_threshold
+                ]
+                # The best match may have expired; fall back to the next live one
+                for _, candidate_key in sorted(matches, reverse=True):
+                    entry = self._lookup(candidate_key)
+                    if entry is not None:
+                        self._stats["semantic_hits"] += 1
+                        return entry.chunks
+        
+        self._stats["misses"] += 1
+        return None
+    
+    def _lookup(self, key: str) -> Optional[_Entry]:
+        """Get a live entry and mark it as recently used."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.created > self.ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+    
+    def put(
+        self,
+        key: str,
+        model_name: str,
+        chunks: List[str],
+        first_message: Optional[str] = None
+    ):
+        """
+        Cache a complete response.
+        
+        Args:
+            key: Cache key from make_key
+            model_name: Model the response was generated with
+            chunks: Response chunks in the order they were streamed
+            first_message: The user message if it opened the conversation
+        """
+        if not self.enabled or not chunks:
+            return
+        
+        if key in self._entries:
+            self._remove(key)
+        entry = _Entry(tuple(chunks), model_name, time.monotonic())
+        if entry.size > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += entry.size
+        self._stats["stores"] += 1
+        
+        if self.semantic_enabled and first_message:
+            index = self._semantic.setdefault(model_name, OrderedDict())
+            index[key] = embed(first_message)
+            while len(index) > self.semantic_max_entries:
+                index.popitem(last=False)
+        
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self._stats["evictions"] += 1
+    
+    def _remove(self, key: str):
+        """Remove an entry from the cache and from the semantic index."""
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        index = self._semantic.get(entry.model)
+        if index is not None:
+            index.pop(key, None)
+            if not index:
+                del self._semantic[entry.model]
+    
+    def get_stats(self) -> dict:
+        """Get hit/miss statistics and occupancy."""
+        lookups = self._stats["exact_hits"] + self._stats["semantic_hits"] + self._stats["misses"]
+        hits = self._stats["exact_hits"] + self._stats["semantic_hits"]
+        return {
+            **self._stats,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "semantic_entries": sum(len(index) for index in self._semantic.values()),
+            "bytes": self._bytes,
+            "enabled": self.enabled,
+            "semantic_enabled": self.semantic_enabled,
+        }
@@ -0,0 +1,343 @@
+"""Routing policy: failover, circuit breaking and hedging across models."""
+
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional
+from config import (
+    ROUTING_FAILOVER_ENABLED,
+    MODEL_FALLBACKS,
+    CIRCUIT_WINDOW,
+    CIRCUIT_MIN_CALLS,
+    CIRCUIT_FAILURE_RATE,
+    CIRCUIT_SLOW_TTFT_SECONDS,
+    CIRCUIT_OPEN_SECONDS,
+    ROUTING_HEDGE_ENABLED,
+    ROUTING_HEDGE_MIN_SAMPLES,
+    ROUTING_HEDGE_MIN_DELAY,
+)
+from logger import get_logger
+from services.model_service import ModelService, ModelHandle
+from services.stream_registry import StreamHandle
+
+logger = get_logger("routing")
+
+# Opens a text stream on a model; cancelled through the given handle
+OpenStream = Callable[[ModelHandle, StreamHandle], AsyncIterator[str]]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Get a percentile of a non-empty list of values."""
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class ModelHealth:
+    """Recent outcomes of calls to one model and its circuit breaker state."""
+    
+    def __init__(self, window: int = CIRCUIT_WINDOW):
+        self.outcomes: Deque[bool] = deque(maxlen=window)  # True for a healthy call
+        self.ttfts: Deque[float] = deque(maxlen=window * 5)
+        self.throughputs: Deque[float] = deque(maxlen=window * 5)  # Characters per second after the first token
+        self.opened_at: Optional[float] = None
+        self.probing = False  # A half-open trial call is in flight
+        self.counters = {"calls": 0, "failures": 0, "failovers": 0, "hedges": 0, "hedge_wins": 0}
+    
+    @property
+    def state(self) -> str:
+        """Breaker state: closed, open or half_open."""
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < CIRCUIT_OPEN_SECONDS:
+            return "open"
+        return "half_open"
+    
+    def usable(self) -> bool:
+        """Whether calls may go to this model: circuit closed, or half open without a trial running."""
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self.probing)
+    
+    def failure_rate(self) -> float:
+        """Share of recent calls that failed or were too slow."""
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+
+class RoutingPolicy:
+    """
+    Streams a response from the requested model or its fallbacks.
+    
+    A model that fails before its first token is replaced by the next
+    model in its fallback chain. Models whose recent calls mostly failed
+    or were slow have their circuit opened and are skipped until a trial
+    call succeeds. With hedging, the next fallback is started when the
+    first token is later than the model's p95 time-to-first-token, and
+    whichever stream starts first is kept.
+    """
+    
+    def __init__(
+        self,
+        model_service: ModelService,
+        fallbacks: Dict[str, List[str]] = MODEL_FALLBACKS,
+        failover: bool = ROUTING_FAILOVER_ENABLED,
+        hedge: bool = ROUTING_HEDGE_ENABLED
+    ):
+        """
+        Initialize the policy.
+        
+        Args:
+            model_service: Service used to resolve models
+            fallbacks: Fallback chain per model
+            failover: Whether to try fallbacks at all
+            hedge: Whether to start a backup stream for slow first tokens
+        """
+        self.model_service = model_service
+        self.fallbacks = fallbacks
+        self.failover = failover
+        self.hedge = hedge
+        self._health: Dict[str, ModelHealth] = {}
+    
+    def health(self, model_name: str) -> ModelHealth:
+        """Get the health record of a model."""
+        health = self._health.get(model_name)
+        if health is None:
+            health = self._health[model_name] = ModelHealth()
+        return health
+    
+    def get_candidates(self, model_name: str) -> List[str]:
+        """
+        Get the models to try for a request, in order.
+        
+        Args:
+            model_name: Requested model
+            
+        Returns:
+            The requested model and its usable fallbacks, skipping open circuits
+        """
+        chain = [model_name]
+        if self.failover:
+            chain += [
+                name for name in self.fallbacks.get(model_name, [])
+                if name != model_name and self.model_service.is_available(name)
+            ]
+        usable = [name for name in chain if self.health(name).usable()]
+        # With every circuit open, still try the requested model
+        return usable or [model_name]
+    
+    def record(self, model_name: str, ok: bool, ttft: Optional[float] = None):
+        """
+        Record the outcome of a call and update the model's circuit breaker.
+        
+        Args:
+            model_name: Model that was called
+            ok: Whether the stream started without an error
+            ttft: Seconds until the first token, for successful calls
+        """
+        health = self.health(model_name)
+        health.counters["calls"] += 1
+        if ttft is not None:
+            health.ttfts.append(ttft)
+        healthy = ok and (ttft is None or ttft <= CIRCUIT_SLOW_TTFT_SECONDS)
+        if not ok:
+            health.counters["failures"] += 1
+        health.outcomes.append(healthy)
+        
+        was_probing, health.probing = health.probing, False
+        if was_probing or health.state == "half_open":
+            # The trial call decides whether the circuit closes again
+            health.opened_at = None if healthy else time.monotonic()
+            if healthy:
+                health.outcomes.clear()
+            logger.info(
+                "Circuit for %s %s after trial call", model_name, "closed" if healthy else "re-opened"
+            )
+        elif (
+            health.opened_at is None
+            and len(health.outcomes) >= CIRCUIT_MIN_CALLS
+            and health.failure_rate() >= CIRCUIT_FAILURE_RATE
+        ):
+            health.opened_at = time.monotonic()
+            logger.warning(
+                "Circuit for %s opened (failure rate %.0f%%)", model_name, health.failure_rate() * 100
+            )
+    
+    def record_throughput(self, model_name: str, chars: int, seconds: float):
+        """Record how fast a completed stream produced text after its first token."""
+        if seconds > 0 and chars > 1:
+            self.health(model_name).throughputs.append(chars / seconds)
+    
+    def hedge_delay(self, model_name: str) -> Optional[float]:
+        """Get how long to wait for a first token before hedging, if known."""
+        ttfts = self.health(model_name).ttfts
+        if not self.hedge or len(ttfts) < ROUTING_HEDGE_MIN_SAMPLES:
+            return None
+        return max(percentile(list(ttfts), 0.95), ROUTING_HEDGE_MIN_DELAY)
+    
+    async def stream(
+        self,
+        model_name: str,
+        open_stream: OpenStream,
+        handle: StreamHandle,
+        on_serve: Optional[Callable[[str], None]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream text from the first model in the chain that starts answering.
+        
+        Args:
+            model_name: Requested model
+            open_stream: Opens a text stream on a resolved model
+            handle: Cancels every attempt when the request is cancelled
+            on_serve: Called with the model that answers, before its first chunk
+            
+        Yields:
+            Response text chunks
+        """
+        candidates = self.get_candidates(model_name)
+        next_index = 0
+        last_error: Optional[Exception] = None
+        
+        while next_index < len(candidates):
+            racing = [self._start(candidates[next_index], open_stream, handle)]
+            next_index += 1
+            hedge_delay = self.hedge_delay(racing[0].model_name)
+            winner = None
+            try:
+                while racing and winner is None:
+                    can_hedge = (
+                        hedge_delay is not None
+                        and len(racing) == 1
+                        and next_index < len(candidates)
+                    )
+                    done, _ = await asyncio.wait(
+                        {attempt.first for attempt in racing},
+                        timeout=hedge_delay if can_hedge else None,
+                        return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if not done:
+                        # The first token is late: race the next fallback
+                        self.health(racing[0].model_name).counters["hedges"] += 1
+                        logger.info(
+                            "Hedging %s with %s after %.0f ms",
+                            racing[0].model_name, candidates[next_index], hedge_delay * 1000
+                        )
+                        backup = self._start(candidates[next_index], open_stream, handle)
+                        backup.hedged_from = racing[0].model_name
+                        racing.append(backup)
+                        next_index += 1
+                        hedge_delay = None
+                        continue
+                    
+                    for attempt in [attempt for attempt in racing if attempt.first in done]:
+                        racing.remove(attempt)
+                        error = attempt.error()
+                        if error is None:
+                            winner = attempt
+                            break
+                        last_error = error
+                        if not handle.cancelled:
+                            self.record(attempt.model_name, False)
+                        logger.warning("Model %s failed before its first token: %s", attempt.model_name, error)
+            finally:
+                for loser in racing:
+                    self.health(loser.model_name).probing = False
+                    await loser.cancel()
+            
+            if winner is None:
+                if handle.cancelled:
+                    return
+                if next_index < len(candidates):
+                    self.health(model_name).counters["failovers"] += 1
+                    logger.info("Failing over from %s to %s", model_name, candidates[next_index])
+                continue
+            
+            if not handle.cancelled:
+                self.record(winner.model_name, True, winner.ttft)
+            if winner.hedged_from is not None:
+                self.health(winner.hedged_from).counters["hedge_wins"] += 1
+            if winner.model_name != model_name:
+                logger.info("Request for %s served by %s", model_name, winner.model_name)
+            if on_serve is not None:
+                on_serve(winner.model_name)
+            try:
+                if winner.chunk is not None:
+                    chars = len(winner.chunk)
+                    first_token_at = time.perf_counter()
+                    yield winner.chunk
+                    async for text in winner.iterator:
+                        chars += len(text)
+                        yield text
+                    if not handle.cancelled:
+                        self.record_throughput(winner.model_name, chars, time.perf_counter() - first_token_at)
+            finally:
+                await winner.iterator.aclose()
+            return
+        
+        raise last_error or RuntimeError(f"No model available for {model_name}")
+    
+    def _start(self, model_name: str, open_stream: OpenStream, handle: StreamHandle) -> "_Attempt":
+        """Open a stream on a model and start waiting for its first token."""
+        health = self.health(model_name)
+        if health.state == "half_open":
+            health.probing = True
+        return _Attempt(self.model_service, model_name, open_stream, handle)
+    
+    def get_stats(self) -> dict:
+        """Get per-model breaker state, failure rates and first-token latency."""
+        stats = {}
+        for model_name, health in self._health.items():
+            ttfts = list(health.ttfts)
+            throughputs = list(health.throughputs)
+            stats[model_name] = {
+                **health.counters,
+                "state": health.state,
+                "failure_rate": health.failure_rate(),
+                "ttft_p50_ms": percentile(ttfts, 0.5) * 1000 if ttfts else None,
+                "ttft_p95_ms": percentile(ttfts, 0.95) * 1000 if ttfts else None,
+                "chars_per_second_p50": percentile(throughputs, 0.5) if throughputs else None,
+            }
+        return {"failover": self.failover, "hedge": self.hedge, "models": stats}
+
+
+class _Attempt:
+    """One model's stream, raced for its first token."""
+    
+    def __init__(
+        self,
+        model_service: ModelService,
+        model_name: str,
+        open_stream: OpenStream,
+        handle: StreamHandle
+    ):
+        self.model_name = model_name
+        self.hedged_from: Optional[str] = None
+        self.started = time.perf_counter()
+        self.ttft: Optional[float] = None
+        self.chunk: Optional[str] = None
+        self.iterator: Optional[AsyncIterator[str]] = None
+        self.first = asyncio.ensure_future(self._first_chunk(model_service, open_stream, handle))
+    
+    async def _first_chunk(self, model_service: ModelService, open_stream: OpenStream, handle: StreamHandle):
+        """Open the stream and read until its first chunk."""
+        model = model_service.resolve(self.model_name)
+        self.iterator = open_stream(model, handle)
+        try:
+            self.chunk = await self.iterator.__anext__()
+        except StopAsyncIteration:
+            self.chunk = None
+        self.ttft = time.perf_counter() - self.started
+    
+    def error(self) -> Optional[Exception]:
+        """Get the error that stopped this attempt, if any."""
+        if self.first.cancelled():
+            return asyncio.CancelledError()
+        return self.first.exception()
+    
+    async def cancel(self):
+        """Stop this attempt and release its upstream connection."""
+        self.first.cancel()
+        await asyncio.wait({self.first})
+        if not self.first.cancelled():
+            self.first.exception()  # Mark a late error as handled
+        if self.iterator is not None:
+            await self.iterator.aclose()
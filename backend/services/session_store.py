@@ -0,0 +1,395 @@
+"""Storage backends that persist conversation history behind the memory manager."""
+
+import itertools
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from config import (
+    SESSION_STORE,
+    SESSION_DB_PATH,
+    SESSION_STORE_BATCH_SIZE,
+    SESSION_STORE_FLUSH_INTERVAL,
+    SESSION_STORE_SHARED,
+    SESSION_STORE_WRITE_RETRIES,
+    SQLITE_REQUEST_TIMEOUT,
+)
+from logger import get_logger
+from metrics import SESSION_WRITE_FAILURES
+
+logger = get_logger("sessions")
+
+# A stored session: its (role, content) turns, oldest first, and its running summary
+StoredSession = Tuple[List[Tuple[str, str]], Optional[str]]
+
+
+class SessionStore:
+    """
+    Durable storage for conversation history.
+    
+    The memory manager keeps recently used sessions in memory and only
+    reads from the store on a cache miss. Writes may be applied later.
+    Writes return a version token; when several worker processes share
+    the store, a cached session is current while the store still holds
+    the version of its last write.
+    """
+    
+    # Whether reads can miss memory and hit the store
+    persistent = False
+    
+    def load(self, session_id: str, limit: int) -> Optional[StoredSession]:
+        """
+        Load a session.
+        
+        Args:
+            session_id: Session identifier
+            limit: Maximum number of most recent turns to load
+            
+        Returns:
+            Stored turns and summary, or None if the session is unknown
+        """
+        return None
+    
+    def get_version(self, session_id: str) -> Optional[str]:
+        """Get the version token of the last stored write to a session."""
+        return None
+    
+    def is_current(self, session_id: str, version: Optional[str]) -> bool:
+        """Whether a cached copy at `version` still matches the store."""
+        return True
+    
+    def append(self, session_id: str, role: str, content: str) -> Optional[str]:
+        """Append a turn to a session; returns the version token of the write."""
+    
+    def apply_summary(self, session_id: str, summary: str, kept: int) -> Optional[str]:
+        """Replace all but the newest `kept` turns of a session with a summary."""
+    
+    def clear(self, session_id: str) -> Optional[str]:
+        """Remove all turns and the summary of a session."""
+    
+    def delete(self, session_id: str) -> Optional[str]:
+        """Remove a session completely."""
+    
+    def flush_session(self, session_id: str):
+        """Wait until the queued writes of one session are stored."""
+    
+    def flush(self):
+        """Wait until all pending writes are stored."""
+    
+    def close(self):
+        """Flush pending writes and release resources."""
+
+
+class InMemorySessionStore(SessionStore):
+    """Default store: history lives only in the memory manager."""
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    SQLite (WAL) session store with write-behind batching.
+    
+    Writes are queued and applied by a background thread in batched
+    transactions, so the request path never waits for the disk. In
+    shared mode every write also stores a version token per session, so
+    worker processes sharing the database can detect stale caches.
+    """
+    
+    persistent = True
+    
+    def __init__(
+        self,
+        path: str = SESSION_DB_PATH,
+        batch_size: int = SESSION_STORE_BATCH_SIZE,
+        flush_interval: float = SESSION_STORE_FLUSH_INTERVAL,
+        shared: bool = SESSION_STORE_SHARED,
+        write_retries: int = SESSION_STORE_WRITE_RETRIES
+    ):
+        """
+        Initialize the store and start the writer thread.
+        
+        Args:
+            path: SQLite database file
+            batch_size: Maximum number of writes applied in one transaction
+            flush_interval: Seconds the writer waits to fill a batch
+            shared: Whether other processes write to the same database
+            write_retries: Retries of a failed batch before its writes are applied one by one
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.shared = shared
+        self.write_retries = write_retries
+        self._queue: "queue.Queue" = queue.Queue()
+        self._pending: Dict[str, int] = {}  # Queued writes per session
+        self._lock = threading.Lock()
+        self._written = threading.Condition(self._lock)
+        # Version tokens are unique across processes: a per-store prefix and a counter
+        self._token_prefix = os.urandom(6).hex()
+        self._tokens = itertools.count(1)
+        # Reads come from the event loop and from worker threads, one at a time
+        self._read_lock = threading.Lock()
+        # Reads serve requests, so they give up on a lock quickly; the writer can wait
+        self._reader = self._connect(SQLITE_REQUEST_TIMEOUT, check_same_thread=False)
+        self._create_schema(self._reader)
+        self._writer = threading.Thread(
+            target=self._run_writer,
+            name="session-store-writer",
+            daemon=True
+        )
+        self._writer.start()
+    
+    def _connect(self, timeout: float = 30, check_same_thread: bool = True) -> sqlite3.Connection:
+        """Open a connection configured for concurrent readers and writers."""
+        conn = sqlite3.connect(
+            self.path, timeout=timeout, isolation_level=None, check_same_thread=check_same_thread
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def _create_schema(self, conn: sqlite3.Connection):
+        """Create the tables if they do not exist yet."""
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " session_id TEXT NOT NULL,"
+            " role TEXT NOT NULL,"
+            " content TEXT NOT NULL)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            " session_id TEXT PRIMARY KEY,"
+            " summary TEXT NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS versions ("
+            " session_id TEXT PRIMARY KEY,"
+            " version TEXT NOT NULL)"
+        )
+    
+    def load(self, session_id: str, limit: int) -> Optional[StoredSession]:
+        """Load the most recent turns and the summary of a session. Blocks; run it in a thread."""
+        # Read-your-writes: wait for the writer only if this session has queued writes
+        with self._lock:
+            has_pending = session_id in self._pending
+        if has_pending:
+            self.flush_session(session_id)
+        
+        with self._read_lock:
+            rows = self._reader.execute(
+                "SELECT role, content FROM messages WHERE session_id = ?"
+                " ORDER BY id DESC LIMIT ?",
+                (session_id, limit)
+            ).fetchall()
+            row = self._reader.execute(
+                "SELECT summary FROM summaries WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+        if not rows and row is None:
+            return None
+        rows.reverse()
+        return rows, row[0] if row else None
+    
+    def get_version(self, session_id: str) -> Optional[str]:
+        """Read the version token of the last write applied to a session."""
+        if not self.shared:
+            return None
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT version FROM versions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+        return row[0] if row else None
+    
+    def is_current(self, session_id: str, version: Optional[str]) -> bool:
+        """Whether no other process has written to the session since `version`."""
+        if not self.shared:
+            return True
+        with self._lock:
+            if session_id in self._pending:
+                # This process wrote last; its queued writes will land on top
+                return True
+        try:
+            return self.get_version(session_id) == version
+        except sqlite3.Error as e:
+            # Serving the cached copy beats failing the request
+            logger.warning("Could not check session %s against the store: %s", session_id, e)
+            return True
+    
+    def append(self, session_id: str, role: str, content: str) -> str:
+        """Queue a turn to be appended."""
+        return self._put(("append", session_id, role, content))
+    
+    def apply_summary(self, session_id: str, summary: str, kept: int) -> str:
+        """Queue replacing all but the newest turns with a summary."""
+        return self._put(("summary", session_id, summary, kept))
+    
+    def clear(self, session_id: str) -> str:
+        """Queue removing all turns of a session."""
+        return self._put(("clear", session_id))
+    
+    def delete(self, session_id: str) -> str:
+        """Queue removing a session, including its version."""
+        return self._put(("delete", session_id))
+    
+    def _put(self, op: tuple) -> str:
+        """Queue a write and count it against its session."""
+        version = f"{self._token_prefix}:{next(self._tokens)}"
+        with self._lock:
+            self._pending[op[1]] = self._pending.get(op[1], 0) + 1
+        self._queue.put((*op, version))
+        return version
+    
+    def flush_session(self, session_id: str):
+        """Block until the writer has applied the queued writes of one session."""
+        with self._written:
+            self._written.wait_for(lambda: session_id not in self._pending)
+    
+    def flush(self):
+        """Block until the writer has applied every queued write."""
+        self._queue.join()
+    
+    def close(self):
+        """Flush pending writes and stop the writer thread."""
+        self._queue.put(None)
+        self._writer.join()
+        self._reader.close()
+    
+    def _run_writer(self):
+        """Apply queued writes in batches until the store is closed."""
+        conn = self._connect()
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            
+            if batch[-1] is None:
+                running = False
+            try:
+                self._write(conn, [op for op in batch if op is not None])
+            finally:
+                with self._lock:
+                    for op in batch:
+                        if op is None:
+                            continue
+                        remaining = self._pending[op[1]] - 1
+                        if remaining:
+                            self._pending[op[1]] = remaining
+                        else:
+                            del self._pending[op[1]]
+                    self._written.notify_all()
+                for _ in batch:
+                    self._queue.task_done()
+        conn.close()
+    
+    def _write(self, conn: sqlite3.Connection, batch: list):
+        """
+        Apply a batch, retrying it with backoff while the database fails.
+        
+        A batch that keeps failing is applied one write at a time, so only
+        the writes that fail on their own are lost.
+        """
+        if not batch:
+            return
+        for attempt in range(self.write_retries + 1):
+            try:
+                self._apply(conn, batch)
+                return
+            except Exception as e:
+                error = e
+            if attempt < self.write_retries:
+                SESSION_WRITE_FAILURES.labels("retried").inc()
+                logger.warning("Failed to write %d session updates, retrying: %s", len(batch), error)
+                time.sleep(min(self.flush_interval * 2 ** attempt, 1.0))
+        
+        dropped = 0
+        for op in batch:
+            try:
+                self._apply(conn, [op])
+            except Exception as e:
+                error = e
+                dropped += 1
+        if dropped:
+            SESSION_WRITE_FAILURES.labels("dropped").inc(dropped)
+            logger.error("Dropped %d of %d session updates: %s", dropped, len(batch), error)
+    
+    def _apply(self, conn: sqlite3.Connection, batch: list):
+        """Apply a batch of writes in one transaction, preserving their order."""
+        appends = []
+        versions = {}  # Last write per session in this batch
+        conn.execute("BEGIN")
+        try:
+            for op in batch:
+                if self.shared:
+                    versions[op[1]] = op[-1]
+                if op[0] == "append":
+                    appends.append(op[1:4])
+                    continue
+                if appends:
+                    conn.executemany(
+                        "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+                        appends
+                    )
+                    appends = []
+                if op[0] == "summary":
+                    _, session_id, summary, kept, _ = op
+                    conn.execute(
+                        "DELETE FROM messages WHERE session_id = ? AND id NOT IN ("
+                        " SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                        (session_id, session_id, kept)
+                    )
+                    conn.execute(
+                        "INSERT OR REPLACE INTO summaries (session_id, summary) VALUES (?, ?)",
+                        (session_id, summary)
+                    )
+                elif op[0] in ("clear", "delete"):
+                    conn.execute("DELETE FROM messages WHERE session_id = ?", (op[1],))
+                    conn.execute("DELETE FROM summaries WHERE session_id = ?", (op[1],))
+                if op[0] == "delete":
+                    # Other workers see the missing version and drop their cached copy
+                    versions.pop(op[1], None)
+                    conn.execute("DELETE FROM versions WHERE session_id = ?", (op[1],))
+            if appends:
+                conn.executemany(
+                    "INSERT INTO messages (session_id, role, content) VALUES (?, ?, ?)",
+                    appends
+                )
+            if versions:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO versions (session_id, version) VALUES (?, ?)",
+                    versions.items()
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+def create_session_store(kind: str = SESSION_STORE) -> SessionStore:
+    """
+    Create the configured session store.
+    
+    Args:
+        kind: "memory" or "sqlite"
+        
+    Returns:
+        Session store instance
+    """
+    if kind == "memory":
+        return InMemorySessionStore()
+    if kind == "sqlite":
+        return SQLiteSessionStore()
+    raise ValueError(f"Unknown session store: {kind}")
@@ -0,0 +1,165 @@
+"""Service for sharing one upstream generation between identical requests."""
+
+import asyncio
+import hashlib
+import json
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from config import SINGLE_FLIGHT_ENABLED
+from services.stream_registry import StreamHandle
+
+
+class _Flight:
+    """An in-flight upstream generation and the chunks it produced so far."""
+    
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[Exception] = None
+        self.subscribers = 0
+        self.owners: List[str] = []  # Everyone who subscribed, including those who left
+        # Not registered: cancelled only when every subscriber has left
+        self.handle = StreamHandle("single-flight", "")
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+    
+    def publish(self, text: str):
+        """Append a chunk and wake every waiting subscriber."""
+        self.chunks.append(text)
+        self._notify()
+    
+    def finish(self, error: Optional[Exception] = None):
+        """Mark the generation as complete."""
+        self.error = error
+        self.done = True
+        self._notify()
+    
+    async def wait(self):
+        """Wait until a chunk is published or the generation ends."""
+        await self._changed.wait()
+    
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent generations into one upstream call.
+    
+    The first request for a key starts the upstream stream in a background
+    task; later identical requests attach to it. Every subscriber reads the
+    shared chunk log with its own cursor, so it receives all chunks in order
+    from the start and a slow subscriber never delays the others.
+    
+    Identical contexts from different sessions share a flight, so the upstream
+    stream gets the owners of all subscribers and must charge each of them
+    rather than the one that started it.
+    """
+    
+    def __init__(self, enabled: bool = SINGLE_FLIGHT_ENABLED):
+        """Initialize with no flights in progress."""
+        self.enabled = enabled
+        self._flights: Dict[str, _Flight] = {}
+        self._stats = {"flights": 0, "coalesced": 0}
+    
+    @staticmethod
+    def make_key(model_name: str, context) -> str:
+        """
+        Build the flight key for a prompt context.
+        
+        Unlike the response cache key, the context is not normalized: a
+        request only shares a live generation that was started for exactly
+        the input the provider would get from it.
+        
+        Args:
+            model_name: Model the response is generated with
+            context: Gemini prompt text or OpenAI messages
+            
+        Returns:
+            Hex digest identifying the request
+        """
+        text = context if isinstance(context, str) else json.dumps(context, ensure_ascii=False)
+        digest = hashlib.sha256(model_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+    
+    def subscribe(
+        self,
+        key: str,
+        start: Callable[[StreamHandle, List[str]], AsyncIterator[str]],
+        owner: str = ""
+    ) -> AsyncIterator[str]:
+        """
+        Stream the generation for a key, starting it if none is running.
+        
+        Args:
+            key: Identity of the request, from make_key
+            start: Starts the upstream stream given a cancellation handle and
+                the live list of owners subscribed to it
+            owner: Who the request is made for, usually its session
+            
+        Returns:
+            Async iterator of response chunks
+        """
+        if not self.enabled:
+            return start(StreamHandle("single-flight", ""), [owner])
+        
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run(key, flight, start))
+            self._stats["flights"] += 1
+        else:
+            self._stats["coalesced"] += 1
+        flight.subscribers += 1
+        flight.owners.append(owner)
+        return self._follow(key, flight)
+    
+    async def _run(
+        self,
+        key: str,
+        flight: _Flight,
+        start: Callable[[StreamHandle, List[str]], AsyncIterator[str]]
+    ):
+        """Drive the upstream stream and publish its chunks."""
+        error = None
+        try:
+            async for text in start(flight.handle, flight.owners):
+                flight.publish(text)
+        except Exception as e:
+            error = e
+        finally:
+            flight.finish(error)
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+    
+    async def _follow(self, key: str, flight: _Flight) -> AsyncIterator[str]:
+        """Yield a flight's chunks for one subscriber."""
+        cursor = 0
+        try:
+            while True:
+                if cursor < len(flight.chunks):
+                    cursor += 1
+                    yield flight.chunks[cursor - 1]
+                elif flight.done:
+                    break
+                else:
+                    await flight.wait()
+            if flight.error is not None:
+                raise flight.error
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Nobody is listening any more: stop the upstream call
+                flight.handle.cancel()
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+    
+    def get_stats(self) -> dict:
+        """Get coalescing statistics."""
+        return {
+            **self._stats,
+            "in_flight": len(self._flights),
+        }
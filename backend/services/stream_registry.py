@@ -0,0 +1,366 @@
+"""Service for tracking active chat streams and cancelling them individually."""
+
+import asyncio
+import inspect
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+from config import WORKERS, STREAM_DB_PATH, CANCEL_POLL_INTERVAL, SQLITE_REQUEST_TIMEOUT
+from logger import get_logger
+
+logger = get_logger("streams")
+
+# Seconds cancel requests and rows of streams left by crashed workers are kept
+_CANCEL_RETENTION = 60
+_STREAM_RETENTION = 6 * 60 * 60
+
+
+class StreamHandle:
+    """Cancellation state for a single active stream."""
+
+    def __init__(self, stream_id: str, session_id: str):
+        """Initialize the handle for a stream belonging to a session."""
+        self.stream_id = stream_id
+        self.session_id = session_id
+        self._cancelled = asyncio.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancellation was requested for this stream."""
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Request cancellation; the upstream iterator stops at once."""
+        self._cancelled.set()
+
+    async def iterate(self, upstream, read_timeout: Optional[float] = None):
+        """
+        Iterate an upstream provider response until it ends or is cancelled.
+
+        Each read is raced against the cancellation event, so a cancel wakes
+        the stream immediately instead of waiting for the next network chunk.
+        The upstream response is closed on exit to release its connection.
+
+        Args:
+            upstream: Async iterable returned by the provider SDK
+            read_timeout: Seconds to wait for each chunk before raising TimeoutError, None to wait forever
+
+        Yields:
+            Provider chunks
+        """
+        iterator = upstream.__aiter__()
+        cancel_wait = asyncio.ensure_future(self._cancelled.wait())
+        next_chunk = None
+        try:
+            while True:
+                next_chunk = asyncio.ensure_future(iterator.__anext__())
+                done, _ = await asyncio.wait(
+                    {next_chunk, cancel_wait},
+                    timeout=read_timeout,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    raise TimeoutError(f"No response from the provider for {read_timeout:g} s")
+                if next_chunk not in done:
+                    return
+                try:
+                    chunk = next_chunk.result()
+                except StopAsyncIteration:
+                    return
+                yield chunk
+        finally:
+            cancel_wait.cancel()
+            if next_chunk is not None and not next_chunk.done():
+                next_chunk.cancel()
+                # Let the pending read unwind before closing the upstream it runs in
+                await asyncio.wait({next_chunk})
+            await _close_upstream(upstream)
+
+
+async def _close_upstream(upstream):
+    """Close a provider response if the SDK exposes a close method."""
+    close = getattr(upstream, "close", None) or getattr(upstream, "aclose", None)
+    if close is None:
+        return
+    try:
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+    except Exception as e:
+        logger.error("Failed to close upstream stream: %s", e)
+
+
+class SharedStreamTable:
+    """
+    Active streams and cancel requests of all worker processes, in SQLite.
+
+    Each worker records the streams it serves. A cancel for a stream of
+    another worker is stored as a request, which the serving worker picks
+    up on its next poll. The registry calls it from one thread of its own,
+    so the connection is never used from two threads at once.
+    """
+
+    def __init__(self, path: str = STREAM_DB_PATH, timeout: float = SQLITE_REQUEST_TIMEOUT):
+        """
+        Open the database and skip cancel requests made before this worker started.
+
+        Args:
+            path: SQLite database file shared by the workers
+            timeout: Seconds a call waits for another worker's write lock
+        """
+        self.worker = f"{os.getpid()}-{os.urandom(3).hex()}"
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS streams ("
+            " stream_id TEXT PRIMARY KEY,"
+            " session_id TEXT NOT NULL,"
+            " worker TEXT NOT NULL,"
+            " started_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_streams_session ON streams (session_id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cancellations ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " stream_id TEXT NOT NULL,"
+            " requested_at REAL NOT NULL)"
+        )
+        self._cursor = self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM cancellations").fetchone()[0]
+
+    def add(self, stream_id: str, session_id: str):
+        """Record a stream served by this worker."""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO streams VALUES (?, ?, ?, ?)",
+            (stream_id, session_id, self.worker, time.time())
+        )
+
+    def remove(self, stream_id: str):
+        """Forget a finished stream."""
+        self._conn.execute("DELETE FROM streams WHERE stream_id = ?", (stream_id,))
+
+    def is_active(self, stream_id: str) -> bool:
+        """Whether any worker serves the stream."""
+        row = self._conn.execute("SELECT 1 FROM streams WHERE stream_id = ?", (stream_id,)).fetchone()
+        return row is not None
+
+    def remote_streams(self, session_id: str) -> List[str]:
+        """Get the ids of a session's streams served by other workers."""
+        rows = self._conn.execute(
+            "SELECT stream_id FROM streams WHERE session_id = ? AND worker != ?",
+            (session_id, self.worker)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def request_cancel(self, stream_ids: List[str]):
+        """Ask the workers serving these streams to cancel them."""
+        now = time.time()
+        self._conn.executemany(
+            "INSERT INTO cancellations (stream_id, requested_at) VALUES (?, ?)",
+            [(stream_id, now) for stream_id in stream_ids]
+        )
+
+    def poll(self) -> List[str]:
+        """Get the stream ids of cancel requests made since the last poll."""
+        rows = self._conn.execute(
+            "SELECT id, stream_id FROM cancellations WHERE id > ? ORDER BY id",
+            (self._cursor,)
+        ).fetchall()
+        if rows:
+            self._cursor = rows[-1][0]
+        return [row[1] for row in rows]
+
+    def purge(self):
+        """Delete old cancel requests and streams left behind by crashed workers."""
+        now = time.time()
+        self._conn.execute("DELETE FROM cancellations WHERE requested_at < ?", (now - _CANCEL_RETENTION,))
+        self._conn.execute("DELETE FROM streams WHERE started_at < ?", (now - _STREAM_RETENTION,))
+
+    def close(self):
+        """Forget this worker's streams and close the database."""
+        self._conn.execute("DELETE FROM streams WHERE worker = ?", (self.worker,))
+        self._conn.close()
+
+
+class StreamRegistry:
+    """
+    Registry of active streams keyed by stream id.
+
+    With a shared table, streams of every worker process can be cancelled
+    from any of them; start() begins polling for cancel requests. The
+    table is only used from a single background thread: registering and
+    unregistering queue their writes there without waiting, cancels await
+    the answer, so a slow or locked database never blocks the event loop.
+    """
+
+    def __init__(self, shared: Optional[SharedStreamTable] = None, poll_interval: float = CANCEL_POLL_INTERVAL):
+        """
+        Initialize an empty registry.
+
+        Args:
+            shared: Table shared with other worker processes, None for a single process
+            poll_interval: Seconds between polls for cancel requests of other workers
+        """
+        self._streams: Dict[str, StreamHandle] = {}
+        self.shared = shared
+        self.poll_interval = poll_interval
+        self._watcher: Optional[asyncio.Task] = None
+        # One thread keeps the table's calls in order: a stream is added before it is removed
+        self._executor = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream-table")
+            if shared is not None else None
+        )
+
+    def _submit(self, fn, *args) -> Future:
+        """Run a call on the shared table in its thread, logging database errors."""
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(_log_table_error)
+        return future
+
+    async def _call(self, fn, *args):
+        """Run a call on the shared table in its thread and wait for the result."""
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    def register(self, session_id: str, stream_id: Optional[str] = None) -> StreamHandle:
+        """
+        Register a new active stream.
+
+        Args:
+            session_id: Session the stream belongs to
+            stream_id: Stream identifier, generated when omitted
+
+        Returns:
+            Handle for the registered stream
+        """
+        stream_id = stream_id or uuid.uuid4().hex
+        handle = StreamHandle(stream_id, session_id)
+        self._streams[stream_id] = handle
+        if self.shared is not None:
+            self._submit(self.shared.add, stream_id, session_id)
+        return handle
+
+    def unregister(self, stream_id: str):
+        """Remove a finished stream from the registry."""
+        if self._streams.pop(stream_id, None) is not None and self.shared is not None:
+            self._submit(self.shared.remove, stream_id)
+
+    def get(self, stream_id: str) -> Optional[StreamHandle]:
+        """Get the handle for an active stream."""
+        return self._streams.get(stream_id)
+
+    async def cancel(self, stream_id: str) -> bool:
+        """
+        Cancel a single stream.
+
+        Args:
+            stream_id: Stream identifier
+
+        Returns:
+            True if an active stream was cancelled
+        """
+        handle = self._streams.get(stream_id)
+        if handle is not None:
+            handle.cancel()
+            return True
+        if self.shared is None:
+            return False
+        try:
+            return await self._call(self._cancel_remote, stream_id)
+        except sqlite3.Error:
+            return False
+
+    def _cancel_remote(self, stream_id: str) -> bool:
+        """Ask the worker serving a stream to cancel it (in the table's thread)."""
+        if not self.shared.is_active(stream_id):
+            return False
+        self.shared.request_cancel([stream_id])
+        return True
+
+    async def cancel_session(self, session_id: str) -> List[str]:
+        """
+        Cancel every active stream of a session.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            Ids of the cancelled streams
+        """
+        cancelled = []
+        for handle in list(self._streams.values()):
+            if handle.session_id == session_id:
+                handle.cancel()
+                cancelled.append(handle.stream_id)
+        if self.shared is not None:
+            try:
+                cancelled.extend(await self._call(self._cancel_remote_session, session_id))
+            except sqlite3.Error:
+                pass  # Logged; the local streams are cancelled all the same
+        return cancelled
+
+    def _cancel_remote_session(self, session_id: str) -> List[str]:
+        """Ask other workers to cancel a session's streams (in the table's thread)."""
+        remote = self.shared.remote_streams(session_id)
+        if remote:
+            self.shared.request_cancel(remote)
+        return remote
+
+    def start(self):
+        """Start applying cancel requests made on other workers."""
+        if self.shared is not None and self._watcher is None:
+            self._watcher = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        """Poll the shared table for cancel requests until stopped."""
+        purged_at = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                for stream_id in await self._call(self.shared.poll):
+                    handle = self._streams.get(stream_id)
+                    if handle is not None:
+                        handle.cancel()
+                if time.monotonic() - purged_at > _CANCEL_RETENTION:
+                    purged_at = time.monotonic()
+                    await self._call(self.shared.purge)
+            except sqlite3.Error:
+                pass  # Logged; the next poll tries again
+
+    def close(self):
+        """Stop polling, finish the queued table writes and release the shared table."""
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        if self.shared is not None:
+            self._executor.shutdown(wait=True)
+            self.shared.close()
+            self.shared = None
+
+    def get_active_count(self) -> int:
+        """Get the number of active streams."""
+        return len(self._streams)
+
+
+def _log_table_error(future: Future):
+    """Log a failed call on the shared stream table."""
+    error = None if future.cancelled() else future.exception()
+    if isinstance(error, sqlite3.Error):
+        logger.error("Shared stream table call failed: %s", error)
+
+
+def create_stream_registry(workers: int = WORKERS) -> StreamRegistry:
+    """
+    Create the stream registry, shared between processes when there are several workers.
+
+    Args:
+        workers: Number of server worker processes
+
+    Returns:
+        Stream registry instance
+    """
+    if workers > 1:
+        return StreamRegistry(SharedStreamTable())
+    return StreamRegistry()
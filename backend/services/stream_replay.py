@@ -0,0 +1,271 @@
+"""Replay buffers that let clients resume an SSE stream after a dropped connection."""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple
+from config import (
+    SSE_RESUME_GRACE_SECONDS,
+    SSE_REPLAY_TTL_SECONDS,
+    SSE_REPLAY_MAX_STREAM_BYTES,
+    SSE_REPLAY_MAX_TOTAL_BYTES,
+)
+from logger import get_logger
+
+logger = get_logger("replay")
+
+# Sent to a client that fell behind the buffer, since the frames it missed are gone
+GONE_FRAME = "data: " + json.dumps(
+    {"error": "The stream is no longer buffered from that event, send the message again", "gone": True},
+    ensure_ascii=False
+) + "\n\n"
+
+
+class ReplayBuffer:
+    """The frames a stream produced so far, numbered for SSE `id:` fields."""
+    
+    def __init__(self, stream_id: str, max_bytes: int):
+        self.stream_id = stream_id
+        self.max_bytes = max_bytes
+        self.frames: Deque[Tuple[int, str]] = deque()  # (event id, frame)
+        self.next_id = 0
+        self.size = 0
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self.grace: Optional[asyncio.TimerHandle] = None
+        self._changed = asyncio.Event()
+    
+    @property
+    def first_id(self) -> int:
+        """Id of the oldest frame still buffered."""
+        return self.frames[0][0] if self.frames else self.next_id
+    
+    def append(self, frame: str) -> int:
+        """
+        Number a frame, buffer it and wake every waiting client.
+        
+        Returns:
+            Change in buffered bytes; the oldest frames go once the buffer is full
+        """
+        frame = f"id: {self.next_id}\n{frame}"
+        self.frames.append((self.next_id, frame))
+        self.next_id += 1
+        before = self.size
+        self.size += len(frame)
+        while self.size > self.max_bytes and len(self.frames) > 1:
+            self.size -= len(self.frames.popleft()[1])
+        self._notify()
+        return self.size - before
+    
+    def finish(self):
+        """Mark the stream as complete."""
+        self.done = True
+        self.finished_at = time.monotonic()
+        self._notify()
+    
+    def wait(self) -> Awaitable[bool]:
+        """
+        Wait until a frame is added or the stream ends.
+        
+        Binds the current event right away rather than when the wait starts
+        running, so a frame added in between (wait_for schedules it as a
+        task) still wakes the caller.
+        """
+        return self._changed.wait()
+    
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+
+class StreamReplay:
+    """
+    Runs SSE streams in background tasks and buffers their frames for reconnecting clients.
+    
+    Each stream is produced by a task that appends numbered frames to a
+    bounded buffer, and every client reads the buffer with its own cursor,
+    like a single-flight subscriber. When the last client disconnects the
+    generation keeps running for a grace period, so a client that comes
+    back with Last-Event-ID picks up where it left off without a new
+    provider call; if none comes back in time the stream is cancelled.
+    Finished buffers are evicted by age, oldest first when all buffers
+    together exceed the size cap.
+    """
+    
+    def __init__(
+        self,
+        cancel: Callable[[str], bool],
+        grace: float = SSE_RESUME_GRACE_SECONDS,
+        ttl: float = SSE_REPLAY_TTL_SECONDS,
+        max_stream_bytes: int = SSE_REPLAY_MAX_STREAM_BYTES,
+        max_total_bytes: int = SSE_REPLAY_MAX_TOTAL_BYTES
+    ):
+        """
+        Initialize with no buffered streams.
+        
+        Args:
+            cancel: Cancels a stream by id once no client is left
+            grace: Seconds a generation keeps running with no client attached
+            ttl: Seconds a finished stream stays resumable
+            max_stream_bytes: Frames kept per stream; older ones cannot be resumed from
+            max_total_bytes: Frames kept across all streams
+        """
+        self.cancel = cancel
+        self.grace = grace
+        self.ttl = ttl
+        self.max_stream_bytes = max_stream_bytes
+        self.max_total_bytes = max_total_bytes
+        self._buffers: Dict[str, ReplayBuffer] = {}
+        self._finished: "OrderedDict[str, ReplayBuffer]" = OrderedDict()  # In finishing order
+        self._bytes = 0
+        self._stats = {"streams": 0, "abandoned": 0, "evicted": 0}
+    
+    def start(
+        self,
+        stream_id: str,
+        frames: AsyncIterator[str],
+        on_finish: Optional[Callable[[], None]] = None
+    ) -> ReplayBuffer:
+        """
+        Start producing a stream's frames in the background.
+        
+        Args:
+            stream_id: Stream identifier, used to resume the stream
+            frames: SSE frames of the stream
+            on_finish: Called once the stream has ended
+            
+        Returns:
+            The stream's buffer
+        """
+        self._evict()
+        buffer = ReplayBuffer(stream_id, self.max_stream_bytes)
+        self._buffers[stream_id] = buffer
+        buffer.task = asyncio.create_task(self._produce(buffer, frames, on_finish))
+        self._stats["streams"] += 1
+        # A client that never reads (it left before the body started) counts as gone
+        self._detached(buffer)
+        return buffer
+    
+    async def _produce(self, buffer: ReplayBuffer, frames: AsyncIterator[str], on_finish):
+        """Drive the stream and buffer its frames."""
+        try:
+            async for frame in frames:
+                self._bytes += buffer.append(frame)
+        except Exception as e:
+            logger.error("Stream %s failed while buffering: %s", buffer.stream_id, e)
+        finally:
+            buffer.finish()
+            self._finished[buffer.stream_id] = buffer
+            if buffer.grace is not None:
+                buffer.grace.cancel()
+            if on_finish is not None:
+                on_finish()
+    
+    def get(self, stream_id: str) -> Optional[ReplayBuffer]:
+        """Get a stream's buffer, or None if it is unknown or was evicted."""
+        self._evict()
+        return self._buffers.get(stream_id)
+    
+    async def follow(
+        self,
+        buffer: ReplayBuffer,
+        after: int = -1,
+        disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+        poll_interval: float = 0.5
+    ) -> AsyncIterator[str]:
+        """
+        Yield a stream's frames for one client.
+        
+        Args:
+            buffer: Buffer of the stream
+            after: Id of the last frame the client received, -1 for all frames
+            disconnected: Checked while no frames arrive, ends the iteration when True
+            poll_interval: Seconds between disconnect checks
+            
+        Yields:
+            SSE frames with ids, then an error frame if the client fell behind the buffer
+        """
+        buffer.subscribers += 1
+        if buffer.grace is not None:
+            buffer.grace.cancel()
+            buffer.grace = None
+        cursor = after + 1
+        try:
+            while True:
+                if cursor < buffer.first_id:
+                    # The client fell further behind than the buffer reaches;
+                    # end with an error rather than a stream that just stops
+                    logger.warning("Client of stream %s fell behind the buffer at event %d", buffer.stream_id, cursor)
+                    yield GONE_FRAME
+                    break
+                if cursor < buffer.next_id:
+                    frame = buffer.frames[cursor - buffer.first_id][1]
+                    cursor += 1
+                    yield frame
+                elif buffer.done:
+                    break
+                elif disconnected is None:
+                    await buffer.wait()
+                else:
+                    try:
+                        await asyncio.wait_for(buffer.wait(), poll_interval)
+                    except asyncio.TimeoutError:
+                        if await disconnected():
+                            break
+        finally:
+            buffer.subscribers -= 1
+            self._detached(buffer)
+    
+    def _detached(self, buffer: ReplayBuffer):
+        """Give a stream without clients the grace period to get one back."""
+        if buffer.subscribers or buffer.done or buffer.grace is not None:
+            return
+        buffer.grace = asyncio.get_running_loop().call_later(self.grace, self._abandon, buffer)
+    
+    def _abandon(self, buffer: ReplayBuffer):
+        """Stop generating a stream nobody came back for."""
+        buffer.grace = None
+        if buffer.subscribers or buffer.done:
+            return
+        self._stats["abandoned"] += 1
+        logger.info("No client came back for stream %s, cancelling it", buffer.stream_id)
+        self.cancel(buffer.stream_id)
+    
+    def _evict(self):
+        """Drop expired buffers, then the oldest finished ones while over the size cap."""
+        now = time.monotonic()
+        while self._finished:
+            stream_id, buffer = next(iter(self._finished.items()))
+            if now - buffer.finished_at <= self.ttl and self._bytes <= self.max_total_bytes:
+                break
+            del self._finished[stream_id]
+            del self._buffers[stream_id]
+            self._bytes -= buffer.size
+            self._stats["evicted"] += 1
+    
+    def get_bytes(self) -> int:
+        """Get the bytes buffered across all streams."""
+        return self._bytes
+    
+    async def aclose(self):
+        """Stop every stream still generating."""
+        tasks = [buffer.task for buffer in self._buffers.values() if not buffer.done]
+        for buffer in self._buffers.values():
+            if buffer.grace is not None:
+                buffer.grace.cancel()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def get_stats(self) -> dict:
+        """Get buffered streams and bytes and how streams ended up."""
+        return {
+            **self._stats,
+            "buffered": len(self._buffers),
+            "generating": sum(1 for buffer in self._buffers.values() if not buffer.done),
+            "detached": sum(1 for buffer in self._buffers.values() if buffer.grace is not None),
+            "bytes": self._bytes,
+        }
@@ -0,0 +1,142 @@
+"""Service for folding old conversation turns into a running summary."""
+
+import asyncio
+from typing import List, Set, Tuple
+from config import (
+    MEMORY_MODE,
+    SUMMARY_MODEL,
+    SUMMARY_TRIGGER_TURNS,
+    SUMMARY_KEEP_TURNS,
+    SUMMARY_PROMPT,
+)
+from services.memory_service import ConversationMemoryManager
+from services.model_service import ModelService
+from services.usage_service import UsageTracker, openai_usage, gemini_usage
+from logger import get_logger
+
+logger = get_logger("summary")
+
+
+class SummaryService:
+    """Compacts long sessions in the background using a cheap model."""
+    
+    def __init__(
+        self,
+        model_service: ModelService,
+        memory_manager: ConversationMemoryManager,
+        mode: str = MEMORY_MODE,
+        model_name: str = SUMMARY_MODEL,
+        trigger_turns: int = SUMMARY_TRIGGER_TURNS,
+        keep_turns: int = SUMMARY_KEEP_TURNS,
+        usage: UsageTracker | None = None
+    ):
+        """
+        Initialize the summary service.
+        
+        Args:
+            model_service: Service used to resolve the summary model
+            memory_manager: Memory holding the sessions to compact
+            mode: Memory mode, summarization only runs in "summarize"
+            model_name: Cheap model used to write summaries
+            trigger_turns: Sessions with more turns than this are compacted
+            keep_turns: Most recent turns that are always kept verbatim
+            usage: Tracker charged with the summary calls, per session
+        """
+        self.model_service = model_service
+        self.memory_manager = memory_manager
+        self.enabled = mode == "summarize"
+        self.model_name = model_name
+        self.trigger_turns = trigger_turns
+        self.keep_turns = keep_turns
+        self.usage = usage
+        self._pending: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+    
+    def maybe_schedule(self, session_id: str):
+        """
+        Start compacting a session in the background if it has grown too long.
+        
+        Args:
+            session_id: Session identifier
+        """
+        if not self.enabled or session_id in self._pending:
+            return
+        if self.memory_manager.get_turn_count(session_id) <= self.trigger_turns:
+            return
+        
+        self._pending.add(session_id)
+        task = asyncio.create_task(self._compact(session_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _compact(self, session_id: str):
+        """Summarize everything but the most recent turns of a session."""
+        try:
+            epoch, seq = self.memory_manager.get_version(session_id)
+            turns = self.memory_manager.get_turns(session_id)
+            count = len(turns) - self.keep_turns
+            if count <= 0:
+                return
+            
+            previous = self.memory_manager.get_summary(session_id)
+            summary = await self.summarize(previous, turns[:count], session_id)
+            if not summary:
+                return
+            
+            first_seq = seq - len(turns)
+            applied = self.memory_manager.apply_summary(
+                session_id, summary, epoch, first_seq + count
+            )
+            logger.info(
+                "Summarized %d turns of session %s (applied: %s)",
+                count, session_id, applied
+            )
+        except Exception as e:
+            logger.error("Summarization failed for session %s: %s", session_id, e)
+        finally:
+            self._pending.discard(session_id)
+    
+    async def summarize(
+        self,
+        previous: str | None,
+        turns: List[Tuple[str, str]],
+        session_id: str | None = None
+    ) -> str:
+        """
+        Write a summary of turns with the summary model.
+        
+        Args:
+            previous: Earlier summary to merge, if any
+            turns: (role, content) pairs to summarize
+            session_id: Session charged with the call's token usage
+            
+        Returns:
+            Summary text
+        """
+        lines = []
+        if previous:
+            lines.append(f"Previous summary: {previous}")
+        for role, content in turns:
+            lines.append(f"{'User' if role == 'user' else 'Assistant'}: {content}")
+        prompt = SUMMARY_PROMPT + "\n\n" + "\n".join(lines)
+        
+        model = self.model_service.resolve(self.model_name)
+        if model.provider == "google":
+            response = await model.client.generate_content_async(
+                prompt,
+                request_options=self.model_service.get_request_options(model.provider)
+            )
+            self._record_usage(session_id, model.name, gemini_usage(response.usage_metadata))
+            return response.text.strip()
+        
+        response = await model.client.chat.completions.create(
+            model=model.name,
+            messages=[{"role": "user", "content": prompt}],
+        )
+        self._record_usage(session_id, model.name, openai_usage(response.usage))
+        return (response.choices[0].message.content or "").strip()
+    
+    def _record_usage(self, session_id: str | None, model_name: str, counts):
+        """Charge a summary call to its session."""
+        if self.usage is not None and session_id is not None and counts is not None:
+            self.usage.record(session_id, model_name, counts)
@@ -0,0 +1,275 @@
+"""Token usage accounting and per-session budgets."""
+
+import asyncio
+import heapq
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from config import (
+    MODEL_PRICES,
+    USAGE_LOG,
+    USAGE_FLUSH_INTERVAL,
+    SESSION_TOKEN_BUDGET,
+    SESSION_COST_BUDGET,
+    BUDGET_DOWNGRADE_MODELS,
+    MEMORY_MAX_SESSIONS,
+)
+from logger import get_logger
+from metrics import TOKENS, COST
+
+logger = get_logger("usage")
+
+# (input tokens, output tokens, cached input tokens)
+TokenCounts = Tuple[int, int, int]
+
+
+def openai_usage(usage) -> Optional[TokenCounts]:
+    """Read the token counts of an OpenAI `usage` object."""
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = getattr(details, "cached_tokens", 0) or 0
+    return usage.prompt_tokens or 0, usage.completion_tokens or 0, cached
+
+
+def gemini_usage(metadata) -> Optional[TokenCounts]:
+    """Read the token counts of Gemini `usage_metadata`."""
+    if metadata is None or not getattr(metadata, "prompt_token_count", 0):
+        return None
+    return (
+        metadata.prompt_token_count,
+        getattr(metadata, "candidates_token_count", 0) or 0,
+        getattr(metadata, "cached_content_token_count", 0) or 0,
+    )
+
+
+class Usage:
+    """Token and cost totals."""
+    
+    __slots__ = ("requests", "input_tokens", "output_tokens", "cached_tokens", "cost", "estimated")
+    
+    def __init__(self):
+        self.requests = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cached_tokens = 0
+        self.cost = 0.0
+        self.estimated = 0  # Requests whose counts were estimated from text length
+    
+    def add(self, counts: TokenCounts, cost: float, estimated: bool):
+        """Add one request."""
+        self.requests += 1
+        self.input_tokens += counts[0]
+        self.output_tokens += counts[1]
+        self.cached_tokens += counts[2]
+        self.cost += cost
+        self.estimated += estimated
+    
+    @property
+    def tokens(self) -> int:
+        """Input and output tokens together."""
+        return self.input_tokens + self.output_tokens
+    
+    def to_dict(self) -> dict:
+        """Get the totals as a dict."""
+        return {
+            "requests": self.requests,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cached_tokens": self.cached_tokens,
+            "cost_usd": round(self.cost, 6),
+            "estimated_requests": self.estimated,
+        }
+
+
+class UsageTracker:
+    """
+    Aggregates provider token usage per session and per model.
+    
+    Totals live in memory (sessions in an LRU bounded like the memory
+    manager); the usage added since the last flush is appended to a JSONL
+    file periodically, one line per session and model, for capacity
+    planning. Sessions over their token or cost budget are downgraded to
+    a cheaper model of the same provider.
+    """
+    
+    def __init__(
+        self,
+        log_path: str = USAGE_LOG,
+        flush_interval: float = USAGE_FLUSH_INTERVAL,
+        token_budget: int = SESSION_TOKEN_BUDGET,
+        cost_budget: float = SESSION_COST_BUDGET,
+        max_sessions: int = MEMORY_MAX_SESSIONS
+    ):
+        """
+        Initialize the tracker.
+        
+        Args:
+            log_path: JSONL file receiving usage deltas, empty disables flushing
+            flush_interval: Seconds between flushes
+            token_budget: Tokens a session may use before it is downgraded, 0 disables
+            cost_budget: USD a session may spend before it is downgraded, 0 disables
+            max_sessions: Sessions whose totals are kept
+        """
+        self.log_path = log_path
+        self.flush_interval = flush_interval
+        self.token_budget = token_budget
+        self.cost_budget = cost_budget
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Usage]" = OrderedDict()
+        self._models: Dict[str, Usage] = {}
+        self._total = Usage()
+        self._pending: Dict[Tuple[str, str], Usage] = {}
+        self._downgrades = 0
+        self._flusher: Optional[asyncio.Task] = None
+    
+    @staticmethod
+    def cost_of(model_name: str, counts: TokenCounts) -> float:
+        """Get the USD cost of a request."""
+        price = MODEL_PRICES.get(model_name)
+        if price is None:
+            return 0.0
+        input_price, output_price, cached_price = price
+        uncached = counts[0] - counts[2]
+        return (uncached * input_price + counts[2] * cached_price + counts[1] * output_price) / 1_000_000
+    
+    def record(self, session_id: str, model_name: str, counts: TokenCounts, estimated: bool = False):
+        """
+        Record the token usage of one provider call.
+        
+        Args:
+            session_id: Session the call was made for
+            model_name: Model that served the call
+            counts: (input, output, cached input) tokens
+            estimated: Whether the counts were estimated rather than reported
+        """
+        cost = self.cost_of(model_name, counts)
+        
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = Usage()
+            if len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        model = self._models.get(model_name)
+        if model is None:
+            model = self._models[model_name] = Usage()
+        totals = [session, model, self._total]
+        # Deltas only wait for a flush when there is a log to flush them to
+        if self.log_path:
+            pending = self._pending.get((session_id, model_name))
+            if pending is None:
+                pending = self._pending[(session_id, model_name)] = Usage()
+            totals.append(pending)
+        
+        for usage in totals:
+            usage.add(counts, cost, estimated)
+        TOKENS.labels(model_name, "input").inc(counts[0])
+        TOKENS.labels(model_name, "output").inc(counts[1])
+        TOKENS.labels(model_name, "cached").inc(counts[2])
+        COST.labels(model_name).inc(cost)
+    
+    def over_budget(self, session_id: str) -> bool:
+        """Whether a session has used up its token or cost budget."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return False
+        return (
+            (self.token_budget > 0 and session.tokens >= self.token_budget)
+            or (self.cost_budget > 0 and session.cost >= self.cost_budget)
+        )
+    
+    def budget_model(self, session_id: str, model_name: str, provider: str) -> str:
+        """
+        Get the model a session's budget allows, without counting a downgrade.
+        
+        Args:
+            session_id: Session identifier
+            model_name: Requested model
+            provider: Provider of the requested model
+            
+        Returns:
+            The requested model, or the provider's cheap model
+        """
+        cheaper = BUDGET_DOWNGRADE_MODELS.get(provider)
+        if cheaper is None or cheaper == model_name or not self.over_budget(session_id):
+            return model_name
+        return cheaper
+    
+    def apply_budget(self, session_id: str, model_name: str, provider: str) -> str:
+        """
+        Get the model to use for a session, downgrading it when over budget.
+        
+        Args:
+            session_id: Session identifier
+            model_name: Requested model
+            provider: Provider of the requested model
+            
+        Returns:
+            The requested model, or the provider's cheap model
+        """
+        cheaper = self.budget_model(session_id, model_name, provider)
+        if cheaper == model_name:
+            return model_name
+        self._downgrades += 1
+        logger.info("Session %s is over its budget, using %s instead of %s", session_id, cheaper, model_name)
+        return cheaper
+    
+    def start(self):
+        """Start flushing usage periodically."""
+        if self.log_path and self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush_periodically())
+    
+    async def _flush_periodically(self):
+        """Flush usage every interval until cancelled."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+    
+    async def flush(self):
+        """Append the usage recorded since the last flush to the log file."""
+        if not self._pending or not self.log_path:
+            return
+        pending, self._pending = self._pending, {}
+        now = time.time()
+        lines = "".join(
+            json.dumps({"time": now, "session_id": session_id, "model": model_name, **usage.to_dict()}) + "\n"
+            for (session_id, model_name), usage in pending.items()
+        )
+        try:
+            await asyncio.to_thread(self._append, lines)
+        except OSError as e:
+            logger.error("Failed to write usage log: %s", e)
+    
+    def _append(self, lines: str):
+        """Write lines to the log file."""
+        with open(self.log_path, "a", encoding="utf-8") as log:
+            log.write(lines)
+    
+    async def aclose(self):
+        """Stop the periodic flush and write what is left."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+    
+    def get_session_usage(self, session_id: str) -> Optional[dict]:
+        """Get a session's totals and budget state, or None if it has no usage."""
+        session = self._sessions.get(session_id)
+        if session is None:
+            return None
+        return {**session.to_dict(), "over_budget": self.over_budget(session_id)}
+    
+    def get_stats(self, top: int = 20) -> dict:
+        """Get overall and per-model totals and the sessions with the highest cost."""
+        heaviest = heapq.nlargest(top, self._sessions.items(), key=lambda item: item[1].cost)
+        return {
+            "total": self._total.to_dict(),
+            "models": {name: usage.to_dict() for name, usage in self._models.items()},
+            "top_sessions": {session_id: usage.to_dict() for session_id, usage in heaviest},
+            "sessions": len(self._sessions),
+            "downgrades": self._downgrades,
+            "budgets": {"tokens": self.token_budget, "cost_usd": self.cost_budget},
+        }
@@ -3,11 +3,23 @@
 from services.model_service import ModelService
 from services.chat_service import ChatService
 from services.memory_service import ConversationMemoryManager
+from services.session_store import create_session_store
+from services.admission import AdmissionController
+from services.batch_service import BatchService
+from metrics import ACTIVE_STREAMS, SESSIONS, ADMISSION_QUEUE, REPLAY_BYTES
 
 # Initialize services globally
 model_service = ModelService()
-memory_manager = ConversationMemoryManager()
+memory_manager = ConversationMemoryManager(store=create_session_store())
 chat_service = ChatService(model_service, memory_manager)
+admission = AdmissionController()
+batch_service = BatchService(model_service, chat_service.usage)
 
-# Initialize default model
-model_service.initialize_model()
+# Gauges read at collection time
+ACTIVE_STREAMS.callback = chat_service.stream_registry.get_active_count
+REPLAY_BYTES.callback = chat_service.stream_replay.get_bytes
+SESSIONS.callback = memory_manager.get_session_count
+ADMISSION_QUEUE.callback = admission.get_queue_length
+
+# The default model is built by the warm-up at startup (or by the first request
+# that uses it), so importing this module does not load any provider SDK
@@ -0,0 +1 @@
+"""Tests for Nova AI backend."""
@@ -0,0 +1,63 @@
+"""Shared fixtures: fake provider SDKs and services wired to them."""
+
+import os
+import sys
+
+# Configuration is read at import time: keep the tests off the network and
+# out of the working directory before any backend module is imported
+os.environ.setdefault("GOOGLE_API_KEY", "test-key")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("USAGE_LOG", "")
+os.environ.setdefault("TRACING_EXPORT", "")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from services.model_service import ModelService
+from services.memory_service import ConversationMemoryManager
+from services.chat_service import ChatService
+from tests.fakes import FakeGenai, FakeOpenAI, FakeProvider, install
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def gemini() -> FakeProvider:
+    """Behaviour of the fake Gemini models."""
+    return FakeProvider(prefix="t")
+
+
+@pytest.fixture
+def openai() -> FakeProvider:
+    """Behaviour of the fake OpenAI client."""
+    return FakeProvider(prefix="o")
+
+
+@pytest.fixture
+def model_service(gemini, openai) -> ModelService:
+    service = ModelService()
+    install(service, FakeGenai(gemini), FakeOpenAI(openai))
+    return service
+
+
+@pytest.fixture
+def memory_manager() -> ConversationMemoryManager:
+    return ConversationMemoryManager()
+
+
+@pytest.fixture
+def chat_service(model_service, memory_manager) -> ChatService:
+    return ChatService(model_service, memory_manager)
+
+
+async def collect(events) -> list:
+    """Read a whole event stream."""
+    return [event async for event in events]
+
+
+def answer_text(events) -> str:
+    """Join the text chunks of an event stream."""
+    return "".join(event.get("text", "") for event in events)
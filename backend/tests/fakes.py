@@ -0,0 +1,269 @@
+"""Fake provider SDKs for tests and benchmarks: no network, configurable latency."""
+
+import asyncio
+import json
+from types import SimpleNamespace
+from typing import Callable, List, Optional
+
+
+class ProviderError(Exception):
+    """Provider error with an HTTP status, like the SDKs raise."""
+
+    def __init__(self, message: str, code: int):
+        super().__init__(message)
+        self.code = code
+        self.status_code = code
+
+
+class FakeStream:
+    """A streamed answer: waits `ttft` before the first part and `delay` between parts."""
+
+    def __init__(self, parts: List[str], ttft: float, delay: float, make_chunk: Callable, last_chunk=None):
+        self.parts = parts
+        self.ttft = ttft
+        self.delay = delay
+        self.make_chunk = make_chunk
+        self.last_chunk = last_chunk
+        self.closed = False
+        self.sent = 0
+
+    async def __aiter__(self):
+        await asyncio.sleep(self.ttft)
+        for index, text in enumerate(self.parts):
+            if index:
+                await asyncio.sleep(self.delay)
+            self.sent += 1
+            yield self.make_chunk(text, index == len(self.parts) - 1)
+        if self.last_chunk is not None:
+            yield self.last_chunk
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeProvider:
+    """
+    Behaviour shared by the fake clients of one provider.
+
+    Args:
+        parts: Number of chunks per streamed answer
+        ttft: Seconds before the first chunk
+        delay: Seconds between chunks
+        prefix: Text of chunk i is f"{prefix}{i} "
+        fail: Error raised when a request starts, if any
+    """
+
+    def __init__(self, parts: int = 20, ttft: float = 0.01, delay: float = 0.0, prefix: str = "t", fail=None):
+        self.parts = parts
+        self.ttft = ttft
+        self.delay = delay
+        self.prefix = prefix
+        self.fail = fail
+        self.calls: list = []
+        self.streams: List[FakeStream] = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    def answer(self) -> List[str]:
+        """Get the chunks of one answer."""
+        return [f"{self.prefix}{index} " for index in range(self.parts)]
+
+    async def _start(self, call):
+        """Record a request and fail it if configured to."""
+        self.calls.append(call)
+        if self.fail is not None:
+            await asyncio.sleep(self.ttft)
+            raise self.fail
+
+    async def _complete(self, prompt: str) -> str:
+        """Answer a non-streamed request after the full generation time."""
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.ttft + self.delay * max(self.parts - 1, 0))
+        finally:
+            self.in_flight -= 1
+        return f"answer: {prompt[-40:]}"
+
+
+class FakeGeminiModel:
+    """Stands in for `genai.GenerativeModel`."""
+
+    def __init__(self, provider: FakeProvider, name: str, cache=None):
+        self.provider = provider
+        self.name = name
+        self.cache = cache
+
+    async def generate_content_async(self, prompt, stream: bool = False, request_options=None):
+        await self.provider._start({"model": self.name, "prompt": prompt, "cache": self.cache, "options": request_options})
+        usage = SimpleNamespace(
+            prompt_token_count=max(len(prompt) // 4, 1),
+            candidates_token_count=self.provider.parts,
+            cached_content_token_count=self.cache.tokens if self.cache else 0,
+        )
+        if not stream:
+            text = await self.provider._complete(prompt)
+            return SimpleNamespace(text=text, usage_metadata=usage)
+
+        def chunk(text, last):
+            return SimpleNamespace(text=text, usage_metadata=usage if last else None)
+
+        response = FakeStream(self.provider.answer(), self.provider.ttft, self.provider.delay, chunk)
+        self.provider.streams.append(response)
+        return response
+
+
+class FakeCachedContent:
+    """Stands in for `genai.caching.CachedContent`."""
+
+    def __init__(self, registry: list, model: str, text: str, ttl):
+        self.registry = registry
+        self.name = f"cachedContents/{len(registry)}"
+        self.model = model
+        self.text = text
+        self.tokens = max(len(text) // 4, 1)
+        self.ttl = ttl
+        self.deleted = False
+
+    def update(self, ttl):
+        self.ttl = ttl
+
+    def delete(self):
+        self.deleted = True
+
+
+class FakeGenai:
+    """Stands in for the `google.generativeai` module."""
+
+    def __init__(self, provider: Optional[FakeProvider] = None):
+        self.provider = provider or FakeProvider(prefix="t")
+        self.models_built: List[str] = []
+        self.caches: List[FakeCachedContent] = []
+        fake = self
+
+        class GenerativeModel(FakeGeminiModel):
+            def __init__(self, model_name, system_instruction=None, generation_config=None):
+                fake.models_built.append(model_name)
+                super().__init__(fake.provider, model_name)
+
+            @classmethod
+            def from_cached_content(cls, cache, generation_config=None):
+                return FakeGeminiModel(fake.provider, cache.model, cache)
+
+        def create(model, system_instruction=None, contents=(), ttl=None):
+            cache = FakeCachedContent(fake.caches, model.split("/")[-1], "".join(contents), ttl)
+            fake.caches.append(cache)
+            return cache
+
+        self.GenerativeModel = GenerativeModel
+        self.caching = SimpleNamespace(CachedContent=SimpleNamespace(create=create))
+
+
+class FakeOpenAI:
+    """Stands in for `AsyncOpenAI`: chat completions plus the files and batches APIs."""
+
+    def __init__(self, provider: Optional[FakeProvider] = None, batch_polls: int = 2):
+        self.provider = provider or FakeProvider(prefix="o")
+        self.base_url = "https://api.openai.test/v1/"
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+        self.files = SimpleNamespace(create=self._file_create, content=self._file_content)
+        self.batches = SimpleNamespace(
+            create=self._batch_create, retrieve=self._batch_retrieve, cancel=self._batch_cancel
+        )
+        self.batch_polls = batch_polls  # Polls before a provider batch completes
+        self._files: dict = {}
+        self._batches: dict = {}
+
+    async def _create(self, **kwargs):
+        await self.provider._start(kwargs)
+        prompt_tokens = sum(len(message["content"]) for message in kwargs["messages"]) // 4
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=self.provider.parts,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=0),
+        )
+        if not kwargs.get("stream"):
+            text = await self.provider._complete(kwargs["messages"][-1]["content"])
+            message = SimpleNamespace(content=text)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+        def chunk(text, last):
+            delta = SimpleNamespace(content=text)
+            return SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+
+        include_usage = kwargs.get("stream_options", {}).get("include_usage")
+        last = SimpleNamespace(choices=[], usage=usage) if include_usage else None
+        response = FakeStream(self.provider.answer(), self.provider.ttft, self.provider.delay, chunk, last)
+        self.provider.streams.append(response)
+        return response
+
+    async def _file_create(self, file, purpose):
+        file_id = f"file-{len(self._files)}"
+        self._files[file_id] = file[1].decode("utf-8")
+        return SimpleNamespace(id=file_id)
+
+    async def _file_content(self, file_id):
+        return SimpleNamespace(text=self._files[file_id])
+
+    async def _batch_create(self, input_file_id, **kwargs):
+        batch_id = f"batch-{len(self._batches)}"
+        self._batches[batch_id] = {"input": input_file_id, "status": "in_progress", "polls": 0}
+        return SimpleNamespace(id=batch_id, status="in_progress")
+
+    async def _batch_retrieve(self, batch_id):
+        batch = self._batches[batch_id]
+        batch["polls"] += 1
+        if batch["status"] == "in_progress" and batch["polls"] >= self.batch_polls:
+            lines = []
+            for line in self._files[batch["input"]].splitlines():
+                request = json.loads(line)
+                content = "batched: " + request["body"]["messages"][-1]["content"]
+                body = {
+                    "choices": [{"message": {"content": content}}],
+                    "usage": {"prompt_tokens": 7, "completion_tokens": 3},
+                }
+                lines.append(json.dumps({
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "body": body},
+                }))
+            self._files[f"out-{batch_id}"] = "\n".join(lines)
+            batch["status"] = "completed"
+        output = f"out-{batch_id}" if batch["status"] == "completed" else None
+        return SimpleNamespace(id=batch_id, status=batch["status"], output_file_id=output, error_file_id=None)
+
+    async def _batch_cancel(self, batch_id):
+        self._batches[batch_id]["status"] = "cancelled"
+
+
+def install(model_service, genai: Optional[FakeGenai] = None, openai: Optional[FakeOpenAI] = None):
+    """
+    Point a ModelService at fake SDKs; everything above the SDKs runs unchanged.
+
+    Returns:
+        Tuple of (fake genai module, fake OpenAI client)
+    """
+    genai = genai or FakeGenai()
+    openai = openai or FakeOpenAI()
+    model_service._genai = genai
+    model_service._openai_client = openai
+    model_service._handles.clear()
+    return genai, openai
+
+
+class StubSummarizer:
+    """Summarizer that answers instantly with a fixed-size summary and counts its calls."""
+
+    def __init__(self, summary_chars: int = 400, delay: float = 0.0):
+        self.summary_chars = summary_chars
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, previous, turns, session_id=None) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return ("summary " * self.summary_chars)[:self.summary_chars]
+
+
+def sse_events(lines) -> List[dict]:
+    """Decode the `data:` lines of an SSE body."""
+    return [json.loads(line[6:]) for line in lines if line.startswith("data: ")]
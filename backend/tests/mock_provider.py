@@ -0,0 +1,84 @@
+"""A local OpenAI-compatible HTTP server for transport tests and benchmarks."""
+
+import asyncio
+import json
+from typing import Optional
+
+
+class MockProvider:
+    """
+    Streams chat completions over HTTP/1.1 keep-alive connections on localhost.
+
+    Args:
+        chunks: Number of content chunks per answer
+        delay: Seconds between chunks
+        connect_delay: Seconds a new connection waits before its first request
+            is read, standing in for the TCP and TLS handshake of a remote host
+    """
+
+    def __init__(self, chunks: int = 5, delay: float = 0.0, connect_delay: float = 0.0):
+        self.chunks = chunks
+        self.delay = delay
+        self.connect_delay = connect_delay
+        self.connections = 0
+        self.requests = 0
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    async def start(self) -> str:
+        """Start listening; returns the base URL to give the SDK."""
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/v1/"
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        await asyncio.sleep(self.connect_delay)
+        try:
+            while request_line := await reader.readline():
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                self.requests += 1
+                if method == "POST" and path.endswith("/chat/completions"):
+                    await self._stream_completion(writer, json.loads(body))
+                else:
+                    writer.write(b"HTTP/1.1 200 OK\r\ncontent-length: 0\r\n\r\n")
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _stream_completion(self, writer: asyncio.StreamWriter, request: dict):
+        """Answer in SSE events, one HTTP chunk each."""
+        writer.write(
+            b"HTTP/1.1 200 OK\r\ncontent-type: text/event-stream\r\n"
+            b"transfer-encoding: chunked\r\n\r\n"
+        )
+        for index in range(self.chunks):
+            if index:
+                await asyncio.sleep(self.delay)
+            chunk = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": request["model"],
+                "choices": [{"index": 0, "delta": {"content": f"w{index} "}, "finish_reason": None}],
+            }
+            self._write_chunk(writer, f"data: {json.dumps(chunk)}\n\n")
+            await writer.drain()
+        self._write_chunk(writer, "data: [DONE]\n\n")
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, text: str):
+        data = text.encode("utf-8")
+        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
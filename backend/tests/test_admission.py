@@ -0,0 +1,114 @@
+"""Admission control: slots, the bounded queue and rate limits."""
+
+import asyncio
+import pytest
+from services.admission import AdmissionController, AdmissionRejected, _RateLimiter
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def controller():
+    controller = AdmissionController(
+        enabled=True, max_streams=4, model_max_streams=2, model_limits={"gemini-2.5-pro": 1},
+        queue_size=2, queue_timeout=0.1
+    )
+    controller.session_limiter = _RateLimiter(0, 0)
+    controller.client_limiter = _RateLimiter(0, 0)
+    return controller
+
+
+async def admit(controller, model_name="gemini-2.5-flash", session_id="s"):
+    return await controller.admit(session_id, "127.0.0.1", model_name)
+
+
+async def test_streams_get_slots_up_to_the_model_limit(controller):
+    tickets = [await admit(controller) for _ in range(2)]
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admit(controller)
+
+    assert rejected.value.status_code == 503
+    assert rejected.value.reason == "queue_timeout"
+    assert rejected.value.retry_after >= 1
+    # Other models still have slots
+    assert await admit(controller, "gpt-4o-mini") is not None
+    assert controller.get_stats()["active_per_model"] == {"gemini-2.5-flash": 2, "gpt-4o-mini": 1}
+    for ticket in tickets:
+        ticket.release()
+
+
+async def test_released_slot_goes_to_the_queued_request(controller):
+    first = await admit(controller, "gemini-2.5-pro")
+    waiting = asyncio.create_task(admit(controller, "gemini-2.5-pro"))
+    await asyncio.sleep(0.01)
+    assert controller.get_queue_length() == 1
+
+    first.release()
+    second = await waiting
+
+    assert second.model_name == "gemini-2.5-pro"
+    assert controller.get_stats()["queued"] == 1
+
+
+async def test_full_queue_is_refused_at_once(controller):
+    await admit(controller, "gemini-2.5-pro")
+    queued = [asyncio.create_task(admit(controller, "gemini-2.5-pro")) for _ in range(2)]
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admit(controller, "gemini-2.5-pro")
+
+    assert rejected.value.reason == "queue_full"
+    await asyncio.gather(*queued, return_exceptions=True)
+
+
+async def test_queued_waiter_does_not_block_other_models(controller):
+    await admit(controller, "gemini-2.5-pro")
+    blocked = asyncio.create_task(admit(controller, "gemini-2.5-pro"))
+    await asyncio.sleep(0.01)
+
+    assert await admit(controller, "gpt-4o-mini") is not None
+    blocked.cancel()
+    await asyncio.gather(blocked, return_exceptions=True)
+    assert controller.get_queue_length() == 0
+
+
+async def test_released_models_leave_no_keys_behind(controller):
+    for index in range(50):
+        ticket = await admit(controller, f"model-{index}")
+        ticket.release()
+        ticket.release()  # A second release is ignored
+
+    assert controller._active_per_model == {}
+    assert controller.get_stats()["active"] == 0
+
+
+async def test_session_flood_gets_429(controller):
+    controller.session_limiter = _RateLimiter(60, 2)
+
+    for _ in range(2):
+        (await admit(controller)).release()
+    with pytest.raises(AdmissionRejected) as rejected:
+        await admit(controller)
+
+    assert rejected.value.status_code == 429
+    assert rejected.value.reason == "session_rate"
+    # Another session is not affected
+    assert await admit(controller, session_id="other") is not None
+
+
+async def test_disabled_admits_everything():
+    controller = AdmissionController(enabled=False, max_streams=0)
+
+    assert await controller.admit("s", "127.0.0.1", "gemini-2.5-flash") is None
+
+
+def test_unknown_and_auto_models_use_the_default_slots():
+    from routes.chat import _admission_model
+    from services_instance import model_service
+
+    default = model_service.get_current_model_name()
+    assert _admission_model("gpt-4o-mini") == "gpt-4o-mini"
+    assert _admission_model("auto") == default
+    assert _admission_model("no-such-model-" + "x" * 100) == default
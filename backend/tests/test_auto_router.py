@@ -0,0 +1,93 @@
+"""Choosing a model for the "auto" model."""
+
+import json
+import pytest
+from services.auto_router import AutoRouter, complexity_tier, extract_features
+from services.routing_policy import RoutingPolicy
+from tests.conftest import collect, answer_text
+
+pytestmark = pytest.mark.anyio
+
+LITE = ["gemini-2.5-flash-lite", "gpt-4o-mini"]
+
+
+@pytest.fixture
+def policy(model_service):
+    return RoutingPolicy(model_service, failover=False, hedge=False)
+
+
+@pytest.fixture
+def router(model_service, policy):
+    return AutoRouter(model_service, policy, explore_rate=0.0, log_path="")
+
+
+def measure(policy, model_name, ttft, calls=10):
+    for _ in range(calls):
+        policy.record(model_name, True, ttft)
+        policy.record_throughput(model_name, 1000, 1.0)
+
+
+@pytest.mark.parametrize("message, tier", [
+    ("Здравей!", "lite"),
+    ("thanks, that helps", "lite"),
+    ("Напиши кратко описание на продукта за онлайн магазин.", "lite"),
+    ("Обясни какво е REST API.", "standard"),
+    ("Обясни стъпка по стъпка защо алгоритъмът на Дейкстра не работи с отрицателни тегла.", "pro"),
+    ("Debug this:\n```python\ndef mean(xs):\n    return sum(xs) / len(xs)\n```\nWhy is it wrong?", "pro"),
+])
+def test_prompt_decides_the_tier(message, tier):
+    assert complexity_tier(extract_features(message, 0)) == tier
+
+
+def test_features_hold_no_message_text():
+    features = extract_features("Обясни защо небето е синьо?", 3)
+
+    assert features == {
+        "words": 5, "small_talk": False, "reasoning": 2, "code": False, "questions": 1, "history_turns": 3,
+    }
+
+
+def test_fastest_measured_model_of_the_tier_wins(router, policy):
+    measure(policy, LITE[0], 2.0)
+    measure(policy, LITE[1], 0.2)
+
+    assert router.choose("Здравей") == LITE[1]
+
+    measure(policy, LITE[0], 0.1, calls=30)
+    assert router.choose("Здравей") == LITE[0]
+
+
+def test_models_with_an_open_circuit_are_routed_around(router, policy):
+    measure(policy, LITE[1], 2.0)
+    for _ in range(10):
+        policy.record(LITE[0], False)
+
+    assert policy.health(LITE[0]).state == "open"
+    assert router.choose("Здравей") == LITE[1]
+
+
+def test_decisions_are_logged_and_replayed(model_service, policy, tmp_path):
+    log = tmp_path / "decisions.jsonl"
+    router = AutoRouter(model_service, policy, explore_rate=0.0, log_path=str(log))
+    messages = ["Здравей", "Обясни стъпка по стъпка защо небето е синьо", "hi"]
+    chosen = [router.choose(message) for message in messages]
+    router.close()
+
+    decisions = [json.loads(line) for line in log.read_text(encoding="utf-8").splitlines()]
+    assert [decision["model"] for decision in decisions] == chosen
+    assert all("Здравей" not in json.dumps(decision, ensure_ascii=False) for decision in decisions)
+
+    summary = router.replay(str(log))
+    assert summary["decisions"] == 3
+    assert summary["changed"] == 0
+    assert summary["tiers_before"] == summary["tiers_after"]
+    assert router.get_stats()["decisions"] == 3
+
+
+async def test_auto_chat_reports_the_model_that_answered(chat_service):
+    events = await collect(chat_service.stream_events("Здравей", "auto", "s1"))
+
+    done = events[-1]
+    assert done["done"] is True
+    assert done["model"] in LITE
+    assert answer_text(events)
@@ -0,0 +1,180 @@
+"""Batch jobs against fake providers: worker pools, retries, resume and the OpenAI Batch API."""
+
+import asyncio
+import json
+import os
+import httpx
+import pytest
+from services import batch_service as batch_module
+from services.batch_service import BatchService, _is_transient
+from tests.fakes import FakeProvider, ProviderError
+
+pytestmark = pytest.mark.anyio
+
+
+class FlakyProvider(FakeProvider):
+    """Fails the first `failures` requests with `error`."""
+
+    def __init__(self, failures: int, error: Exception, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = failures
+        self.error = error
+
+    async def _start(self, call):
+        self.calls.append(call)
+        if len(self.calls) <= self.failures:
+            raise self.error
+
+
+@pytest.fixture
+def service(model_service, tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_module, "_backoff", lambda error, attempt: 0)
+    return BatchService(
+        model_service,
+        directory=str(tmp_path / "jobs"),
+        concurrency={"google": 4, "openai": 8},
+        rate_per_minute={},
+        max_attempts=3,
+        max_input_bytes=64 * 1024,
+        checkpoint_interval=0.01,
+        poll_interval=0
+    )
+
+
+async def upload(lines, chunk_size: int = 100):
+    """Request body chunks of a JSONL input."""
+    data = "".join(lines).encode("utf-8")
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+def prompts(count: int, model: str = "gemini-2.5-flash", prefix: str = "p") -> list:
+    """JSONL input lines with ids prefix0, prefix1, ..."""
+    return [
+        json.dumps({"id": f"{prefix}{index}", "message": f"въпрос {index}", "model": model}) + "\n"
+        for index in range(count)
+    ]
+
+
+async def run(service, lines, **options):
+    job = await service.create_job(upload(lines), **options)
+    await service._tasks[job.id]
+    return job
+
+
+def results(job) -> dict:
+    with open(job.output_path, encoding="utf-8") as output:
+        return {result["id"]: result for result in map(json.loads, output)}
+
+
+async def test_job_answers_every_prompt_within_the_provider_limit(service, gemini, openai):
+    gemini.ttft = openai.ttft = 0.01
+    lines = prompts(30) + prompts(10, "gpt-4o-mini", "o") + ['{"id": "bad", "model": "gpt-4o-mini"}\n', "not json\n"]
+
+    job = await run(service, lines)
+
+    assert job.state == "completed"
+    assert (job.total, job.processed, job.failed) == (42, 42, 2)
+    output = results(job)
+    assert output["p7"]["text"] == "answer: въпрос 7"
+    assert output["p7"]["usage"]["output_tokens"] == gemini.parts
+    assert "message" in output["line-41"]["error"]
+    assert "Invalid JSON" in output["line-42"]["error"]
+    assert gemini.peak_in_flight == 4
+    assert len(gemini.calls) == 30 and len(openai.calls) == 10
+    with open(os.path.join(job.directory, "job.json"), encoding="utf-8") as manifest:
+        assert json.load(manifest)["state"] == "completed"
+
+
+@pytest.mark.parametrize("error, transient", [
+    (ProviderError("rate limited", 429), True),
+    (ProviderError("unavailable", 503), True),
+    (ProviderError("bad request", 400), False),
+    (httpx.ConnectError("refused"), True),
+    (httpx.ReadTimeout("slow"), True),
+    (asyncio.TimeoutError(), True),
+    (ConnectionResetError(), True),
+    (ValueError("no text in the response"), False),
+    (KeyError("choices"), False),
+])
+def test_only_network_errors_rate_limits_and_server_errors_are_transient(error, transient):
+    assert _is_transient(error) is transient
+
+
+async def test_transient_errors_are_retried(service, model_service):
+    flaky = FlakyProvider(2, ProviderError("unavailable", 503), prefix="t")
+    model_service._genai.provider = flaky
+
+    job = await run(service, prompts(1))
+
+    assert results(job)["p0"]["attempts"] == 3
+    assert job.failed == 0
+
+
+async def test_other_errors_fail_the_prompt_at_once(service, model_service):
+    flaky = FlakyProvider(1, ValueError("response has no text"), prefix="t")
+    model_service._genai.provider = flaky
+
+    job = await run(service, prompts(2))
+
+    output = results(job)
+    assert [output[key].get("attempts") for key in ("p0", "p1")] == [1, 1]
+    assert job.failed == 1
+
+
+async def test_resumed_job_skips_answered_prompts(service, model_service, gemini):
+    job = await service.create_job(upload(prompts(10)))
+    await asyncio.sleep(0)
+    await service.aclose()
+    # Output of a crashed run: three results and a torn fourth line
+    with open(job.output_path, "w", encoding="utf-8") as output:
+        for index in range(3):
+            output.write(json.dumps({"id": f"p{index}", "text": "earlier"}) + "\n")
+        output.write('{"id": "p3", "te')
+    gemini.calls.clear()
+
+    restarted = BatchService(
+        model_service, directory=service.directory, concurrency=service.concurrency, rate_per_minute={},
+        checkpoint_interval=0.01
+    )
+    restarted.resume()
+    await restarted._tasks[job.id]
+
+    output = results(restarted.get_job(job.id))
+    assert sorted(output) == sorted(f"p{index}" for index in range(10))
+    assert output["p0"]["text"] == "earlier"
+    assert len(gemini.calls) == 7
+    assert restarted.get_job(job.id).state == "completed"
+
+
+async def test_openai_prompts_can_use_the_batch_api(service, openai):
+    lines = prompts(5, "gpt-4o-mini", "o") + prompts(3)
+
+    job = await run(service, lines, provider_batch=True)
+
+    output = results(job)
+    assert output["o2"]["text"] == "batched: въпрос 2"
+    assert output["o2"]["provider_batch"] is True
+    assert "provider_batch" not in output["p1"]
+    assert openai.calls == []
+    assert job.provider_batch_id == "batch-0"
+
+
+async def test_oversized_input_is_refused_and_removed(service):
+    with pytest.raises(ValueError, match="larger than"):
+        await service.create_job(upload(prompts(2000)))
+
+    assert os.listdir(service.directory) == []
+
+
+async def test_cancel_keeps_the_results_so_far(service, gemini):
+    gemini.ttft = 0.05
+    job = await service.create_job(upload(prompts(40)))
+    await asyncio.sleep(0.12)
+
+    task = service._tasks[job.id]
+    service.cancel(job.id)
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert job.state == "cancelled"
+    assert 0 < len(results(job)) < 40
@@ -0,0 +1,91 @@
+"""Streaming through the async provider clients."""
+
+import asyncio
+import time
+import pytest
+from config import GOOGLE_REQUEST_DEADLINE
+from services import http_transport
+from tests.conftest import collect, answer_text
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("model_name, prefix", [("gemini-2.5-flash", "t"), ("gpt-4o-mini", "o")])
+async def test_stream_answers_and_records_history(chat_service, memory_manager, model_name, prefix):
+    events = await collect(chat_service.stream_events("Здравей", model_name, "s1"))
+
+    assert events[-1] == {"done": True}
+    assert answer_text(events) == "".join(f"{prefix}{index} " for index in range(20))
+    assert memory_manager.get_turns("s1") == [("user", "Здравей"), ("assistant", answer_text(events))]
+
+
+async def test_concurrent_streams_do_not_queue_behind_each_other(chat_service, gemini):
+    gemini.ttft, gemini.delay = 0.05, 0.005
+
+    async def one(index):
+        started = time.perf_counter()
+        first = None
+        async for event in chat_service.stream_events(f"m{index}", "gemini-2.5-flash", f"s{index}"):
+            if first is None:
+                first = time.perf_counter() - started
+        return first, time.perf_counter() - started
+
+    single_ttft, single = await one(-1)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(index) for index in range(200)))
+    wall = time.perf_counter() - started
+
+    # 200 streams overlap instead of running one after another
+    assert wall < single * 5
+    assert max(ttft for ttft, _ in results) < single_ttft + 0.5
+
+
+async def test_event_loop_keeps_running_during_streams(chat_service, gemini, openai):
+    gemini.ttft = openai.ttft = 0.02
+    gemini.delay = openai.delay = 0.005
+    gaps = []
+
+    async def heartbeat(stop):
+        last = time.perf_counter()
+        while not stop.is_set():
+            await asyncio.sleep(0.005)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    stop = asyncio.Event()
+    beat = asyncio.create_task(heartbeat(stop))
+    await asyncio.gather(*(
+        collect(chat_service.stream_events(f"m{index}", model, f"s{index}"))
+        for index in range(50)
+        for model in ("gemini-2.5-flash", "gpt-4o-mini")
+    ))
+    stop.set()
+    await beat
+
+    assert max(gaps) < 0.1
+
+
+async def test_gemini_answers_may_outlast_the_read_timeout(chat_service, gemini, monkeypatch):
+    monkeypatch.setitem(http_transport.PROVIDER_READ_TIMEOUTS, "google", 0.05)
+    gemini.parts, gemini.delay = 10, 0.02
+
+    events = await collect(chat_service.stream_events("Здравей", "gemini-2.5-flash", "s1"))
+
+    assert events[-1] == {"done": True}
+    assert answer_text(events) == "".join(f"t{index} " for index in range(10))
+    # The SDK's timeout is the deadline of the whole stream, not of one read
+    assert gemini.calls[0]["options"] == {"timeout": GOOGLE_REQUEST_DEADLINE}
+
+
+async def test_stalled_gemini_stream_fails_after_the_read_timeout(chat_service, gemini, monkeypatch):
+    monkeypatch.setitem(http_transport.PROVIDER_READ_TIMEOUTS, "google", 0.05)
+    gemini.delay = 5
+
+    started = time.perf_counter()
+    events = await collect(chat_service.stream_events("Здравей", "gemini-2.5-flash", "s1"))
+
+    assert events[0] == {"text": "t0 "}
+    assert "No response from the provider" in events[-1]["error"]
+    assert time.perf_counter() - started < 1
+    assert gemini.streams[0].closed
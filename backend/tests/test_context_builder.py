@@ -0,0 +1,86 @@
+"""Token-budgeted, incrementally built prompts."""
+
+from services.memory_service import ConversationMemoryManager
+from services.context_builder import ContextBuilder
+
+
+def make_builder(model_service, **memory_options):
+    memory = ConversationMemoryManager(**memory_options)
+    return memory, ContextBuilder(memory, model_service)
+
+
+def test_prompt_is_extended_incrementally(model_service):
+    memory, builder = make_builder(model_service)
+    memory.add_message("s", "user", "first")
+    builder.build_gemini_prompt("s", "gemini-2.5-flash")
+    window = builder._windows["s"]
+    memory.add_message("s", "assistant", "answer")
+    memory.add_message("s", "user", "second")
+
+    prompt, turns = builder.build_gemini_prompt("s", "gemini-2.5-flash")
+    assert builder._windows["s"] is window
+    assert prompt == "User: first\nAssistant: answer\nUser: second\n"
+    assert turns == 3
+
+
+def test_prompt_stays_within_the_model_budget(model_service):
+    memory, builder = make_builder(model_service, max_messages_per_session=10**6, max_total_bytes=10**12)
+    budget = builder.get_budget("gpt-4o-mini")
+    for index in range(2000):
+        memory.add_message("s", "user" if index % 2 == 0 else "assistant", f"{index} " + "word " * 100)
+        builder.build_openai_messages("s", "gpt-4o-mini")
+
+    messages = builder.build_openai_messages("s", "gpt-4o-mini")
+    assert builder.get_token_count("s") <= budget
+    assert messages[-1]["content"].startswith("1999 ")
+    assert len(messages) < 2000
+
+
+def test_turns_trimmed_from_memory_leave_the_prompt(model_service):
+    memory, builder = make_builder(model_service, max_messages_per_session=4)
+    for index in range(4):
+        memory.add_message("s", "user", f"m{index}")
+    builder.build_gemini_prompt("s", "gemini-2.5-flash")
+    builder.build_openai_messages("s", "gpt-4o-mini")
+    for index in range(4, 7):
+        memory.add_message("s", "user", f"m{index}")
+
+    prompt, turns = builder.build_gemini_prompt("s", "gemini-2.5-flash")
+    assert prompt == "User: m3\nUser: m4\nUser: m5\nUser: m6\n"
+    assert turns == 4
+    messages = builder.build_openai_messages("s", "gpt-4o-mini")
+    assert [message["content"] for message in messages[1:]] == ["m3", "m4", "m5", "m6"]
+
+
+def test_cleared_session_starts_an_empty_prompt(model_service):
+    memory, builder = make_builder(model_service)
+    memory.add_message("s", "user", "old")
+    builder.build_gemini_prompt("s", "gemini-2.5-flash")
+    memory.clear_session("s")
+    memory.add_message("s", "user", "new")
+
+    assert builder.build_gemini_prompt("s", "gemini-2.5-flash") == ("User: new\n", 1)
+
+
+def test_sessions_leaving_memory_drop_their_windows(model_service):
+    memory, builder = make_builder(model_service, max_sessions=2)
+    for session_id in ("a", "b"):
+        memory.add_message(session_id, "user", "hi")
+        builder.build_gemini_prompt(session_id, "gemini-2.5-flash")
+
+    memory.add_message("c", "user", "hi")  # Evicts "a"
+    memory.delete_session("b")
+
+    assert "a" not in builder._windows
+    assert "b" not in builder._windows
+    assert builder.get_token_count("a") == 0
+
+
+def test_expired_session_drops_its_window(model_service):
+    memory, builder = make_builder(model_service, session_ttl=0)
+    memory.add_message("a", "user", "hi")
+    builder.build_gemini_prompt("a", "gemini-2.5-flash")
+
+    memory.add_message("b", "user", "hi")
+
+    assert "a" not in builder._windows
@@ -0,0 +1,121 @@
+"""The shared provider transport against a local mock provider server."""
+
+import asyncio
+import time
+import pytest
+from services import http_transport
+from services.http_transport import HttpTransport
+from services.model_service import ModelService
+from tests.fakes import FakeGenai
+from tests.mock_provider import MockProvider
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def provider():
+    server = MockProvider(connect_delay=0.05)
+    server.base_url = await server.start()
+    yield server
+    await server.close()
+
+
+@pytest.fixture
+async def transport():
+    transport = HttpTransport(http2=False)
+    yield transport
+    await transport.aclose()
+
+
+@pytest.fixture
+async def model_service(provider, monkeypatch):
+    monkeypatch.setenv("OPENAI_BASE_URL", provider.base_url)
+    service = ModelService()
+    service._genai = FakeGenai()  # Only OpenAI requests go through the shared pool
+    yield service
+    await service.aclose()
+
+
+async def first_token(client) -> float:
+    """Seconds until the first content chunk of a streamed completion."""
+    started = time.perf_counter()
+    stream = await client.chat.completions.create(
+        model="gpt-4o-mini", messages=[{"role": "user", "content": "Здравей"}], stream=True
+    )
+    first = None
+    async for chunk in stream:
+        if first is None and chunk.choices and chunk.choices[0].delta.content:
+            first = time.perf_counter() - started
+    return first
+
+
+async def test_requests_reuse_one_keepalive_connection(provider, transport):
+    for _ in range(5):
+        response = await transport.client.get(provider.base_url + "models")
+        assert response.status_code == 200
+
+    stats = transport.get_stats()["hosts"]["127.0.0.1"]
+    assert provider.connections == 1
+    assert stats["requests"] == 5
+    assert stats["new_connections"] == 1
+    assert stats["reused_connections"] == 4
+    assert stats["reuse_rate"] == 0.8
+    assert stats["avg_connect_ms"] > 0
+
+
+async def test_pool_wait_is_measured_when_the_pool_is_full(provider):
+    provider.delay = 0.02
+    transport = HttpTransport(max_connections=1, http2=False)
+    try:
+        async def complete():
+            async with transport.client.stream(
+                "POST", provider.base_url + "chat/completions", json={"model": "m"}
+            ) as response:
+                await response.aread()
+
+        await asyncio.gather(*(complete() for _ in range(3)))
+    finally:
+        await transport.aclose()
+
+    stats = transport.get_stats()["hosts"]["127.0.0.1"]
+    assert provider.connections == 1
+    assert stats["max_pool_wait_ms"] >= 20
+
+
+async def test_openai_sdk_streams_over_the_shared_pool(provider, model_service):
+    cold = await first_token(model_service.openai_client)
+    warm = await first_token(model_service.openai_client)
+
+    assert provider.connections == 1
+    # The second request skips connection setup
+    assert warm < cold - 0.03
+    stats = model_service.transport.get_stats()["hosts"]["127.0.0.1"]
+    assert stats["reused_connections"] == 1
+
+
+async def test_warm_up_takes_connection_setup_out_of_the_first_request(provider, model_service):
+    await model_service.warm_up()
+    requests = provider.requests
+
+    ttft = await first_token(model_service.openai_client)
+
+    assert provider.requests == requests + 1
+    assert ttft < provider.connect_delay
+    assert model_service.transport.get_stats()["hosts"]["127.0.0.1"]["reused_connections"] == 1
+
+
+async def test_keep_warm_skips_recently_used_hosts(provider, transport):
+    assert await transport.keep_warm(provider.base_url) is True
+    assert await transport.keep_warm(provider.base_url) is False
+
+    transport._last_used["127.0.0.1"] -= transport.keepalive_expiry
+    assert await transport.keep_warm(provider.base_url) is True
+    assert provider.connections == 1
+
+
+def test_timeouts_are_per_provider(monkeypatch):
+    monkeypatch.setitem(http_transport.PROVIDER_READ_TIMEOUTS, "google", 99.0)
+    transport = HttpTransport(http2=False)
+
+    assert transport.timeout_for("google").read == 99.0
+    assert transport.timeout_for("unknown").read == transport.timeout_for("openai").read
@@ -0,0 +1,75 @@
+"""Queued, level-gated logging and the cost of the chunk path."""
+
+import json
+import logging
+from logging.handlers import QueueHandler
+import pytest
+from logger import JsonFormatter, get_logger
+from tests.conftest import collect
+
+pytestmark = pytest.mark.anyio
+
+
+class Records(logging.Handler):
+    """Keeps every record it is given."""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def records():
+    root = logging.getLogger("nova")
+    handler = Records()
+    level = root.level
+    root.addHandler(handler)
+    yield handler.records, root
+    root.removeHandler(handler)
+    root.setLevel(level)
+
+
+def test_request_threads_only_enqueue_records():
+    get_logger("test")
+
+    handlers = logging.getLogger("nova").handlers
+    assert any(isinstance(handler, QueueHandler) for handler in handlers)
+    assert not any(type(handler) is logging.StreamHandler for handler in handlers)
+
+
+async def test_chunks_are_not_logged_at_info(chat_service, gemini, records):
+    records, root = records
+    root.setLevel(logging.INFO)
+    gemini.parts = 500
+
+    events = await collect(chat_service.stream_events("Здравей", "gemini-2.5-flash", "s1"))
+
+    assert len(events) == 501
+    # A handful of per-request lines, none per chunk
+    assert 0 < len(records) < 10
+    assert not any("chunk #" in record.getMessage() for record in records)
+
+
+async def test_chunks_are_logged_at_debug(chat_service, gemini, records):
+    records, root = records
+    root.setLevel(logging.DEBUG)
+    gemini.parts = 50
+
+    await collect(chat_service.stream_events("Здравей", "gemini-2.5-flash", "s1"))
+
+    assert sum("chunk #" in record.getMessage() for record in records) == 50
+
+
+def test_json_format_keeps_extra_fields():
+    record = logging.LogRecord("nova.chat", logging.INFO, __file__, 1, "Stream %s done", ("a1",), None)
+    record.session_id = "s1"
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "Stream a1 done"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "nova.chat"
+    assert entry["session_id"] == "s1"
@@ -0,0 +1,124 @@
+"""Bounded, evicting conversation memory."""
+
+import time
+import pytest
+from services.memory_service import ConversationMemoryManager
+
+
+def test_least_recently_used_session_is_evicted_first():
+    memory = ConversationMemoryManager(max_sessions=3)
+    for session_id in ("a", "b", "c"):
+        memory.add_message(session_id, "user", "hi")
+    memory.get_turns("a")  # "b" is now the least recently used
+    memory.add_message("d", "user", "hi")
+
+    assert memory.get_turn_count("b") == 0
+    assert all(memory.get_turn_count(session_id) == 1 for session_id in ("a", "c", "d"))
+    assert memory.get_stats()["evictions"]["lru"] == 1
+
+
+def test_idle_sessions_expire():
+    memory = ConversationMemoryManager(session_ttl=0.05)
+    memory.add_message("old", "user", "hi")
+    time.sleep(0.1)
+    memory.add_message("new", "user", "hi")
+
+    assert memory.get_session_count() == 1
+    assert memory.get_stats()["evictions"]["ttl"] == 1
+
+
+def test_messages_per_session_are_capped():
+    memory = ConversationMemoryManager(max_messages_per_session=4)
+    for index in range(10):
+        memory.add_message("s", "user", f"m{index}")
+
+    assert memory.get_turns("s") == [("user", f"m{index}") for index in range(6, 10)]
+    assert memory.get_stats()["trimmed_messages"] == 6
+
+
+def test_total_bytes_stay_within_budget():
+    memory = ConversationMemoryManager(max_total_bytes=10_000)
+    for index in range(1000):
+        memory.add_message(f"s{index}", "user", "x" * 100)
+
+    stats = memory.get_stats()
+    assert stats["bytes"] <= 10_000
+    assert stats["sessions"] == 100
+    assert stats["evictions"]["bytes"] == 900
+
+
+def test_a_single_oversized_session_is_trimmed():
+    memory = ConversationMemoryManager(max_total_bytes=1000)
+    for index in range(50):
+        memory.add_message("s", "user", "x" * 100)
+
+    assert memory.get_stats()["bytes"] <= 1000
+    assert memory.get_turn_count("s") == 10
+
+
+def test_stats_track_occupancy_after_clear_and_delete():
+    memory = ConversationMemoryManager()
+    memory.add_message("a", "user", "hello")
+    memory.add_message("a", "assistant", "world")
+    memory.add_message("b", "user", "hey")
+    memory.clear_session("a")
+    memory.delete_session("b")
+
+    stats = memory.get_stats()
+    assert stats["messages"] == 0
+    assert stats["bytes"] == 0
+    assert stats["sessions"] == 1
+
+
+def test_turns_are_compact_records_with_interned_short_content():
+    memory = ConversationMemoryManager()
+    memory.add_message("a", "user", "Здравей")
+    memory.add_message("b", "user", "".join(["Здра", "вей"]))
+
+    first, second = memory._sessions["a"].turns[0], memory._sessions["b"].turns[0]
+    assert not hasattr(first, "__dict__")
+    assert first.data is second.data
+
+
+@pytest.mark.parametrize("compression", ["zstd", "zlib"])
+def test_old_turns_are_compressed_and_read_back(compression):
+    memory = ConversationMemoryManager(compress_after_turns=2, compress_min_bytes=100, compression=compression)
+    long_text = "Разбира се! Ето подробно обяснение. " * 20
+    for index in range(6):
+        memory.add_message("s", "user", f"{index} {long_text}")
+
+    turns = memory._sessions["s"].turns
+    assert [turn.data.__class__ for turn in turns] == [bytes] * 4 + [str] * 2
+    assert memory.get_turns("s") == [("user", f"{index} {long_text}") for index in range(6)]
+    assert memory.get_stats()["bytes"] < 6 * len(long_text.encode("utf-8")) // 2
+    assert memory.get_stats()["limits"]["compression"] == compression
+
+
+def test_turns_written_by_either_codec_read_back_in_one_session():
+    memory = ConversationMemoryManager(compress_after_turns=1, compress_min_bytes=10, compression="zlib")
+    memory.add_message("s", "user", "a" * 100)
+    memory.add_message("s", "user", "b" * 100)
+    memory.compression = "zstd"
+    memory.add_message("s", "user", "c" * 100)
+
+    assert [content for _, content in memory.get_turns("s")] == ["a" * 100, "b" * 100, "c" * 100]
+
+
+@pytest.mark.parametrize("compress_after_turns, warned", [(0, False), (2, True)])
+def test_missing_zstandard_is_reported_only_when_compressing(monkeypatch, caplog, compress_after_turns, warned):
+    monkeypatch.setattr("services.memory_service.zstandard", None)
+
+    memory = ConversationMemoryManager(compress_after_turns=compress_after_turns, compression="zstd")
+
+    assert memory.compression == "zlib"
+    assert ("zstandard package is missing" in caplog.text) is warned
+
+
+def test_history_is_converted_to_langchain_messages_on_request():
+    memory = ConversationMemoryManager()
+    memory.add_message("s", "user", "hi")
+    memory.add_message("s", "assistant", "hello")
+
+    history = memory.get_history("s")
+    assert [(message.type, message.content) for message in history] == [("human", "hi"), ("ai", "hello")]
+    assert history is not memory.get_history("s")
@@ -0,0 +1,122 @@
+"""Prometheus text exposition and the HTTP metrics middleware."""
+
+import re
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from metrics import (
+    HTTP_DURATION,
+    HTTP_REQUESTS,
+    REGISTRY,
+    Counter,
+    Gauge,
+    Histogram,
+    HttpMetricsMiddleware,
+    Registry,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+def render(metric) -> list:
+    registry = Registry()
+    registry.register(metric)
+    text = registry.render()
+    assert text.endswith("\n")
+    return text.splitlines()
+
+
+def test_counter_renders_help_type_and_one_line_per_label_set():
+    counter = Counter("nova_test_total", "Things that happened.", ["model"])
+    counter.labels("gpt-4o").inc()
+    counter.labels("gpt-4o").inc(2)
+    counter.labels("gemini-2.5-flash").inc(0.5)
+
+    assert render(counter) == [
+        "# HELP nova_test_total Things that happened.",
+        "# TYPE nova_test_total counter",
+        'nova_test_total{model="gpt-4o"} 3',
+        'nova_test_total{model="gemini-2.5-flash"} 0.5',
+    ]
+
+
+def test_label_values_are_escaped():
+    counter = Counter("nova_test_total", "Escaping.", ["route"])
+    counter.labels('a"b\\c\nd').inc()
+
+    assert render(counter)[-1] == 'nova_test_total{route="a\\"b\\\\c\\nd"} 1'
+
+
+def test_unlabelled_counter_and_gauge_callback():
+    counter = Counter("nova_plain_total", "No labels.")
+    counter.inc()
+    gauge = Gauge("nova_level", "Read when collected.", callback=lambda: 7)
+
+    assert render(counter)[-1] == "nova_plain_total 1"
+    assert render(gauge)[1:] == ["# TYPE nova_level gauge", "nova_level 7"]
+
+
+def test_histogram_buckets_are_cumulative_with_sum_and_count():
+    histogram = Histogram("nova_latency_seconds", "Latency.", ["model"], buckets=(0.5, 0.1, 1))
+    for value in (0.05, 0.1, 0.3, 2):
+        histogram.labels("m").observe(value)
+
+    assert render(histogram)[2:] == [
+        'nova_latency_seconds_bucket{model="m",le="0.1"} 2',  # A value on a bound falls in its bucket
+        'nova_latency_seconds_bucket{model="m",le="0.5"} 3',
+        'nova_latency_seconds_bucket{model="m",le="1"} 3',
+        'nova_latency_seconds_bucket{model="m",le="+Inf"} 4',
+        'nova_latency_seconds_sum{model="m"} 2.45',
+        'nova_latency_seconds_count{model="m"} 4',
+    ]
+
+
+def test_names_and_label_counts_are_checked():
+    registry = Registry()
+    registry.register(Counter("nova_once_total", "Once."))
+    counter = Counter("nova_labelled_total", "Labelled.", ["model"])
+
+    with pytest.raises(ValueError):
+        registry.register(Counter("nova_once_total", "Again."))
+    with pytest.raises(ValueError):
+        counter.labels("a", "b")
+
+
+def test_app_registry_renders_valid_exposition():
+    sample = re.compile(r'^nova_\w+(\{(\w+="([^"\\]|\\.)*",?)+\})? (-?[0-9.e+-]+|\+Inf)$')
+    HTTP_REQUESTS.labels("GET", "/api/models", "200").inc()
+
+    for line in REGISTRY.render().splitlines():
+        assert line.startswith(("# HELP nova_", "# TYPE nova_")) or sample.match(line), line
+
+
+async def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+
+    @app.get("/api/sessions/{session_id}")
+    async def get_session(session_id: str):
+        return {"session_id": session_id}
+
+    @app.get("/api/stream")
+    async def stream():
+        async def body():
+            yield b"data: {}\n\n"
+        return StreamingResponse(body(), media_type="text/event-stream")
+
+    route = "/api/sessions/{session_id}"
+    before = HTTP_REQUESTS.labels("GET", route, "200").value
+    unmatched = HTTP_REQUESTS.labels("GET", "unmatched", "404").value
+    timed = HTTP_DURATION.labels("GET", "/api/stream").counts[:]
+    transport = httpx.ASGITransport(app=HttpMetricsMiddleware(app, enabled=True))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for session_id in ("s1", "s2"):
+            assert (await client.get(f"/api/sessions/{session_id}")).status_code == 200
+        assert (await client.get("/nowhere")).status_code == 404
+        assert (await client.get("/api/stream")).status_code == 200
+
+    assert HTTP_REQUESTS.labels("GET", route, "200").value - before == 2
+    assert HTTP_REQUESTS.labels("GET", "unmatched", "404").value - unmatched == 1
+    assert sum(HTTP_DURATION.labels("GET", "/api/stream").counts) - sum(timed) == 1
+    # Session ids never become label values
+    assert not any("s1" in values for values in HTTP_REQUESTS._children)
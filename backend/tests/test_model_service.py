@@ -0,0 +1,46 @@
+"""Per-request model resolution without process-wide switching."""
+
+import asyncio
+import re
+import pytest
+from tests.conftest import collect
+
+pytestmark = pytest.mark.anyio
+
+
+def test_resolve_builds_each_model_once(model_service):
+    names = ["gemini-2.5-pro", "gemini-2.5-flash", "gpt-4o-mini", "gemini-2.0-flash"]
+    handles = [model_service.resolve(names[index % 4]) for index in range(400)]
+
+    assert model_service._genai.models_built == ["gemini-2.5-pro", "gemini-2.5-flash", "gemini-2.0-flash"]
+    assert handles[0] is handles[4]
+    assert {handle.name for handle in handles} == set(names)
+
+
+def test_resolve_rejects_unknown_models(model_service):
+    with pytest.raises(ValueError):
+        model_service.resolve("gpt-99")
+
+
+def test_set_model_only_changes_the_default(model_service):
+    flash = model_service.resolve("gemini-2.5-flash")
+    model_service.set_model("gpt-4o-mini")
+
+    assert model_service.get_current_model_name() == "gpt-4o-mini"
+    assert model_service.resolve("gemini-2.5-flash") is flash
+
+
+async def test_concurrent_requests_stream_from_the_model_they_picked(chat_service, gemini, openai):
+    gemini.ttft = openai.ttft = 0.01
+    names = ["gemini-2.5-pro", "gemini-2.5-flash", "gpt-4o-mini", "gemini-2.0-flash"]
+    await asyncio.gather(*(
+        collect(chat_service.stream_events(f"m{index}", names[index % 4], f"s{index}"))
+        for index in range(40)
+    ))
+
+    for call in gemini.calls:
+        index = int(re.findall(r"User: m(\d+)", call["prompt"])[-1])
+        assert call["model"] == names[index % 4]
+    for call in openai.calls:
+        assert call["model"] == "gpt-4o-mini"
+        assert int(call["messages"][-1]["content"][1:]) % 4 == 2
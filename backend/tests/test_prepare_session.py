@@ -0,0 +1,84 @@
+"""The prepare hint sent while the user types the next message."""
+
+import asyncio
+import pytest
+from services.chat_service import ChatService
+from services.memory_service import ConversationMemoryManager
+from services.prompt_cache import PromptCache
+from services.session_store import SQLiteSessionStore
+from tests.conftest import collect
+
+pytestmark = pytest.mark.anyio
+
+MODEL = "gemini-2.5-flash"
+TURN = "подробен текст за темата " * 40
+
+
+@pytest.fixture
+def stored_chat(model_service, tmp_path):
+    """Chat service whose session "s1" is in the SQLite store but not in memory."""
+    path = str(tmp_path / "sessions.db")
+    writer = ConversationMemoryManager(store=SQLiteSessionStore(path))
+    for index in range(40):
+        writer.add_message("s1", "user" if index % 2 == 0 else "assistant", f"{index} {TURN}")
+    writer.close()
+    memory = ConversationMemoryManager(store=SQLiteSessionStore(path))
+    yield ChatService(model_service, memory)
+    memory.close()
+
+
+async def test_prepare_loads_the_session_before_the_request(stored_chat):
+    loads = []
+    load = stored_chat.memory_manager.store.load
+    stored_chat.memory_manager.store.load = lambda *args: loads.append(args) or load(*args)
+
+    prepared = await stored_chat.prepare_session("s1", MODEL)
+    loaded_by_hint = len(loads)
+    await collect(stored_chat.stream_events("И какво следва?", MODEL, "s1"))
+
+    assert prepared["turns"] == 40
+    assert prepared["model"] == MODEL
+    assert prepared["context_tokens"] > 0
+    assert loaded_by_hint == 1
+    assert len(loads) == 1
+
+
+async def test_prepare_does_not_change_what_the_request_sends(chat_service, gemini):
+    for session_id in ("hinted", "plain"):
+        for index in range(6):
+            chat_service.memory_manager.add_message(session_id, "user" if index % 2 == 0 else "assistant", TURN)
+
+    await chat_service.prepare_session("hinted", MODEL)
+    await collect(chat_service.stream_events("още", MODEL, "hinted"))
+    await collect(chat_service.stream_events("още", MODEL, "plain"))
+
+    assert gemini.calls[0]["prompt"] == gemini.calls[1]["prompt"]
+
+
+async def test_prepare_uploads_the_cached_prefix(stored_chat, gemini):
+    stored_chat.prompt_cache = PromptCache(stored_chat.model_service, enabled=True, min_tokens=1000)
+
+    await stored_chat.prepare_session("s1", MODEL)
+    await asyncio.gather(*stored_chat.prompt_cache._tasks)
+    await collect(stored_chat.stream_events("И какво следва?", MODEL, "s1"))
+
+    caches = stored_chat.model_service._genai.caches
+    assert len(caches) == 1
+    assert gemini.calls[-1]["cache"] is caches[0]
+    assert gemini.calls[-1]["prompt"].startswith("User: И какво следва?")
+
+
+@pytest.mark.parametrize("model_name", ["auto", "no-such-model"])
+async def test_models_known_only_at_request_time_are_not_prepared(stored_chat, gemini, model_name):
+    prepared = await stored_chat.prepare_session("s1", model_name)
+
+    assert prepared["turns"] == 40
+    assert prepared["model"] is None
+    assert stored_chat.model_service._genai.caches == []
+
+
+async def test_unknown_sessions_are_not_created(chat_service):
+    prepared = await chat_service.prepare_session("never-seen", MODEL)
+
+    assert prepared["turns"] == 0
+    assert chat_service.memory_manager.get_session_count() == 0
@@ -0,0 +1,163 @@
+"""Gemini cached content for long sessions, against the fake caching API."""
+
+import asyncio
+import pytest
+from services.prompt_cache import PromptCache
+from tests.conftest import collect, answer_text
+
+pytestmark = pytest.mark.anyio
+
+MODEL = "gemini-2.5-flash"
+# About 1000 estimated tokens per turn
+LONG = "разкажи повече за темата " * 160
+
+
+@pytest.fixture
+def caches(model_service):
+    """Cached contents created through the fake genai module."""
+    return model_service._genai.caches
+
+
+@pytest.fixture
+def cache(model_service):
+    return PromptCache(model_service, enabled=True, min_tokens=1000, refresh_tokens=1000, ttl=600, max_sessions=2)
+
+
+async def settle(cache: PromptCache):
+    """Wait for the background uploads, extensions and deletions."""
+    while cache._tasks:
+        await asyncio.gather(*cache._tasks)
+
+
+async def test_nothing_is_uploaded_unless_enabled(model_service, caches):
+    cache = PromptCache(model_service, min_tokens=1000)  # Paid storage is opt-in
+    cache.update("s1", MODEL, f"User: {LONG}\n")
+    await settle(cache)
+
+    assert caches == []
+    assert cache.get_stats()["enabled"] is False
+
+
+async def test_short_prefixes_are_not_uploaded(cache, caches):
+    cache.update("s1", MODEL, "User: здравей\n")
+    await settle(cache)
+
+    assert caches == []
+    assert cache.lookup("s1", MODEL, "User: здравей\nUser: още\n") is None
+
+
+async def test_long_prefix_is_uploaded_and_matched(cache, caches):
+    prefix = f"User: {LONG}\n"
+    cache.update("s1", MODEL, prefix)
+    await settle(cache)
+
+    assert len(caches) == 1
+    assert caches[0].model == MODEL
+    assert caches[0].text == prefix
+    entry = cache.lookup("s1", MODEL, prefix + "User: следващ въпрос\n")
+    assert entry is not None and entry.length == len(prefix)
+    # A changed start of the prompt, or another model, sends the full prompt
+    assert cache.lookup("s1", MODEL, "User: друго\n" + prefix) is None
+    assert cache.lookup("s1", "gemini-2.5-pro", prefix) is None
+    assert cache.get_stats()["tokens_not_resent"] == entry.tokens
+
+
+async def test_grown_prefix_is_uploaded_again_and_the_old_one_deleted(cache, caches):
+    prefix = f"User: {LONG}\n"
+    cache.update("s1", MODEL, prefix)
+    await settle(cache)
+    cache.update("s1", MODEL, prefix + "Assistant: кратко\n")
+    await settle(cache)
+    assert len(caches) == 1
+
+    cache.update("s1", MODEL, prefix + f"Assistant: {LONG}\n")
+    await settle(cache)
+
+    assert len(caches) == 2
+    assert caches[0].deleted and not caches[1].deleted
+    assert cache.get_stats()["uploads"] == 2
+
+
+async def test_entries_close_to_expiry_are_extended(cache, caches):
+    prefix = f"User: {LONG}\n"
+    cache.update("s1", MODEL, prefix)
+    await settle(cache)
+    entry = cache._entries["s1"]
+    entry.expires_at -= 400
+    aged = entry.expires_at
+
+    cache.update("s1", MODEL, prefix)
+    await settle(cache)
+
+    assert cache.get_stats()["extensions"] == 1
+    assert caches[0].ttl.total_seconds() == 600
+    assert entry.expires_at >= aged + 400
+    # Content about to expire is not used at all
+    entry.expires_at = 0
+    assert cache.lookup("s1", MODEL, prefix) is None
+
+
+async def test_least_recently_used_sessions_are_deleted(cache, caches):
+    for session_id in ("s1", "s2", "s3"):
+        cache.update(session_id, MODEL, f"User: {session_id} {LONG}\n")
+        await settle(cache)
+
+    assert cache.get_stats()["sessions"] == 2
+    assert [entry.deleted for entry in caches] == [True, False, False]
+
+    await cache.aclose()
+    assert all(entry.deleted for entry in caches)
+
+
+async def test_refused_uploads_back_off(cache, model_service):
+    calls = []
+
+    def refuse(model_name, text, ttl):
+        calls.append(model_name)
+        raise RuntimeError("400 cached content is too small")
+
+    model_service.create_cached_content = refuse
+    cache.update("s1", MODEL, f"User: {LONG}\n")
+    await settle(cache)
+    cache.update("s2", MODEL, f"User: {LONG}\n")
+    await settle(cache)
+
+    assert calls == [MODEL]
+    assert cache.get_stats()["failures"] == 1
+
+
+async def test_long_session_sends_only_the_uncached_turns(chat_service, gemini, caches):
+    chat_service.prompt_cache = PromptCache(chat_service.model_service, enabled=True, min_tokens=1000)
+    for message in (LONG, "кратък въпрос", "още един"):
+        await collect(chat_service.stream_events(message, MODEL, "s1"))
+        await settle(chat_service.prompt_cache)
+
+    first, last = gemini.calls[0], gemini.calls[-1]
+    assert first["cache"] is None
+    assert last["cache"] is caches[-1]
+    assert len(caches) == 1
+    # The cached prefix plus the text sent is the prompt the request would have sent in full
+    prompt, _ = chat_service.context_builder.build_gemini_prompt("s1", MODEL)
+    assert prompt.startswith(caches[0].text + last["prompt"])
+    assert last["prompt"].startswith("User: кратък въпрос")
+    # The provider reports the cached tokens, which the usage accounting bills at the cached rate
+    assert chat_service.usage.get_session_usage("s1")["cached_tokens"] == 2 * caches[0].tokens
+
+
+async def test_unusable_cached_content_falls_back_to_the_full_prompt(chat_service, gemini, caches):
+    chat_service.prompt_cache = PromptCache(chat_service.model_service, enabled=True, min_tokens=1000)
+    await collect(chat_service.stream_events(LONG, MODEL, "s1"))
+    await settle(chat_service.prompt_cache)
+
+    class Expired:
+        async def generate_content_async(self, *args, **kwargs):
+            raise RuntimeError("404 cachedContent not found")
+
+    chat_service.prompt_cache._entries["s1"].client = Expired()
+    events = await collect(chat_service.stream_events("още", MODEL, "s1"))
+    await settle(chat_service.prompt_cache)
+
+    assert answer_text(events)
+    assert events[-1]["done"] is True
+    assert gemini.calls[-1]["cache"] is None
+    assert caches[0].deleted
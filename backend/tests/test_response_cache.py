@@ -0,0 +1,92 @@
+"""Exact and semantic response cache."""
+
+import time
+import pytest
+from services.response_cache import ResponseCache
+from tests.conftest import collect, answer_text
+from tests.fakes import ProviderError
+
+pytestmark = pytest.mark.anyio
+
+
+def make_cache(**options):
+    return ResponseCache(enabled=True, **options)
+
+
+def test_exact_hits_ignore_case_and_whitespace():
+    cache = make_cache()
+    cache.put(cache.make_key("m", "User: Здравей\n"), "m", ["a", "b"])
+
+    assert cache.get(cache.make_key("m", "user:   здравей "), "m") == ("a", "b")
+    assert cache.get(cache.make_key("other", "User: Здравей\n"), "other") is None
+    assert cache.get_stats()["exact_hits"] == 1
+
+
+def test_entries_expire_and_are_evicted_by_count_and_size():
+    cache = make_cache(ttl=0.05, max_entries=2, max_bytes=10)
+    cache.put("a", "m", ["aaaa"])
+    cache.put("b", "m", ["bbbb"])
+    cache.put("c", "m", ["cccc"])
+    assert cache.get("a", "m") is None
+    cache.put("big", "m", ["x" * 11])
+    assert cache.get("big", "m") is None
+    time.sleep(0.1)
+    assert cache.get("c", "m") is None
+    assert cache.get_stats()["entries"] == 1
+
+
+def test_semantic_tier_matches_similar_first_messages():
+    cache = make_cache(semantic_enabled=True, semantic_threshold=0.8)
+    cache.put("k1", "m", ["Здравейте!"], first_message="Здравей, какво можеш?")
+
+    assert cache.get("k2", "m", first_message="здравей какво можеш") == ("Здравейте!",)
+    assert cache.get("k3", "m", first_message="Разкажи ми за черните дупки") is None
+    assert cache.get_stats()["semantic_hits"] == 1
+
+
+def test_removed_entries_leave_the_semantic_index():
+    cache = make_cache(semantic_enabled=True, max_entries=1)
+    cache.put("k1", "m", ["first"], first_message="Здравей")
+    cache.put("k2", "m", ["second"], first_message="Какво можеш?")
+
+    assert cache.get_stats()["semantic_entries"] == 1
+    assert cache.get("k3", "m", first_message="Здравей") is None
+
+
+def test_an_expired_best_match_falls_back_to_the_next_live_one():
+    cache = make_cache(semantic_enabled=True, semantic_threshold=0.6)
+    cache.put("live", "m", ["live answer"], first_message="здравей, какво можеш да правиш?")
+    cache.put("stale", "m", ["stale answer"], first_message="здравей, какво можеш?")
+    cache._entries["stale"].created -= cache.ttl + 1
+
+    assert cache.get("new", "m", first_message="здравей, какво можеш?") == ("live answer",)
+    assert cache.get_stats()["semantic_entries"] == 1
+
+
+def test_disabled_by_default():
+    assert ResponseCache().enabled is False
+
+
+async def test_repeated_context_is_replayed_without_a_provider_call(chat_service, gemini):
+    chat_service.response_cache.enabled = True
+    first = await collect(chat_service.stream_events("Здравей", "gemini-2.5-flash", "a"))
+    second = await collect(chat_service.stream_events("Здравей", "gemini-2.5-flash", "b"))
+
+    assert len(gemini.calls) == 1
+    assert second == first
+    assert answer_text(second) == "".join(f"t{index} " for index in range(20))
+    assert chat_service.response_cache.get_stats()["exact_hits"] == 1
+
+
+async def test_answers_from_a_fallback_model_are_not_cached(chat_service, gemini, openai):
+    chat_service.response_cache.enabled = True
+    gemini.fail = ProviderError("overloaded", 503)
+
+    first = await collect(chat_service.stream_events("Здравей", "gemini-2.5-flash", "a"))
+    gemini.fail = None
+    second = await collect(chat_service.stream_events("Здравей", "gemini-2.5-flash", "b"))
+
+    assert answer_text(first) == "".join(f"o{index} " for index in range(20))
+    assert answer_text(second) == "".join(f"t{index} " for index in range(20))
+    assert chat_service.response_cache.get_stats()["exact_hits"] == 0
+    assert len(openai.calls) == 1
@@ -0,0 +1,172 @@
+"""Failover, circuit breaking and hedging with fake providers that inject delays."""
+
+import asyncio
+import time
+import pytest
+from services import routing_policy
+from services.routing_policy import RoutingPolicy
+from services.stream_registry import StreamHandle
+from tests.conftest import collect, answer_text
+from tests.fakes import ProviderError
+
+pytestmark = pytest.mark.anyio
+
+FALLBACKS = {"gemini-2.5-pro": ["gemini-2.5-flash", "gpt-4o-mini"]}
+
+
+class Models:
+    """Per-model first-token delay and failure, for RoutingPolicy's open_stream."""
+
+    def __init__(self, ttfts: dict = None):
+        self.ttfts = dict(ttfts or {})
+        self.failing = set()
+        self.calls = []
+        self.closed = []
+
+    def __call__(self, model, handle):
+        return self._stream(model.name, handle)
+
+    async def _stream(self, name, handle):
+        self.calls.append(name)
+        try:
+            await asyncio.sleep(self.ttfts.get(name, 0.01))
+            if name in self.failing:
+                raise ProviderError(f"{name} is overloaded", 503)
+            for index in range(3):
+                if handle.cancelled:
+                    return
+                yield f"{name}:{index} "
+        finally:
+            self.closed.append(name)
+
+
+def text_of(chunks):
+    return "".join(chunks)
+
+
+@pytest.fixture
+def policy(model_service):
+    return RoutingPolicy(model_service, FALLBACKS, failover=True, hedge=False)
+
+
+async def ask(policy, models, model_name="gemini-2.5-pro", handle=None):
+    handle = handle or StreamHandle("s", "")
+    # ChatService reads the policy the same way, so a cancel stops it at once
+    return [text async for text in handle.iterate(policy.stream(model_name, models, handle))]
+
+
+async def test_failover_to_the_next_model_in_the_chain(policy):
+    models = Models()
+    models.failing.add("gemini-2.5-pro")
+
+    chunks = await ask(policy, models)
+
+    assert text_of(chunks) == "gemini-2.5-flash:0 gemini-2.5-flash:1 gemini-2.5-flash:2 "
+    assert models.calls == ["gemini-2.5-pro", "gemini-2.5-flash"]
+    stats = policy.get_stats()["models"]["gemini-2.5-pro"]
+    assert stats["failures"] == 1
+    assert stats["failovers"] == 1
+
+
+async def test_error_when_every_model_fails(policy):
+    models = Models()
+    models.failing.update(["gemini-2.5-pro", "gemini-2.5-flash", "gpt-4o-mini"])
+
+    with pytest.raises(ProviderError, match="gpt-4o-mini"):
+        await ask(policy, models)
+
+
+async def test_no_failover_when_disabled(model_service):
+    policy = RoutingPolicy(model_service, FALLBACKS, failover=False, hedge=False)
+    models = Models()
+    models.failing.add("gemini-2.5-pro")
+
+    with pytest.raises(ProviderError):
+        await ask(policy, models)
+    assert models.calls == ["gemini-2.5-pro"]
+
+
+async def test_circuit_opens_and_closes_after_a_good_trial_call(policy, monkeypatch):
+    monkeypatch.setattr(routing_policy, "CIRCUIT_OPEN_SECONDS", 0.1)
+    models = Models()
+    models.failing.add("gemini-2.5-pro")
+
+    for _ in range(routing_policy.CIRCUIT_MIN_CALLS):
+        await ask(policy, models)
+    assert policy.health("gemini-2.5-pro").state == "open"
+
+    # While open, requests go straight to the fallback
+    models.calls.clear()
+    await ask(policy, models)
+    assert models.calls == ["gemini-2.5-flash"]
+
+    await asyncio.sleep(0.12)
+    models.failing.clear()
+    chunks = await ask(policy, models)
+    assert chunks[0] == "gemini-2.5-pro:0 "
+    assert policy.health("gemini-2.5-pro").state == "closed"
+
+
+async def test_slow_first_tokens_open_the_circuit(policy, monkeypatch):
+    monkeypatch.setattr(routing_policy, "CIRCUIT_SLOW_TTFT_SECONDS", 0.02)
+    models = Models({"gemini-2.5-pro": 0.04})
+
+    for _ in range(routing_policy.CIRCUIT_MIN_CALLS):
+        await ask(policy, models)
+
+    assert policy.health("gemini-2.5-pro").state == "open"
+    assert policy.get_stats()["models"]["gemini-2.5-pro"]["failures"] == 0
+
+
+async def test_hedge_starts_a_backup_and_cancels_the_slower_stream(policy, monkeypatch):
+    monkeypatch.setattr(routing_policy, "ROUTING_HEDGE_MIN_SAMPLES", 5)
+    monkeypatch.setattr(routing_policy, "ROUTING_HEDGE_MIN_DELAY", 0.01)
+    policy.hedge = True
+    models = Models({"gemini-2.5-pro": 0.02, "gemini-2.5-flash": 0.02})
+    for _ in range(5):
+        await ask(policy, models)
+
+    models.ttfts["gemini-2.5-pro"] = 1.0
+    started = time.perf_counter()
+    chunks = await ask(policy, models)
+    elapsed = time.perf_counter() - started
+
+    assert chunks[0] == "gemini-2.5-flash:0 "
+    assert elapsed < 0.5
+    assert "gemini-2.5-pro" in models.closed
+    stats = policy.get_stats()["models"]["gemini-2.5-pro"]
+    assert stats["hedges"] == 1
+    assert stats["hedge_wins"] == 1
+
+
+async def test_without_hedging_a_slow_model_is_waited_for(policy):
+    models = Models({"gemini-2.5-pro": 0.2})
+    for _ in range(25):
+        policy.record("gemini-2.5-pro", True, 0.01)
+
+    chunks = await ask(policy, models)
+
+    assert chunks[0] == "gemini-2.5-pro:0 "
+    assert models.calls == ["gemini-2.5-pro"]
+
+
+async def test_cancel_while_racing_stops_every_attempt(policy):
+    models = Models({"gemini-2.5-pro": 5.0})
+    handle = StreamHandle("s", "")
+
+    task = asyncio.create_task(ask(policy, models, handle=handle))
+    await asyncio.sleep(0.05)
+    handle.cancel()
+    chunks = await asyncio.wait_for(task, 1)
+
+    assert chunks == []
+    assert models.closed == ["gemini-2.5-pro"]
+
+
+async def test_chat_fails_over_to_another_provider(chat_service, gemini):
+    gemini.fail = ProviderError("503 upstream overloaded", 503)
+
+    events = await collect(chat_service.stream_events("Здравей", "gemini-2.5-flash", "s1"))
+
+    assert events[-1] == {"done": True}
+    assert answer_text(events).startswith("o0 ")
@@ -0,0 +1,219 @@
+"""SQLite session store with write-behind, behind the memory manager."""
+
+import sqlite3
+import threading
+import pytest
+from services.memory_service import ConversationMemoryManager
+from metrics import SESSION_WRITE_FAILURES
+from services.session_store import SQLiteSessionStore
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "sessions.db")
+
+
+def make_memory(db_path, shared=False, **options):
+    return ConversationMemoryManager(store=SQLiteSessionStore(db_path, shared=shared), **options)
+
+
+def test_history_survives_a_restart(db_path):
+    memory = make_memory(db_path)
+    memory.add_message("s", "user", "помни ме")
+    memory.add_message("s", "assistant", "добре")
+    memory.close()
+
+    restarted = make_memory(db_path)
+    assert restarted.get_turns("s") == [("user", "помни ме"), ("assistant", "добре")]
+    restarted.close()
+
+
+def test_evicted_sessions_are_loaded_back(db_path):
+    memory = make_memory(db_path, max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        memory.add_message(session_id, "user", session_id)
+
+    assert memory.get_stats()["evictions"]["lru"] == 1
+    assert memory.get_turns("a") == [("user", "a")]
+    memory.close()
+
+
+def test_writes_are_batched_behind_the_request(db_path):
+    store = SQLiteSessionStore(db_path, batch_size=1000, flush_interval=0.2)
+    for index in range(500):
+        store.append("s", "user", f"m{index}")
+    store.flush()
+
+    rows = sqlite3.connect(db_path).execute("SELECT content FROM messages ORDER BY id").fetchall()
+    assert [row[0] for row in rows] == [f"m{index}" for index in range(500)]
+    store.close()
+
+
+def test_summary_replaces_old_turns_in_the_store(db_path):
+    memory = make_memory(db_path)
+    for index in range(6):
+        memory.add_message("s", "user", f"m{index}")
+    epoch, seq = memory.get_version("s")
+    assert memory.apply_summary("s", "earlier", epoch, 4)
+    memory.close()
+
+    restarted = make_memory(db_path)
+    assert restarted.get_turns("s") == [("user", "m4"), ("user", "m5")]
+    assert restarted.get_summary("s") == "earlier"
+    restarted.close()
+
+
+@pytest.mark.anyio
+async def test_workers_sharing_the_store_see_each_others_writes(db_path):
+    first = make_memory(db_path, shared=True)
+    second = make_memory(db_path, shared=True)
+    first.add_message("s", "user", "one")
+    first.flush_session("s")
+    await second.preload("s")  # As each chat request does first
+    assert second.get_turns("s") == [("user", "one")]
+
+    second.add_message("s", "assistant", "two")
+    second.flush_session("s")
+    await first.preload("s")
+    assert first.get_turns("s") == [("user", "one"), ("assistant", "two")]
+    first.close()
+    second.close()
+
+
+@pytest.mark.anyio
+async def test_delete_removes_the_session_everywhere(db_path):
+    first = make_memory(db_path, shared=True)
+    second = make_memory(db_path, shared=True)
+    first.add_message("s", "user", "secret")
+    first.flush_session("s")
+    assert second.get_turns("s") == [("user", "secret")]
+
+    first.delete_session("s")
+    first.store.flush()
+    connection = sqlite3.connect(db_path)
+    for table in ("messages", "summaries", "versions"):
+        assert connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == 0
+    await second.preload("s")
+    assert second.get_turns("s") == []
+    first.close()
+    second.close()
+
+
+@pytest.mark.anyio
+async def test_preload_reads_the_store_off_the_event_loop(db_path):
+    writer = make_memory(db_path)
+    writer.add_message("s", "user", "stored")
+    writer.close()
+
+    memory = make_memory(db_path)
+    loop_thread = threading.current_thread()
+    threads = []
+    load = memory.store.load
+
+    def recording_load(*args):
+        threads.append(threading.current_thread())
+        return load(*args)
+
+    memory.store.load = recording_load
+    assert await memory.preload("s") == 1
+    assert await memory.preload("unknown") == 0
+    assert memory.get_turns("s") == [("user", "stored")]
+    assert threads and loop_thread not in threads
+    assert memory.get_session_count() == 1
+    memory.close()
+
+
+@pytest.mark.anyio
+async def test_preload_keeps_writes_made_while_it_read(db_path):
+    memory = make_memory(db_path, shared=True)
+    memory.add_message("s", "user", "one")
+    memory.flush_session("s")
+    is_current = memory.store.is_current
+    checks = []
+
+    def stale_once(session_id, version):
+        checks.append(version)
+        return len(checks) > 1 and is_current(session_id, version)
+
+    read = memory._read
+
+    def read_then_write(session_id):
+        result = read(session_id)
+        memory.add_message("s", "assistant", "two")  # A request on the loop, meanwhile
+        return result
+
+    memory.store.is_current = stale_once
+    memory._read = read_then_write
+    await memory.preload("s")
+    assert memory.get_turns("s") == [("user", "one"), ("assistant", "two")]
+    memory.close()
+
+
+def test_cached_sessions_are_checked_once_per_interval(db_path):
+    memory = make_memory(db_path, shared=True, version_check_interval=60)
+    other = make_memory(db_path, shared=True)
+    memory.add_message("s", "user", "one")
+    memory.flush_session("s")
+    checks = []
+    is_current = memory.store.is_current
+
+    def counting_is_current(session_id, version):
+        checks.append(version)
+        return is_current(session_id, version)
+
+    memory.store.is_current = counting_is_current
+    for _ in range(3):
+        memory.get_turns("s")
+    assert checks == []  # Just loaded, so the reads hit no SQLite on the loop
+
+    other.add_message("s", "assistant", "two")
+    other.flush_session("s")
+    memory.version_check_interval = 0
+    assert memory.get_turns("s") == [("user", "one"), ("assistant", "two")]
+    assert len(checks) == 1
+    memory.close()
+    other.close()
+
+
+def failing_apply(store, failures: int = 0, bad: str = None):
+    """Make the store's transactions fail `failures` times, and always when they hold `bad`."""
+    apply = store._apply
+    state = {"failures": failures}
+
+    def flaky(conn, batch):
+        if state["failures"]:
+            state["failures"] -= 1
+            raise sqlite3.OperationalError("database is locked")
+        if any(op[0] == "append" and op[3] == bad for op in batch):
+            raise sqlite3.IntegrityError("rejected")
+        apply(conn, batch)
+
+    store._apply = flaky
+
+
+def test_failed_write_batches_are_retried(db_path):
+    retried = SESSION_WRITE_FAILURES.labels("retried").value
+    store = SQLiteSessionStore(db_path, flush_interval=0.001)
+    failing_apply(store, failures=2)
+    for index in range(3):
+        store.append("s", "user", f"m{index}")
+    store.close()
+
+    reopened = SQLiteSessionStore(db_path)
+    assert reopened.load("s", 10) == ([("user", "m0"), ("user", "m1"), ("user", "m2")], None)
+    reopened.close()
+    assert SESSION_WRITE_FAILURES.labels("retried").value - retried == 2
+
+
+def test_only_writes_that_keep_failing_are_dropped(db_path):
+    dropped = SESSION_WRITE_FAILURES.labels("dropped").value
+    store = SQLiteSessionStore(db_path, flush_interval=0.001, write_retries=1)
+    failing_apply(store, bad="m1")
+    for index in range(3):
+        store.append("s", "user", f"m{index}")
+    store.close()
+
+    reopened = SQLiteSessionStore(db_path)
+    assert reopened.load("s", 10) == ([("user", "m0"), ("user", "m2")], None)
+    reopened.close()
+    assert SESSION_WRITE_FAILURES.labels("dropped").value - dropped == 1
@@ -0,0 +1,161 @@
+"""Coalescing identical concurrent generations into one upstream stream."""
+
+import asyncio
+import time
+import pytest
+from services.single_flight import SingleFlight
+from services.stream_registry import StreamHandle
+from tests.conftest import collect, answer_text
+
+pytestmark = pytest.mark.anyio
+
+CHUNKS = [f"c{index} " for index in range(20)]
+
+
+class Upstream:
+    """Upstream generation that counts how often it was started."""
+
+    def __init__(self, delay: float = 0.005, fail_after: int = None):
+        self.delay = delay
+        self.fail_after = fail_after
+        self.starts = 0
+        self.owners = None
+        self.sent = 0
+
+    def __call__(self, handle: StreamHandle, owners: list):
+        self.starts += 1
+        self.owners = owners
+        return handle.iterate(self._generate())
+
+    async def _generate(self):
+        for index, text in enumerate(CHUNKS):
+            if index == self.fail_after:
+                raise RuntimeError("upstream failed")
+            await asyncio.sleep(self.delay)
+            self.sent += 1
+            yield text
+
+
+async def subscribe(flight, upstream, owner="s", slow=0.0, stop_after=None):
+    """Read one subscription, optionally slowly or leaving early; returns (chunks, seconds)."""
+    handle = StreamHandle(owner, "")
+    received = []
+    started = time.perf_counter()
+    async for text in handle.iterate(flight.subscribe("key", upstream, owner)):
+        received.append(text)
+        if len(received) == stop_after:
+            handle.cancel()
+        await asyncio.sleep(slow)
+    return received, time.perf_counter() - started
+
+
+async def test_subscribers_share_one_upstream_and_get_every_chunk_in_order():
+    flight, upstream = SingleFlight(enabled=True), Upstream()
+
+    results = await asyncio.gather(*(subscribe(flight, upstream, f"s{index}") for index in range(5)))
+
+    assert upstream.starts == 1
+    assert all(received == CHUNKS for received, _ in results)
+    assert upstream.owners == [f"s{index}" for index in range(5)]
+    assert flight.get_stats() == {"flights": 1, "coalesced": 4, "in_flight": 0}
+
+
+async def test_late_subscriber_gets_the_chunks_it_missed():
+    flight, upstream = SingleFlight(enabled=True), Upstream()
+
+    early = asyncio.create_task(subscribe(flight, upstream))
+    await asyncio.sleep(0.04)
+    late, _ = await subscribe(flight, upstream)
+
+    assert late == CHUNKS
+    assert (await early)[0] == CHUNKS
+    assert upstream.starts == 1
+
+
+async def test_slow_subscriber_does_not_hold_back_the_others():
+    flight, upstream = SingleFlight(enabled=True), Upstream()
+
+    (fast, fast_seconds), (slow, slow_seconds) = await asyncio.gather(
+        subscribe(flight, upstream), subscribe(flight, upstream, slow=0.02)
+    )
+
+    assert fast == slow == CHUNKS
+    # The fast reader finishes at the upstream's pace, not the slow reader's
+    assert fast_seconds < 20 * 0.02 / 2
+    assert slow_seconds >= 20 * 0.02
+
+
+async def test_cancelled_subscriber_leaves_the_others_listening():
+    flight, upstream = SingleFlight(enabled=True), Upstream()
+
+    (left, _), (stayed, _) = await asyncio.gather(
+        subscribe(flight, upstream, stop_after=3), subscribe(flight, upstream)
+    )
+
+    assert left == CHUNKS[:3]
+    assert stayed == CHUNKS
+    assert upstream.sent == len(CHUNKS)
+
+
+async def test_upstream_stops_when_every_subscriber_left():
+    flight, upstream = SingleFlight(enabled=True), Upstream()
+
+    await asyncio.gather(subscribe(flight, upstream, stop_after=3), subscribe(flight, upstream, stop_after=5))
+    await asyncio.sleep(0.03)
+
+    assert upstream.sent < len(CHUNKS)
+    assert flight.get_stats()["in_flight"] == 0
+
+
+async def test_upstream_error_reaches_every_subscriber():
+    flight, upstream = SingleFlight(enabled=True), Upstream(fail_after=2)
+
+    results = await asyncio.gather(
+        subscribe(flight, upstream), subscribe(flight, upstream), return_exceptions=True
+    )
+
+    assert [str(result) for result in results] == ["upstream failed"] * 2
+
+
+async def test_disabled_starts_one_upstream_per_request():
+    flight, upstream = SingleFlight(enabled=False), Upstream()
+
+    await asyncio.gather(subscribe(flight, upstream), subscribe(flight, upstream))
+
+    assert upstream.starts == 2
+
+
+@pytest.mark.parametrize("model_name", ["gemini-2.5-flash", "gpt-4o-mini"])
+async def test_duplicate_requests_cost_one_call_charged_to_every_session(
+    chat_service, gemini, openai, model_name
+):
+    gemini.ttft = openai.ttft = 0.05
+    sessions = [f"s{index}" for index in range(3)]
+
+    results = await asyncio.gather(*(
+        collect(chat_service.stream_events("Здравей", model_name, session_id)) for session_id in sessions
+    ))
+
+    provider = gemini if model_name.startswith("gemini") else openai
+    assert len(provider.calls) == 1
+    assert len({answer_text(events) for events in results}) == 1
+    # The provider's counts are split between the sessions, not charged to the first one
+    usage = [chat_service.usage.get_session_usage(session_id) for session_id in sessions]
+    total = chat_service.usage.get_stats()["total"]
+    assert all(session["output_tokens"] > 0 for session in usage)
+    assert sum(session["input_tokens"] for session in usage) == total["input_tokens"]
+    assert sum(session["output_tokens"] for session in usage) == provider.parts
+
+
+@pytest.mark.parametrize("model_name", ["gemini-2.5-flash", "gpt-4o-mini"])
+async def test_requests_differing_in_case_or_spacing_are_not_coalesced(chat_service, gemini, openai, model_name):
+    gemini.ttft = openai.ttft = 0.05
+    messages = ["Здравей", "здравей", "Здравей  "]
+
+    await asyncio.gather(*(
+        collect(chat_service.stream_events(message, model_name, f"s{index}"))
+        for index, message in enumerate(messages)
+    ))
+
+    provider = gemini if model_name.startswith("gemini") else openai
+    assert len(provider.calls) == 3
@@ -0,0 +1,74 @@
+"""Merging text deltas into fewer SSE frames."""
+
+import asyncio
+import time
+import pytest
+from routes.chat import _coalesce
+
+pytestmark = pytest.mark.anyio
+
+
+async def events(plan):
+    """Yield each event after its delay."""
+    for delay, event in plan:
+        await asyncio.sleep(delay)
+        yield event
+
+
+async def timed(plan, **kwargs):
+    """Coalesce a plan; returns (seconds since start, event) pairs."""
+    started = time.perf_counter()
+    return [(time.perf_counter() - started, event) async for event in _coalesce(events(plan), **kwargs)]
+
+
+async def test_first_text_goes_out_immediately():
+    plan = [(0.02, {"text": "a"})] + [(0.001, {"text": "b"})] * 10 + [(0, {"done": True})]
+
+    output = await timed(plan, window=0.5, max_bytes=1024)
+
+    first_at, first = output[0]
+    assert first == {"text": "a"}
+    assert first_at < 0.1
+    # The rest is held for the window and then sent as one frame
+    assert [event for _, event in output[1:]] == [{"text": "b" * 10}, {"done": True}]
+
+
+async def test_text_is_released_when_the_window_passes():
+    plan = [(0, {"text": "a"})] + [(0.002, {"text": "b"})] * 5 + [(0.15, {"text": "c"}), (0, {"done": True})]
+
+    output = await timed(plan, window=0.03, max_bytes=1024)
+
+    events_out = [event for _, event in output]
+    assert events_out == [{"text": "a"}, {"text": "bbbbb"}, {"text": "c"}, {"done": True}]
+    # "bbbbb" left after the window, not when the provider spoke again
+    assert output[1][0] < 0.1
+
+
+async def test_text_is_released_at_the_byte_threshold():
+    plan = [(0, {"text": "x" * 10})] * 10 + [(0, {"done": True})]
+
+    output = await timed(plan, window=5, max_bytes=25)
+
+    sizes = [len(event["text"]) for _, event in output if "text" in event]
+    assert sum(sizes) == 100
+    assert sizes[0] == 10
+    assert all(size <= 30 for size in sizes[1:])
+    assert output[-1][0] < 1
+
+
+async def test_non_text_events_keep_their_place():
+    plan = [(0, {"text": "a"}), (0, {"text": "b"}), (0, {"text": "c"}), (0, {"error": "boom"})]
+
+    output = await timed(plan, window=1, max_bytes=1024)
+
+    assert [event for _, event in output] == [{"text": "a"}, {"text": "bc"}, {"error": "boom"}]
+
+
+async def test_closing_early_stops_the_reader():
+    coalesced = _coalesce(events([(0, {"text": "a"})] + [(0.01, {"text": "b"})] * 100))
+    before = len(asyncio.all_tasks())
+
+    assert await coalesced.__anext__() == {"text": "a"}
+    await coalesced.aclose()
+
+    assert len(asyncio.all_tasks()) <= before
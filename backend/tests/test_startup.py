@@ -0,0 +1,62 @@
+"""Cold start: importing the app loads no provider SDK, and /ready tracks the warm-up."""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import httpx
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_importing_the_app_loads_no_provider_sdk():
+    code = (
+        "import json, sys, main; "
+        "print(json.dumps([name in sys.modules for name in ('google.generativeai', 'openai', 'langchain_core')]))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True, timeout=60
+    ).stdout
+
+    assert json.loads(output.splitlines()[-1]) == [False, False, False]
+
+
+@pytest.fixture
+async def client():
+    """Client of the app without its lifespan, so the test controls the warm-up."""
+    from main import app
+
+    previous = getattr(app.state, "warm_up", None)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client, app
+    app.state.warm_up = previous
+
+
+async def test_ready_is_503_until_the_warm_up_finishes(client):
+    client, app = client
+    app.state.warm_up = asyncio.get_running_loop().create_future()
+
+    starting = await client.get("/ready")
+    app.state.warm_up.set_result(None)
+    ready = await client.get("/ready")
+
+    assert starting.status_code == 503
+    assert starting.json()["status"] == "starting"
+    assert ready.status_code == 200
+    assert ready.json()["status"] == "ready"
+    assert set(ready.json()["sdks"]) == {"google", "openai"}
+
+
+async def test_failed_warm_up_still_serves(client):
+    client, app = client
+    app.state.warm_up = asyncio.get_running_loop().create_future()
+    app.state.warm_up.set_exception(ImportError("no module named google.generativeai"))
+
+    response = await client.get("/ready")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "degraded"
@@ -0,0 +1,144 @@
+"""Stream cancellation within one worker and across worker processes."""
+
+import asyncio
+import threading
+import pytest
+from services.stream_registry import SharedStreamTable, StreamRegistry
+from tests.fakes import FakeStream
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two registries sharing one table, as two worker processes would."""
+    path = str(tmp_path / "streams.db")
+    registries = [StreamRegistry(SharedStreamTable(path), poll_interval=0.01) for _ in range(2)]
+    yield registries
+    for registry in registries:
+        registry.close()
+
+
+async def test_cancel_stops_the_upstream_read_at_once():
+    registry = StreamRegistry()
+    handle = registry.register("s1", "stream-1")
+    upstream = FakeStream([f"t{index}" for index in range(100)], 0, 0.05, lambda text, last: text)
+    chunks = []
+
+    async def read():
+        async for chunk in handle.iterate(upstream):
+            chunks.append(chunk)
+
+    reader = asyncio.create_task(read())
+    await asyncio.sleep(0.12)
+    assert await registry.cancel("stream-1") is True
+    await asyncio.wait_for(reader, 0.05)
+
+    assert 1 <= len(chunks) < 5
+    assert upstream.closed
+    assert await registry.cancel("unknown") is False
+
+
+async def test_cancel_wakes_a_read_waiting_for_the_first_chunk():
+    handle = StreamRegistry().register("s1", "stream-1")
+    upstream = FakeStream(["t0"], 60, 0, lambda text, last: text)  # The provider has not answered yet
+
+    async def read():
+        return [chunk async for chunk in handle.iterate(upstream)]
+
+    reader = asyncio.create_task(read())
+    await asyncio.sleep(0.01)
+    handle.cancel()
+
+    assert await asyncio.wait_for(reader, 0.05) == []
+    assert upstream.closed
+
+
+async def test_finished_upstream_is_closed():
+    handle = StreamRegistry().register("s1", "stream-1")
+    upstream = FakeStream(["t0", "t1"], 0, 0, lambda text, last: text)
+
+    chunks = [chunk async for chunk in handle.iterate(upstream)]
+
+    assert chunks == ["t0", "t1"]
+    assert upstream.closed
+    assert not handle.cancelled
+
+
+async def test_session_cancel_leaves_other_sessions_streaming():
+    registry = StreamRegistry()
+    first = registry.register("s1", "first")
+    second = registry.register("s1", "second")
+    other = registry.register("s2", "other")
+
+    assert sorted(await registry.cancel_session("s1")) == ["first", "second"]
+
+    assert first.cancelled and second.cancelled
+    assert not other.cancelled
+    assert await registry.cancel_session("unknown") == []
+
+
+async def test_cancel_reaches_the_worker_serving_the_stream(workers):
+    first, second = workers
+    handle = first.register("s1", "stream-1")
+    first.start()
+
+    assert await second.cancel("stream-1") is True
+    await asyncio.sleep(0.05)
+
+    assert handle.cancelled
+    assert await second.cancel("unknown") is False
+
+
+async def test_session_cancel_covers_every_worker(workers):
+    first, second = workers
+    local = second.register("s1", "local")
+    remote = first.register("s1", "remote")
+    other = first.register("s2", "other")
+    first.start()
+
+    assert sorted(await second.cancel_session("s1")) == ["local", "remote"]
+    await asyncio.sleep(0.05)
+
+    assert local.cancelled and remote.cancelled
+    assert not other.cancelled
+
+
+async def test_finished_and_closed_streams_leave_the_table(workers):
+    first, second = workers
+    first.register("s1", "done")
+    first.unregister("done")
+    second.register("s1", "open")
+
+    assert await first.cancel("done") is False
+    assert await second._call(second.shared.is_active, "open")
+    second.close()
+    assert await first.cancel("open") is False
+
+
+async def test_shared_table_is_used_off_the_event_loop(workers):
+    first, second = workers
+    loop_thread = threading.current_thread()
+    threads = []
+    for name in ("add", "remove", "is_active", "remote_streams", "poll"):
+        method = getattr(first.shared, name)
+        setattr(first.shared, name, _recording(method, threads))
+    first.start()
+
+    first.register("s1", "stream-1")
+    await first.cancel("elsewhere")
+    await first.cancel_session("s1")
+    first.unregister("stream-1")
+    await asyncio.sleep(0.05)
+
+    assert len(threads) >= 5
+    assert loop_thread not in threads
+    # One thread, so the table's calls keep their order
+    assert len(set(threads)) == 1
+
+
+def _recording(method, threads: list):
+    def call(*args):
+        threads.append(threading.current_thread())
+        return method(*args)
+    return call
@@ -0,0 +1,131 @@
+"""Replay buffers: resuming with Last-Event-ID, the grace period, eviction and clients that fall behind."""
+
+import asyncio
+import time
+import pytest
+from services.stream_replay import GONE_FRAME, StreamReplay
+
+pytestmark = pytest.mark.anyio
+
+
+async def frames(count: int, delay: float = 0, gate: asyncio.Event = None):
+    """SSE frames "data: 0" to "data: count-1", held back by the gate until it opens."""
+    for index in range(count):
+        if gate is not None:
+            await gate.wait()
+        if delay:
+            await asyncio.sleep(delay)
+        yield f"data: {index}\n\n"
+
+
+async def read(stream) -> list:
+    return [frame async for frame in stream]
+
+
+def replay(**kwargs):
+    cancelled = []
+    service = StreamReplay(lambda stream_id: cancelled.append(stream_id) or True, **kwargs)
+    return service, cancelled
+
+
+async def test_frames_are_numbered_for_last_event_id():
+    service, _ = replay()
+    buffer = service.start("s1", frames(3))
+
+    received = await read(service.follow(buffer))
+
+    assert received == [f"id: {index}\ndata: {index}\n\n" for index in range(3)]
+
+
+async def test_resume_continues_after_the_last_event():
+    service, _ = replay()
+    buffer = service.start("s1", frames(5))
+    await buffer.task
+
+    received = await read(service.follow(service.get("s1"), after=2))
+
+    assert received == ["id: 3\ndata: 3\n\n", "id: 4\ndata: 4\n\n"]
+
+
+async def test_generation_outlives_a_dropped_connection():
+    service, cancelled = replay(grace=1)
+    gate = asyncio.Event()
+    buffer = service.start("s1", frames(4, gate=gate))
+    first = service.follow(buffer)
+    gate.set()
+    await first.__anext__()
+    await first.aclose()  # The connection drops after one frame
+
+    resumed = await read(service.follow(buffer, after=0))
+
+    assert [frame.split("\n")[0] for frame in resumed] == ["id: 1", "id: 2", "id: 3"]
+    assert cancelled == []
+    assert service.get_stats()["abandoned"] == 0
+
+
+async def test_stream_is_cancelled_when_no_client_comes_back():
+    service, cancelled = replay(grace=0.05)
+    service.start("s1", frames(2, gate=asyncio.Event()))  # The client left before reading
+
+    await asyncio.sleep(0.1)
+
+    assert cancelled == ["s1"]
+    assert service.get_stats()["abandoned"] == 1
+    await service.aclose()
+
+
+async def test_finished_streams_are_evicted():
+    service, _ = replay(ttl=0.05)
+    for stream_id in ("old", "new"):
+        await service.start(stream_id, frames(2)).task
+    assert service.get("old") is not None
+
+    await asyncio.sleep(0.1)
+
+    assert service.get("old") is None
+    assert service.get("new") is None
+    assert service.get_bytes() == 0
+    assert service.get_stats()["evicted"] == 2
+
+
+async def test_oldest_streams_go_first_over_the_size_cap():
+    service, _ = replay(max_total_bytes=100)
+    for stream_id in ("s1", "s2", "s3"):
+        await service.start(stream_id, frames(4)).task
+
+    assert service.get("s1") is None
+    assert service.get("s3") is not None
+    assert service.get_bytes() <= 100
+
+
+async def test_client_behind_the_buffer_gets_an_error_frame():
+    service, _ = replay(max_stream_bytes=40)
+    buffer = service.start("s1", frames(10, delay=0.001))
+    follower = service.follow(buffer)
+    first = await follower.__anext__()
+    await buffer.task  # The buffer keeps only the last frames meanwhile
+
+    rest = await read(follower)
+
+    assert first.startswith("id: 0\n")
+    assert rest == [GONE_FRAME]
+
+
+async def test_waiting_client_wakes_on_the_next_frame():
+    service, _ = replay()
+    gate = asyncio.Event()
+    buffer = service.start("s1", frames(2, gate=gate))
+    await asyncio.sleep(0)  # The generation waits for the provider
+
+    async def never_disconnected():
+        return False
+
+    started = time.perf_counter()
+    reader = asyncio.create_task(read(service.follow(buffer, disconnected=never_disconnected, poll_interval=5)))
+    # The first frame comes right after the client starts waiting
+    gate.set()
+    received = await asyncio.wait_for(reader, 2)
+
+    assert len(received) == 2
+    # Frames added while the wait was being scheduled must not leave it for the poll interval
+    assert time.perf_counter() - started < 1
@@ -0,0 +1,84 @@
+"""Rolling summarization of old turns, with a stub summarizer."""
+
+import asyncio
+import pytest
+from services.memory_service import ConversationMemoryManager
+from services.context_builder import ContextBuilder
+from services.summary_service import SummaryService
+from tests.fakes import StubSummarizer
+
+pytestmark = pytest.mark.anyio
+
+
+def make_service(model_service, mode="summarize"):
+    memory = ConversationMemoryManager()
+    summary_service = SummaryService(model_service, memory, mode=mode, trigger_turns=10, keep_turns=4)
+    summary_service.summarize = StubSummarizer(summary_chars=100)
+    return memory, ContextBuilder(memory, model_service), summary_service
+
+
+async def drain(summary_service):
+    while summary_service._tasks:
+        await asyncio.gather(*summary_service._tasks)
+
+
+async def test_old_turns_are_folded_into_the_summary(model_service):
+    memory, builder, summary_service = make_service(model_service)
+    for index in range(11):
+        memory.add_message("s", "user", f"m{index}")
+    summary_service.maybe_schedule("s")
+    await drain(summary_service)
+
+    assert summary_service.summarize.calls == 1
+    assert [content for _, content in memory.get_turns("s")] == ["m7", "m8", "m9", "m10"]
+    prompt, turns = builder.build_gemini_prompt("s", "gemini-2.5-flash")
+    assert prompt.startswith("Summary of the earlier conversation: summary")
+    assert turns == 5
+
+
+async def test_turns_added_while_summarizing_are_kept(model_service):
+    memory, _, summary_service = make_service(model_service)
+    summary_service.summarize.delay = 0.05
+    for index in range(11):
+        memory.add_message("s", "user", f"m{index}")
+    summary_service.maybe_schedule("s")
+    await asyncio.sleep(0.01)
+    memory.add_message("s", "assistant", "late")
+    await drain(summary_service)
+
+    assert [content for _, content in memory.get_turns("s")] == ["m7", "m8", "m9", "m10", "late"]
+
+
+async def test_summary_is_dropped_when_the_session_was_cleared_meanwhile(model_service):
+    memory, _, summary_service = make_service(model_service)
+    summary_service.summarize.delay = 0.05
+    for index in range(11):
+        memory.add_message("s", "user", f"m{index}")
+    summary_service.maybe_schedule("s")
+    await asyncio.sleep(0.01)
+    memory.clear_session("s")
+    memory.add_message("s", "user", "fresh")
+    await drain(summary_service)
+
+    assert memory.get_turns("s") == [("user", "fresh")]
+    assert memory.get_summary("s") is None
+
+
+async def test_truncate_mode_never_summarizes(model_service):
+    memory, _, summary_service = make_service(model_service, mode="truncate")
+    for index in range(50):
+        memory.add_message("s", "user", f"m{index}")
+        summary_service.maybe_schedule("s")
+    await drain(summary_service)
+
+    assert summary_service.summarize.calls == 0
+
+
+async def test_summary_model_is_called_through_the_provider(model_service, gemini):
+    memory = ConversationMemoryManager()
+    summary_service = SummaryService(model_service, memory, mode="summarize", model_name="gemini-2.5-flash-lite")
+
+    summary = await summary_service.summarize(None, [("user", "hi"), ("assistant", "hello")], "s")
+    assert summary.startswith("answer:")
+    assert gemini.calls[-1]["model"] == "gemini-2.5-flash-lite"
+    assert "User: hi\nAssistant: hello" in gemini.calls[-1]["prompt"]
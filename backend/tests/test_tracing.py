@@ -0,0 +1,149 @@
+"""Request tracing: sampling, span parenting, OTLP export and the middleware."""
+
+import asyncio
+import json
+import httpx
+import pytest
+from fastapi import FastAPI
+import tracing
+
+pytestmark = pytest.mark.anyio
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def exported(tmp_path):
+    """Export spans to a JSONL file; returns a function that stops the exporter and reads the spans."""
+    path = tmp_path / "traces.jsonl"
+    tracing.setup_tracing(str(path), "nova-test")
+
+    def read() -> list:
+        tracing.shutdown_tracing()
+        if not path.exists():
+            return []
+        return [
+            (batch["resourceSpans"][0]["resource"], span)
+            for line in path.read_text(encoding="utf-8").splitlines()
+            for batch in [json.loads(line)]
+            for span in batch["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        ]
+
+    yield read
+    tracing.shutdown_tracing()
+
+
+def test_sampled_traceparent_continues_the_callers_trace():
+    root = tracing.start_trace("GET /", f"00-{TRACE_ID}-{PARENT_ID}-01", sample_rate=0)
+
+    assert root.trace_id == TRACE_ID
+    assert root.parent_id == PARENT_ID
+    assert root.kind == 2
+    assert root.traceparent() == f"00-{TRACE_ID}-{root.span_id}-01"
+
+
+@pytest.mark.parametrize("traceparent, sample_rate, traced", [
+    (f"00-{TRACE_ID}-{PARENT_ID}-00", 1, False),  # The caller decided not to sample
+    ("00-short-id-01", 0, False),  # Malformed headers fall back to the sample rate
+    ("garbage", 1, True),
+    (None, 0, False),
+    (None, 1, True),
+])
+def test_requests_without_a_sampled_parent_follow_the_sample_rate(traceparent, sample_rate, traced):
+    root = tracing.start_trace("GET /", traceparent, sample_rate=sample_rate)
+
+    assert bool(root) is traced
+    if traced:
+        assert len(root.trace_id) == 32 and root.parent_id is None
+
+
+async def test_spans_nest_through_the_context_and_into_tasks():
+    assert tracing.span("outside") is tracing.NOOP_SPAN
+    assert tracing.start_span("outside") is tracing.NOOP_SPAN
+
+    root = tracing.start_trace("GET /", sample_rate=1)
+    with root:
+        with tracing.span("outer", step=1) as outer:
+            inner = tracing.span("inner")
+            streaming = tracing.start_span("stream")
+            assert tracing.current_span() is outer
+        in_task = await asyncio.create_task(_child_in_task())
+
+    assert outer.parent_id == root.span_id
+    assert inner.parent_id == streaming.parent_id == outer.span_id
+    assert in_task.parent_id == root.span_id
+    assert {span.trace_id for span in (outer, inner, streaming, in_task)} == {root.trace_id}
+    assert tracing.current_span() is tracing.NOOP_SPAN
+    assert outer.end_ns is not None and streaming.end_ns is None
+
+
+async def _child_in_task():
+    with tracing.span("task") as child:
+        return child
+
+
+def test_failed_block_marks_its_span():
+    root = tracing.start_trace("GET /", sample_rate=1)
+
+    with pytest.raises(ValueError):
+        with root:
+            with tracing.span("model.resolve") as failed:
+                raise ValueError("unknown model")
+
+    assert failed.status == root.status == tracing.STATUS_ERROR
+    assert failed.attributes["error.type"] == "ValueError"
+    assert failed.attributes["error.message"] == "unknown model"
+
+
+def test_spans_are_exported_as_otlp_json(exported):
+    root = tracing.start_trace("POST /api/chat/stream", sample_rate=1)
+    with root:
+        with tracing.span("prompt.build", turns=3, cached=True, ratio=0.5, provider="google"):
+            pass
+
+    (resource, child), (_, parent) = exported()
+
+    assert resource == {"attributes": [{"key": "service.name", "value": {"stringValue": "nova-test"}}]}
+    assert child["parentSpanId"] == parent["spanId"] == root.span_id
+    assert "parentSpanId" not in parent
+    assert child["traceId"] == parent["traceId"] == root.trace_id
+    assert (child["kind"], parent["kind"]) == (1, 2)
+    assert child["attributes"] == [
+        {"key": "turns", "value": {"intValue": "3"}},
+        {"key": "cached", "value": {"boolValue": True}},
+        {"key": "ratio", "value": {"doubleValue": 0.5}},
+        {"key": "provider", "value": {"stringValue": "google"}},
+    ]
+    assert int(child["startTimeUnixNano"]) <= int(child["endTimeUnixNano"])
+    assert child["status"] == {"code": tracing.STATUS_OK}
+
+
+def test_nothing_is_exported_without_a_target():
+    tracing.setup_tracing("")
+
+    assert tracing._exporter is None
+
+
+async def test_middleware_traces_sampled_requests_by_route(exported):
+    app = FastAPI()
+
+    @app.get("/api/sessions/{session_id}")
+    async def get_session(session_id: str):
+        with tracing.span("memory.load"):
+            return {"session_id": session_id}
+
+    transport = httpx.ASGITransport(app=tracing.TracingMiddleware(app))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        traced = await client.get("/api/sessions/s1", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+        untraced = await client.get("/api/sessions/s2", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-00"})
+
+    spans = {span["name"]: span for _, span in exported()}
+    assert traced.headers["traceparent"].startswith(f"00-{TRACE_ID}-")
+    assert "traceparent" not in untraced.headers
+    assert set(spans) == {"memory.load", "GET /api/sessions/{session_id}"}
+    root = spans["GET /api/sessions/{session_id}"]
+    assert root["parentSpanId"] == PARENT_ID
+    assert traced.headers["traceparent"] == f"00-{TRACE_ID}-{root['spanId']}-01"
+    assert {"key": "http.status_code", "value": {"intValue": "200"}} in root["attributes"]
+    assert spans["memory.load"]["parentSpanId"] == root["spanId"]
@@ -0,0 +1,114 @@
+"""Token usage accounting, the usage log and per-session budgets."""
+
+import asyncio
+import json
+import pytest
+from services.usage_service import UsageTracker, gemini_usage, openai_usage
+from tests.conftest import collect
+
+pytestmark = pytest.mark.anyio
+
+
+def test_records_add_up_per_session_model_and_total():
+    usage = UsageTracker(log_path="")
+
+    usage.record("s1", "gpt-4o-mini", (1000, 200, 400))
+    usage.record("s1", "gemini-2.5-flash", (500, 100, 0))
+    usage.record("s2", "gpt-4o-mini", (10, 5, 0), estimated=True)
+
+    session = usage.get_session_usage("s1")
+    assert session["requests"] == 2
+    assert session["input_tokens"] == 1500
+    assert session["output_tokens"] == 300
+    assert session["cached_tokens"] == 400
+    # 600 uncached and 400 cached input tokens, 200 output tokens
+    expected = (600 * 0.15 + 400 * 0.075 + 200 * 0.60 + 500 * 0.30 + 100 * 2.50) / 1_000_000
+    assert session["cost_usd"] == pytest.approx(expected)
+    stats = usage.get_stats()
+    assert stats["total"]["requests"] == 3
+    assert stats["total"]["estimated_requests"] == 1
+    assert stats["models"]["gpt-4o-mini"]["input_tokens"] == 1010
+    assert usage.get_session_usage("unknown") is None
+
+
+def test_provider_usage_objects_are_read():
+    class Details:
+        cached_tokens = 7
+
+    class OpenAIUsage:
+        prompt_tokens, completion_tokens, prompt_tokens_details = 30, 5, Details()
+
+    class GeminiMetadata:
+        prompt_token_count, candidates_token_count, cached_content_token_count = 40, 6, 0
+
+    assert openai_usage(OpenAIUsage()) == (30, 5, 7)
+    assert gemini_usage(GeminiMetadata()) == (40, 6, 0)
+    assert openai_usage(None) is None
+
+
+def test_over_budget_sessions_are_downgraded_within_their_provider():
+    usage = UsageTracker(log_path="", token_budget=1000)
+    usage.record("s1", "gpt-4o", (900, 200, 0))
+
+    assert usage.apply_budget("s1", "gpt-4o", "openai") == "gpt-4o-mini"
+    assert usage.apply_budget("s1", "gemini-2.5-pro", "google") == "gemini-2.5-flash-lite"
+    assert usage.apply_budget("s2", "gpt-4o", "openai") == "gpt-4o"
+    assert usage.get_stats()["downgrades"] == 2
+
+
+def test_session_totals_are_bounded():
+    usage = UsageTracker(log_path="", max_sessions=3)
+    for index in range(5):
+        usage.record(f"s{index}", "gpt-4o-mini", (1, 1, 0))
+
+    assert usage.get_stats()["sessions"] == 3
+    assert usage.get_session_usage("s0") is None
+    assert usage.get_stats()["total"]["requests"] == 5
+
+
+def test_nothing_is_queued_without_a_usage_log():
+    usage = UsageTracker(log_path="")
+    for index in range(3):
+        usage.record(f"s{index}", "gpt-4o-mini", (10, 2, 0))
+
+    assert usage._pending == {}
+    assert usage.get_stats()["total"]["requests"] == 3
+
+
+async def test_flush_appends_only_new_usage(tmp_path):
+    path = tmp_path / "usage.jsonl"
+    usage = UsageTracker(log_path=str(path))
+
+    usage.record("s1", "gpt-4o-mini", (10, 2, 0))
+    usage.record("s1", "gpt-4o-mini", (20, 3, 0))
+    await usage.flush()
+    usage.record("s2", "gemini-2.5-flash", (5, 1, 0))
+    await usage.aclose()
+
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [(line["session_id"], line["requests"], line["input_tokens"]) for line in lines] == [
+        ("s1", 2, 30), ("s2", 1, 5),
+    ]
+
+
+async def test_chat_records_reported_usage(chat_service):
+    await collect(chat_service.stream_events("Здравей", "gpt-4o-mini", "s1"))
+
+    session = chat_service.usage.get_session_usage("s1")
+    assert session["requests"] == 1
+    assert session["output_tokens"] == 20
+    assert session["estimated_requests"] == 0
+
+
+async def test_cancelled_chat_records_estimated_usage(chat_service, gemini):
+    gemini.delay = 0.05
+    events = chat_service.stream_events("Здравей", "gemini-2.5-flash", "s1", "stream-1")
+
+    assert "text" in await events.__anext__()
+    await chat_service.cancel_stream("stream-1")
+    await collect(events)
+    await asyncio.sleep(0.01)
+
+    session = chat_service.usage.get_session_usage("s1")
+    assert session["estimated_requests"] == 1
+    assert session["input_tokens"] > 0
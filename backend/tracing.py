@@ -0,0 +1,362 @@
+"""Opt-in request tracing with OpenTelemetry-compatible spans."""
+
+import atexit
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import List, Optional
+from config import TRACING_SAMPLE_RATE, TRACING_EXPORT, TRACING_SERVICE_NAME
+from logger import get_logger
+
+logger = get_logger("tracing")
+
+# Span status codes of the OTLP format
+STATUS_OK = 1
+STATUS_ERROR = 2
+# Valid W3C trace-flags values and their bits
+_TRACE_FLAGS = {f"{flags:02x}": flags for flags in range(256)}
+# Spans written per export batch
+_BATCH_SIZE = 512
+
+# Span currently active in this task; tasks inherit it when they are created
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("nova_span", default=None)
+_exporter: Optional["_Exporter"] = None
+
+
+class Span:
+    """
+    A timed operation of a traced request.
+
+    Used as a context manager it becomes the parent of spans started
+    inside the block. Spans that stay open across `yield`s are started
+    with start_span() and ended explicitly instead.
+    """
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_id",
+        "start_ns", "end_ns", "attributes", "status", "kind", "_token",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        start_ns: Optional[int] = None,
+        attributes: Optional[dict] = None
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+        self.status = STATUS_OK
+        self.kind = 1  # INTERNAL; request spans are SERVER (2)
+        self._token = None
+
+    def __bool__(self) -> bool:
+        return True
+
+    def child(self, name: str, start_ns: Optional[int] = None, **attributes) -> "Span":
+        """Start a span below this one."""
+        return Span(name, self.trace_id, self.span_id, start_ns, attributes)
+
+    def set(self, **attributes):
+        """Add attributes to the span."""
+        self.attributes.update(attributes)
+
+    def fail(self, error: BaseException):
+        """Mark the span as failed."""
+        self.status = STATUS_ERROR
+        self.attributes["error.type"] = type(error).__name__
+        self.attributes["error.message"] = str(error)
+
+    def end(self):
+        """End the span and queue it for export; later calls are ignored."""
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            if _exporter is not None:
+                _exporter.queue.put(self)
+
+    def traceparent(self) -> str:
+        """W3C traceparent header value pointing at this span."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_otlp(self) -> dict:
+        """Convert to the OTLP/JSON span representation."""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.reset(self._token)
+        if exc is not None and not isinstance(exc, GeneratorExit):
+            self.fail(exc)
+        self.end()
+        return False
+
+
+class _NoopSpan:
+    """Stands in for a span when the request is not traced; every call is a no-op."""
+
+    __slots__ = ()
+
+    def __bool__(self) -> bool:
+        return False
+
+    def child(self, name: str, start_ns: Optional[int] = None, **attributes) -> "_NoopSpan":
+        return self
+
+    def set(self, **attributes):
+        pass
+
+    def fail(self, error: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_attribute(key: str, value) -> dict:
+    """Convert an attribute to the OTLP/JSON key-value form."""
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def current_span():
+    """Get the active span, or the no-op span outside a traced request."""
+    return _current.get() or NOOP_SPAN
+
+
+def span(name: str, **attributes):
+    """
+    Start a span below the active one, for use in a `with` block.
+
+    Outside a traced request this returns the shared no-op span, so the
+    cost of an untraced request is one context variable lookup.
+
+    Args:
+        name: Operation name, e.g. "model.resolve"
+        **attributes: Span attributes
+
+    Returns:
+        A span (or no-op span) that is active inside the block
+    """
+    parent = _current.get()
+    if parent is None:
+        return NOOP_SPAN
+    return parent.child(name, **attributes)
+
+
+def start_span(name: str, start_ns: Optional[int] = None, **attributes):
+    """
+    Start a span below the active one without making it active.
+
+    For operations that span `yield`s, such as streaming. The caller
+    ends it with end().
+
+    Args:
+        name: Operation name
+        start_ns: Start time in epoch nanoseconds, defaults to now
+        **attributes: Span attributes
+
+    Returns:
+        A span, or the no-op span outside a traced request
+    """
+    parent = _current.get()
+    if parent is None:
+        return NOOP_SPAN
+    return parent.child(name, start_ns, **attributes)
+
+
+def start_trace(name: str, traceparent: Optional[str] = None, sample_rate: float = TRACING_SAMPLE_RATE):
+    """
+    Start the root span of a request if it is sampled.
+
+    A W3C traceparent header from the caller is honoured: its trace is
+    continued when the caller sampled it and skipped when it did not.
+
+    Args:
+        name: Root span name
+        traceparent: Incoming traceparent header value, if any
+        sample_rate: Share of requests without a traceparent that are traced
+
+    Returns:
+        The root span, or the no-op span for unsampled requests
+    """
+    root = None
+    parts = traceparent.split("-") if traceparent else ()
+    if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16 and parts[3] in _TRACE_FLAGS:
+        if not _TRACE_FLAGS[parts[3]] & 1:
+            return NOOP_SPAN
+        root = Span(name, parts[1], parts[2])
+    elif random.random() < sample_rate:
+        root = Span(name, os.urandom(16).hex())
+    if root is None:
+        return NOOP_SPAN
+    root.kind = 2
+    return root
+
+
+class _Exporter:
+    """Background thread writing finished spans to a JSONL file or an OTLP/HTTP collector."""
+
+    def __init__(self, target: str, service_name: str):
+        self.target = target
+        self.resource = {"attributes": [_otlp_attribute("service.name", service_name)]}
+        self.queue: "queue.SimpleQueue[Optional[Span]]" = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name="nova-trace-export", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """Collect spans into batches and export them until stopped."""
+        client = None
+        if self.target.startswith(("http://", "https://")):
+            import httpx
+            client = httpx.Client(timeout=5)
+        running = True
+        while running:
+            batch: List[Span] = []
+            item = self.queue.get()
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= _BATCH_SIZE:
+                    break
+                try:
+                    item = self.queue.get(timeout=1)
+                except queue.Empty:
+                    break
+            running = item is not None
+            if batch:
+                self._export(batch, client)
+        if client is not None:
+            client.close()
+
+    def _export(self, batch: List[Span], client):
+        """Write one batch as an OTLP ExportTraceServiceRequest."""
+        payload = {
+            "resourceSpans": [{
+                "resource": self.resource,
+                "scopeSpans": [{"scope": {"name": "nova"}, "spans": [span.to_otlp() for span in batch]}],
+            }]
+        }
+        try:
+            if client is not None:
+                client.post(self.target, json=payload).raise_for_status()
+            else:
+                with open(self.target, "a", encoding="utf-8") as output:
+                    output.write(json.dumps(payload) + "\n")
+        except Exception as e:
+            logger.warning("Failed to export %d spans: %s", len(batch), e)
+
+    def stop(self):
+        """Export the queued spans and stop the thread."""
+        self.queue.put(None)
+        self._thread.join(timeout=10)
+
+
+def setup_tracing(target: str = TRACING_EXPORT, service_name: str = TRACING_SERVICE_NAME):
+    """
+    Start exporting finished spans. Calling it again is a no-op.
+
+    Args:
+        target: JSONL file path, or an OTLP/HTTP JSON endpoint such as
+            http://localhost:4318/v1/traces; empty to export nothing
+        service_name: service.name resource attribute
+    """
+    global _exporter
+    if _exporter is not None:
+        return
+    if not target:
+        logger.warning("Tracing is sampled but TRACING_EXPORT is not set, spans are not exported")
+        return
+    _exporter = _Exporter(target, service_name)
+    atexit.register(shutdown_tracing)
+    logger.info("Tracing %.0f%% of requests to %s", TRACING_SAMPLE_RATE * 100, target)
+
+
+def shutdown_tracing():
+    """Export all finished spans and stop the exporter."""
+    global _exporter
+    if _exporter is not None:
+        _exporter.stop()
+        _exporter = None
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware starting a root span for sampled HTTP requests.
+
+    The span lasts until the response body is fully sent, so a streamed
+    chat response is traced end to end. Its traceparent is returned in
+    the response headers. Only installed when tracing is enabled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        setup_tracing()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for key, value in scope["headers"]:
+            if key == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        root = start_trace(f"{scope['method']} {scope['path']}", traceparent)
+        if not root:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_trace(message):
+            if message["type"] == "http.response.start":
+                root.set(**{"http.status_code": message["status"]})
+                headers = list(message.get("headers", []))
+                headers.append((b"traceparent", root.traceparent().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        root.set(**{"http.method": scope["method"], "http.target": scope["path"]})
+        with root:
+            await self.app(scope, receive, send_with_trace)
+            route = scope.get("route")
+            if route is not None:
+                # Name by the route template so traces group per endpoint
+                root.name = f"{scope['method']} {route.path}"
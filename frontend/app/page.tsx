@@ -37,7 +37,7 @@ export default function Home() {
   } = useModels();
 
   // Streaming chat logic
-  const { sendMessage, stopStream } = useStreamingChat({
+  const { sendMessage, stopStream, prepareSession } = useStreamingChat({
     selectedCompany,
     selectedModel,
     messagesRef,
@@ -77,6 +77,14 @@ export default function Home() {
     await sendMessage(userInput);
   };
 
+  const handleInputChange = (value: string) => {
+    // Първият символ на ново съобщение подготвя сесията в бекенда
+    if (!input && value && !loading) {
+      prepareSession();
+    }
+    setInput(value);
+  };
+
   const handleKeyPress = (e: React.KeyboardEvent) => {
     if (e.key === 'Enter' && !e.shiftKey) {
       e.preventDefault();
@@ -101,7 +109,7 @@ export default function Home() {
             <ChatInput
               input={input}
               loading={loading}
-              onInputChange={setInput}
+              onInputChange={handleInputChange}
               onSendMessage={handleSendMessage}
               onKeyPress={handleKeyPress}
               onStopStream={stopStream}
@@ -1,5 +1,8 @@
 import { useCallback, useRef } from 'react';
 
+// Сесията на разговора в бекенда; чатът и prepare трябва да ползват една и съща
+const SESSION_ID = 'default';
+
 interface UseStreamingChatProps {
   selectedCompany: string;
   selectedModel: string;
@@ -24,6 +27,7 @@ export const useStreamingChat = ({
   onAbort,
 }: UseStreamingChatProps) => {
   const abortControllerRef = useRef<AbortController | null>(null);
+  const streamIdRef = useRef<string | null>(null);
 
   const sendMessage = useCallback(
     async (userInput: string) => {
@@ -45,18 +49,28 @@ export const useStreamingChat = ({
             message: userInput,
             company: selectedCompany,
             model: selectedModel,
+            session_id: SESSION_ID,
           }),
           signal,
         });
 
+        if (response.status === 429 || response.status === 503) {
+          const retryAfter = response.headers.get('Retry-After');
+          throw new Error(
+            `Сървърът е претоварен, опитайте отново след ${retryAfter || 'няколко'} сек.`
+          );
+        }
         if (!response.ok) throw new Error('Грешка при заявката');
 
+        // Запомни ID-то на стрийма, за да може да бъде отменен само той
+        streamIdRef.current = response.headers.get('X-Stream-Id');
+
         console.log('[FRONTEND LOG] Започва стрийма...');
 
         // Добави празното съобщение на бот-а с анимация
         addAssistantMessage(true);
 
-        const reader = response.body?.getReader();
+        let reader = response.body?.getReader();
         const decoder = new TextDecoder();
 
         if (!reader) throw new Error('No reader available');
@@ -64,9 +78,32 @@ export const useStreamingChat = ({
         let totalText = '';
         let buffer = '';
         let chunkCounter = 0;
+        let lastEventId: string | null = null;
+        let pendingEventId: string | null = null;
+        let reconnects = 0;
 
         while (true) {
-          const { done, value } = await reader.read();
+          let chunk: ReadableStreamReadResult<Uint8Array>;
+          try {
+            chunk = await reader.read();
+          } catch (readError) {
+            // Връзката прекъсна: продължи стрийма от последното получено събитие
+            if (signal.aborted || !streamIdRef.current || reconnects >= 3) {
+              throw readError;
+            }
+            reconnects++;
+            console.log('[FRONTEND LOG] Връзката прекъсна, възобновяване...');
+            await new Promise((resolve) => setTimeout(resolve, 1000));
+            const resumed = await fetch(`${apiUrl}/${streamIdRef.current}`, {
+              headers: lastEventId ? { 'Last-Event-ID': lastEventId } : {},
+              signal,
+            });
+            if (!resumed.ok || !resumed.body) throw readError;
+            reader = resumed.body.getReader();
+            buffer = '';
+            continue;
+          }
+          const { done, value } = chunk;
           if (done) break;
 
           buffer += decoder.decode(value, { stream: true });
@@ -76,7 +113,13 @@ export const useStreamingChat = ({
 
           for (const line of lines) {
             const trimmedLine = line.trim();
+            if (trimmedLine.startsWith('id: ')) {
+              pendingEventId = trimmedLine.slice(4);
+              continue;
+            }
             if (trimmedLine.startsWith('data: ')) {
+              // Събитието е получено изцяло едва с реда data
+              lastEventId = pendingEventId;
               const jsonString = trimmedLine.slice(6).trim();
 
               if (!jsonString) continue;
@@ -169,11 +212,28 @@ export const useStreamingChat = ({
       );
       fetch(`${apiBaseUrl}/cancel-stream`, {
         method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ stream_id: streamIdRef.current }),
       }).catch((err) =>
         console.error('[FRONTEND LOG] Грешка при cancel:', err)
       );
     }
   }, []);
 
-  return { sendMessage, stopStream };
+  const prepareSession = useCallback(() => {
+    // Кажи на бекенда, че потребителят пише, за да подготви контекста на сесията
+    const apiBaseUrl = process.env.NEXT_PUBLIC_API_URL!.replace(
+      '/chat/stream',
+      ''
+    );
+    fetch(`${apiBaseUrl}/sessions/${encodeURIComponent(SESSION_ID)}/prepare`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ model: selectedModel }),
+    }).catch((err) =>
+      console.error('[FRONTEND LOG] Грешка при prepare:', err)
+    );
+  }, [selectedModel]);
+
+  return { sendMessage, stopStream, prepareSession };
 };